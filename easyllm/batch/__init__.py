@@ -0,0 +1 @@
+from easyllm.batch.runner import BatchReport, load_checkpoint, run_batch
@@ -0,0 +1,240 @@
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from types import ModuleType
+from typing import Any, Dict, Iterator, Optional, Set, Tuple, Union
+
+from pydantic import BaseModel
+
+from easyllm.clients import load_client
+from easyllm.utils import setup_logger
+
+logger = setup_logger()
+
+
+class BatchReport(BaseModel):
+    requests: int
+    succeeded: int
+    failed: int
+    skipped: int
+    duration: float
+    requests_per_second: float
+    output_tokens: int
+    output_tokens_per_second: float
+
+
+class Checkpoint(BaseModel):
+    # every line before `offset` (starting at byte `position` of the input) is done
+    offset: int = 0
+    position: int = 0
+    # lines after `offset` which are done as well
+    done: Set[int] = set()
+    # size of the output files when the checkpoint was written, later bytes are discarded on resume
+    output_bytes: int = 0
+    failures_bytes: int = 0
+
+
+def load_checkpoint(path: str) -> Optional[Checkpoint]:
+    """Loads the checkpoint of a batch job, returns None if the job was not started yet."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return Checkpoint(**json.load(f))
+
+
+def _save_checkpoint(path: str, checkpoint: Checkpoint) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({**checkpoint.model_dump(), "done": sorted(checkpoint.done)}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_lines(path: str, offset: int, position: int) -> Iterator[Tuple[int, int, bytes]]:
+    """Yields (line number, byte position, line) of the input, starting at line `offset` located at `position`."""
+    with open(path, "rb") as f:
+        f.seek(position)
+        for line in f:
+            yield offset, position, line
+            offset += 1
+            position += len(line)
+
+
+def _call(client: ModuleType, request: Dict[str, Any]) -> Dict[str, Any]:
+    if "messages" in request:
+        return client.ChatCompletion.create(**request)
+    if "input" in request:
+        return client.Embedding.create(**request)
+    return client.Completion.create(**request)
+
+
+def _open_output(path: str, size: int):
+    # discards results written after the last checkpoint, their lines are sent again
+    f = open(path, "ab")
+    f.truncate(size)
+    return f
+
+
+def run_batch(
+    client: Union[str, ModuleType],
+    input_path: str,
+    output_path: str,
+    failures_path: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    concurrency: int = 8,
+    model: Optional[str] = None,
+    checkpoint_interval: float = 5.0,
+    report_interval: float = 10.0,
+    overwrite: bool = False,
+) -> BatchReport:
+    """
+    Runs a JSONL file of requests through a client module and streams the results to `output_path`, keeping
+    `concurrency` requests in flight. Each line contains the keyword arguments of a `ChatCompletion.create` (with
+    `messages`), `Embedding.create` (with `input`) or `Completion.create` (with `prompt`) call and an optional
+    `custom_id`, which is copied to the result together with the line number (`offset`). A `stream` key is ignored,
+    requests are always sent without streaming.
+
+    Results are written in completion order. Failed requests are written to `failures_path` with the error and the
+    original request, e.g. to retry them in a new job. Completed lines are
+    checkpointed every `checkpoint_interval` seconds. If the job is restarted, it resumes after the last
+    checkpoint without sending completed lines again and without duplicating results.
+
+    Args:
+        client (`Union[str, ModuleType]`): The client module or its name, e.g. "huggingface".
+        input_path (`str`): JSONL file with the requests.
+        output_path (`str`): JSONL file the results are written to.
+        failures_path (`str`, *optional*, defaults to None): JSONL file failed requests are written to. Defaults to
+            `<output>.failures.jsonl`.
+        checkpoint_path (`str`, *optional*, defaults to None): Checkpoint file. Defaults to `<output>.checkpoint`.
+        concurrency (`int`, defaults to 8): Number of concurrent requests.
+        model (`str`, *optional*, defaults to None): Model used for requests which do not provide one.
+        checkpoint_interval (`float`, defaults to 5.0): Seconds between checkpoints.
+        report_interval (`float`, defaults to 10.0): Seconds between progress log messages.
+        overwrite (`bool`, defaults to False): Start from scratch if `output_path` exists without a checkpoint.
+    """
+    module = load_client(client) if isinstance(client, str) else client
+    root, _ = os.path.splitext(output_path)
+    failures_path = failures_path or f"{root}.failures.jsonl"
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+
+    checkpoint = load_checkpoint(checkpoint_path)
+    if checkpoint is None:
+        if os.path.exists(output_path) and os.path.getsize(output_path) and not overwrite:
+            raise FileExistsError(f"{output_path} exists without a checkpoint, pass overwrite=True to replace it")
+        checkpoint = Checkpoint()
+    elif checkpoint.offset or checkpoint.done:
+        logger.info("Resuming %s at line %s, %s later lines done", input_path, checkpoint.offset, len(checkpoint.done))
+
+    output = _open_output(output_path, checkpoint.output_bytes)
+    failures = _open_output(failures_path, checkpoint.failures_bytes)
+    # line number -> byte position of the requests in flight
+    inflight: Dict[int, int] = {}
+    pending: Dict["Future[Dict[str, Any]]", Tuple[int, Dict[str, Any], Optional[str]]] = {}
+    done = set(checkpoint.done)
+    next_line = (checkpoint.offset, checkpoint.position)
+    requests = succeeded = failed = skipped = output_tokens = 0
+
+    def save() -> None:
+        output.flush()
+        failures.flush()
+        os.fsync(output.fileno())
+        os.fsync(failures.fileno())
+        offset, position = min(inflight.items()) if inflight else next_line
+        # lines before the first one in flight are covered by the offset
+        done.difference_update([line for line in done if line < offset])
+        _save_checkpoint(
+            checkpoint_path,
+            Checkpoint(
+                offset=offset,
+                position=position,
+                done=done,
+                output_bytes=output.tell(),
+                failures_bytes=failures.tell(),
+            ),
+        )
+
+    def collect(futures) -> None:
+        nonlocal succeeded, failed, output_tokens
+        for future in futures:
+            offset, request, custom_id = pending.pop(future)
+            del inflight[offset]
+            done.add(offset)
+            record: Dict[str, Any] = {"offset": offset}
+            if custom_id is not None:
+                record["custom_id"] = custom_id
+            try:
+                res = future.result()
+            except Exception as e:
+                failed += 1
+                record.update(error=type(e).__name__, message=str(e), request=request)
+                failures.write(json.dumps(record).encode() + b"\n")
+                continue
+            succeeded += 1
+            output_tokens += (res.get("usage") or {}).get("completion_tokens") or 0
+            record["response"] = res
+            output.write(json.dumps(record).encode() + b"\n")
+
+    start = last_checkpoint = last_report = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="easyllm-batch") as executor:
+            for offset, position, line in _read_lines(input_path, checkpoint.offset, checkpoint.position):
+                next_line = (offset + 1, position + len(line))
+                if offset in done:
+                    skipped += 1
+                    continue
+                if not line.strip():
+                    done.add(offset)
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError as e:
+                    done.add(offset)
+                    failed += 1
+                    record = {"offset": offset, "error": type(e).__name__, "message": str(e), "line": line.decode()}
+                    failures.write(json.dumps(record).encode() + b"\n")
+                    continue
+                custom_id = request.pop("custom_id", None)
+                # results are written as complete responses, a streamed one would be a generator
+                request.pop("stream", None)
+                if model is not None:
+                    request = {"model": model, **request}
+                while len(pending) >= concurrency:
+                    collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                inflight[offset] = position
+                pending[executor.submit(_call, module, request)] = (offset, request, custom_id)
+                requests += 1
+
+                now = time.perf_counter()
+                if now - last_checkpoint >= checkpoint_interval:
+                    last_checkpoint = now
+                    save()
+                if now - last_report >= report_interval:
+                    last_report = now
+                    completed = succeeded + failed
+                    logger.info(
+                        "Completed %s requests (%s failed), %.1f req/s, %.1f output tokens/s",
+                        completed,
+                        failed,
+                        completed / (now - start),
+                        output_tokens / (now - start),
+                    )
+            while pending:
+                collect(wait(pending, return_when=FIRST_COMPLETED).done)
+        save()
+    finally:
+        output.close()
+        failures.close()
+
+    duration = time.perf_counter() - start
+    return BatchReport(
+        requests=requests,
+        succeeded=succeeded,
+        failed=failed,
+        skipped=skipped,
+        duration=duration,
+        requests_per_second=(succeeded + failed) / duration if duration else 0.0,
+        output_tokens=output_tokens,
+        output_tokens_per_second=output_tokens / duration if duration else 0.0,
+    )
@@ -0,0 +1,2 @@
+from easyllm.bench.runner import load_requests, run_benchmark, run_request
+from easyllm.bench.stats import BenchmarkReport, format_report
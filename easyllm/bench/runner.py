@@ -0,0 +1,173 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Union
+
+from easyllm.bench.stats import BenchmarkReport, RequestResult, build_report
+from easyllm.clients import client_name, load_client
+from easyllm.utils import setup_logger
+
+logger = setup_logger()
+
+
+def load_requests(path: str) -> List[Dict[str, Any]]:
+    """
+    Loads benchmark requests from a JSONL file. Each line is the keyword arguments of a `ChatCompletion.create`
+    call (with `messages`) or a `Completion.create` call (with `prompt`).
+    """
+    requests = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                requests.append(json.loads(line))
+    if not requests:
+        raise ValueError(f"No requests found in {path}")
+    return requests
+
+
+def _chunk_text(chunk: Dict[str, Any]) -> Optional[str]:
+    """Extracts the generated text of a chat or completion stream chunk."""
+    choices = chunk.get("choices")
+    if not choices:
+        return None
+    choice = choices[0]
+    if "delta" in choice:
+        return choice["delta"].get("content") if isinstance(choice["delta"], dict) else None
+    return choice.get("text")
+
+
+def _chunk_tokens(chunk: Dict[str, Any]) -> Optional[int]:
+    """Returns the generated token count a stream chunk reports in its `usage` or TGI `details`, if any."""
+    usage = chunk.get("usage")
+    if isinstance(usage, dict) and usage.get("completion_tokens") is not None:
+        return usage["completion_tokens"]
+    details = chunk.get("details")
+    if isinstance(details, dict) and details.get("generated_tokens") is not None:
+        return details["generated_tokens"]
+    return None
+
+
+def run_request(
+    client: ModuleType, request: Dict[str, Any], stream: bool, start: Optional[float] = None
+) -> RequestResult:
+    """
+    Sends a single request through the client and measures it. Streamed output tokens are the count reported by the
+    last chunk carrying `usage` or `details`. If no chunk reports one, every chunk with text is counted as one token,
+    which undercounts endpoints sending several tokens per chunk.
+
+    Args:
+        client (`ModuleType`): The client module, e.g. `easyllm.clients.huggingface`.
+        request (`Dict[str, Any]`): Keyword arguments for `ChatCompletion.create` or `Completion.create`. A `stream`
+            key is ignored, `stream` decides.
+        stream (`bool`): Whether to stream the response, required to measure time to first token.
+        start (`float`, *optional*): `time.perf_counter()` timestamp the request was scheduled at. Open-loop runs
+            pass the scheduled arrival so queueing delay is part of the measured latency.
+    """
+    start = time.perf_counter() if start is None else start
+    ttft = None
+    inter_token_latencies = []
+    output_tokens = 0
+    # OpenAI request files may set `stream`, the benchmark mode overrides it
+    request = {key: value for key, value in request.items() if key != "stream"}
+    try:
+        resource = client.ChatCompletion if "messages" in request else client.Completion
+        if stream:
+            last = None
+            reported = None
+            for chunk in resource.create(**request, stream=True):
+                tokens = _chunk_tokens(chunk)
+                if tokens is not None:
+                    reported = tokens
+                if not _chunk_text(chunk):
+                    continue
+                now = time.perf_counter()
+                if last is None:
+                    ttft = now - start
+                else:
+                    inter_token_latencies.append(now - last)
+                last = now
+                output_tokens += 1
+            if reported is not None:
+                output_tokens = reported
+        else:
+            res = resource.create(**request)
+            ttft = time.perf_counter() - start
+            output_tokens = res["usage"].get("completion_tokens") or 0
+    except Exception as e:
+        return RequestResult(start=start, latency=time.perf_counter() - start, error=type(e).__name__)
+    return RequestResult(
+        start=start,
+        latency=time.perf_counter() - start,
+        ttft=ttft,
+        inter_token_latencies=inter_token_latencies,
+        output_tokens=output_tokens,
+    )
+
+
+def run_benchmark(
+    client: Union[str, ModuleType],
+    requests: List[Dict[str, Any]],
+    num_requests: Optional[int] = None,
+    concurrency: int = 8,
+    rate: Optional[float] = None,
+    stream: bool = True,
+    seed: int = 42,
+) -> BenchmarkReport:
+    """
+    Replays requests through a client module and reports latency and throughput.
+
+    Closed-loop mode (default) keeps `concurrency` requests in flight. Open-loop mode (`rate` set) sends requests with
+    Poisson arrivals at `rate` requests per second regardless of how fast the endpoint answers, using up to
+    `concurrency` threads.
+
+    Args:
+        client (`Union[str, ModuleType]`): The client module or its name, e.g. "huggingface".
+        requests (`List[Dict[str, Any]]`): The requests to replay, see `load_requests`.
+        num_requests (`int`, *optional*, defaults to None): Total number of requests to send. Requests are cycled if
+            larger than `len(requests)`. Defaults to `len(requests)`.
+        concurrency (`int`, defaults to 8): Number of concurrent requests (closed-loop) or threads (open-loop).
+        rate (`float`, *optional*, defaults to None): Arrival rate in requests per second for open-loop mode.
+        stream (`bool`, defaults to True): Whether to stream responses, required for time to first token.
+        seed (`int`, defaults to 42): Seed for the open-loop arrival process.
+    """
+    module = load_client(client) if isinstance(client, str) else client
+    num_requests = num_requests or len(requests)
+    batch = list(islice(cycle(requests), num_requests))
+
+    results: List[RequestResult] = []
+    lock = threading.Lock()
+
+    def execute(request: Dict[str, Any], start: Optional[float] = None) -> None:
+        result = run_request(module, request, stream, start=start)
+        with lock:
+            results.append(result)
+
+    begin = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="easyllm-bench") as executor:
+        if rate is None:
+            for request in batch:
+                executor.submit(execute, request)
+        else:
+            rng = random.Random(seed)
+            scheduled = begin
+            for request in batch:
+                scheduled += rng.expovariate(rate)
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(execute, request, scheduled)
+    duration = time.perf_counter() - begin
+
+    return build_report(
+        results,
+        duration,
+        client=client_name(module),
+        stream=stream,
+        concurrency=concurrency,
+        rate=rate,
+    )
@@ -0,0 +1,131 @@
+import math
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Returns the q-th percentile (0-100) of `values` using linear interpolation, or None if `values` is empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    if low == high:
+        return values[low]
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+class LatencyStats(BaseModel):
+    mean: Optional[float] = None
+    p50: Optional[float] = None
+    p95: Optional[float] = None
+    p99: Optional[float] = None
+    max: Optional[float] = None
+
+    @classmethod
+    def from_values(cls, values: List[float]) -> "LatencyStats":
+        if not values:
+            return cls()
+        return cls(
+            mean=sum(values) / len(values),
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            p99=percentile(values, 99),
+            max=max(values),
+        )
+
+
+class RequestResult(BaseModel):
+    """Measurements of a single benchmark request. All times are in seconds."""
+
+    start: float
+    latency: float
+    ttft: Optional[float] = None
+    inter_token_latencies: List[float] = []
+    output_tokens: int = 0
+    error: Optional[str] = None
+
+
+class BenchmarkReport(BaseModel):
+    """Aggregated benchmark results. Latencies are reported in seconds."""
+
+    client: str
+    mode: str
+    concurrency: Optional[int] = None
+    rate: Optional[float] = None
+    stream: bool
+    duration: float
+    requests: int
+    successful_requests: int
+    errors: int
+    error_rate: float
+    errors_by_type: Dict[str, int] = {}
+    requests_per_second: float
+    output_tokens: int
+    output_tokens_per_second: float
+    ttft: LatencyStats
+    inter_token_latency: LatencyStats
+    latency: LatencyStats
+
+
+def build_report(
+    results: List[RequestResult],
+    duration: float,
+    client: str,
+    stream: bool,
+    concurrency: Optional[int] = None,
+    rate: Optional[float] = None,
+) -> BenchmarkReport:
+    """Aggregates the results of a benchmark run into a `BenchmarkReport`."""
+    ok = [r for r in results if r.error is None]
+    errors_by_type: Dict[str, int] = {}
+    for r in results:
+        if r.error is not None:
+            errors_by_type[r.error] = errors_by_type.get(r.error, 0) + 1
+    output_tokens = sum(r.output_tokens for r in ok)
+    duration = max(duration, 1e-9)
+    return BenchmarkReport(
+        client=client,
+        mode="open-loop" if rate is not None else "closed-loop",
+        concurrency=concurrency,
+        rate=rate,
+        stream=stream,
+        duration=duration,
+        requests=len(results),
+        successful_requests=len(ok),
+        errors=len(results) - len(ok),
+        error_rate=(len(results) - len(ok)) / len(results) if results else 0.0,
+        errors_by_type=errors_by_type,
+        requests_per_second=len(ok) / duration,
+        output_tokens=output_tokens,
+        output_tokens_per_second=output_tokens / duration,
+        ttft=LatencyStats.from_values([r.ttft for r in ok if r.ttft is not None]),
+        inter_token_latency=LatencyStats.from_values([t for r in ok for t in r.inter_token_latencies]),
+        latency=LatencyStats.from_values([r.latency for r in ok]),
+    )
+
+
+def format_report(report: BenchmarkReport) -> str:
+    """Formats a `BenchmarkReport` as a human readable table, latencies in milliseconds."""
+
+    def ms(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value * 1000:.1f}"
+
+    lines = [
+        f"client: {report.client}  mode: {report.mode}  stream: {report.stream}",
+        f"requests: {report.requests}  errors: {report.errors} ({report.error_rate:.2%})  duration: {report.duration:.2f}s",
+        f"throughput: {report.requests_per_second:.2f} req/s  {report.output_tokens_per_second:.1f} output tokens/s",
+        f"{'':<20}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}",
+    ]
+    for name, stats in [
+        ("ttft (ms)", report.ttft),
+        ("itl (ms)", report.inter_token_latency),
+        ("latency (ms)", report.latency),
+    ]:
+        lines.append(
+            f"{name:<20}{ms(stats.mean):>10}{ms(stats.p50):>10}{ms(stats.p95):>10}{ms(stats.p99):>10}{ms(stats.max):>10}"
+        )
+    for error, count in report.errors_by_type.items():
+        lines.append(f"error {error}: {count}")
+    return "\n".join(lines)
@@ -0,0 +1 @@
+from easyllm.cache.embeddings import CachedEmbedding, EmbeddingCache, cache_key
@@ -0,0 +1,254 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("easyllm.cache requires numpy. Install it with `pip install easyllm[numpy]`.") from e
+
+from easyllm.schema.base import Usage, construct_object, dump_object
+from easyllm.schema.openai import EmbeddingsResponse, embedding_object
+from easyllm.utils import setup_logger
+from easyllm.utils.embeddings import encode_embeddings, validate_encoding_format
+
+logger = setup_logger()
+
+KEY_SIZE = 16
+
+
+def cache_key(model: Optional[str], text: str) -> bytes:
+    """Content address of an embedding, a 16 byte blake2b digest of the model and the text."""
+    return hashlib.blake2b(f"{model or ''}\0{text}".encode(), digest_size=KEY_SIZE).digest()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk cache of embeddings. Vectors are appended to a raw float32 file which is read through a
+    memory map, their keys to a second file of 16 byte digests, so row `i` of both files belong together. The
+    key to row mapping is kept in memory and rebuilt from the keys file on open.
+
+    All vectors of a cache have the same dimension, use one directory per embedding model size.
+
+    Args:
+        path (`str`): Directory of the cache, created if it does not exist.
+        dim (`int`, *optional*, defaults to None): Dimension of the vectors. Read from the cache if it exists,
+            otherwise set by the first `put`.
+    """
+
+    def __init__(self, path: str, dim: Optional[int] = None):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._mmap: Optional[np.ndarray] = None
+        self.hits = 0
+        self.misses = 0
+
+        config_path = os.path.join(path, "cache.json")
+        if os.path.exists(config_path):
+            with open(config_path) as f:
+                stored_dim = json.load(f)["dim"]
+            if dim is not None and dim != stored_dim:
+                raise ValueError(f"Cache at {path} stores vectors of dimension {stored_dim}, got dim={dim}")
+            dim = stored_dim
+        self.dim = dim
+        if dim is not None:
+            self._open()
+
+    @property
+    def _vectors_path(self) -> str:
+        return os.path.join(self.path, "vectors.f32")
+
+    @property
+    def _keys_path(self) -> str:
+        return os.path.join(self.path, "keys.bin")
+
+    def _open(self) -> None:
+        with open(os.path.join(self.path, "cache.json"), "w") as f:
+            json.dump({"dim": self.dim}, f)
+        for path in (self._vectors_path, self._keys_path):
+            open(path, "ab").close()
+        row_size = 4 * self.dim
+        # a crash between the two appends can leave a partial row, only complete rows of both files are kept
+        rows = min(os.path.getsize(self._vectors_path) // row_size, os.path.getsize(self._keys_path) // KEY_SIZE)
+        for path, size in ((self._vectors_path, rows * row_size), (self._keys_path, rows * KEY_SIZE)):
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+        with open(self._keys_path, "rb") as f:
+            keys = f.read()
+        self._rows = {keys[i : i + KEY_SIZE]: i // KEY_SIZE for i in range(0, len(keys), KEY_SIZE)}
+        self._vectors_file = open(self._vectors_path, "ab")
+        self._keys_file = open(self._keys_path, "ab")
+        self._mmap = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, key: bytes) -> bool:
+        return key in self._rows
+
+    def _vectors(self, rows: int) -> np.ndarray:
+        """Memory map of the vectors file covering at least `rows` rows, re-mapped after appends."""
+        if self._mmap is None or len(self._mmap) < rows:
+            self._vectors_file.flush()
+            self._mmap = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(len(self._rows), self.dim))
+        return self._mmap
+
+    def get(self, model: Optional[str], texts: Sequence[str]) -> Tuple[Optional[np.ndarray], List[int]]:
+        """
+        Looks up the embeddings of `texts` and updates the hit statistics.
+
+        Returns a `(len(texts), dim)` float32 matrix with the cached rows filled in, or None if nothing is cached
+        and the dimension is unknown, and the positions of the texts that were not found.
+        """
+        keys = [cache_key(model, text) for text in texts]
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            found = [i for i, row in enumerate(rows) if row is not None]
+            missing = [i for i, row in enumerate(rows) if row is None]
+            self.hits += len(found)
+            self.misses += len(missing)
+            if self.dim is None:
+                return None, missing
+            vectors = self._vectors(max(rows[i] for i in found) + 1) if found else None
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if found:
+            matrix[found] = vectors[[rows[i] for i in found]]
+        return matrix, missing
+
+    def put(self, model: Optional[str], texts: Sequence[str], vectors: Any) -> None:
+        """Appends the embeddings of `texts`, texts which are already cached are skipped."""
+        matrix = np.ascontiguousarray(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if len(matrix) != len(texts):
+            raise ValueError(f"Got {len(texts)} texts but {len(matrix)} vectors")
+        with self._lock:
+            if self.dim is None:
+                self.dim = matrix.shape[1]
+                self._open()
+            if matrix.shape[1] != self.dim:
+                raise ValueError(f"Expected vectors of dimension {self.dim}, got {matrix.shape[1]}")
+            new = {}
+            for row, text in enumerate(texts):
+                key = cache_key(model, text)
+                if key not in self._rows and key not in new:
+                    new[key] = row
+            if not new:
+                return
+            self._vectors_file.write(matrix[list(new.values())].tobytes())
+            self._vectors_file.flush()
+            self._keys_file.write(b"".join(new))
+            self._keys_file.flush()
+            offset = len(self._rows)
+            for i, key in enumerate(new):
+                self._rows[key] = offset + i
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        """Returns the number of entries, hits, misses, the hit rate and the size on disk in bytes."""
+        size = sum(os.path.getsize(p) for p in (self._vectors_path, self._keys_path) if os.path.exists(p))
+        return {
+            "entries": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "bytes": size,
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def compact(self, keep: Iterable[Tuple[Optional[str], str]]) -> int:
+        """
+        Rewrites the cache with only the entries of `keep`, e.g. the chunks of the current corpus, and returns the
+        number of removed entries. The files are replaced atomically.
+
+        Args:
+            keep (`Iterable[Tuple[Optional[str], str]]`): `(model, text)` pairs to keep.
+        """
+        if not self._rows:
+            return 0
+        with self._lock:
+            keys = sorted({cache_key(model, text) for model, text in keep} & self._rows.keys(), key=self._rows.get)
+            vectors = self._vectors(len(self._rows))
+            self._vectors_file.close()
+            self._keys_file.close()
+            with open(f"{self._vectors_path}.tmp", "wb") as f:
+                # copy in blocks so compacting a large cache does not load it into memory
+                for start in range(0, len(keys), 65536):
+                    f.write(
+                        np.ascontiguousarray(vectors[[self._rows[k] for k in keys[start : start + 65536]]]).tobytes()
+                    )
+            with open(f"{self._keys_path}.tmp", "wb") as f:
+                f.write(b"".join(keys))
+            removed = len(self._rows) - len(keys)
+            self._mmap = None
+            os.replace(f"{self._vectors_path}.tmp", self._vectors_path)
+            os.replace(f"{self._keys_path}.tmp", self._keys_path)
+            self._open()
+        logger.info("Compacted embedding cache %s, removed %s of %s entries", self.path, removed, removed + len(keys))
+        return removed
+
+    def close(self) -> None:
+        if self.dim is not None:
+            self._vectors_file.close()
+            self._keys_file.close()
+        self._mmap = None
+
+
+class CachedEmbedding:
+    """
+    Drop-in replacement for a client's `Embedding` which only sends texts missing from the cache upstream.
+
+    Args:
+        embedding (`Any`): The client embedding class, e.g. `huggingface.Embedding`. Its `create` has to support
+            `encoding_format="numpy"`.
+        cache (`EmbeddingCache`): The cache to read from and write to.
+    """
+
+    def __init__(self, embedding: Any, cache: EmbeddingCache):
+        self.embedding = embedding
+        self.cache = cache
+
+    def create(
+        self,
+        input: Union[str, List[str]],
+        model: Optional[str] = None,
+        encoding_format: str = "float",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        """
+        Creates embeddings like `Embedding.create`, usage only counts the tokens of the texts sent upstream.
+        """
+        validate_encoding_format(encoding_format)
+        texts = input if isinstance(input, list) else [input]
+        matrix, missing = self.cache.get(model, texts)
+        prompt_tokens = 0
+        if missing:
+            misses = [texts[i] for i in missing]
+            res = self.embedding.create(input=misses, model=model, encoding_format="numpy", **kwargs)
+            computed = np.stack([item["embedding"] for item in res["data"]])
+            self.cache.put(model, misses, computed)
+            if matrix is None:
+                matrix = np.zeros((len(texts), computed.shape[1]), dtype=np.float32)
+            matrix[missing] = computed
+            prompt_tokens = res["usage"]["prompt_tokens"]
+
+        data = [
+            embedding_object(i, embedding) for i, embedding in enumerate(encode_embeddings(matrix, encoding_format))
+        ]
+        return dump_object(
+            construct_object(
+                EmbeddingsResponse,
+                model=model,
+                data=data,
+                usage=construct_object(Usage, prompt_tokens=prompt_tokens, total_tokens=prompt_tokens),
+            )
+        )
@@ -1,13 +1,255 @@
 from argparse import ArgumentParser
 
 
-def parse_args():
-    parser = ArgumentParser(description="Description of your program")
-    parser.add_argument("-f", "--foo", help="Description for foo argument", required=True)
+def add_serve_parser(subparsers):
+    parser = subparsers.add_parser("serve", help="Run an OpenAI compatible HTTP gateway in front of a client.")
+    parser.add_argument(
+        "--client",
+        default="huggingface",
+        choices=["huggingface", "sagemaker", "bedrock"],
+        help="Client module used for upstream requests.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind to.")
+    parser.add_argument("--workers", type=int, default=16, help="Number of threads executing upstream requests.")
+    parser.add_argument(
+        "--max-concurrency", type=int, default=64, help="Maximum number of concurrent upstream requests."
+    )
+    parser.add_argument(
+        "--max-queue", type=int, default=None, help="Maximum number of queued requests before returning 429."
+    )
+    parser.add_argument(
+        "--pool-size", type=int, default=None, help="Upstream connections kept alive per host. Defaults to --workers."
+    )
+    parser.add_argument("--prompt-builder", default=None, help="Prompt builder from PROMPT_MAPPING, e.g. llama2.")
+    parser.add_argument("--api-base", default=None, help="Overrides the api_base of the client.")
+    parser.add_argument("--model", default=None, help="Default model if a request does not provide one.")
+    parser.add_argument(
+        "--metrics", action="store_true", help="Collect client metrics and serve them for Prometheus on /metrics."
+    )
+    parser.add_argument(
+        "--warmup",
+        action="store_true",
+        default=None,
+        help="Resolve credentials and open upstream connections of all workers before serving. Also enabled by "
+        "EASYLLM_WARMUP=1.",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=None,
+        help="Seconds a request may take, including queueing, before returning 504.",
+    )
+    parser.set_defaults(func=run_serve)
 
-    return parser.parse_args()
 
+def run_serve(args):
+    from easyllm.server import serve
 
-def main():
-    args = parse_args()
-    print(args)
+    serve(
+        client=args.client,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_concurrency=args.max_concurrency,
+        max_queue=args.max_queue,
+        pool_size=args.pool_size,
+        prompt_builder=args.prompt_builder,
+        api_base=args.api_base,
+        model=args.model,
+        metrics=args.metrics,
+        warmup=args.warmup,
+        request_timeout=args.request_timeout,
+    )
+
+
+def add_bench_parser(subparsers):
+    parser = subparsers.add_parser("bench", help="Replay a JSONL file of requests and report latency and throughput.")
+    parser.add_argument("requests", help="JSONL file with ChatCompletion (messages) or Completion (prompt) requests.")
+    parser.add_argument(
+        "--client",
+        default="huggingface",
+        choices=["huggingface", "sagemaker", "bedrock"],
+        help="Client module used for the requests.",
+    )
+    parser.add_argument("--api-base", default=None, help="Overrides the api_base of the client.")
+    parser.add_argument("--prompt-builder", default=None, help="Prompt builder from PROMPT_MAPPING, e.g. llama2.")
+    parser.add_argument("--model", default=None, help="Model used for requests which do not provide one.")
+    parser.add_argument("--num-requests", type=int, default=None, help="Total number of requests to send.")
+    parser.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent requests (closed-loop) or threads (open-loop)."
+    )
+    parser.add_argument(
+        "--rate", type=float, default=None, help="Open-loop arrival rate in requests per second (Poisson)."
+    )
+    parser.add_argument(
+        "--no-stream", action="store_true", help="Disable streaming, time to first token equals the latency."
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the open-loop arrival process.")
+    parser.add_argument("--output", default=None, help="Write the report as JSON to this file.")
+    parser.add_argument(
+        "--mock", action="store_true", help="Run against a local mock server instead of the real endpoint."
+    )
+    parser.set_defaults(func=run_bench)
+
+
+def run_bench(args):
+    import json
+
+    from easyllm.bench import format_report, load_requests, run_benchmark
+    from easyllm.clients import load_client
+    from easyllm.schema.base import dump_object
+
+    module = load_client(args.client)
+    mock = None
+    if args.mock:
+        from easyllm.server.mock import MockServer
+
+        mock = MockServer(port=0)
+        url = mock.start_in_background()
+        module.api_base = f"{url}/endpoints" if args.client == "sagemaker" else url
+    if args.api_base is not None:
+        module.api_base = args.api_base
+    if args.prompt_builder is not None:
+        module.prompt_builder = args.prompt_builder
+    requests = load_requests(args.requests)
+    if args.model is not None:
+        requests = [{"model": args.model, **r} for r in requests]
+
+    try:
+        report = run_benchmark(
+            module,
+            requests,
+            num_requests=args.num_requests,
+            concurrency=args.concurrency,
+            rate=args.rate,
+            stream=not args.no_stream,
+            seed=args.seed,
+        )
+    finally:
+        if mock is not None:
+            mock.stop()
+    print(format_report(report))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(dump_object(report), f, indent=2)
+
+
+def add_batch_parser(subparsers):
+    parser = subparsers.add_parser(
+        "batch", help="Run a JSONL file of requests offline, resuming from the last checkpoint if interrupted."
+    )
+    parser.add_argument("requests", help="JSONL file with ChatCompletion, Completion or Embedding requests.")
+    parser.add_argument("output", help="JSONL file the results are written to.")
+    parser.add_argument(
+        "--client",
+        default="huggingface",
+        choices=["huggingface", "sagemaker", "bedrock"],
+        help="Client module used for the requests.",
+    )
+    parser.add_argument("--api-base", default=None, help="Overrides the api_base of the client.")
+    parser.add_argument("--prompt-builder", default=None, help="Prompt builder from PROMPT_MAPPING, e.g. llama2.")
+    parser.add_argument("--model", default=None, help="Model used for requests which do not provide one.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent requests.")
+    parser.add_argument(
+        "--failures",
+        default=None,
+        help="JSONL file failed requests are written to. Defaults to <output>.failures.jsonl.",
+    )
+    parser.add_argument("--checkpoint", default=None, help="Checkpoint file. Defaults to <output>.checkpoint.")
+    parser.add_argument("--checkpoint-interval", type=float, default=5.0, help="Seconds between checkpoints.")
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds between progress reports.")
+    parser.add_argument(
+        "--overwrite", action="store_true", help="Replace an existing output file which has no checkpoint."
+    )
+    parser.set_defaults(func=run_batch_job)
+
+
+def run_batch_job(args):
+    from easyllm.batch import run_batch
+    from easyllm.clients import load_client
+
+    module = load_client(args.client)
+    if args.api_base is not None:
+        module.api_base = args.api_base
+    if args.prompt_builder is not None:
+        module.prompt_builder = args.prompt_builder
+
+    report = run_batch(
+        module,
+        args.requests,
+        args.output,
+        failures_path=args.failures,
+        checkpoint_path=args.checkpoint,
+        concurrency=args.concurrency,
+        model=args.model,
+        checkpoint_interval=args.checkpoint_interval,
+        report_interval=args.report_interval,
+        overwrite=args.overwrite,
+    )
+    print(
+        f"{report.succeeded} succeeded, {report.failed} failed, {report.skipped} skipped in {report.duration:.1f}s "
+        f"({report.requests_per_second:.1f} req/s, {report.output_tokens_per_second:.1f} output tokens/s)"
+    )
+
+
+def add_mock_parser(subparsers):
+    parser = subparsers.add_parser(
+        "mock", help="Run a local stand-in for TGI, SageMaker and Bedrock endpoints for offline benchmarking."
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to.")
+    parser.add_argument("--port", type=int, default=8081, help="Port to bind to.")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Decoding speed of a single request.")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Time to first token in seconds.")
+    parser.add_argument("--max-output-tokens", type=int, default=128, help="Upper bound for generated tokens.")
+    parser.add_argument("--embedding-dim", type=int, default=384, help="Dimension of the returned embeddings.")
+    parser.add_argument(
+        "--embedding-latency", type=float, default=0.005, help="Latency of an embedding request in seconds."
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probability of answering with a 500.")
+    parser.add_argument(
+        "--rate-limit", type=float, default=None, help="Requests per second accepted before answering with 429."
+    )
+    parser.add_argument(
+        "--max-concurrency", type=int, default=None, help="Concurrent requests accepted before answering with 429."
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed for error injection.")
+    parser.add_argument(
+        "--gzip-min-size", type=int, default=None, help="Gzip compress responses of at least this many bytes."
+    )
+    parser.set_defaults(func=run_mock)
+
+
+def run_mock(args):
+    from easyllm.server.mock import serve_mock
+
+    serve_mock(
+        host=args.host,
+        port=args.port,
+        tokens_per_second=args.tokens_per_second,
+        ttft=args.ttft,
+        max_output_tokens=args.max_output_tokens,
+        embedding_dim=args.embedding_dim,
+        embedding_latency=args.embedding_latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        max_concurrency=args.max_concurrency,
+        seed=args.seed,
+        gzip_min_size=args.gzip_min_size,
+    )
+
+
+def parse_args(argv=None):
+    parser = ArgumentParser("easyllm", description="EasyLLM command line interface")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_serve_parser(subparsers)
+    add_bench_parser(subparsers)
+    add_batch_parser(subparsers)
+    add_mock_parser(subparsers)
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    args.func(args)
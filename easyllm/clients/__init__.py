@@ -0,0 +1,17 @@
+import importlib
+from types import ModuleType
+from typing import Any
+
+SUPPORTED_CLIENTS = ["huggingface", "sagemaker", "bedrock"]
+
+
+def load_client(name: str) -> ModuleType:
+    """Imports a client module from `easyllm.clients` by name, e.g. `huggingface`."""
+    if name not in SUPPORTED_CLIENTS:
+        raise ValueError(f"Client {name} is not supported. Supported clients are: {SUPPORTED_CLIENTS}")
+    return importlib.import_module(f"easyllm.clients.{name}")
+
+
+def client_name(client: Any) -> str:
+    """Returns the name of a client module or client instance, e.g. `huggingface`."""
+    return getattr(client, "api_type", None) or client.__name__.rsplit(".", 1)[-1]
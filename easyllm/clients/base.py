@@ -0,0 +1,175 @@
+import time
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import requests
+
+from easyllm.prompt_utils.base import build_prompt, buildBasePrompt
+from easyllm.schema.base import ChatMessage
+from easyllm.utils import setup_logger
+from easyllm.utils.http import warm_connections
+from easyllm.utils.logging import warn_once
+
+logger = setup_logger()
+
+
+class Operation:
+    """
+    Exposes a client method as `create`, and its async version as `acreate` if the client has one, so client
+    instances can be used wherever a client module is expected.
+    """
+
+    __slots__ = ("create", "acreate")
+
+    def __init__(self, create: Callable[..., Any], acreate: Optional[Callable[..., Any]] = None):
+        self.create = create
+        if acreate is not None:
+            self.acreate = acreate
+
+
+class BaseClient:
+    """
+    Configuration and request building shared by the client classes. Subclasses implement the operations and call
+    `_bind_operations` so instances expose `ChatCompletion`, `Completion`, `Embedding` and `LogLikelihood` like the
+    client modules.
+
+    Args:
+        prompt_builder (`Union[str, Callable]`, *optional*, defaults to None): Name of a prompt builder of
+            `easyllm.prompt_utils` or a function turning a list of messages into a prompt.
+        stop_sequences (`List[str]`, *optional*, defaults to None): Stop sequences added to every request.
+        seed (`int`, defaults to 42): The seed used for sampling.
+    """
+
+    api_type = ""
+
+    def __init__(
+        self,
+        prompt_builder: Optional[Union[str, Callable]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: int = 42,
+    ):
+        self.prompt_builder = prompt_builder
+        self.stop_sequences = list(stop_sequences or [])
+        self.seed = seed
+
+    def _bind_operations(self) -> None:
+        self.ChatCompletion = Operation(self.chat_completion)
+        self.Completion = Operation(self.completion)
+        self.Embedding = Operation(self.embedding)
+        self.LogLikelihood = Operation(self.loglikelihood)
+
+    def warmup(
+        self, models: Optional[List[str]] = None, connections: int = 1, ping: Optional[bool] = None
+    ) -> Dict[str, int]:
+        """
+        Prepares the client for traffic: resolves credentials and opens pooled connections to the endpoint of every
+        model, so the first requests do not pay for DNS, TCP, TLS and credential lookups. Pooled sessions are per
+        thread, connections are opened in the pool of the calling thread. `Gateway.warmup` warms up all its workers.
+
+        Args:
+            models (`List[str]`, *optional*, defaults to None): The models to warm up, defaults to the base url.
+            connections (`int`, defaults to 1): Number of connections to open per endpoint.
+            ping (`bool`, *optional*, defaults to None): Whether to send a one token request, which makes serverless
+                endpoints load the model. Defaults to pinging models of the Hugging Face Inference API only.
+
+        Returns:
+            `Dict[str, int]`: The number of connections opened per url.
+        """
+        start = time.perf_counter()
+        self._resolve_credentials()
+        session = self._warmup_session()
+        opened = {}
+        for model in models or [None]:
+            url = self._url(model)
+            opened[url] = warm_connections(session, url, connections)
+            if ping if ping is not None else self._pings_by_default(url):
+                try:
+                    self._ping(session, url)
+                except Exception as e:
+                    logger.warning("Warm up request to %s failed: %s", url, e)
+        logger.info("Warmed up %s connections in %.3fs", sum(opened.values()), time.perf_counter() - start)
+        return opened
+
+    def ping(self, model: Optional[str] = None) -> None:
+        """
+        Sends a one token request to the model, e.g. to keep a serverless model loaded, see
+        `easyllm.utils.model_loading.KeepWarm`.
+        """
+        self._ping(self._warmup_session(), self._url(model))
+
+    def close(self) -> None:
+        """
+        Releases resources owned by the client, e.g. background credential renewal or HTTP/2 connections. Requests
+        sent afterwards open them again.
+        """
+
+    def _resolve_credentials(self) -> None:
+        pass
+
+    def _warmup_session(self) -> requests.Session:
+        raise NotImplementedError
+
+    def _url(self, model: Optional[str]) -> str:
+        raise NotImplementedError
+
+    def _pings_by_default(self, url: str) -> bool:
+        return False
+
+    def _ping(self, session: requests.Session, url: str) -> None:
+        raise NotImplementedError
+
+    def _chat_prompt(self, messages: List[ChatMessage]) -> str:
+        prompt_builder = self.prompt_builder
+        if prompt_builder is None:
+            warn_once(
+                logger,
+                f"{self.api_type}.chat.prompt_builder",
+                "The prompt_builder of the %s client is not set, using the default prompt builder. Set it to a "
+                "function that takes a list of messages and returns a string, or use an existing prompt builder from "
+                "easyllm.prompt_utils. Pass debug=True to log the prompt sent to the model.",
+                self.api_type,
+            )
+            return buildBasePrompt(messages)
+        return build_prompt(messages, prompt_builder)
+
+    def _completion_prompt(self, prompt: Union[str, List[Any]]) -> str:
+        prompt_builder = self.prompt_builder
+        if prompt_builder is None:
+            warn_once(
+                logger,
+                f"{self.api_type}.completion.prompt_builder",
+                "The prompt_builder of the %s client is not set, using the input as prompt. Set it to a function "
+                "that takes a list of messages and returns a string, or use an existing prompt builder from "
+                "easyllm.prompt_utils. Pass debug=True to log the prompt sent to the model.",
+                self.api_type,
+            )
+            return prompt
+        return build_prompt(prompt, prompt_builder)
+
+    def _stop(self, stop: Optional[Union[str, List[str]]]) -> List[str]:
+        if isinstance(stop, list):
+            return self.stop_sequences + stop
+        elif isinstance(stop, str):
+            return self.stop_sequences + [stop]
+        return self.stop_sequences
+
+    def _generation_parameters(self, request: Any, stop: List[str], return_full_text: bool = False) -> Dict[str, Any]:
+        """Builds the text-generation-inference parameters of a chat or completion request."""
+        gen_kwargs = {
+            "do_sample": True,
+            "return_full_text": return_full_text,
+            "max_new_tokens": request.max_tokens,
+            "top_p": float(request.top_p),
+            "temperature": float(request.temperature),
+            "stop_sequences": stop,
+            "repetition_penalty": request.frequency_penalty,
+            "top_k": request.top_k,
+            "seed": self.seed,
+        }
+        if request.top_p == 0:
+            gen_kwargs.pop("top_p")
+        if request.top_p == 1:
+            request.top_p = 0.9999999
+        if request.temperature == 0:
+            gen_kwargs.pop("temperature")
+            gen_kwargs["do_sample"] = False
+        return gen_kwargs
@@ -0,0 +1,177 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from easyllm.schema.base import Usage, construct_object, dump_object
+from easyllm.schema.openai import EmbeddingsResponse, embedding_object
+from easyllm.utils import setup_logger
+
+logger = setup_logger()
+
+_STOP = object()
+
+# requests with the same key are sent upstream together
+_Key = Tuple[Optional[str], str]
+
+
+class EmbeddingBatcher:
+    """
+    Collects concurrent single-input embedding calls and sends them upstream as one batched request. A batch is sent
+    once `max_batch_size` inputs are waiting or `max_wait_ms` passed since the first one arrived. While all
+    `max_concurrency` upstream requests are busy, new inputs keep accumulating, so batches grow with the load.
+
+    Works from any number of threads (`embed`, `create`) and from asyncio (`aembed`, `acreate`).
+
+    Args:
+        embedding (`Any`): The client embedding class, e.g. `huggingface.Embedding` or `sagemaker.Embedding`.
+        model (`str`, *optional*, defaults to None): Default model of the requests.
+        max_batch_size (`int`, defaults to 32): Maximum number of inputs per upstream request.
+        max_wait_ms (`float`, defaults to 5.0): Maximum time the first input of a batch waits for more inputs.
+        max_concurrency (`int`, defaults to 4): Maximum number of concurrent upstream requests.
+    """
+
+    def __init__(
+        self,
+        embedding: Any,
+        model: Optional[str] = None,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_concurrency: int = 4,
+    ):
+        self.embedding = embedding
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.max_concurrency = max_concurrency
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._slots = threading.Semaphore(max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.requests = 0
+        self.inputs = 0
+
+    def __enter__(self) -> "EmbeddingBatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(self, text: str, model: Optional[str] = None, encoding_format: str = "float") -> "Future[Any]":
+        """Queues a single input and returns a future resolving to its embedding."""
+        if not isinstance(text, str):
+            raise TypeError(f"EmbeddingBatcher only accepts single string inputs, got {type(text).__name__}")
+        future: "Future[Any]" = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("EmbeddingBatcher is closed")
+            if self._thread is None:
+                self._executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="easyllm-batcher")
+                self._thread = threading.Thread(target=self._dispatch, name="easyllm-batcher", daemon=True)
+                self._thread.start()
+            self._queue.put(((model or self.model, encoding_format), text, future))
+        return future
+
+    def embed(self, text: str, model: Optional[str] = None, encoding_format: str = "float") -> Any:
+        """Returns the embedding of `text`, blocking until its batch completed."""
+        return self.submit(text, model, encoding_format).result()
+
+    async def aembed(self, text: str, model: Optional[str] = None, encoding_format: str = "float") -> Any:
+        """Returns the embedding of `text` without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(text, model, encoding_format))
+
+    def _response(self, text: str, embedding: Any, model: Optional[str]) -> Dict[str, Any]:
+        tokens = int(len(text) / 4)
+        return dump_object(
+            construct_object(
+                EmbeddingsResponse,
+                model=model,
+                data=[embedding_object(0, embedding)],
+                usage=construct_object(Usage, prompt_tokens=tokens, total_tokens=tokens),
+            )
+        )
+
+    def create(self, input: str, model: Optional[str] = None, encoding_format: str = "float") -> Dict[str, Any]:
+        """
+        Same as `Embedding.create` for a single input, but batched with concurrent calls. The upstream response only
+        holds the usage of the whole batch, so `usage` estimates the tokens of `input` as one per 4 characters, the
+        same estimate the Hugging Face and SageMaker embedding clients report.
+        """
+        model = model or self.model
+        return self._response(input, self.embed(input, model, encoding_format), model)
+
+    async def acreate(self, input: str, model: Optional[str] = None, encoding_format: str = "float") -> Dict[str, Any]:
+        """Same as `create`, for asyncio."""
+        model = model or self.model
+        return self._response(input, await self.aembed(input, model, encoding_format), model)
+
+    def _dispatch(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            # waiting for a free slot lets inputs pile up, so busy periods produce larger batches
+            self._slots.acquire()
+            items = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(items) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                items.append(item)
+
+            groups: Dict[_Key, List[Tuple[str, "Future[Any]"]]] = {}
+            for key, text, future in items:
+                groups.setdefault(key, []).append((text, future))
+            # the slot is held by the first group, further groups (other models) wait for their own
+            for position, (key, group) in enumerate(groups.items()):
+                if position > 0:
+                    self._slots.acquire()
+                self._executor.submit(self._send, key, group)
+
+    def _send(self, key: _Key, group: List[Tuple[str, "Future[Any]"]]) -> None:
+        model, encoding_format = key
+        # futures cancelled by their caller are dropped, the others can no longer be cancelled
+        group = [(text, future) for text, future in group if future.set_running_or_notify_cancel()]
+        try:
+            if not group:
+                return
+            # identical inputs of a batch are only embedded once
+            texts = list(dict.fromkeys(text for text, _ in group))
+            kwargs = {"encoding_format": encoding_format} if encoding_format != "float" else {}
+            res = self.embedding.create(input=texts, model=model, **kwargs)
+            embeddings = {text: item["embedding"] for text, item in zip(texts, res["data"])}
+            with self._lock:
+                self.requests += 1
+                self.inputs += len(group)
+            for text, future in group:
+                future.set_result(embeddings[text])
+        except BaseException as e:
+            logger.debug("Batched embedding request of %s inputs failed: %s", len(group), e)
+            for _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """Sends the waiting inputs and stops the background threads."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread, executor = self._thread, self._executor
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join()
+            executor.shutdown(wait=True)
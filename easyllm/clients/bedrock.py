@@ -1,12 +1,11 @@
-import json
-import logging
 import os
+import threading
 from typing import Any, Dict, List, Optional
 
 from nanoid import generate
 
 from easyllm.prompt_utils.base import build_prompt, buildBasePrompt
-from easyllm.schema.base import ChatMessage, Usage, dump_object
+from easyllm.schema.base import ChatMessage, Usage, construct_object, dump_object
 from easyllm.schema.openai import (
     ChatCompletionRequest,
     ChatCompletionResponse,
@@ -16,7 +15,10 @@ from easyllm.schema.openai import (
     DeltaMessage,
 )
 from easyllm.utils import setup_logger
-from easyllm.utils.aws import get_bedrock_client
+from easyllm.utils.deadlines import Deadline, current_deadline
+from easyllm.utils.logging import request_logger, warn_once
+from easyllm.utils.serialization import dumps, loads
+from easyllm.utils.tracing import current_trace, traced
 
 logger = setup_logger()
 
@@ -25,12 +27,11 @@ api_type = "bedrock"
 api_aws_access_key = os.environ.get("AWS_ACCESS_KEY_ID", None)
 api_aws_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY", None)
 api_aws_session_token = os.environ.get("AWS_SESSION_TOKEN", None)
+api_base = os.environ.get("BEDROCK_API_BASE", None)
 
-client = get_bedrock_client(
-    aws_access_key_id=api_aws_access_key,
-    aws_secret_access_key=api_aws_secret_key,
-    aws_session_token=api_aws_session_token,
-)
+# boto3 client, created on the first request. Can be set to a custom client.
+client = None
+_client_lock = threading.Lock()
 
 
 SUPPORTED_MODELS = [
@@ -43,46 +44,92 @@ prompt_builder = os.environ.get("BEDROCK_PROMPT", None)
 stop_sequences = []
 
 
-def stream_chat_request(client, body, model):
+def get_client():
+    """Returns the boto3 Bedrock client, creating it on first use from the module configuration."""
+    global client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from easyllm.utils.aws import get_bedrock_client
+
+                client = get_bedrock_client(
+                    aws_access_key_id=api_aws_access_key,
+                    aws_secret_access_key=api_aws_secret_key,
+                    aws_session_token=api_aws_session_token,
+                    endpoint_url=api_base,
+                )
+    return client
+
+
+def warmup(models: Optional[List[str]] = None, connections: int = 1, ping: Optional[bool] = None) -> Dict[str, int]:
+    """
+    Prepares the client for traffic by resolving credentials, assuming the configured role and creating the boto3
+    client. botocore opens connections on demand, so none are opened ahead of time.
+
+    Returns:
+        `Dict[str, int]`: The number of connections opened per url, always empty.
+    """
+    get_client()
+    return {}
+
+
+def stream_chat_request(client, body, model, deadline: Optional[Deadline] = None):
     """Utility function for streaming chat requests."""
+    deadline = deadline or current_deadline()
+    deadline.check()
     id = f"hf-{generate(size=10)}"
     response = client.invoke_model_with_response_stream(
-        body=json.dumps(body), modelId=model, accept="application/json", contentType="application/json"
+        body=dumps(body), modelId=model, accept="application/json", contentType="application/json"
     )
     stream = response.get("body")
 
     yield dump_object(
-        ChatCompletionStreamResponse(
+        construct_object(
+            ChatCompletionStreamResponse,
             id=id,
             model=model,
-            choices=[ChatCompletionResponseStreamChoice(index=0, delta=DeltaMessage(role="assistant"))],
+            choices=[
+                construct_object(
+                    ChatCompletionResponseStreamChoice, index=0, delta=construct_object(DeltaMessage, role="assistant")
+                )
+            ],
         )
     )
     # yield each generated token
     reason = None
     for _idx, event in enumerate(stream):
+        deadline.check()
         chunk = event.get("chunk")
         if chunk:
-            chunk_obj = json.loads(chunk.get("bytes").decode())
+            chunk_obj = loads(chunk.get("bytes"))
             text = chunk_obj["completion"]
             yield dump_object(
-                ChatCompletionStreamResponse(
+                construct_object(
+                    ChatCompletionStreamResponse,
                     id=id,
                     model=model,
-                    choices=[ChatCompletionResponseStreamChoice(index=0, delta=DeltaMessage(content=text))],
+                    choices=[
+                        construct_object(
+                            ChatCompletionResponseStreamChoice,
+                            index=0,
+                            delta=construct_object(DeltaMessage, content=text),
+                        )
+                    ],
                 )
             )
     yield dump_object(
-        ChatCompletionStreamResponse(
+        construct_object(
+            ChatCompletionStreamResponse,
             id=id,
             model=model,
-            choices=[ChatCompletionResponseStreamChoice(index=0, finish_reason=reason, delta={})],
+            choices=[construct_object(ChatCompletionResponseStreamChoice, index=0, finish_reason=reason, delta={})],
         )
     )
 
 
 class ChatCompletion:
     @staticmethod
+    @traced("bedrock", "chat")
     def create(
         messages: List[ChatMessage],
         model: Optional[str] = None,
@@ -116,9 +163,9 @@ class ChatCompletion:
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
         # validate it model is in model_mapping
         if model not in SUPPORTED_MODELS:
             raise ValueError(f"Model {model} is not supported. Supported models are: {SUPPORTED_MODELS}")
@@ -135,20 +182,21 @@ class ChatCompletion:
             stream=stream,
             frequency_penalty=frequency_penalty,
         )
+        trace.phase("validate")
 
         if prompt_builder is None:
-            logger.warn(
-                f"""huggingface.prompt_builder is not set.
-Using default prompt builder for. Prompt sent to model will be:
-----------------------------------------
-{buildBasePrompt(request.messages)}.
-----------------------------------------
-If you want to use a custom prompt builder, set bedrock.prompt_builder to a function that takes a list of messages and returns a string.
-You can also use existing prompt builders by importing them from easyllm.prompt_utils"""
+            warn_once(
+                logger,
+                "bedrock.chat.prompt_builder",
+                "bedrock.prompt_builder is not set, using the default prompt builder. Set bedrock.prompt_builder to a "
+                "function that takes a list of messages and returns a string, or use an existing prompt builder from "
+                "easyllm.prompt_utils. Pass debug=True to log the prompt sent to the model.",
             )
             prompt = buildBasePrompt(request.messages)
         else:
             prompt = build_prompt(request.messages, prompt_builder)
+        trace.phase("build_prompt")
+        log.debug("Prompt sent to model will be:\n%s", prompt)
 
         # create stop sequences
         if isinstance(request.stop, list):
@@ -157,7 +205,7 @@ You can also use existing prompt builders by importing them from easyllm.prompt_
             stop = stop_sequences + [request.stop]
         else:
             stop = stop_sequences
-        logger.debug(f"Stop sequences:\n{stop}")
+        log.debug("Stop sequences:\n%s", stop)
 
         # check if we can stream
         if request.stream is True and request.n > 1:
@@ -173,40 +221,51 @@ You can also use existing prompt builders by importing them from easyllm.prompt_
             "stop_sequences": stop,
             "anthropic_version": model_version_mapping[model],
         }
-        logger.debug(f"Generation body:\n{body}")
+        log.debug("Generation body:\n%s", body)
 
+        client = get_client()
+        trace.update(endpoint=model)
+        trace.phase("connect")
         if request.stream:
-            return stream_chat_request(client, body, model)
+            return stream_chat_request(client, body, model, current_deadline())
         else:
             choices = []
             generated_tokens = 0
             for _i in range(request.n):
+                # botocore applies the connect and read timeouts of `get_bedrock_client`, the total is checked per call
+                current_deadline().check()
                 response = client.invoke_model(
-                    body=json.dumps(body), modelId=model, accept="application/json", contentType="application/json"
+                    body=dumps(body), modelId=model, accept="application/json", contentType="application/json"
                 )
                 # parse response
-                res = json.loads(response.get("body").read())
+                res = loads(response.get("body").read())
+                trace.phase("complete")
 
                 # convert to schema
-                parsed = ChatCompletionResponseChoice(
+                parsed = construct_object(
+                    ChatCompletionResponseChoice,
                     index=_i,
-                    message=ChatMessage(role="assistant", content=res["completion"].strip()),
+                    message=construct_object(ChatMessage, role="assistant", content=res["completion"].strip()),
                     finish_reason=res["stop_reason"],
                 )
                 generated_tokens += len(res["completion"].strip()) // 4
                 choices.append(parsed)
-                logger.debug(f"Response at index {_i}:\n{parsed}")
+                log.debug("Response at index %s:\n%s", _i, parsed)
             # calculate usage details
             # TODO: fix when details is fixed
             prompt_tokens = int(len(prompt) / 4)
             total_tokens = prompt_tokens + generated_tokens
 
             return dump_object(
-                ChatCompletionResponse(
+                construct_object(
+                    ChatCompletionResponse,
                     model=request.model,
                     choices=choices,
-                    usage=Usage(
-                        prompt_tokens=prompt_tokens, completion_tokens=generated_tokens, total_tokens=total_tokens
+                    usage=construct_object(
+                        Usage,
+                        prompt_tokens=prompt_tokens,
+                        completion_tokens=generated_tokens,
+                        total_tokens=total_tokens,
                     ),
                 )
             )
@@ -1,13 +1,15 @@
-import json
-import logging
+import asyncio
+import contextlib
 import os
-from typing import Any, Dict, List, Optional, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
 
-from huggingface_hub import HfFolder, InferenceClient
+import requests
 from nanoid import generate
 
-from easyllm.prompt_utils.base import build_prompt, buildBasePrompt
-from easyllm.schema.base import ChatMessage, Usage, dump_object
+from easyllm.clients.base import BaseClient, Operation
+from easyllm.schema.base import ChatMessage, Usage, construct_object, dump_object
 from easyllm.schema.openai import (
     ChatCompletionRequest,
     ChatCompletionResponse,
@@ -20,48 +22,154 @@ from easyllm.schema.openai import (
     CompletionResponseStreamChoice,
     CompletionStreamResponse,
     DeltaMessage,
-    EmbeddingsObjectResponse,
     EmbeddingsRequest,
     EmbeddingsResponse,
+    embedding_object,
 )
 from easyllm.utils import setup_logger
+from easyllm.utils.deadlines import Deadline, current_deadline, use_deadline
+from easyllm.utils.embeddings import encode_embeddings, parse_embeddings, validate_encoding_format
+from easyllm.utils.http import HTTPXTransport, to_requests_response
+from easyllm.utils.logging import request_logger
+from easyllm.utils.model_loading import ModelLoadingTimeout, ModelLoadingWaiter
+from easyllm.utils.scoring import build_scores, continuation_logprobs, pair_inputs
+from easyllm.utils.serialization import JSON_HEADERS, dumps, loads
+from easyllm.utils.tracing import current_trace, traced
 
 logger = setup_logger()
 
 # default parameters
 api_type = "huggingface"
-api_key = (
-    os.environ.get(
-        "HUGGINGFACE_TOKEN",
-    )
-    or HfFolder.get_token()
-)
-api_base = os.environ.get("HUGGINGFACE_API_BASE", None) or "https://api-inference.huggingface.co/models"
+# falls back to the token of the HuggingFace CLI on first use, see `get_api_key`
+api_key = os.environ.get("HUGGINGFACE_TOKEN", None)
+DEFAULT_API_BASE = "https://api-inference.huggingface.co/models"
+api_base = os.environ.get("HUGGINGFACE_API_BASE", None) or DEFAULT_API_BASE
 api_version = os.environ.get("HUGGINGFACE_API_VERSION", None) or "2023-07-29"
 prompt_builder = os.environ.get("HUGGINGFACE_PROMPT", None)
 stop_sequences = []
 seed = 42
+# waits for models of the Inference API which are loaded on demand, see `ModelLoadingWaiter`
+model_loading = ModelLoadingWaiter()
+# multiplexes requests over HTTP/2 connections with httpx, see `HTTPXTransport`
+http2 = os.environ.get("HUGGINGFACE_HTTP2", "").lower() in ("1", "true")
+
+# timeout in seconds of the warm up request, the Inference API answers it right away while the model is loading
+PING_TIMEOUT = 10
+
+_cli_token = None
+_inference_client_class = None
+
+
+def _get_cli_token() -> Optional[str]:
+    """Returns the token saved by the HuggingFace CLI, which is only read once."""
+    global _cli_token
+    if _cli_token is None:
+        from huggingface_hub import HfFolder
+
+        _cli_token = HfFolder.get_token() or ""
+    return _cli_token or None
+
+
+def get_api_key() -> Optional[str]:
+    """Returns `api_key` or the token saved by the HuggingFace CLI."""
+    return api_key if api_key is not None else _get_cli_token()
+
+
+def get_inference_client(url: str):
+    """Returns the `InferenceClient` of the default client for the url, huggingface_hub is imported on first use."""
+    return default_client.get_inference_client(url)
+
+
+def _get_inference_client_class():
+    """Returns an `InferenceClient` waiting for loading models with a `ModelLoadingWaiter`, created on first use."""
+    global _inference_client_class
+    if _inference_client_class is None:
+        from huggingface_hub import InferenceClient, InferenceTimeoutError
+        from huggingface_hub.utils import get_session, hf_raise_for_status
+
+        class ModelLoadingInferenceClient(InferenceClient):
+            # `InferenceClient.post` retries every second while the model is loading, each waiting request polling
+            # the server on its own. The waiter is read from the owning client, so changing it applies right away.
+            def __init__(self, model: str, token: Optional[str], owner: "HuggingFaceClient"):
+                super().__init__(model, token=token)
+                self.owner = owner
+
+            def post(self, *, json=None, data=None, model=None, task=None, stream=False):
+                if data is not None:
+                    return super().post(json=json, data=data, model=model, task=task, stream=stream)
+                url = self._resolve_url(model, task)
+                # serialized once, retries while the model is loading send the same bytes
+                body = dumps(json)
+
+                def send(headers: Dict[str, str]) -> requests.Response:
+                    headers = {**self.headers, **JSON_HEADERS, **headers}
+                    try:
+                        if self.owner.http2:
+                            timeout = current_deadline().timeout()
+                            return self.owner.transport().post(url, body, headers, timeout, stream=stream)
+                        return get_session().post(
+                            url,
+                            data=body,
+                            headers=headers,
+                            cookies=self.cookies,
+                            timeout=current_deadline().timeout(),
+                            stream=stream,
+                        )
+                    except TimeoutError as error:
+                        raise InferenceTimeoutError(f"Inference call timed out: {url}") from error
+
+                try:
+                    response = self.owner.model_loading.request(url, send)
+                except ModelLoadingTimeout as error:
+                    raise InferenceTimeoutError(str(error)) from error
+                hf_raise_for_status(response)
+                return response.iter_lines() if stream else response.content
+
+        _inference_client_class = ModelLoadingInferenceClient
+    return _inference_client_class
+
+
+def _chat_chunk(id: str, model: Optional[str], **choice) -> Dict[str, Any]:
+    return dump_object(
+        construct_object(
+            ChatCompletionStreamResponse,
+            id=id,
+            model=model,
+            choices=[construct_object(ChatCompletionResponseStreamChoice, index=0, **choice)],
+        )
+    )
 
 
-def stream_chat_request(client, prompt, stop, gen_kwargs, model):
-    """Utility function for streaming chat requests."""
-    id = f"hf-{generate(size=10)}"
-    res = client.text_generation(
-        prompt,
-        stream=True,
-        details=True,
-        **gen_kwargs,
-    )
-    yield dump_object(
-        ChatCompletionStreamResponse(
+def _completion_chunk(id: str, model: Optional[str], token: Any) -> Dict[str, Any]:
+    return dump_object(
+        construct_object(
+            CompletionStreamResponse,
             id=id,
             model=model,
-            choices=[ChatCompletionResponseStreamChoice(index=0, delta=DeltaMessage(role="assistant"))],
+            choices=[
+                construct_object(CompletionResponseStreamChoice, index=0, text=token.text, logprobs=token.logprob)
+            ],
         )
     )
+
+
+def stream_chat_request(client, prompt, stop, gen_kwargs, model, deadline: Optional[Deadline] = None):
+    """Utility function for streaming chat requests."""
+    deadline = deadline or current_deadline()
+    id = f"hf-{generate(size=10)}"
+    # the stream is started by the first read, after `create` returned and left the deadline of the caller
+    with use_deadline(deadline):
+        res = client.text_generation(
+            prompt,
+            stream=True,
+            details=True,
+            **gen_kwargs,
+        )
+    yield _chat_chunk(id, model, delta=construct_object(DeltaMessage, role="assistant"))
     # yield each generated token
     reason = None
     for _idx, chunk in enumerate(res):
+        deadline.check()
         # skip special tokens
         if chunk.token.special:
             continue
@@ -71,27 +179,236 @@ def stream_chat_request(client, prompt, stop, gen_kwargs, model):
         # check if details is not none and if finish_reason key in details is not none
         if chunk.details is not None and chunk.details.finish_reason is not None:
             # set reason to finish reason
-            reason = chunk.details.finish_reason
+            reason = chunk.details.finish_reason.value
         # yield the generated token
-        yield dump_object(
-            ChatCompletionStreamResponse(
-                id=id,
-                model=model,
-                choices=[ChatCompletionResponseStreamChoice(index=0, delta=DeltaMessage(content=chunk.token.text))],
-            )
+        yield _chat_chunk(id, model, delta=construct_object(DeltaMessage, content=chunk.token.text))
+    yield _chat_chunk(id, model, finish_reason=reason, delta={})
+
+
+def stream_completion_request(client, prompt, stop, gen_kwargs, model, deadline: Optional[Deadline] = None):
+    """Utility function for completion chat requests."""
+    deadline = deadline or current_deadline()
+    id = f"hf-{generate(size=10)}"
+    with use_deadline(deadline):
+        res = client.text_generation(
+            prompt,
+            stream=True,
+            details=True,
+            **gen_kwargs,
         )
-    yield dump_object(
-        ChatCompletionStreamResponse(
-            id=id,
-            model=model,
-            choices=[ChatCompletionResponseStreamChoice(index=0, finish_reason=reason, delta={})],
+    # yield each generated token
+    for _idx, chunk in enumerate(res):
+        deadline.check()
+        # skip special tokens
+        if chunk.token.special:
+            continue
+        # stop if we encounter a stop sequence
+        if chunk.token.text in stop:
+            break
+        # yield the generated token
+        yield _completion_chunk(id, model, chunk.token)
+
+
+async def astream_chat_request(client, url, prompt, stop, gen_kwargs, model, deadline: Optional[Deadline] = None):
+    """Async version of `stream_chat_request`, reading the stream with the async client of `client`."""
+    deadline = deadline or current_deadline()
+    id = f"hf-{generate(size=10)}"
+    yield _chat_chunk(id, model, delta=construct_object(DeltaMessage, role="assistant"))
+    reason = None
+    async for chunk in client._agenerate_stream(url, prompt, gen_kwargs, deadline):
+        if chunk.token.special:
+            continue
+        if chunk.token.text in stop:
+            break
+        if chunk.details is not None and chunk.details.finish_reason is not None:
+            reason = chunk.details.finish_reason.value
+        yield _chat_chunk(id, model, delta=construct_object(DeltaMessage, content=chunk.token.text))
+    yield _chat_chunk(id, model, finish_reason=reason, delta={})
+
+
+async def astream_completion_request(
+    client, url, prompt, stop, gen_kwargs, model, deadline: Optional[Deadline] = None
+):
+    """Async version of `stream_completion_request`, reading the stream with the async client of `client`."""
+    deadline = deadline or current_deadline()
+    id = f"hf-{generate(size=10)}"
+    async for chunk in client._agenerate_stream(url, prompt, gen_kwargs, deadline):
+        if chunk.token.special:
+            continue
+        if chunk.token.text in stop:
+            break
+        yield _completion_chunk(id, model, chunk.token)
+
+
+class HuggingFaceClient(BaseClient):
+    """
+    Hugging Face client owning its configuration, so clients with different endpoints, tokens or prompt builders can
+    be used concurrently in one process. Instances are thread-safe and reuse an `InferenceClient` per url. They expose
+    the interface of the module, e.g. `client.ChatCompletion.create(...)`, and can be passed wherever a client module
+    is expected. The module-level classes use a default client reading the module configuration.
+
+    Args:
+        api_key (`str`, *optional*, defaults to None): The Hugging Face token, defaults to the token of the
+            Hugging Face CLI.
+        api_base (`str`, *optional*, defaults to None): The base url of the models, defaults to the Inference API.
+        prompt_builder (`Union[str, Callable]`, *optional*, defaults to None): Name of a prompt builder of
+            `easyllm.prompt_utils` or a function turning a list of messages into a prompt.
+        stop_sequences (`List[str]`, *optional*, defaults to None): Stop sequences added to every request.
+        seed (`int`, defaults to 42): The seed used for sampling.
+        model_loading (`ModelLoadingWaiter`, *optional*, defaults to None): Waits for models of the Inference API
+            while they are loaded, concurrent requests for a loading model share one poll. Defaults to a
+            `ModelLoadingWaiter()` of the client.
+        http2 (`bool`, defaults to False): Whether to send requests with httpx over HTTP/2, multiplexing concurrent
+            requests and streams to a host over a few connections, see `HTTPXTransport`. Requires
+            `pip install easyllm[http2]`. The async `acreate` methods always use httpx, over HTTP/1.1 if not set.
+    """
+
+    api_type = "huggingface"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        api_base: Optional[str] = None,
+        prompt_builder: Optional[Union[str, Callable]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: int = 42,
+        model_loading: Optional[ModelLoadingWaiter] = None,
+        http2: bool = False,
+    ):
+        super().__init__(prompt_builder=prompt_builder, stop_sequences=stop_sequences, seed=seed)
+        self.api_key = api_key
+        self.api_base = api_base or DEFAULT_API_BASE
+        self.model_loading = model_loading or ModelLoadingWaiter()
+        self.http2 = http2
+        self._setup()
+
+    def _setup(self) -> None:
+        self._clients: Dict[Tuple[str, Optional[str]], Any] = {}
+        self._transports: Dict[bool, HTTPXTransport] = {}
+        self._transport_lock = threading.Lock()
+        self._bind_operations()
+
+    def _bind_operations(self) -> None:
+        super()._bind_operations()
+        self.ChatCompletion = Operation(self.chat_completion, self.achat_completion)
+        self.Completion = Operation(self.completion, self.acompletion)
+
+    def transport(self) -> HTTPXTransport:
+        """Returns the httpx transport of the client, shared by all threads and created on first use."""
+        http2 = self.http2
+        transport = self._transports.get(http2)
+        if transport is None:
+            with self._transport_lock:
+                transport = self._transports.get(http2)
+                if transport is None:
+                    transport = self._transports[http2] = HTTPXTransport(http2=http2)
+        return transport
+
+    def close(self) -> None:
+        """Closes the sync connections of the httpx transports, see `HTTPXTransport.close`."""
+        with self._transport_lock:
+            transports, self._transports = list(self._transports.values()), {}
+        for transport in transports:
+            transport.close()
+
+    def _token(self) -> Optional[str]:
+        return self.api_key if self.api_key is not None else _get_cli_token()
+
+    def get_inference_client(self, url: str):
+        """Returns the `InferenceClient` of the url, created on first use."""
+        token = self._token()
+        client = self._clients.get((url, token))
+        if client is None:
+            # a race creates an extra client, which is harmless
+            client = self._clients[(url, token)] = _get_inference_client_class()(url, token, self)
+        return client
+
+    def _url(self, model: Optional[str]) -> str:
+        # if the model is a url, use it directly
+        return f"{self.api_base}/{model}" if model else self.api_base
+
+    def _resolve_credentials(self) -> None:
+        self._token()
+
+    def _warmup_session(self) -> requests.Session:
+        # the session used by `InferenceClient`, configured by `configure_http_pool`
+        from huggingface_hub.utils import get_session
+
+        return get_session()
+
+    def _pings_by_default(self, url: str) -> bool:
+        return url.startswith(DEFAULT_API_BASE) and url != DEFAULT_API_BASE
+
+    def _ping(self, session: requests.Session, url: str) -> None:
+        token = self._token()
+        res = session.post(
+            url,
+            json={"inputs": "ping", "parameters": {"max_new_tokens": 1}, "options": {"wait_for_model": False}},
+            headers={"Authorization": f"Bearer {token}"} if token else None,
+            timeout=PING_TIMEOUT,
         )
-    )
+        if res.status_code == 503:
+            logger.info("Model at %s is loading: %s", url, res.text)
+        elif res.status_code != 200:
+            raise Exception(res.text)
 
+    def _chat_parameters(self, request: ChatCompletionRequest, log) -> Tuple[str, str, List[str], Dict[str, Any]]:
+        """Builds the prompt, url, stop sequences and generation parameters of a chat request."""
+        trace = current_trace()
+        prompt = self._chat_prompt(request.messages)
+        trace.phase("build_prompt")
+        log.debug("Prompt sent to model will be:\n%s", prompt)
 
-class ChatCompletion:
-    @staticmethod
-    def create(
+        url = self._url(request.model)
+        log.debug("Url:\n%s", url)
+        trace.update(endpoint=url)
+
+        stop = self._stop(request.stop)
+        log.debug("Stop sequences:\n%s", stop)
+
+        # check if we can stream
+        if request.stream is True and request.n > 1:
+            raise ValueError("Cannot stream more than one completion")
+
+        gen_kwargs = self._generation_parameters(request, stop)
+        log.debug("Generation parameters:\n%s", gen_kwargs)
+        return prompt, url, stop, gen_kwargs
+
+    def _chat_response(self, request: ChatCompletionRequest, prompt: str, responses: List[Any], log) -> Dict[str, Any]:
+        choices = []
+        generated_tokens = 0
+        for _i, res in enumerate(responses):
+            parsed = construct_object(
+                ChatCompletionResponseChoice,
+                index=_i,
+                message=construct_object(ChatMessage, role="assistant", content=res.generated_text),
+                finish_reason=res.details.finish_reason.value,
+            )
+            generated_tokens += res.details.generated_tokens
+            choices.append(parsed)
+            log.debug("Response at index %s:\n%s", _i, parsed)
+        # calculate usage details
+        # TODO: fix when details is fixed
+        prompt_tokens = int(len(prompt) / 4)
+        total_tokens = prompt_tokens + generated_tokens
+
+        return dump_object(
+            construct_object(
+                ChatCompletionResponse,
+                model=request.model,
+                choices=choices,
+                usage=construct_object(
+                    Usage,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=generated_tokens,
+                    total_tokens=total_tokens,
+                ),
+            )
+        )
+
+    @traced("huggingface", "chat")
+    def chat_completion(
+        self,
         messages: List[ChatMessage],
         model: Optional[str] = None,
         temperature: float = 0.9,
@@ -124,9 +441,9 @@ class ChatCompletion:
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
         request = ChatCompletionRequest(
             messages=messages,
             model=model,
@@ -139,137 +456,133 @@ class ChatCompletion:
             stream=stream,
             frequency_penalty=frequency_penalty,
         )
+        trace.phase("validate")
 
-        if prompt_builder is None:
-            logger.warn(
-                f"""huggingface.prompt_builder is not set.
-Using default prompt builder for. Prompt sent to model will be:
-----------------------------------------
-{buildBasePrompt(request.messages)}.
-----------------------------------------
-If you want to use a custom prompt builder, set huggingface.prompt_builder to a function that takes a list of messages and returns a string.
-You can also use existing prompt builders by importing them from easyllm.prompt_utils"""
-            )
-            prompt = buildBasePrompt(request.messages)
-        else:
-            prompt = build_prompt(request.messages, prompt_builder)
+        prompt, url, stop, gen_kwargs = self._chat_parameters(request, log)
+        client = self.get_inference_client(url)
+        trace.phase("connect")
 
-        # if the model is a url, use it directly
-        if request.model:
-            url = f"{api_base}/{request.model}"
-            logger.debug(f"Url:\n{url}")
-        else:
-            url = api_base
+        if request.stream:
+            return stream_chat_request(client, prompt, stop, gen_kwargs, request.model, current_deadline())
+        responses = []
+        for _i in range(request.n):
+            responses.append(client.text_generation(prompt, details=True, **gen_kwargs))
+            trace.phase("complete")
+        return self._chat_response(request, prompt, responses, log)
+
+    @traced("huggingface", "chat")
+    async def achat_completion(
+        self,
+        messages: List[ChatMessage],
+        model: Optional[str] = None,
+        temperature: float = 0.9,
+        top_p: float = 0.6,
+        top_k: Optional[int] = 10,
+        n: int = 1,
+        max_tokens: int = 1024,
+        stop: Optional[List[str]] = None,
+        stream: bool = False,
+        frequency_penalty: Optional[float] = 1.0,
+        debug: bool = False,
+    ) -> Union[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
+        """
+        Async version of `chat_completion` for Text Generation Inference endpoints, sent with httpx over HTTP/2 if
+        `http2` is set. Streams are returned as async iterators. Models of the Inference API which are still loading
+        are waited for with `model_loading`. Takes the same arguments as `chat_completion`.
+        """
+        log = request_logger(debug)
 
-        # create the client
-        client = InferenceClient(url, token=api_key)
+        trace = current_trace()
+        request = ChatCompletionRequest(
+            messages=messages,
+            model=model,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            n=n,
+            max_tokens=max_tokens,
+            stop=stop,
+            stream=stream,
+            frequency_penalty=frequency_penalty,
+        )
+        trace.phase("validate")
 
-        # create stop sequences
-        if isinstance(request.stop, list):
-            stop = stop_sequences + request.stop
-        elif isinstance(request.stop, str):
-            stop = stop_sequences + [request.stop]
-        else:
-            stop = stop_sequences
-        logger.debug(f"Stop sequences:\n{stop}")
+        prompt, url, stop, gen_kwargs = self._chat_parameters(request, log)
+        self.transport()
+        trace.phase("connect")
+
+        if request.stream:
+            return astream_chat_request(self, url, prompt, stop, gen_kwargs, request.model, current_deadline())
+        responses = await asyncio.gather(*(self._agenerate(url, prompt, gen_kwargs) for _ in range(request.n)))
+        trace.phase("complete")
+        return self._chat_response(request, prompt, responses, log)
+
+    def _completion_parameters(self, request: CompletionRequest, log) -> Tuple[str, str, List[str], Dict[str, Any]]:
+        """Builds the prompt, url, stop sequences and generation parameters of a completion request."""
+        trace = current_trace()
+        # include suffix if it exists
+        if request.suffix is not None:
+            request.prompt = request.prompt + request.suffix
+
+        prompt = self._completion_prompt(request.prompt)
+        trace.phase("build_prompt")
+        log.debug("Prompt sent to model will be:\n%s", prompt)
+
+        url = self._url(request.model)
+        log.debug("Url:\n%s", url)
+        trace.update(endpoint=url)
+
+        stop = self._stop(request.stop)
+        log.debug("Stop sequences:\n%s", stop)
 
         # check if we can stream
         if request.stream is True and request.n > 1:
             raise ValueError("Cannot stream more than one completion")
 
-        # create generation parameters
-        gen_kwargs = {
-            "do_sample": True,
-            "return_full_text": False,
-            "max_new_tokens": request.max_tokens,
-            "top_p": float(request.top_p),
-            "temperature": float(request.temperature),
-            "stop_sequences": stop,
-            "repetition_penalty": request.frequency_penalty,
-            "top_k": request.top_k,
-            "seed": seed,
-        }
-        if request.top_p == 0:
-            gen_kwargs.pop("top_p")
-        if request.top_p == 1:
-            request.top_p = 0.9999999
-        if request.temperature == 0:
-            gen_kwargs.pop("temperature")
-            gen_kwargs["do_sample"] = False
-        logger.debug(f"Generation parameters:\n{gen_kwargs}")
+        gen_kwargs = self._generation_parameters(request, stop, return_full_text=bool(request.echo))
+        log.debug("Generation parameters:\n%s", gen_kwargs)
+        return prompt, url, stop, gen_kwargs
 
-        if request.stream:
-            return stream_chat_request(client, prompt, stop, gen_kwargs, request.model)
-        else:
-            choices = []
-            generated_tokens = 0
-            for _i in range(request.n):
-                res = client.text_generation(
-                    prompt,
-                    details=True,
-                    **gen_kwargs,
-                )
-                parsed = ChatCompletionResponseChoice(
-                    index=_i,
-                    message=ChatMessage(role="assistant", content=res.generated_text),
-                    finish_reason=res.details.finish_reason.value,
-                )
-                generated_tokens += res.details.generated_tokens
-                choices.append(parsed)
-                logger.debug(f"Response at index {_i}:\n{parsed}")
-            # calculate usage details
-            # TODO: fix when details is fixed
-            prompt_tokens = int(len(prompt) / 4)
-            total_tokens = prompt_tokens + generated_tokens
-
-            return dump_object(
-                ChatCompletionResponse(
-                    model=request.model,
-                    choices=choices,
-                    usage=Usage(
-                        prompt_tokens=prompt_tokens, completion_tokens=generated_tokens, total_tokens=total_tokens
-                    ),
-                )
+    def _completion_response(
+        self, request: CompletionRequest, prompt: str, responses: List[Any], log
+    ) -> Dict[str, Any]:
+        choices = []
+        generated_tokens = 0
+        for _i, res in enumerate(responses):
+            parsed = construct_object(
+                CompletionResponseChoice,
+                index=_i,
+                text=res.generated_text,
+                finish_reason=res.details.finish_reason.value,
             )
+            if request.logprobs:
+                parsed.logprobs = res.details.tokens
 
-    @classmethod
-    async def acreate(cls, *args, **kwargs):
-        """
-        Creates a new chat completion for the provided messages and parameters.
-        """
-        raise NotImplementedError("ChatCompletion.acreate is not implemented")
-
+            generated_tokens += res.details.generated_tokens
+            choices.append(parsed)
+            log.debug("Response at index %s:\n%s", _i, parsed)
+        # calcuate usage details
+        # TODO: fix when details is fixed
+        prompt_tokens = int(len(prompt) / 4)
+        total_tokens = prompt_tokens + generated_tokens
 
-def stream_completion_request(client, prompt, stop, gen_kwargs, model):
-    """Utility function for completion chat requests."""
-    id = f"hf-{generate(size=10)}"
-    res = client.text_generation(
-        prompt,
-        stream=True,
-        details=True,
-        **gen_kwargs,
-    )
-    # yield each generated token
-    for _idx, chunk in enumerate(res):
-        # skip special tokens
-        if chunk.token.special:
-            continue
-        # stop if we encounter a stop sequence
-        if chunk.token.text in stop:
-            break
-        # yield the generated token
-        yield dump_object(
-            CompletionStreamResponse(
-                id=id,
-                model=model,
-                choices=[CompletionResponseStreamChoice(index=0, text=chunk.token.text, logprobs=chunk.token.logprob)],
+        return dump_object(
+            construct_object(
+                CompletionResponse,
+                model=request.model,
+                choices=choices,
+                usage=construct_object(
+                    Usage,
+                    prompt_tokens=prompt_tokens,
+                    completion_tokens=generated_tokens,
+                    total_tokens=total_tokens,
+                ),
             )
         )
 
-
-class Completion:
-    @staticmethod
-    def create(
+    @traced("huggingface", "completion")
+    def completion(
+        self,
         prompt: Union[str, List[Any]],
         model: Optional[str] = None,
         suffix: Optional[str] = None,
@@ -309,9 +622,9 @@ class Completion:
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
         request = CompletionRequest(
             model=model,
             prompt=prompt,
@@ -327,120 +640,154 @@ class Completion:
             logprobs=logprobs,
             echo=echo,
         )
+        trace.phase("validate")
 
-        # include suffix if it exists
-        if request.suffix is not None:
-            request.prompt = request.prompt + request.suffix
+        prompt, url, stop, gen_kwargs = self._completion_parameters(request, log)
+        client = self.get_inference_client(url)
+        trace.phase("connect")
 
-        if prompt_builder is None:
-            logging.warn(
-                f"""huggingface.prompt_builder is not set.
-Using input as prompt builder. Prompt sent to model will be:
-----------------------------------------
-{request.prompt}.
-----------------------------------------
-If you want to use a custom prompt builder, set huggingface.prompt_builder to a function that takes a list of messages and returns a string.
-You can also use existing prompt builders by importing them from easyllm.prompt_utils"""
-            )
-            prompt = request.prompt
-        else:
-            prompt = build_prompt(request.prompt, prompt_builder)
-        logger.debug(f"Prompt sent to model will be:\n{prompt}")
+        if request.stream:
+            return stream_completion_request(client, prompt, stop, gen_kwargs, request.model, current_deadline())
+        responses = []
+        for _i in range(request.n):
+            responses.append(client.text_generation(prompt, details=True, **gen_kwargs))
+            trace.phase("complete")
+        return self._completion_response(request, prompt, responses, log)
+
+    @traced("huggingface", "completion")
+    async def acompletion(
+        self,
+        prompt: Union[str, List[Any]],
+        model: Optional[str] = None,
+        suffix: Optional[str] = None,
+        temperature: float = 0.9,
+        top_p: float = 0.6,
+        top_k: Optional[int] = 10,
+        n: int = 1,
+        max_tokens: int = 1024,
+        stop: Optional[List[str]] = None,
+        stream: bool = False,
+        frequency_penalty: Optional[float] = 1.0,
+        logprobs: bool = False,
+        echo: bool = False,
+        debug: bool = False,
+    ) -> Union[Dict[str, Any], AsyncIterator[Dict[str, Any]]]:
+        """
+        Async version of `completion` for Text Generation Inference endpoints, see `achat_completion`. Takes the same
+        arguments as `completion`.
+        """
+        log = request_logger(debug)
 
-        # if the model is a url, use it directly
-        if request.model:
-            url = f"{api_base}/{request.model}"
-            logger.debug(f"Url:\n{url}")
-        else:
-            url = api_base
+        trace = current_trace()
+        request = CompletionRequest(
+            model=model,
+            prompt=prompt,
+            suffix=suffix,
+            temperature=temperature,
+            top_p=top_p,
+            top_k=top_k,
+            n=n,
+            max_tokens=max_tokens,
+            stop=stop,
+            stream=stream,
+            frequency_penalty=frequency_penalty,
+            logprobs=logprobs,
+            echo=echo,
+        )
+        trace.phase("validate")
 
-        # create the client
-        client = InferenceClient(url, token=api_key)
+        prompt, url, stop, gen_kwargs = self._completion_parameters(request, log)
+        self.transport()
+        trace.phase("connect")
 
-        # create stop sequences
-        if isinstance(request.stop, list):
-            stop = stop_sequences + request.stop
-        elif isinstance(request.stop, str):
-            stop = stop_sequences + [request.stop]
-        else:
-            stop = stop_sequences
-        logger.debug(f"Stop sequences:\n{stop}")
+        if request.stream:
+            return astream_completion_request(self, url, prompt, stop, gen_kwargs, request.model, current_deadline())
+        responses = await asyncio.gather(*(self._agenerate(url, prompt, gen_kwargs) for _ in range(request.n)))
+        trace.phase("complete")
+        return self._completion_response(request, prompt, responses, log)
+
+    def _text_generation_request(self, prompt: str, gen_kwargs: Dict[str, Any], stream: bool):
+        """The body and headers of a Text Generation Inference request, like `InferenceClient.text_generation`."""
+        parameters = dict(gen_kwargs)
+        parameters["stop"] = parameters.pop("stop_sequences", None) or []
+        parameters["details"] = True
+        body = dumps({"inputs": prompt, "parameters": parameters, "stream": stream})
+        token = self._token()
+        return body, {**JSON_HEADERS, "Authorization": f"Bearer {token}"} if token else JSON_HEADERS
 
-        # check if we can stream
-        if request.stream is True and request.n > 1:
-            raise ValueError("Cannot stream more than one completion")
+    @staticmethod
+    async def _araise_for_status(response: Any) -> None:
+        """Raises the errors `InferenceClient.text_generation` raises for an error response."""
+        if response.status_code < 400:
+            return
+        from huggingface_hub.utils import hf_raise_for_status
 
-        # create generation parameters
-        gen_kwargs = {
-            "do_sample": True,
-            "return_full_text": True if request.echo else False,
-            "max_new_tokens": request.max_tokens,
-            "top_p": float(request.top_p),
-            "temperature": float(request.temperature),
-            "stop_sequences": stop,
-            "repetition_penalty": request.frequency_penalty,
-            "top_k": request.top_k,
-            "seed": seed,
-        }
-        if request.top_p == 0:
-            gen_kwargs.pop("top_p")
-        if request.top_p == 1:
-            request.top_p = 0.9999999
-        if request.temperature == 0:
-            gen_kwargs.pop("temperature")
-            gen_kwargs["do_sample"] = False
-        logger.debug(f"Generation parameters:\n{gen_kwargs}")
+        from easyllm.utils.text_generation import raise_text_generation_error
 
-        if request.stream:
-            return stream_completion_request(client, prompt, stop, gen_kwargs, request.model)
-        else:
-            choices = []
-            generated_tokens = 0
-            for _i in range(request.n):
-                res = client.text_generation(
-                    prompt,
-                    details=True,
-                    **gen_kwargs,
-                )
-                parsed = CompletionResponseChoice(
-                    index=_i,
-                    text=res.generated_text,
-                    finish_reason=res.details.finish_reason.value,
-                )
-                if request.logprobs:
-                    parsed.logprobs = res.details.tokens
-
-                generated_tokens += res.details.generated_tokens
-                choices.append(parsed)
-                logger.debug(f"Response at index {_i}:\n{parsed}")
-            # calcuate usage details
-            # TODO: fix when details is fixed
-            prompt_tokens = int(len(prompt) / 4)
-            total_tokens = prompt_tokens + generated_tokens
-
-            return dump_object(
-                CompletionResponse(
-                    model=request.model,
-                    choices=choices,
-                    usage=Usage(
-                        prompt_tokens=prompt_tokens, completion_tokens=generated_tokens, total_tokens=total_tokens
-                    ),
-                )
-            )
+        await response.aread()
+        try:
+            hf_raise_for_status(to_requests_response(response))
+        except requests.HTTPError as e:
+            raise_text_generation_error(e)
 
-    @classmethod
-    async def acreate(cls, *args, **kwargs):
+    async def _asend(self, stack: contextlib.AsyncExitStack, url: str, body: bytes, headers: Dict[str, str], timeout):
         """
-        Creates a new chat completion for the provided messages and parameters.
+        Opens the response of a text generation request, waiting with `model_loading` while the model is loaded. The
+        response is closed when `stack` exits.
         """
-        raise NotImplementedError("ChatCompletion.acreate is not implemented")
 
-
-class Embedding:
-    @staticmethod
-    def create(
+        async def send(extra: Dict[str, str]) -> Any:
+            context = self.transport().astream(url, body, {**headers, **extra}, timeout)
+            response = await context.__aenter__()
+            if response.status_code != 503:
+                stack.push_async_exit(context)
+                return response
+            # loading responses are read for their `estimated_time` and closed before the next attempt
+            try:
+                await response.aread()
+            finally:
+                await context.__aexit__(None, None, None)
+            return response
+
+        try:
+            response = await self.model_loading.arequest(url, send)
+        except ModelLoadingTimeout as error:
+            from huggingface_hub import InferenceTimeoutError
+
+            raise InferenceTimeoutError(str(error)) from error
+        await self._araise_for_status(response)
+        return response
+
+    async def _agenerate(self, url: str, prompt: str, gen_kwargs: Dict[str, Any]):
+        """Sends a text generation request with the async client and returns the response `InferenceClient` returns."""
+        from easyllm.utils.text_generation import parse_text_generation
+
+        body, headers = self._text_generation_request(prompt, gen_kwargs, stream=False)
+        async with contextlib.AsyncExitStack() as stack:
+            response = await self._asend(stack, url, body, headers, current_deadline().timeout())
+            data = loads(await response.aread())
+        # the root route answers with a list, `/generate` with an object
+        return parse_text_generation(data[0] if isinstance(data, list) else data)
+
+    async def _agenerate_stream(self, url: str, prompt: str, gen_kwargs: Dict[str, Any], deadline: Deadline):
+        """Streams a text generation request with the async client as the events `InferenceClient` yields."""
+        from easyllm.utils.text_generation import parse_text_generation_stream
+
+        body, headers = self._text_generation_request(prompt, gen_kwargs, stream=True)
+        async with contextlib.AsyncExitStack() as stack:
+            with use_deadline(deadline):
+                response = await self._asend(stack, url, body, headers, deadline.timeout())
+            async for line in response.aiter_lines():
+                deadline.check()
+                if line.startswith("data:"):
+                    yield parse_text_generation_stream(loads(line[5:]))
+
+    @traced("huggingface", "embedding")
+    def embedding(
+        self,
         input: Union[str, List[Any]],
         model: Optional[str] = None,
+        encoding_format: str = "float",
         debug: bool = False,
     ) -> Dict[str, Any]:
         """
@@ -450,38 +797,49 @@ class Embedding:
             input (`Union[str, List[Any]]`) document(s) to embed.
             model (`str`, *optional*, defaults to None) The model to use for the completion. If not provided,
                 defaults to the base url.
+            encoding_format (`str`, defaults to "float"): The format of the returned embeddings. "float" returns lists
+                of floats, "base64" base64 encoded little-endian float32 bytes like OpenAI and "numpy" (or "float32")
+                float32 numpy arrays. All formats except "float" require numpy.
             debug (`bool`, defaults to False): Whether to enable debug logging.
 
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
+        validate_encoding_format(encoding_format)
         request = EmbeddingsRequest(model=model, input=input)
+        trace.phase("validate")
 
         # if the model is a url, use it directly
+        api_base = self.api_base
         if request.model:
             if api_base.endswith("/models"):
                 url = f"{api_base.replace('/models', '/pipeline/feature-extraction')}/{request.model}"
             else:
                 url = f"{api_base}/{request.model}"
-            logger.debug(f"Url:\n{url}")
+            log.debug("Url:\n%s", url)
         else:
             url = api_base
 
-        # create the client
-        client = InferenceClient(url, token=api_key)
+        client = self.get_inference_client(url)
+        trace.update(endpoint=url)
+        trace.phase("connect")
 
         # client is currently not supporting batched request thats why we run sequentially
         emb = []
         res = client.post(json={"inputs": request.input, "model": request.model, "task": "feature-extraction"})
-        parsed_res = json.loads(res.decode())
-        if isinstance(request.input, list):
-            for idx, i in enumerate(parsed_res):
-                emb.append(EmbeddingsObjectResponse(index=idx, embedding=i))
+        trace.phase("complete")
+        if encoding_format != "float":
+            embeddings = encode_embeddings(parse_embeddings(res), encoding_format)
+            for idx, i in enumerate(embeddings):
+                emb.append(embedding_object(idx, i))
+        elif isinstance(request.input, list):
+            for idx, i in enumerate(loads(res)):
+                emb.append(embedding_object(idx, i))
         else:
-            emb.append(EmbeddingsObjectResponse(index=0, embedding=parsed_res))
+            emb.append(embedding_object(0, loads(res)))
 
         if isinstance(res, list):
             # TODO: only approximating tokens
@@ -490,16 +848,121 @@ class Embedding:
             tokens = int(len(request.input) / 4)
 
         return dump_object(
-            EmbeddingsResponse(
+            construct_object(
+                EmbeddingsResponse,
                 model=request.model,
                 data=emb,
-                usage=Usage(prompt_tokens=tokens, total_tokens=tokens),
+                usage=construct_object(Usage, prompt_tokens=tokens, total_tokens=tokens),
             )
         )
 
+    def loglikelihood(
+        self,
+        context: Union[str, List[str]],
+        continuation: Union[str, List[str]],
+        model: Optional[str] = None,
+        concurrency: int = 8,
+        debug: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Scores `continuation` given `context` with the log-probabilities of the model, without sampling. Each
+        context + continuation is sent once with `decoder_input_details=True` and `max_new_tokens=1`, and the
+        logprobs of the prefill tokens covering the continuation are returned. Inputs are scored concurrently.
+
+        Args:
+            context (`Union[str, List[str]]`): The context(s), a single context is shared by all continuations.
+            continuation (`Union[str, List[str]]`): The continuation(s) to score.
+            model (`str`, *optional*, defaults to None): The model to use. If not provided, defaults to the base url.
+            concurrency (`int`, defaults to 8): Number of concurrent requests.
+            debug (`bool`, defaults to False): Whether to enable debug logging.
+
+        Returns:
+            `Dict[str, Any]` with NumPy arrays: `sum` (summed logprob per input), `num_tokens`, `logprobs` (per-token
+            logprobs of all inputs, flat) and `offsets`, input `i` spans `logprobs[offsets[i]:offsets[i + 1]]`.
+        """
+        log = request_logger(debug)
+
+        pairs = pair_inputs(context, continuation)
+        url = self._url(model)
+        log.debug("Url:\n%s", url)
+        client = self.get_inference_client(url)
+        seed = self.seed
+        # the deadline of the caller applies to the requests sent by the thread pool
+        deadline = current_deadline()
+
+        def score(pair):
+            with use_deadline(deadline):
+                res = client.text_generation(
+                    "".join(pair), details=True, decoder_input_details=True, max_new_tokens=1, seed=seed
+                )
+            return continuation_logprobs(res.details.prefill, pair[1]), len(res.details.prefill)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pairs)))) as executor:
+            results = list(executor.map(score, pairs))
+        return build_scores([logprobs for logprobs, _ in results], sum(tokens for _, tokens in results), model)
+
+
+class _ModuleClient(HuggingFaceClient):
+    """The default client, reading the module configuration on every call so `huggingface.api_base = ...` applies."""
+
+    def __init__(self):
+        self._setup()
+
+    @property
+    def api_key(self) -> Optional[str]:
+        return api_key
+
+    @property
+    def api_base(self) -> str:
+        return api_base
+
+    @property
+    def prompt_builder(self) -> Optional[Union[str, Callable]]:
+        return prompt_builder
+
+    @property
+    def stop_sequences(self) -> List[str]:
+        return stop_sequences
+
+    @property
+    def seed(self) -> int:
+        return seed
+
+    @property
+    def model_loading(self) -> ModelLoadingWaiter:
+        return model_loading
+
+    @property
+    def http2(self) -> bool:
+        return http2
+
+
+default_client = _ModuleClient()
+
+warmup = default_client.warmup
+ping = default_client.ping
+
+
+class ChatCompletion:
+    create = staticmethod(default_client.chat_completion)
+    acreate = staticmethod(default_client.achat_completion)
+
+
+class Completion:
+    create = staticmethod(default_client.completion)
+    acreate = staticmethod(default_client.acompletion)
+
+
+class Embedding:
+    create = staticmethod(default_client.embedding)
+
     @classmethod
     async def acreate(cls, *args, **kwargs):
         """
         Creates a new chat completion for the provided messages and parameters.
         """
         raise NotImplementedError("ChatCompletion.acreate is not implemented")
+
+
+class LogLikelihood:
+    create = staticmethod(default_client.loglikelihood)
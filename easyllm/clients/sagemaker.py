@@ -1,11 +1,12 @@
-import logging
 import os
-from typing import Any, Dict, List, Optional, Union
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import requests
 
-from easyllm.prompt_utils.base import build_prompt, buildBasePrompt
-from easyllm.schema.base import ChatMessage, Usage, dump_object
+from easyllm.clients.base import BaseClient
+from easyllm.schema.base import ChatMessage, Usage, construct_object, dump_object
 from easyllm.schema.openai import (
     ChatCompletionRequest,
     ChatCompletionResponse,
@@ -13,11 +14,25 @@ from easyllm.schema.openai import (
     CompletionRequest,
     CompletionResponse,
     CompletionResponseChoice,
-    EmbeddingsObjectResponse,
     EmbeddingsRequest,
     EmbeddingsResponse,
+    embedding_object,
 )
-from easyllm.utils import AWSSigV4, setup_logger
+from easyllm.utils import setup_logger
+from easyllm.utils.aws import AWSSigV4
+from easyllm.utils.deadlines import current_deadline, use_deadline
+from easyllm.utils.embeddings import (
+    BINARY_ACCEPT,
+    encode_embeddings,
+    is_binary_embedding,
+    parse_embeddings,
+    validate_encoding_format,
+)
+from easyllm.utils.http import build_session, get_session, gzip_body
+from easyllm.utils.logging import request_logger
+from easyllm.utils.scoring import build_scores, continuation_logprobs, pair_inputs
+from easyllm.utils.serialization import JSON_HEADERS, dumps, loads
+from easyllm.utils.tracing import current_trace, traced
 
 logger = setup_logger()
 
@@ -27,19 +42,44 @@ api_aws_access_key = os.environ.get("AWS_ACCESS_KEY_ID", None)
 api_aws_secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY", None)
 api_aws_session_token = os.environ.get("AWS_SESSION_TOKEN", None)
 
-aws_auth = AWSSigV4(
-    "sagemaker",
-    aws_access_key_id=api_aws_access_key,
-    aws_secret_access_key=api_aws_secret_key,
-    aws_session_token=api_aws_session_token,
-)
+# request signer, created on the first request from the credentials above, see `get_aws_auth`
+aws_auth = None
+_aws_auth_lock = threading.Lock()
 
-api_base = f"https://runtime.sagemaker.{aws_auth.region}.amazonaws.com/endpoints"
+# defaults to the SageMaker runtime of the resolved region, see `get_api_base`
+api_base = os.environ.get("SAGEMAKER_API_BASE", None)
 
 api_version = os.environ.get("SAGEMAKER_API_VERSION", None) or "2023-07-29"
 prompt_builder = os.environ.get("HUGGINGFACE_PROMPT", None)
 stop_sequences = []
 seed = 42
+# asks embedding endpoints for npy or raw float32 bodies instead of JSON, see `SageMakerClient`
+binary_embeddings = os.environ.get("SAGEMAKER_BINARY_EMBEDDINGS", "").lower() in ("1", "true")
+# compresses request bodies of at least `easyllm.utils.http.GZIP_MIN_SIZE` bytes with gzip
+gzip_requests = os.environ.get("SAGEMAKER_GZIP_REQUESTS", "").lower() in ("1", "true")
+
+# keys of the embedding endpoint response holding the vectors, checked in order
+EMBEDDING_KEYS = ("vectors", "predictions", "embeddings")
+
+
+def get_aws_auth() -> AWSSigV4:
+    """Returns the SigV4 request signer, creating it on first use from the module configuration."""
+    global aws_auth
+    if aws_auth is None:
+        with _aws_auth_lock:
+            if aws_auth is None:
+                aws_auth = AWSSigV4(
+                    "sagemaker",
+                    aws_access_key_id=api_aws_access_key,
+                    aws_secret_access_key=api_aws_secret_key,
+                    aws_session_token=api_aws_session_token,
+                )
+    return aws_auth
+
+
+def get_api_base() -> str:
+    """Returns `api_base` or the SageMaker runtime url of the region resolved from the AWS credentials."""
+    return default_client.get_api_base()
 
 
 def stream_chat_request(client, prompt, stop, gen_kwargs, model):
@@ -47,9 +87,140 @@ def stream_chat_request(client, prompt, stop, gen_kwargs, model):
     raise NotImplementedError("SageMaker is not yet supporting streaming requests")
 
 
-class ChatCompletion:
-    @staticmethod
-    def create(
+def stream_completion_request(client, prompt, stop, gen_kwargs, model):
+    """Utility function for completion chat requests."""
+    raise NotImplementedError("SageMaker is not yet supporting streaming requests")
+
+
+class SageMakerClient(BaseClient):
+    """
+    SageMaker client owning its configuration, credentials and connection pool, so clients of different endpoints,
+    accounts or prompt builders can be used concurrently in one process. Instances are thread-safe and expose the
+    interface of the module, e.g. `client.ChatCompletion.create(...)`, so they can be passed wherever a client module
+    is expected. The module-level classes use a default client reading the module configuration.
+
+    Args:
+        aws_access_key_id (`str`, *optional*, defaults to None): The AWS access key, resolved with boto3 if not set.
+        aws_secret_access_key (`str`, *optional*, defaults to None): The AWS secret key.
+        aws_session_token (`str`, *optional*, defaults to None): The AWS session token.
+        region (`str`, *optional*, defaults to None): The AWS region, resolved with boto3 if not set.
+        api_base (`str`, *optional*, defaults to None): The base url of the endpoints, defaults to the SageMaker
+            runtime of the region.
+        prompt_builder (`Union[str, Callable]`, *optional*, defaults to None): Name of a prompt builder of
+            `easyllm.prompt_utils` or a function turning a list of messages into a prompt.
+        stop_sequences (`List[str]`, *optional*, defaults to None): Stop sequences added to every request.
+        seed (`int`, defaults to 42): The seed used for sampling.
+        auth (`requests.auth.AuthBase`, *optional*, defaults to None): Request signer, defaults to an `AWSSigV4` of
+            the credentials above.
+        pool_size (`int`, *optional*, defaults to None): Connections kept alive per endpoint host in a pool owned by
+            the client. Defaults to the shared pool of `easyllm.utils.http`.
+        binary_embeddings (`bool`, defaults to False): Whether embedding requests accept `application/x-npy` and raw
+            float32 (`application/octet-stream`) responses, which are decoded into numpy without parsing JSON.
+            Endpoints answering with JSON keep working. Requires numpy.
+        gzip_requests (`bool`, defaults to False): Whether request bodies of at least 1 KiB are sent gzip compressed.
+            The endpoint has to support `Content-Encoding: gzip`. Responses are decompressed if the endpoint
+            compresses them.
+    """
+
+    api_type = "sagemaker"
+
+    def __init__(
+        self,
+        aws_access_key_id: Optional[str] = None,
+        aws_secret_access_key: Optional[str] = None,
+        aws_session_token: Optional[str] = None,
+        region: Optional[str] = None,
+        api_base: Optional[str] = None,
+        prompt_builder: Optional[Union[str, Callable]] = None,
+        stop_sequences: Optional[List[str]] = None,
+        seed: int = 42,
+        auth: Any = None,
+        pool_size: Optional[int] = None,
+        binary_embeddings: bool = False,
+        gzip_requests: bool = False,
+    ):
+        super().__init__(prompt_builder=prompt_builder, stop_sequences=stop_sequences, seed=seed)
+        self.api_base = api_base
+        self.auth = auth or AWSSigV4(
+            "sagemaker",
+            aws_access_key_id=aws_access_key_id,
+            aws_secret_access_key=aws_secret_access_key,
+            aws_session_token=aws_session_token,
+            region=region,
+        )
+        self.pool_size = pool_size
+        self.binary_embeddings = binary_embeddings
+        self.gzip_requests = gzip_requests
+        self._setup()
+
+    def _setup(self) -> None:
+        self._local = threading.local()
+        self._bind_operations()
+
+    def get_session(self) -> requests.Session:
+        """Returns the pooled session of the current thread."""
+        if self.pool_size is None:
+            return get_session()
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = build_session(self.pool_size)
+        return session
+
+    def get_api_base(self) -> str:
+        """Returns `api_base` or the SageMaker runtime url of the region resolved from the AWS credentials."""
+        if self.api_base is not None:
+            return self.api_base
+        return f"https://runtime.sagemaker.{self.auth.region}.amazonaws.com/endpoints"
+
+    def _url(self, model: Optional[str]) -> str:
+        # if the model is a url, use it directly
+        return f"{self.get_api_base()}/{model}/invocations" if model else self.get_api_base()
+
+    def close(self) -> None:
+        """Releases the credentials of the signer, stopping their renewal if no other client uses them."""
+        close = getattr(self.auth, "close", None)
+        if close is not None:
+            close()
+
+    def _resolve_credentials(self) -> None:
+        resolve = getattr(self.auth, "resolve", None)
+        if resolve is not None:
+            resolve()
+
+    def _warmup_session(self) -> requests.Session:
+        return self.get_session()
+
+    def _ping(self, session: requests.Session, url: str) -> None:
+        self._generate(session, url, self.auth, "ping", {"max_new_tokens": 1})
+
+    def _post(
+        self,
+        session: requests.Session,
+        url: str,
+        auth: Any,
+        body: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> requests.Response:
+        # the body is serialized and compressed to bytes once, `AWSSigV4` hashes the same bytes which are sent
+        data, headers = dumps(body), {**JSON_HEADERS, **(headers or {})}
+        if self.gzip_requests:
+            data, headers = gzip_body(data, headers)
+        return session.request(
+            "POST", url, data=data, headers=headers, auth=auth, timeout=current_deadline().timeout()
+        )
+
+    def _generate(self, session: requests.Session, url: str, auth: Any, prompt: str, parameters: Dict[str, Any]):
+        res = self._post(session, url, auth, {"inputs": prompt, "parameters": parameters})
+        trace = current_trace()
+        trace.update(status=res.status_code)
+        trace.phase("complete")
+        if res.status_code != 200:
+            raise Exception(res.text)
+        return loads(res.content)[0]
+
+    @traced("sagemaker", "chat")
+    def chat_completion(
+        self,
         messages: List[ChatMessage],
         model: Optional[str] = None,
         temperature: float = 0.9,
@@ -82,9 +253,9 @@ class ChatCompletion:
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
         request = ChatCompletionRequest(
             messages=messages,
             model=model,
@@ -97,61 +268,28 @@ class ChatCompletion:
             stream=stream,
             frequency_penalty=frequency_penalty,
         )
+        trace.phase("validate")
 
-        if prompt_builder is None:
-            logger.warn(
-                f"""huggingface.prompt_builder is not set.
-Using default prompt builder for. Prompt sent to model will be:
-----------------------------------------
-{buildBasePrompt(request.messages)}.
-----------------------------------------
-If you want to use a custom prompt builder, set huggingface.prompt_builder to a function that takes a list of messages and returns a string.
-You can also use existing prompt builders by importing them from easyllm.prompt_utils"""
-            )
-            prompt = buildBasePrompt(request.messages)
-        else:
-            prompt = build_prompt(request.messages, prompt_builder)
+        prompt = self._chat_prompt(request.messages)
+        trace.phase("build_prompt")
+        log.debug("Prompt sent to model will be:\n%s", prompt)
 
-        # if the model is a url, use it directly
-        if request.model:
-            url = f"{api_base}/{request.model}/invocations"
-            logger.debug(f"Url:\n{url}")
-        else:
-            url = api_base
+        url = self._url(request.model)
+        log.debug("Url:\n%s", url)
 
-        # create stop sequences
-        if isinstance(request.stop, list):
-            stop = stop_sequences + request.stop
-        elif isinstance(request.stop, str):
-            stop = stop_sequences + [request.stop]
-        else:
-            stop = stop_sequences
-        logger.debug(f"Stop sequences:\n{stop}")
+        stop = self._stop(request.stop)
+        log.debug("Stop sequences:\n%s", stop)
 
         # check if we can stream
         if request.stream is True and request.n > 1:
             raise ValueError("Cannot stream more than one completion")
 
-        # create generation parameters
-        gen_kwargs = {
-            "do_sample": True,
-            "return_full_text": False,
-            "max_new_tokens": request.max_tokens,
-            "top_p": float(request.top_p),
-            "temperature": float(request.temperature),
-            "stop_sequences": stop,
-            "repetition_penalty": request.frequency_penalty,
-            "top_k": request.top_k,
-            "seed": seed,
-        }
-        if request.top_p == 0:
-            gen_kwargs.pop("top_p")
-        if request.top_p == 1:
-            request.top_p = 0.9999999
-        if request.temperature == 0:
-            gen_kwargs.pop("temperature")
-            gen_kwargs["do_sample"] = False
-        logger.debug(f"Generation parameters:\n{gen_kwargs}")
+        gen_kwargs = self._generation_parameters(request, stop)
+        log.debug("Generation parameters:\n%s", gen_kwargs)
+
+        session, auth = self.get_session(), self.auth
+        trace.update(endpoint=url)
+        trace.phase("connect")
 
         if request.stream:
             return stream_chat_request(url, prompt, stop, gen_kwargs, request.model)
@@ -159,63 +297,40 @@ You can also use existing prompt builders by importing them from easyllm.prompt_
             choices = []
             generated_tokens = 0
             for _i in range(request.n):
-                res = requests.request(
-                    "POST",
-                    url,
-                    json={
-                        "inputs": prompt,
-                        "parameters": {
-                            "details": True,
-                            **gen_kwargs,
-                        },
-                    },
-                    auth=aws_auth,
-                )
-                if res.status_code != 200:
-                    raise Exception(res.text)
-                # parse response
-                res = res.json()[0]
+                res = self._generate(session, url, auth, prompt, {"details": True, **gen_kwargs})
 
                 # convert to schema
-                parsed = ChatCompletionResponseChoice(
+                parsed = construct_object(
+                    ChatCompletionResponseChoice,
                     index=_i,
-                    message=ChatMessage(role="assistant", content=res["generated_text"]),
+                    message=construct_object(ChatMessage, role="assistant", content=res["generated_text"]),
                     finish_reason=res["details"]["finish_reason"],
                 )
                 generated_tokens += res["details"]["generated_tokens"]
                 choices.append(parsed)
-                logger.debug(f"Response at index {_i}:\n{parsed}")
+                log.debug("Response at index %s:\n%s", _i, parsed)
             # calculate usage details
             # TODO: fix when details is fixed
             prompt_tokens = int(len(prompt) / 4)
             total_tokens = prompt_tokens + generated_tokens
 
             return dump_object(
-                ChatCompletionResponse(
+                construct_object(
+                    ChatCompletionResponse,
                     model=request.model,
                     choices=choices,
-                    usage=Usage(
-                        prompt_tokens=prompt_tokens, completion_tokens=generated_tokens, total_tokens=total_tokens
+                    usage=construct_object(
+                        Usage,
+                        prompt_tokens=prompt_tokens,
+                        completion_tokens=generated_tokens,
+                        total_tokens=total_tokens,
                     ),
                 )
             )
 
-    @classmethod
-    async def acreate(cls, *args, **kwargs):
-        """
-        Creates a new chat completion for the provided messages and parameters.
-        """
-        raise NotImplementedError("ChatCompletion.acreate is not implemented")
-
-
-def stream_completion_request(client, prompt, stop, gen_kwargs, model):
-    """Utility function for completion chat requests."""
-    raise NotImplementedError("SageMaker is not yet supporting streaming requests")
-
-
-class Completion:
-    @staticmethod
-    def create(
+    @traced("sagemaker", "completion")
+    def completion(
+        self,
         prompt: Union[str, List[Any]],
         model: Optional[str] = None,
         suffix: Optional[str] = None,
@@ -255,9 +370,9 @@ class Completion:
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
         request = CompletionRequest(
             model=model,
             prompt=prompt,
@@ -273,66 +388,32 @@ class Completion:
             logprobs=logprobs,
             echo=echo,
         )
+        trace.phase("validate")
 
         # include suffix if it exists
         if request.suffix is not None:
             request.prompt = request.prompt + request.suffix
 
-        if prompt_builder is None:
-            logging.warn(
-                f"""huggingface.prompt_builder is not set.
-Using input as prompt builder. Prompt sent to model will be:
-----------------------------------------
-{request.prompt}.
-----------------------------------------
-If you want to use a custom prompt builder, set huggingface.prompt_builder to a function that takes a list of messages and returns a string.
-You can also use existing prompt builders by importing them from easyllm.prompt_utils"""
-            )
-            prompt = request.prompt
-        else:
-            prompt = build_prompt(request.prompt, prompt_builder)
-        logger.debug(f"Prompt sent to model will be:\n{prompt}")
+        prompt = self._completion_prompt(request.prompt)
+        trace.phase("build_prompt")
+        log.debug("Prompt sent to model will be:\n%s", prompt)
 
-        # if the model is a url, use it directly
-        if request.model:
-            url = f"{api_base}/{request.model}/invocations"
-            logger.debug(f"Url:\n{url}")
-        else:
-            url = api_base
+        url = self._url(request.model)
+        log.debug("Url:\n%s", url)
 
-        # create stop sequences
-        if isinstance(request.stop, list):
-            stop = stop_sequences + request.stop
-        elif isinstance(request.stop, str):
-            stop = stop_sequences + [request.stop]
-        else:
-            stop = stop_sequences
-        logger.debug(f"Stop sequences:\n{stop}")
+        stop = self._stop(request.stop)
+        log.debug("Stop sequences:\n%s", stop)
 
         # check if we can stream
         if request.stream is True and request.n > 1:
             raise ValueError("Cannot stream more than one completion")
 
-        gen_kwargs = {
-            "do_sample": True,
-            "return_full_text": True if request.echo else False,
-            "max_new_tokens": request.max_tokens,
-            "top_p": float(request.top_p),
-            "temperature": float(request.temperature),
-            "stop_sequences": stop,
-            "repetition_penalty": request.frequency_penalty,
-            "top_k": request.top_k,
-            "seed": seed,
-        }
-        if request.top_p == 0:
-            gen_kwargs.pop("top_p")
-        if request.top_p == 1:
-            request.top_p = 0.9999999
-        if request.temperature == 0:
-            gen_kwargs.pop("temperature")
-            gen_kwargs["do_sample"] = False
-
-        logger.debug(f"Generation parameters:\n{gen_kwargs}")
+        gen_kwargs = self._generation_parameters(request, stop, return_full_text=bool(request.echo))
+        log.debug("Generation parameters:\n%s", gen_kwargs)
+
+        session, auth = self.get_session(), self.auth
+        trace.update(endpoint=url)
+        trace.phase("connect")
 
         if request.stream:
             return stream_completion_request(url, prompt, stop, gen_kwargs, request.model)
@@ -340,24 +421,10 @@ You can also use existing prompt builders by importing them from easyllm.prompt_
             choices = []
             generated_tokens = 0
             for _i in range(request.n):
-                res = requests.request(
-                    "POST",
-                    url,
-                    json={
-                        "inputs": prompt,
-                        "parameters": {
-                            "details": True,
-                            **gen_kwargs,
-                        },
-                    },
-                    auth=aws_auth,
-                )
-                if res.status_code != 200:
-                    raise Exception(res.text)
-                # parse response
-                res = res.json()[0]
+                res = self._generate(session, url, auth, prompt, {"details": True, **gen_kwargs})
                 # convert to schema
-                parsed = CompletionResponseChoice(
+                parsed = construct_object(
+                    CompletionResponseChoice,
                     index=_i,
                     text=res["generated_text"],
                     finish_reason=res["details"]["finish_reason"],
@@ -367,35 +434,32 @@ You can also use existing prompt builders by importing them from easyllm.prompt_
 
                 generated_tokens += res["details"]["generated_tokens"]
                 choices.append(parsed)
-                logger.debug(f"Response at index {_i}:\n{parsed}")
+                log.debug("Response at index %s:\n%s", _i, parsed)
             # calcuate usage details
             # TODO: fix when details is fixed
             prompt_tokens = int(len(prompt) / 4)
             total_tokens = prompt_tokens + generated_tokens
 
             return dump_object(
-                CompletionResponse(
+                construct_object(
+                    CompletionResponse,
                     model=request.model,
                     choices=choices,
-                    usage=Usage(
-                        prompt_tokens=prompt_tokens, completion_tokens=generated_tokens, total_tokens=total_tokens
+                    usage=construct_object(
+                        Usage,
+                        prompt_tokens=prompt_tokens,
+                        completion_tokens=generated_tokens,
+                        total_tokens=total_tokens,
                     ),
                 )
             )
 
-    @classmethod
-    async def acreate(cls, *args, **kwargs):
-        """
-        Creates a new chat completion for the provided messages and parameters.
-        """
-        raise NotImplementedError("ChatCompletion.acreate is not implemented")
-
-
-class Embedding:
-    @staticmethod
-    def create(
+    @traced("sagemaker", "embedding")
+    def embedding(
+        self,
         input: Union[str, List[Any]],
         model: Optional[str] = None,
+        encoding_format: str = "float",
         debug: bool = False,
     ) -> Dict[str, Any]:
         """
@@ -405,39 +469,49 @@ class Embedding:
             input (`Union[str, List[Any]]`) document(s) to embed.
             model (`str`, *optional*, defaults to None) The model to use for the completion. If not provided,
                 defaults to the base url.
+            encoding_format (`str`, defaults to "float"): The format of the returned embeddings. "float" returns lists
+                of floats, "base64" base64 encoded little-endian float32 bytes like OpenAI and "numpy" (or "float32")
+                float32 numpy arrays. All formats except "float" require numpy.
             debug (`bool`, defaults to False): Whether to enable debug logging.
 
         Tip: Prompt builder
             Make sure to always use a prompt builder for your model.
         """
-        if debug:
-            logger.setLevel(logging.DEBUG)
+        log = request_logger(debug)
 
+        trace = current_trace()
+        validate_encoding_format(encoding_format)
         request = EmbeddingsRequest(model=model, input=input)
+        trace.phase("validate")
 
-        # if the model is a url, use it directly
-        if request.model:
-            url = f"{api_base}/{request.model}/invocations"
-            logger.debug(f"Url:\n{url}")
-        else:
-            url = api_base
+        url = self._url(request.model)
+        log.debug("Url:\n%s", url)
+
+        session, auth = self.get_session(), self.auth
+        trace.update(endpoint=url)
+        trace.phase("connect")
 
         # client is currently not supporting batched request thats why we run sequentially
         emb = []
-        res = requests.request(
-            "POST",
-            url,
-            json={"inputs": request.input},
-            auth=aws_auth,
-        )
-        res = res.json()
-        parsed_res = res.get("vectors", res.get("predictions", res.get("embeddings", None)))
-
-        if isinstance(request.input, list):
-            for idx, i in enumerate(parsed_res):
-                emb.append(EmbeddingsObjectResponse(index=idx, embedding=i))
+        headers = {"Accept": BINARY_ACCEPT} if self.binary_embeddings else None
+        res = self._post(session, url, auth, {"inputs": request.input}, headers=headers)
+        trace.update(status=res.status_code)
+        trace.phase("complete")
+        content_type = res.headers.get("Content-Type")
+        if encoding_format != "float" or is_binary_embedding(content_type):
+            rows = len(request.input) if isinstance(request.input, list) else 1
+            matrix = parse_embeddings(res.content, keys=EMBEDDING_KEYS, content_type=content_type, rows=rows)
+            embeddings = encode_embeddings(matrix, encoding_format)
+            for idx, i in enumerate(embeddings):
+                emb.append(embedding_object(idx, i))
         else:
-            emb.append(EmbeddingsObjectResponse(index=0, embedding=parsed_res[0]))
+            res = loads(res.content)
+            parsed_res = next((res[key] for key in EMBEDDING_KEYS if key in res), None)
+            if isinstance(request.input, list):
+                for idx, i in enumerate(parsed_res):
+                    emb.append(embedding_object(idx, i))
+            else:
+                emb.append(embedding_object(0, parsed_res[0]))
 
         if isinstance(res, list):
             # TODO: only approximating tokens
@@ -446,16 +520,135 @@ class Embedding:
             tokens = int(len(request.input) / 4)
 
         return dump_object(
-            EmbeddingsResponse(
+            construct_object(
+                EmbeddingsResponse,
                 model=request.model,
                 data=emb,
-                usage=Usage(prompt_tokens=tokens, total_tokens=tokens),
+                usage=construct_object(Usage, prompt_tokens=tokens, total_tokens=tokens),
             )
         )
 
+    def loglikelihood(
+        self,
+        context: Union[str, List[str]],
+        continuation: Union[str, List[str]],
+        model: Optional[str] = None,
+        concurrency: int = 8,
+        debug: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Scores `continuation` given `context` with the log-probabilities of the model, without sampling. Each
+        context + continuation is sent once with `decoder_input_details=True` and `max_new_tokens=1`, and the
+        logprobs of the prefill tokens covering the continuation are returned. Inputs are scored concurrently.
+
+        Args:
+            context (`Union[str, List[str]]`): The context(s), a single context is shared by all continuations.
+            continuation (`Union[str, List[str]]`): The continuation(s) to score.
+            model (`str`, *optional*, defaults to None): The model to use. If not provided, defaults to the base url.
+            concurrency (`int`, defaults to 8): Number of concurrent requests.
+            debug (`bool`, defaults to False): Whether to enable debug logging.
+
+        Returns:
+            `Dict[str, Any]` with NumPy arrays: `sum` (summed logprob per input), `num_tokens`, `logprobs` (per-token
+            logprobs of all inputs, flat) and `offsets`, input `i` spans `logprobs[offsets[i]:offsets[i + 1]]`.
+        """
+        log = request_logger(debug)
+
+        pairs = pair_inputs(context, continuation)
+        url = self._url(model)
+        log.debug("Url:\n%s", url)
+        auth = self.auth
+        parameters = {"details": True, "decoder_input_details": True, "max_new_tokens": 1, "seed": self.seed}
+
+        # the deadline of the caller applies to the requests sent by the thread pool
+        deadline = current_deadline()
+
+        def score(pair):
+            with use_deadline(deadline):
+                res = self._generate(self.get_session(), url, auth, "".join(pair), parameters)
+            prefill = res["details"]["prefill"]
+            return continuation_logprobs(prefill, pair[1]), len(prefill)
+
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, len(pairs)))) as executor:
+            results = list(executor.map(score, pairs))
+        return build_scores([logprobs for logprobs, _ in results], sum(tokens for _, tokens in results), model)
+
+
+class _ModuleClient(SageMakerClient):
+    """The default client, reading the module configuration on every call so `sagemaker.api_base = ...` applies."""
+
+    pool_size = None
+
+    def __init__(self):
+        self._setup()
+
+    @property
+    def auth(self) -> AWSSigV4:
+        return get_aws_auth()
+
+    @property
+    def api_base(self) -> Optional[str]:
+        return api_base
+
+    @property
+    def prompt_builder(self) -> Optional[Union[str, Callable]]:
+        return prompt_builder
+
+    @property
+    def stop_sequences(self) -> List[str]:
+        return stop_sequences
+
+    @property
+    def seed(self) -> int:
+        return seed
+
+    @property
+    def binary_embeddings(self) -> bool:
+        return binary_embeddings
+
+    @property
+    def gzip_requests(self) -> bool:
+        return gzip_requests
+
+
+default_client = _ModuleClient()
+
+warmup = default_client.warmup
+ping = default_client.ping
+
+
+class ChatCompletion:
+    create = staticmethod(default_client.chat_completion)
+
     @classmethod
     async def acreate(cls, *args, **kwargs):
         """
         Creates a new chat completion for the provided messages and parameters.
         """
         raise NotImplementedError("ChatCompletion.acreate is not implemented")
+
+
+class Completion:
+    create = staticmethod(default_client.completion)
+
+    @classmethod
+    async def acreate(cls, *args, **kwargs):
+        """
+        Creates a new chat completion for the provided messages and parameters.
+        """
+        raise NotImplementedError("ChatCompletion.acreate is not implemented")
+
+
+class Embedding:
+    create = staticmethod(default_client.embedding)
+
+    @classmethod
+    async def acreate(cls, *args, **kwargs):
+        """
+        Creates a new chat completion for the provided messages and parameters.
+        """
+        raise NotImplementedError("ChatCompletion.acreate is not implemented")
+
+
+class LogLikelihood:
+    create = staticmethod(default_client.loglikelihood)
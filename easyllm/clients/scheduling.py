@@ -0,0 +1,279 @@
+import functools
+import heapq
+import itertools
+import math
+import queue
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from easyllm.clients import client_name
+from easyllm.clients.base import Operation
+from easyllm.utils import setup_logger
+from easyllm.utils.deadlines import DeadlineExceeded, current_deadline, use_deadline
+
+logger = setup_logger()
+
+# priorities of requests, lower values run first
+INTERACTIVE = 0
+BATCH = 10
+
+# weight of the latest latency in the moving average used to predict whether a request finishes in time
+LATENCY_SMOOTHING = 0.2
+
+# chunks of a stream read ahead by its thread before the caller reads them
+STREAM_BUFFER = 16
+
+_OPERATIONS = ("ChatCompletion", "Completion", "Embedding", "LogLikelihood")
+
+
+class RequestScheduler:
+    """
+    Runs client requests on `max_concurrency` threads, ordered by priority and then by deadline, so interactive
+    requests never queue behind batch requests sharing the process. `reserved` threads only run `INTERACTIVE`
+    requests, so interactive requests start right away even while slow batch requests occupy all other threads.
+
+    A queued request which can no longer finish before its deadline is dropped with `DeadlineExceeded` instead of
+    being sent: it is expected to take as long as the moving average of the previous requests of the same operation.
+    Requests run with their deadline, so the timeouts of their upstream calls, retries and streams are clamped to it.
+
+    A request returning an iterator, e.g. with `stream=True`, is read on its thread, which is held until the stream
+    ended or the caller closed it, so streams count against `max_concurrency` and `reserved` like other requests. At
+    most `STREAM_BUFFER` chunks are read ahead of the caller. The latency of a stream is the time until its end.
+
+    Args:
+        max_concurrency (`int`, defaults to 8): Number of requests running at the same time.
+        reserved (`int`, defaults to 1): Threads only running `INTERACTIVE` requests, less than `max_concurrency`.
+        timeout (`float`, *optional*, defaults to None): Default total deadline of a request in seconds, counted
+            from its submission.
+    """
+
+    def __init__(self, max_concurrency: int = 8, reserved: int = 1, timeout: Optional[float] = None):
+        if not 0 <= reserved < max_concurrency:
+            raise ValueError("reserved must be at least 0 and less than max_concurrency")
+        self.max_concurrency = max_concurrency
+        self.reserved = reserved
+        self.timeout = timeout
+        self._queue: List[Any] = []
+        self._condition = threading.Condition()
+        self._sequence = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._closed = False
+        self._latency: Dict[str, float] = {}
+        self.dropped = 0
+
+    def __enter__(self) -> "RequestScheduler":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: int = INTERACTIVE,
+        timeout: Optional[float] = None,
+        name: Optional[str] = None,
+        **kwargs: Any,
+    ) -> "Future[Any]":
+        """
+        Queues `fn(*args, **kwargs)` and returns a future resolving to its result. The deadline is `timeout` (or the
+        default of the scheduler) seconds from now, and never later than the deadline of the caller. Requests of
+        the same `name`, defaulting to the name of `fn`, share their latency estimate.
+        """
+        deadline = current_deadline().child(timeout if timeout is not None else self.timeout)
+        name = name or getattr(fn, "__qualname__", repr(fn))
+        future: "Future[Any]" = Future()
+        expires = deadline.expires if deadline.expires is not None else math.inf
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("RequestScheduler is closed")
+            if not self._threads:
+                self._threads = [
+                    threading.Thread(
+                        target=self._work, args=(i < self.reserved,), name="easyllm-scheduler", daemon=True
+                    )
+                    for i in range(self.max_concurrency)
+                ]
+                for thread in self._threads:
+                    thread.start()
+            heapq.heappush(
+                self._queue, (priority, expires, next(self._sequence), name, fn, args, kwargs, future, deadline)
+            )
+            # reserved threads can not take batch requests, so all threads are woken up
+            self._condition.notify_all()
+        return future
+
+    def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Same as `submit`, blocking until the request completed."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    def client(self, client: Any, priority: int = INTERACTIVE, timeout: Optional[float] = None) -> "ScheduledClient":
+        """
+        Wraps a client module or instance, so its requests run on the scheduler with `priority` and `timeout`. The
+        wrapper can be passed wherever a client is expected, e.g. the gateway (interactive) and `run_batch` (batch)
+        sharing one scheduler.
+        """
+        return ScheduledClient(self, client, priority, timeout)
+
+    def expected_latency(self, name: str) -> float:
+        """The moving average of the latency of requests of `name` in seconds, 0 before the first one completed."""
+        return self._latency.get(name, 0.0)
+
+    def _next(self, interactive_only: bool) -> Optional[Any]:
+        with self._condition:
+            while True:
+                if self._queue and (not interactive_only or self._queue[0][0] <= INTERACTIVE):
+                    return heapq.heappop(self._queue)
+                # batch requests left after closing are run by the other threads
+                if self._closed and (not self._queue or interactive_only):
+                    return None
+                self._condition.wait()
+
+    def _work(self, interactive_only: bool) -> None:
+        while True:
+            item = self._next(interactive_only)
+            if item is None:
+                return
+            self._run(*item[3:])
+
+    def _run(self, name: str, fn: Callable[..., Any], args: Any, kwargs: Any, future: Future, deadline: Any) -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        remaining = deadline.remaining()
+        expected = self.expected_latency(name)
+        if remaining is not None and remaining <= expected:
+            self.dropped += 1
+            logger.debug("Dropped %s with %.3fs left, expected to take %.3fs", name, remaining, expected)
+            future.set_exception(
+                DeadlineExceeded(f"{name} can not finish in time, {remaining:.3f}s left, expected {expected:.3f}s")
+            )
+            return
+        start = time.monotonic()
+        try:
+            with use_deadline(deadline):
+                result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        if isinstance(result, Iterator):
+            if not self._pump(result, future, deadline):
+                return
+        else:
+            future.set_result(result)
+        latency = time.monotonic() - start
+        previous = self._latency.get(name)
+        self._latency[name] = latency if previous is None else previous + LATENCY_SMOOTHING * (latency - previous)
+
+    def _pump(self, iterator: Iterator, future: Future, deadline: Any) -> bool:
+        """
+        Reads a stream on the thread of the request and hands its chunks to the caller through a bounded queue.
+        Returns whether the stream was read to the end.
+        """
+        chunks: "queue.Queue[Any]" = queue.Queue(maxsize=STREAM_BUFFER)
+        closed = threading.Event()
+        future.set_result(_ScheduledStream(chunks, closed))
+
+        def put(item: Any) -> bool:
+            # blocks while the caller is behind (backpressure), gives up once it closed the stream
+            while not closed.is_set():
+                try:
+                    chunks.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            with use_deadline(deadline):
+                for chunk in iterator:
+                    if not put(chunk):
+                        return False
+        except BaseException as e:
+            put(_StreamError(e))
+            return False
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+        return put(_STREAM_END)
+
+    def close(self) -> None:
+        """Runs the queued requests and stops the threads."""
+        with self._condition:
+            self._closed = True
+            threads, self._threads = self._threads, []
+            self._condition.notify_all()
+        for thread in threads:
+            thread.join()
+
+
+_STREAM_END = object()
+
+
+class _StreamError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _ScheduledStream:
+    """The chunks of a stream read by the thread of a `RequestScheduler`, closing it releases the thread."""
+
+    def __init__(self, chunks: "queue.Queue[Any]", closed: threading.Event):
+        self._chunks = chunks
+        # a stream dropped without being closed releases the thread as well
+        self._close = weakref.finalize(self, closed.set)
+
+    def __iter__(self) -> "_ScheduledStream":
+        return self
+
+    def __next__(self) -> Any:
+        if not self._close.alive:
+            raise StopIteration
+        item = self._chunks.get()
+        if item is _STREAM_END:
+            self.close()
+            raise StopIteration
+        if isinstance(item, _StreamError):
+            self.close()
+            raise item.error
+        return item
+
+    def close(self) -> None:
+        self._close()
+
+
+class ScheduledClient:
+    """
+    A client module or instance whose requests run on a `RequestScheduler`, see `RequestScheduler.client`. Other
+    attributes are read from the wrapped client.
+    """
+
+    def __init__(self, scheduler: RequestScheduler, client: Any, priority: int, timeout: Optional[float]):
+        self.scheduler = scheduler
+        self.client = client
+        self.priority = priority
+        self.timeout = timeout
+        self.api_type = client_name(client)
+        for operation in _OPERATIONS:
+            target = getattr(client, operation, None)
+            if target is not None:
+                setattr(self, operation, Operation(self._schedule(f"{self.api_type}.{operation}", target.create)))
+
+    def _schedule(self, name: str, create: Callable[..., Any]) -> Callable[..., Any]:
+        # keeps the signature of `create`, the gateway reads it to filter request parameters
+        @functools.wraps(create)
+        def scheduled(*args: Any, **kwargs: Any) -> Any:
+            future = self.scheduler.submit(
+                create, *args, priority=self.priority, timeout=self.timeout, name=name, **kwargs
+            )
+            return future.result()
+
+        return scheduled
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
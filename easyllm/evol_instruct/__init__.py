@@ -0,0 +1,3 @@
+from easyllm.evol_instruct.engine import EvolInstruct, EvolReport, completed_rounds, load_round, read_dataset
+from easyllm.evol_instruct.filters import EvolutionFilter, ResponseFilter, clean_instruction
+from easyllm.evol_instruct.prompts import METHODS, build_evolution_prompt
@@ -0,0 +1,233 @@
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from types import ModuleType
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+from pydantic import BaseModel
+
+from easyllm.clients import load_client
+from easyllm.evol_instruct.filters import EvolutionFilter, ResponseFilter, clean_instruction
+from easyllm.evol_instruct.prompts import METHODS, build_evolution_prompt
+from easyllm.utils import setup_logger
+
+logger = setup_logger()
+
+Record = Dict[str, Any]
+
+_ROUND_FILE = re.compile(r"^round_(\d+)\.jsonl$")
+
+
+class EvolReport(BaseModel):
+    rounds: int
+    instructions: int
+    evolved: int
+    failed: Dict[str, int]
+    llm_calls: int
+    duration: float
+
+
+def _round_path(output_dir: str, round: int) -> str:
+    return os.path.join(output_dir, f"round_{round:03d}.jsonl")
+
+
+def completed_rounds(output_dir: str) -> List[int]:
+    """Returns the numbers of the rounds checkpointed in `output_dir`, round 0 holds the seed instructions."""
+    if not os.path.isdir(output_dir):
+        return []
+    return sorted(int(match.group(1)) for match in map(_ROUND_FILE.match, os.listdir(output_dir)) if match)
+
+
+def load_round(output_dir: str, round: int) -> Iterator[Record]:
+    """Lazily reads the records of a checkpointed round."""
+    with open(_round_path(output_dir, round)) as f:
+        for line in f:
+            yield json.loads(line)
+
+
+def read_dataset(output_dir: str, include_seeds: bool = False) -> Iterator[Record]:
+    """Yields the successfully evolved instructions of all checkpointed rounds."""
+    for round in completed_rounds(output_dir):
+        for record in load_round(output_dir, round):
+            if record["evolved"] or (include_seeds and round == 0):
+                yield record
+
+
+class EvolInstruct:
+    """
+    Evol-Instruct (WizardLM, Xu et al., 2023) data generation through any client module. Each round evolves every
+    instruction of the pool with a random method, in-depth (add constraints, deepening, concretizing, reasoning) or
+    in-breadth (a new instruction of the same domain). Failed evolutions are detected with cheap heuristics before a
+    response is generated, and the original instruction is kept in the pool for the next round.
+
+    Up to `concurrency` evolutions are in flight at once. Every round is checkpointed to
+    `<output_dir>/round_<n>.jsonl`, a restarted job continues after the last completed round.
+
+    Args:
+        client (`Union[str, ModuleType]`): The client module or its name, e.g. "huggingface".
+        output_dir (`str`): Directory the rounds are checkpointed to.
+        model (`str`, *optional*, defaults to None): The model used for evolutions and responses.
+        concurrency (`int`, defaults to 16): Number of concurrent instructions being evolved.
+        methods (`List[str]`, *optional*, defaults to None): Evolution methods to pick from, defaults to `METHODS`.
+        generate_responses (`bool`, defaults to True): Whether to generate and filter a response for each evolved
+            instruction.
+        evolution_filter (`EvolutionFilter`, *optional*, defaults to None): Filter of evolved instructions.
+        response_filter (`ResponseFilter`, *optional*, defaults to None): Filter of generated responses.
+        seed (`int`, defaults to 42): Seed for the choice of evolution methods. The method of an instruction only
+            depends on the seed, its id and the round, so resumed runs pick the same methods.
+        **generation_kwargs: Passed to `ChatCompletion.create`, e.g. `temperature` or `max_tokens`.
+    """
+
+    def __init__(
+        self,
+        client: Union[str, ModuleType],
+        output_dir: str,
+        model: Optional[str] = None,
+        concurrency: int = 16,
+        methods: Optional[List[str]] = None,
+        generate_responses: bool = True,
+        evolution_filter: Optional[EvolutionFilter] = None,
+        response_filter: Optional[ResponseFilter] = None,
+        seed: int = 42,
+        **generation_kwargs,
+    ):
+        self.client = load_client(client) if isinstance(client, str) else client
+        self.output_dir = output_dir
+        self.model = model
+        self.concurrency = concurrency
+        self.methods = methods or METHODS
+        self.generate_responses = generate_responses
+        self.evolution_filter = evolution_filter or EvolutionFilter()
+        self.response_filter = response_filter or ResponseFilter()
+        self.seed = seed
+        self.generation_kwargs = generation_kwargs
+
+    def _chat(self, content: str) -> str:
+        res = self.client.ChatCompletion.create(
+            messages=[{"role": "user", "content": content}], model=self.model, **self.generation_kwargs
+        )
+        return res["choices"][0]["message"]["content"]
+
+    def _method(self, id: str, round: int) -> str:
+        return random.Random(f"{self.seed}-{id}-{round}").choice(self.methods)
+
+    def evolve(self, record: Record, round: int) -> Record:
+        """
+        Evolves a single pool record. Returns the evolved record, or the original one with the failure `reason` if
+        the evolution failed.
+        """
+        method = self._method(record["id"], round)
+        failed = {**record, "round": round, "method": method, "evolved": False}
+        calls = 0
+        try:
+            calls += 1
+            evolved = clean_instruction(self._chat(build_evolution_prompt(record["instruction"], method)))
+            reason = self.evolution_filter(record["instruction"], evolved)
+            if reason is not None:
+                return {**failed, "reason": reason, "llm_calls": calls}
+            response = None
+            if self.generate_responses:
+                calls += 1
+                response = self._chat(evolved).strip()
+                reason = self.response_filter(response)
+                if reason is not None:
+                    return {**failed, "reason": reason, "llm_calls": calls}
+        except Exception as e:
+            logger.debug("Evolving %s failed: %s", record["id"], e)
+            return {**failed, "reason": "error", "llm_calls": calls}
+        return {
+            "id": f"{record['id']}-{round}",
+            "parent_id": record["id"],
+            "instruction": evolved,
+            "response": response,
+            "round": round,
+            "method": method,
+            "evolved": True,
+            "reason": None,
+            "llm_calls": calls,
+        }
+
+    def _write_round(self, round: int, records: Iterable[Record]) -> None:
+        # written to a temporary file first, so a round file only exists once the round completed
+        path = _round_path(self.output_dir, round)
+        with open(f"{path}.tmp", "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def _evolve_all(self, pool: Iterable[Record], round: int) -> Iterator[Record]:
+        # keeps `concurrency` evolutions in flight, results are yielded in completion order
+        pending: Dict["Future[Record]", None] = {}
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="easyllm-evol") as executor:
+            for record in pool:
+                while len(pending) >= self.concurrency:
+                    for future in wait(pending, return_when=FIRST_COMPLETED).done:
+                        del pending[future]
+                        yield future.result()
+                pending[executor.submit(self.evolve, record, round)] = None
+            for future in pending:
+                yield future.result()
+
+    def run(self, seeds: Iterable[Union[str, Record]], rounds: int = 4) -> EvolReport:
+        """
+        Runs the evolution rounds, resuming after the last round found in `output_dir`.
+
+        Args:
+            seeds (`Iterable[Union[str, Dict[str, Any]]]`): Seed instructions, strings or dicts with `instruction` and
+                an optional `id`. Ignored when resuming.
+            rounds (`int`, defaults to 4): Total number of evolution rounds.
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        done = completed_rounds(self.output_dir)
+        if not done:
+            records = []
+            for position, seed in enumerate(seeds):
+                record = {"instruction": seed} if isinstance(seed, str) else dict(seed)
+                record.setdefault("id", str(position))
+                records.append({**record, "round": 0, "evolved": False})
+            self._write_round(0, records)
+            done = [0]
+        elif done[-1] > 0:
+            logger.info("Resuming %s after round %s", self.output_dir, done[-1])
+
+        start = time.perf_counter()
+        evolved = llm_calls = instructions = 0
+        failed: Dict[str, int] = {}
+        for round in range(done[-1] + 1, rounds + 1):
+            round_start = time.perf_counter()
+            round_evolved = 0
+            pool = ({"id": r["id"], "instruction": r["instruction"]} for r in load_round(self.output_dir, round - 1))
+
+            def counted(records: Iterator[Record]) -> Iterator[Record]:
+                nonlocal round_evolved, instructions, llm_calls
+                for record in records:
+                    instructions += 1
+                    llm_calls += record.pop("llm_calls")
+                    if record["evolved"]:
+                        round_evolved += 1
+                    else:
+                        failed[record["reason"]] = failed.get(record["reason"], 0) + 1
+                    yield record
+
+            self._write_round(round, counted(self._evolve_all(pool, round)))
+            evolved += round_evolved
+            logger.info(
+                "Round %s evolved %s instructions in %.1fs, %.1f LLM calls/s",
+                round,
+                round_evolved,
+                time.perf_counter() - round_start,
+                llm_calls / (time.perf_counter() - start),
+            )
+        return EvolReport(
+            rounds=rounds,
+            instructions=instructions,
+            evolved=evolved,
+            failed=failed,
+            llm_calls=llm_calls,
+            duration=time.perf_counter() - start,
+        )
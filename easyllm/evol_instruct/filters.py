@@ -0,0 +1,73 @@
+import re
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+TEMPLATE_PHRASES = ["given prompt", "rewritten prompt", "created prompt"]
+REFUSAL_PHRASES = ["sorry", "as an ai", "i cannot", "i can't"]
+STOP_WORDS = ["the", "a", "an", "and", "or", "of", "to", "in", "is", "it", "i", "you", "ok", "okay", "yes", "no"]
+
+# "#Rewritten Prompt#:", "#Created Prompt#" or "Rewritten prompt:", but not a sentence starting with "The given prompt"
+_PREFIX = re.compile(
+    r"^\s*(#\s*(the\s+)?(rewritten|created|given)\s+prompt\s*#\s*:?\s*|(rewritten|created)\s+prompt\s*:\s*)+",
+    re.IGNORECASE,
+)
+_WORD = re.compile(r"\w+")
+
+
+def clean_instruction(text: str) -> str:
+    """Strips whitespace and a leading "#Rewritten Prompt#:" label which models tend to repeat."""
+    return _PREFIX.sub("", text).strip()
+
+
+def _normalize(text: str) -> List[str]:
+    return _WORD.findall(text.lower())
+
+
+class EvolutionFilter(BaseModel):
+    """
+    Ref: WizardLM (Xu et al., 2023)
+    Desc: Removes failed evolutions without another LLM call, evolved instructions which are unchanged, too short or
+    too long, copied words of the evolution prompt or refuse the task. Returns the reason or None to keep.
+    """
+
+    name: str = "evolution"
+    min_words: int = 3
+    max_words: int = 512
+    template_phrases: List[str] = TEMPLATE_PHRASES
+    refusal_phrases: List[str] = REFUSAL_PHRASES
+
+    def __call__(self, original: str, evolved: str) -> Optional[str]:
+        words = _normalize(evolved)
+        if words == _normalize(original):
+            return "unchanged"
+        if len(words) < self.min_words or len(words) > self.max_words:
+            return "length"
+        lowered = evolved.lower()
+        if any(phrase in lowered for phrase in self.template_phrases):
+            return "copied_prompt"
+        if any(lowered.startswith(phrase) for phrase in self.refusal_phrases):
+            return "refusal"
+        return None
+
+
+class ResponseFilter(BaseModel):
+    """
+    Ref: WizardLM (Xu et al., 2023)
+    Desc: Removes responses showing that the evolved instruction is hard to answer, short apologies and responses
+    consisting only of punctuation and stop words. Returns the reason or None to keep.
+    """
+
+    name: str = "response"
+    max_refusal_words: int = 80
+    refusal_phrases: List[str] = REFUSAL_PHRASES
+    stop_words: List[str] = STOP_WORDS
+
+    def __call__(self, response: str) -> Optional[str]:
+        words = _normalize(response)
+        if all(word in self.stop_words for word in words):
+            return "empty_response"
+        lowered = response.lower()
+        if len(words) < self.max_refusal_words and any(phrase in lowered for phrase in self.refusal_phrases):
+            return "refusal"
+        return None
@@ -0,0 +1,51 @@
+from typing import Dict
+
+DEPTH_TEMPLATE = """I want you to act as a Prompt Rewriter.
+Your objective is to rewrite a given prompt into a more complex version to make those famous AI systems (e.g., \
+ChatGPT and GPT4) a bit harder to handle.
+But the rewritten prompt must be reasonable and must be understood and responded by humans.
+Your rewriting cannot omit the non-text parts such as the table and code in #The Given Prompt#. Also, please do not \
+omit the input in #The Given Prompt#.
+You SHOULD complicate the given prompt using the following method:
+{method}
+You should try your best not to make the #Rewritten Prompt# become verbose, #Rewritten Prompt# can only add 10 to 20 \
+words into #The Given Prompt#.
+'#The Given Prompt#', '#Rewritten Prompt#', 'given prompt' and 'rewritten prompt' are not allowed to appear in \
+#Rewritten Prompt#
+#The Given Prompt#:
+{instruction}
+#Rewritten Prompt#:
+"""
+
+BREADTH_TEMPLATE = """I want you to act as a Prompt Creator.
+Your goal is to draw inspiration from the #Given Prompt# to create a brand new prompt.
+This new prompt should belong to the same domain as the #Given Prompt# but be even more rare.
+The LENGTH and complexity of the #Created Prompt# should be similar to that of the #Given Prompt#.
+The #Created Prompt# must be reasonable and must be understood and responded by humans.
+'#Given Prompt#', '#Created Prompt#', 'given prompt' and 'created prompt' are not allowed to appear in \
+#Created Prompt#.
+#Given Prompt#:
+{instruction}
+#Created Prompt#:
+"""
+
+DEPTH_METHODS: Dict[str, str] = {
+    "constraints": "Please add one more constraints/requirements into #The Given Prompt#.",
+    "deepening": "If #The Given Prompt# contains inquiries about certain issues, the depth and breadth of the inquiry "
+    "can be increased.",
+    "concretizing": "Please replace general concepts with more specific concepts.",
+    "reasoning": "If #The Given Prompt# can be solved with just a few simple thinking processes, you can rewrite it to "
+    "explicitly request multiple-step reasoning.",
+}
+
+# all evolution methods, the depth methods plus "breadth" which creates a new instruction of the same domain
+METHODS = [*DEPTH_METHODS, "breadth"]
+
+
+def build_evolution_prompt(instruction: str, method: str) -> str:
+    """Builds the prompt asking the model to evolve `instruction` with one of `METHODS`."""
+    if method == "breadth":
+        return BREADTH_TEMPLATE.format(instruction=instruction)
+    if method not in DEPTH_METHODS:
+        raise ValueError(f"Unknown evolution method {method}, expected one of {METHODS}")
+    return DEPTH_TEMPLATE.format(method=DEPTH_METHODS[method], instruction=instruction)
@@ -0,0 +1,2 @@
+from easyllm.index.flat import FlatIndex
+from easyllm.index.ivf import IVFIndex
@@ -0,0 +1,207 @@
+import json
+import os
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("easyllm.index requires numpy. Install it with `pip install easyllm[numpy]`.") from e
+
+METRICS = ("cosine", "ip")
+
+# upper bound of query x vector scores computed at once, keeps batched searches at ~256MB of float32 scores
+MAX_SCORES_PER_BLOCK = 64 * 1024 * 1024
+
+
+def as_matrix(vectors: Any, dim: int) -> np.ndarray:
+    """Converts a vector or a batch of vectors, e.g. the `data` of an `Embedding.create` response, to float32."""
+    if isinstance(vectors, dict) and "data" in vectors:
+        vectors = [item["embedding"] for item in vectors["data"]]
+    if isinstance(vectors, (list, tuple)) and vectors and isinstance(vectors[0], np.ndarray):
+        vectors = np.stack(vectors)
+    matrix = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    if matrix.ndim != 2 or matrix.shape[1] != dim:
+        raise ValueError(f"Expected vectors of dimension {dim}, got shape {matrix.shape}")
+    return matrix
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2 normalizes the rows of a float32 matrix in place, zero vectors are kept as is."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    matrix /= norms
+    return matrix
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the scores and positions of the `k` highest scores of each row, sorted in descending order."""
+    k = min(k, scores.shape[1])
+    if k < scores.shape[1]:
+        positions = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        positions = np.broadcast_to(np.arange(k), (scores.shape[0], k))
+    selected = np.take_along_axis(scores, positions, axis=1)
+    order = np.argsort(-selected, axis=1, kind="stable")
+    return np.take_along_axis(selected, order, axis=1), np.take_along_axis(positions, order, axis=1)
+
+
+def _atomic_write(path: str, write: Callable[[BinaryIO], Any]) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+class FlatIndex:
+    """
+    Exact nearest neighbour index over embeddings, stored as one contiguous float32 matrix. Searches are a single
+    matrix multiplication followed by an `argpartition` top-k, which is fast enough for a few hundred thousand
+    vectors on a single machine. Saved indexes can be loaded memory-mapped.
+
+    Args:
+        dim (`int`): The dimension of the vectors.
+        metric (`str`, defaults to "cosine"): The similarity metric, "cosine" or "ip" (inner product). Vectors are
+            normalized on insert for "cosine".
+        capacity (`int`, defaults to 1024): Number of vectors allocated up front, grows by doubling.
+    """
+
+    def __init__(self, dim: int, metric: str = "cosine", capacity: int = 1024):
+        if metric not in METRICS:
+            raise ValueError(f"Metric {metric} is not supported. Supported metrics are: {METRICS}")
+        self.dim = dim
+        self.metric = metric
+        self._vectors = np.empty((max(capacity, 1), dim), dtype=np.float32)
+        self._ids = np.empty(max(capacity, 1), dtype=np.int64)
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The stored vectors, a view without the unused capacity."""
+        return self._vectors[: self._size]
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    def _reserve(self, size: int) -> None:
+        if size <= len(self._vectors) and self._vectors.flags.writeable:
+            return
+        capacity = max(size, 2 * len(self._vectors))
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        ids = np.empty(capacity, dtype=np.int64)
+        ids[: self._size] = self._ids[: self._size]
+        self._vectors, self._ids = vectors, ids
+
+    def add(
+        self,
+        vectors: Any,
+        ids: Optional[Sequence[int]] = None,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> np.ndarray:
+        """
+        Adds vectors to the index and returns their ids.
+
+        Args:
+            vectors (`Any`): A vector, a batch of vectors or an `Embedding.create` response.
+            ids (`Sequence[int]`, *optional*, defaults to None): Ids of the vectors, defaults to their insert position.
+            metadata (`Sequence[Dict[str, Any]]`, *optional*, defaults to None): JSON serializable metadata per vector,
+                e.g. the embedded text, returned by `search`.
+        """
+        matrix = as_matrix(vectors, self.dim)
+        count = len(matrix)
+        if ids is None:
+            ids = np.arange(self._size, self._size + count, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != count or (metadata is not None and len(metadata) != count):
+            raise ValueError(f"Got {count} vectors but {len(ids)} ids and {len(metadata or [])} metadata entries")
+
+        self._reserve(self._size + count)
+        target = self._vectors[self._size : self._size + count]
+        target[:] = matrix
+        if self.metric == "cosine":
+            normalize(target)
+        self._ids[self._size : self._size + count] = ids
+        self.metadata.extend(metadata if metadata is not None else [None] * count)
+        self._size += count
+        return ids
+
+    def _search(self, queries: Any, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = as_matrix(queries, self.dim)
+        if self.metric == "cosine":
+            queries = normalize(queries.copy())
+        k = min(k, self._size)
+        scores = np.empty((len(queries), k), dtype=np.float32)
+        positions = np.empty((len(queries), k), dtype=np.int64)
+        if k == 0:
+            return scores, positions
+
+        vectors = self.vectors
+        block = max(1, MAX_SCORES_PER_BLOCK // self._size)
+        for start in range(0, len(queries), block):
+            end = start + block
+            scores[start:end], positions[start:end] = top_k(queries[start:end] @ vectors.T, k)
+        return scores, positions
+
+    def search(self, queries: Any, k: int = 10) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the scores and ids of the `k` nearest vectors for each query, both of shape `(len(queries), k)`.
+        Queries are scored in blocks, so large batches do not allocate a full `queries x vectors` matrix.
+
+        Args:
+            queries (`Any`): A query vector or a batch of query vectors.
+            k (`int`, defaults to 10): Number of results per query, capped at the size of the index.
+        """
+        scores, positions = self._search(queries, k)
+        return scores, self.ids[positions]
+
+    def query(self, queries: Any, k: int = 10) -> List[List[Dict[str, Any]]]:
+        """Like `search`, but returns a list of `{"id", "score", "metadata"}` results per query."""
+        scores, positions = self._search(queries, k)
+        ids = self.ids
+        return [
+            [
+                {"id": int(ids[position]), "score": float(score), "metadata": self.metadata[position]}
+                for score, position in zip(row_scores, row_positions)
+            ]
+            for row_scores, row_positions in zip(scores, positions)
+        ]
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index to the directory `path`. The vectors are stored as `.npy` so they can be memory-mapped. Files
+        are written next to the existing ones and then renamed, so an index memory-mapped from `path` stays valid.
+        """
+        os.makedirs(path, exist_ok=True)
+        _atomic_write(os.path.join(path, "vectors.npy"), lambda f: np.save(f, self.vectors))
+        _atomic_write(os.path.join(path, "ids.npy"), lambda f: np.save(f, self.ids))
+        _atomic_write(
+            os.path.join(path, "metadata.jsonl"),
+            lambda f: f.writelines(json.dumps(item).encode() + b"\n" for item in self.metadata),
+        )
+        config = {"type": "flat", "dim": self.dim, "metric": self.metric, "size": self._size}
+        _atomic_write(os.path.join(path, "index.json"), lambda f: f.write(json.dumps(config).encode()))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "FlatIndex":
+        """
+        Loads an index saved with `save`.
+
+        Args:
+            path (`str`): The directory the index was saved to.
+            mmap (`bool`, defaults to True): Memory-map the vectors instead of reading them into memory. They are
+                copied into memory on the next `add`.
+        """
+        with open(os.path.join(path, "index.json")) as f:
+            config = json.load(f)
+        index = cls(config["dim"], metric=config["metric"], capacity=1)
+        index._vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r" if mmap else None)
+        index._ids = np.load(os.path.join(path, "ids.npy"))
+        with open(os.path.join(path, "metadata.jsonl")) as f:
+            index.metadata = [json.loads(line) for line in f]
+        index._size = config["size"]
+        return index
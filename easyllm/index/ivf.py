@@ -0,0 +1,374 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError as e:
+    raise ImportError("easyllm.index requires numpy. Install it with `pip install easyllm[numpy]`.") from e
+
+from easyllm.index.flat import METRICS, _atomic_write, as_matrix, normalize, top_k
+
+QUANTIZERS = ("int8", "pq")
+
+# upper bound of vector x centroid distances computed at once during training and assignment
+MAX_DISTANCES_PER_BLOCK = 16 * 1024 * 1024
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Returns the position of the nearest (L2) centroid of each vector, computed in blocks."""
+    half_norms = (centroids**2).sum(axis=1) / 2
+    block = max(1, MAX_DISTANCES_PER_BLOCK // len(centroids))
+    labels = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block):
+        # argmin |x - c|^2 == argmax x.c - |c|^2 / 2
+        labels[start : start + block] = np.argmax(vectors[start : start + block] @ centroids.T - half_norms, axis=1)
+    return labels
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """
+    Lloyd's k-means on float32 vectors, initialized with a random sample. Empty clusters are re-seeded with random
+    vectors. Returns the `(k, dim)` centroids.
+    """
+    if len(vectors) < k:
+        raise ValueError(f"Need at least {k} vectors to train {k} centroids, got {len(vectors)}")
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        present = sorted_labels[starts]
+        counts = np.diff(np.r_[starts, len(labels)])
+        centroids[present] = np.add.reduceat(vectors[order], starts) / counts[:, None]
+        empty = np.setdiff1d(np.arange(k), present)
+        centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Approximate nearest neighbour index for large embedding corpora. Vectors are partitioned into `nlist` k-means
+    clusters (inverted file) and stored as compressed residuals to their cluster centroid. A search only scans the
+    `nprobe` clusters closest to the query, trading recall for speed.
+
+    Residuals are either quantized to int8 per dimension (`dim` bytes per vector, 4x smaller than float32) or
+    product-quantized into `pq_m` sub-vectors of one byte each (`pq_m` bytes per vector).
+
+    Searches do not modify the index, so they can run on several threads, also while vectors are added. Calls of
+    `add` have to be serialized.
+
+    Args:
+        dim (`int`): The dimension of the vectors.
+        nlist (`int`, defaults to 1024): Number of clusters, roughly `sqrt(number of vectors)` is a good start.
+        metric (`str`, defaults to "cosine"): The similarity metric, "cosine" or "ip" (inner product).
+        quantizer (`str`, defaults to "int8"): The residual encoding, "int8" or "pq".
+        pq_m (`int`, *optional*, defaults to None): Number of sub-vectors for "pq", has to divide `dim`. Defaults
+            to `dim // 8`.
+        nprobe (`int`, defaults to 8): Number of clusters scanned per query, can be overwritten per search.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 1024,
+        metric: str = "cosine",
+        quantizer: str = "int8",
+        pq_m: Optional[int] = None,
+        nprobe: int = 8,
+    ):
+        if metric not in METRICS:
+            raise ValueError(f"Metric {metric} is not supported. Supported metrics are: {METRICS}")
+        if quantizer not in QUANTIZERS:
+            raise ValueError(f"Quantizer {quantizer} is not supported. Supported quantizers are: {QUANTIZERS}")
+        pq_m = pq_m or max(1, dim // 8)
+        if quantizer == "pq" and dim % pq_m != 0:
+            raise ValueError(f"pq_m ({pq_m}) has to divide the dimension ({dim})")
+        self.dim = dim
+        self.nlist = nlist
+        self.metric = metric
+        self.quantizer = quantizer
+        self.pq_m = pq_m
+        self.nprobe = nprobe
+        self.centroids: Optional[np.ndarray] = None
+        # int8: per dimension scale of the residuals, pq: (pq_m, 256, dim // pq_m) codebooks
+        self.scale: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self.metadata: List[Optional[Dict[str, Any]]] = []
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        # per cluster codes and insert positions, of which the first `_counts[label]` rows are set. Clusters grow
+        # like `_ids` in `add`, so searches only read them and can run concurrently with each other and with `add`
+        self._codes: List[Optional[np.ndarray]] = [None] * nlist
+        self._positions: List[Optional[np.ndarray]] = [None] * nlist
+        self._counts: List[int] = [0] * nlist
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    @property
+    def ids(self) -> np.ndarray:
+        return self._ids[: self._size]
+
+    @property
+    def code_size(self) -> int:
+        """Bytes stored per vector, without ids and metadata."""
+        return self.dim if self.quantizer == "int8" else self.pq_m
+
+    def _prepare(self, vectors: Any) -> np.ndarray:
+        matrix = as_matrix(vectors, self.dim)
+        if self.metric == "cosine":
+            matrix = normalize(matrix.copy())
+        return matrix
+
+    def train(self, vectors: Any, iterations: int = 10, max_samples: Optional[int] = None, seed: int = 0) -> None:
+        """
+        Trains the centroids and the residual quantizer on a representative sample of the vectors.
+
+        Args:
+            vectors (`Any`): Training vectors, at least `nlist` (and 256 for "pq").
+            iterations (`int`, defaults to 10): Number of k-means iterations.
+            max_samples (`int`, *optional*, defaults to None): Number of vectors sampled for training, defaults to
+                `256 * nlist`.
+            seed (`int`, defaults to 0): Seed of the sampling and centroid initialization.
+        """
+        matrix = self._prepare(vectors)
+        max_samples = max_samples or 256 * self.nlist
+        if len(matrix) > max_samples:
+            matrix = matrix[np.random.default_rng(seed).choice(len(matrix), max_samples, replace=False)]
+
+        centroids = kmeans(matrix, self.nlist, iterations=iterations, seed=seed)
+        residuals = matrix - centroids[assign(matrix, centroids)]
+        if self.quantizer == "int8":
+            scale = np.abs(residuals).max(axis=0) / 127
+            scale[scale == 0] = 1
+            self.scale = scale.astype(np.float32)
+        else:
+            dsub = self.dim // self.pq_m
+            self.codebooks = np.stack(
+                [
+                    kmeans(residuals[:, m * dsub : (m + 1) * dsub].copy(), 256, iterations=iterations, seed=seed + m)
+                    for m in range(self.pq_m)
+                ]
+            )
+        self.centroids = centroids
+
+    def _encode(self, residuals: np.ndarray) -> np.ndarray:
+        if self.quantizer == "int8":
+            return np.clip(np.rint(residuals / self.scale), -127, 127).astype(np.int8)
+        dsub = self.dim // self.pq_m
+        codes = np.empty((len(residuals), self.pq_m), dtype=np.uint8)
+        for m in range(self.pq_m):
+            codes[:, m] = assign(residuals[:, m * dsub : (m + 1) * dsub], self.codebooks[m])
+        return codes
+
+    def add(
+        self,
+        vectors: Any,
+        ids: Optional[Sequence[int]] = None,
+        metadata: Optional[Sequence[Optional[Dict[str, Any]]]] = None,
+    ) -> np.ndarray:
+        """
+        Adds vectors to a trained index and returns their ids, see `FlatIndex.add`.
+        """
+        if not self.is_trained:
+            raise ValueError("The index has to be trained before adding vectors, call `train` first")
+        matrix = self._prepare(vectors)
+        count = len(matrix)
+        if ids is None:
+            ids = np.arange(self._size, self._size + count, dtype=np.int64)
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) != count or (metadata is not None and len(metadata) != count):
+            raise ValueError(f"Got {count} vectors but {len(ids)} ids and {len(metadata or [])} metadata entries")
+
+        labels = assign(matrix, self.centroids)
+        codes = self._encode(matrix - self.centroids[labels])
+        positions = np.arange(self._size, self._size + count, dtype=np.int64)
+        if self._size + count > len(self._ids):
+            grown = np.empty(max(self._size + count, 2 * len(self._ids)), dtype=np.int64)
+            grown[: self._size] = self._ids[: self._size]
+            self._ids = grown
+        self._ids[self._size : self._size + count] = ids
+        self.metadata.extend(metadata if metadata is not None else [None] * count)
+        self._size += count
+
+        # the ids and metadata are set before searches can find the vectors in their clusters
+        order = np.argsort(labels, kind="stable")
+        bounds = np.searchsorted(labels[order], np.arange(self.nlist + 1))
+        for label in np.flatnonzero(np.diff(bounds)):
+            selected = order[bounds[label] : bounds[label + 1]]
+            self._append(label, codes[selected], positions[selected])
+        return ids
+
+    def _append(self, label: int, codes: np.ndarray, positions: np.ndarray) -> None:
+        count = self._counts[label]
+        end = count + len(codes)
+        cluster_codes, cluster_positions = self._codes[label], self._positions[label]
+        if cluster_codes is None or end > len(cluster_codes):
+            grown_codes = np.empty((max(end, 2 * count), codes.shape[1]), dtype=codes.dtype)
+            grown_positions = np.empty(len(grown_codes), dtype=np.int64)
+            if count:
+                grown_codes[:count] = cluster_codes[:count]
+                grown_positions[:count] = cluster_positions[:count]
+            cluster_codes, cluster_positions = grown_codes, grown_positions
+        # rows after the count are not read by searches, the count is raised once they are written
+        cluster_codes[count:end] = codes
+        cluster_positions[count:end] = positions
+        self._codes[label], self._positions[label] = cluster_codes, cluster_positions
+        self._counts[label] = end
+
+    def _cluster(self, label: int) -> Tuple[Optional[np.ndarray], Optional[np.ndarray]]:
+        count = self._counts[label]
+        if not count:
+            return None, None
+        return self._codes[label][:count], self._positions[label][:count]
+
+    def _residual_scorer(self, query: np.ndarray):
+        """Returns a function scoring codes against the query, i.e. the inner product with the decoded residuals."""
+        if self.quantizer == "int8":
+            weights = query * self.scale
+            return lambda codes: codes.astype(np.float32) @ weights
+        dsub = self.dim // self.pq_m
+        # asymmetric distance computation: one lookup table of sub-vector inner products per query
+        table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(self.pq_m, dsub))
+        subspaces = np.arange(self.pq_m)
+        return lambda codes: table[subspaces, codes].sum(axis=1)
+
+    def _search(self, queries: Any, k: int, nprobe: Optional[int]) -> Tuple[np.ndarray, np.ndarray]:
+        if not self.is_trained:
+            raise ValueError("The index has to be trained before searching, call `train` first")
+        queries = self._prepare(queries)
+        coarse = queries @ self.centroids.T
+        _, probes = top_k(coarse, min(nprobe or self.nprobe, self.nlist))
+
+        scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        positions = np.full((len(queries), k), -1, dtype=np.int64)
+        for i, query in enumerate(queries):
+            score_codes = self._residual_scorer(query)
+            candidate_scores, candidate_positions = [], []
+            for label in probes[i]:
+                codes, cluster_positions = self._cluster(label)
+                if codes is not None:
+                    candidate_scores.append(coarse[i, label] + score_codes(codes))
+                    candidate_positions.append(cluster_positions)
+            if not candidate_scores:
+                continue
+            candidate_scores = np.concatenate(candidate_scores)[None, :]
+            best_scores, best = top_k(candidate_scores, k)
+            scores[i, : best.shape[1]] = best_scores[0]
+            positions[i, : best.shape[1]] = np.concatenate(candidate_positions)[best[0]]
+        return scores, positions
+
+    def search(self, queries: Any, k: int = 10, nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the approximate scores and ids of the `k` nearest vectors for each query, both of shape
+        `(len(queries), k)`. If the probed clusters hold fewer than `k` vectors, the remaining ids are -1 and the
+        scores -inf.
+
+        Args:
+            queries (`Any`): A query vector or a batch of query vectors.
+            k (`int`, defaults to 10): Number of results per query.
+            nprobe (`int`, *optional*, defaults to None): Number of clusters to scan, defaults to `self.nprobe`.
+        """
+        scores, positions = self._search(queries, k, nprobe)
+        if self._size == 0:
+            return scores, positions
+        return scores, np.where(positions >= 0, self.ids[positions], -1)
+
+    def query(self, queries: Any, k: int = 10, nprobe: Optional[int] = None) -> List[List[Dict[str, Any]]]:
+        """Like `search`, but returns a list of `{"id", "score", "metadata"}` results per query."""
+        scores, positions = self._search(queries, k, nprobe)
+        ids = self.ids
+        return [
+            [
+                {"id": int(ids[position]), "score": float(score), "metadata": self.metadata[position]}
+                for score, position in zip(row_scores, row_positions)
+                if position >= 0
+            ]
+            for row_scores, row_positions in zip(scores, positions)
+        ]
+
+    def save(self, path: str) -> None:
+        """
+        Saves the index to the directory `path`. Codes are stored grouped by cluster, so they can be memory-mapped
+        on load.
+        """
+        if not self.is_trained:
+            raise ValueError("The index has to be trained before saving")
+        os.makedirs(path, exist_ok=True)
+        clusters = [self._cluster(label) for label in range(self.nlist)]
+        sizes = [0 if codes is None else len(codes) for codes, _ in clusters]
+        codes = [codes for codes, _ in clusters if codes is not None]
+        positions = [positions for _, positions in clusters if positions is not None]
+        empty_codes = np.empty((0, self.code_size), dtype=np.int8 if self.quantizer == "int8" else np.uint8)
+
+        arrays = {
+            "centroids": self.centroids,
+            "quantizer": self.scale if self.quantizer == "int8" else self.codebooks,
+            "codes": np.concatenate(codes) if codes else empty_codes,
+            "positions": np.concatenate(positions) if positions else np.empty(0, dtype=np.int64),
+            "offsets": np.concatenate([[0], np.cumsum(sizes)]).astype(np.int64),
+            "ids": self.ids,
+        }
+        for name, array in arrays.items():
+            _atomic_write(os.path.join(path, f"{name}.npy"), lambda f, array=array: np.save(f, array))
+        _atomic_write(
+            os.path.join(path, "metadata.jsonl"),
+            lambda f: f.writelines(json.dumps(item).encode() + b"\n" for item in self.metadata),
+        )
+        config = {
+            "type": "ivf",
+            "dim": self.dim,
+            "nlist": self.nlist,
+            "metric": self.metric,
+            "quantizer": self.quantizer,
+            "pq_m": self.pq_m,
+            "nprobe": self.nprobe,
+            "size": self._size,
+        }
+        _atomic_write(os.path.join(path, "index.json"), lambda f: f.write(json.dumps(config).encode()))
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "IVFIndex":
+        """
+        Loads an index saved with `save`.
+
+        Args:
+            path (`str`): The directory the index was saved to.
+            mmap (`bool`, defaults to True): Memory-map the codes instead of reading them into memory.
+        """
+        with open(os.path.join(path, "index.json")) as f:
+            config = json.load(f)
+        index = cls(
+            config["dim"],
+            nlist=config["nlist"],
+            metric=config["metric"],
+            quantizer=config["quantizer"],
+            pq_m=config["pq_m"],
+            nprobe=config["nprobe"],
+        )
+        index.centroids = np.load(os.path.join(path, "centroids.npy"))
+        if index.quantizer == "int8":
+            index.scale = np.load(os.path.join(path, "quantizer.npy"))
+        else:
+            index.codebooks = np.load(os.path.join(path, "quantizer.npy"))
+        codes = np.load(os.path.join(path, "codes.npy"), mmap_mode="r" if mmap else None)
+        positions = np.load(os.path.join(path, "positions.npy"))
+        offsets = np.load(os.path.join(path, "offsets.npy"))
+        for label in range(index.nlist):
+            start, end = offsets[label], offsets[label + 1]
+            if end > start:
+                index._codes[label] = codes[start:end]
+                index._positions[label] = positions[start:end]
+                index._counts[label] = int(end - start)
+        index._ids = np.load(os.path.join(path, "ids.npy"))
+        with open(os.path.join(path, "metadata.jsonl")) as f:
+            index.metadata = [json.loads(line) for line in f]
+        index._size = config["size"]
+        return index
@@ -0,0 +1,3 @@
+from easyllm.rag.chunking import chunk_text, tokenizer_spans, whitespace_spans
+from easyllm.rag.pipeline import IngestionPipeline, IngestionReport, batch_chunks
+from easyllm.rag.readers import read_documents, read_jsonl, read_parquet
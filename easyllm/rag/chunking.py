@@ -0,0 +1,53 @@
+import re
+from typing import Any, Callable, Iterator, List, Tuple
+
+Span = Tuple[int, int]
+
+_WORD = re.compile(r"\S+")
+
+
+def whitespace_spans(text: str) -> List[Span]:
+    """Character spans of the whitespace separated words of `text`, a cheap approximation of tokens."""
+    return [match.span() for match in _WORD.finditer(text)]
+
+
+def tokenizer_spans(tokenizer: Any) -> Callable[[str], List[Span]]:
+    """
+    Returns a span function using the offsets of a Hugging Face fast tokenizer, so chunks are bounded by the token
+    count of the embedding model.
+    """
+
+    def spans(text: str) -> List[Span]:
+        offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        return [(start, end) for start, end in offsets if end > start]
+
+    return spans
+
+
+def chunk_text(
+    text: str,
+    max_tokens: int = 256,
+    overlap: int = 32,
+    spans: Callable[[str], List[Span]] = whitespace_spans,
+) -> Iterator[str]:
+    """
+    Splits `text` into chunks of at most `max_tokens` tokens, consecutive chunks share `overlap` tokens. Chunks are
+    slices of the original text, so whitespace and formatting inside a chunk are kept.
+
+    Args:
+        text (`str`): The text to split.
+        max_tokens (`int`, defaults to 256): Maximum number of tokens per chunk.
+        overlap (`int`, defaults to 32): Number of tokens repeated at the start of the next chunk.
+        spans (`Callable[[str], List[Tuple[int, int]]]`, defaults to `whitespace_spans`): Returns the character
+            spans of the tokens of a text, see `tokenizer_spans` to count tokens with the model tokenizer.
+    """
+    if overlap >= max_tokens:
+        raise ValueError(f"overlap ({overlap}) has to be smaller than max_tokens ({max_tokens})")
+    tokens = spans(text)
+    start = 0
+    while start < len(tokens):
+        end = min(start + max_tokens, len(tokens))
+        yield text[tokens[start][0] : tokens[end - 1][1]]
+        if end == len(tokens):
+            break
+        start = end - overlap
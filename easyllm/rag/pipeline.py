@@ -0,0 +1,244 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from pydantic import BaseModel
+
+from easyllm.rag.chunking import Span, chunk_text, whitespace_spans
+from easyllm.rag.readers import Document
+from easyllm.utils import setup_logger
+
+logger = setup_logger()
+
+Chunk = Dict[str, Any]
+
+_DONE = object()
+
+
+class IngestionReport(BaseModel):
+    documents: int
+    chunks: int
+    batches: int
+    bytes: int
+    duration: float
+    chunks_per_second: float
+    bytes_per_second: float
+
+
+def batch_chunks(
+    documents: Iterable[Document],
+    max_tokens: int = 256,
+    overlap: int = 32,
+    spans: Callable[[str], List[Span]] = whitespace_spans,
+    batch_size: int = 64,
+    max_batch_bytes: int = 1024 * 1024,
+) -> Iterator[List[Chunk]]:
+    """
+    Lazily splits documents into chunks and groups them into batches of at most `batch_size` chunks and
+    `max_batch_bytes` bytes of text. A single chunk larger than `max_batch_bytes` is sent as its own batch.
+    """
+    batch: List[Chunk] = []
+    batch_bytes = 0
+    for document in documents:
+        for position, text in enumerate(chunk_text(document["text"], max_tokens, overlap, spans)):
+            size = len(text.encode())
+            if batch and (len(batch) >= batch_size or batch_bytes + size > max_batch_bytes):
+                yield batch
+                batch, batch_bytes = [], 0
+            batch.append(
+                {
+                    "text": text,
+                    "bytes": size,
+                    "document_id": document["id"],
+                    "chunk": position,
+                    "metadata": document.get("metadata") or {},
+                }
+            )
+            batch_bytes += size
+    if batch:
+        yield batch
+
+
+class IngestionPipeline:
+    """
+    Streaming ingestion of documents into a vector index: documents are read lazily, split into token-bounded
+    overlapping chunks, embedded in concurrent batches and added to the index. The stages are connected by bounded
+    queues, so a slow embedding endpoint or index slows down reading instead of buffering the corpus in memory.
+
+    Args:
+        embedding (`Any`): An embedding class supporting `encoding_format="numpy"`, e.g. `huggingface.Embedding` or a
+            `CachedEmbedding`.
+        index (`Any`): The index to write to, e.g. a `FlatIndex` or a trained `IVFIndex`.
+        model (`str`, *optional*, defaults to None): The embedding model, passed to `embedding.create`.
+        max_tokens (`int`, defaults to 256): Maximum number of tokens per chunk.
+        overlap (`int`, defaults to 32): Number of tokens shared by consecutive chunks.
+        spans (`Callable`, defaults to `whitespace_spans`): Token span function, see `chunk_text`.
+        batch_size (`int`, defaults to 64): Maximum number of chunks per embedding request.
+        max_batch_bytes (`int`, defaults to 1MB): Maximum size of the texts of one embedding request.
+        concurrency (`int`, defaults to 4): Number of concurrent embedding requests.
+        max_pending (`int`, *optional*, defaults to None): Maximum number of batches waiting to be embedded or
+            written, defaults to `2 * concurrency`.
+        store_text (`bool`, defaults to True): Whether to store the chunk text in the index metadata.
+        report_interval (`float`, defaults to 10.0): Seconds between progress log messages.
+    """
+
+    def __init__(
+        self,
+        embedding: Any,
+        index: Any,
+        model: Optional[str] = None,
+        max_tokens: int = 256,
+        overlap: int = 32,
+        spans: Callable[[str], List[Span]] = whitespace_spans,
+        batch_size: int = 64,
+        max_batch_bytes: int = 1024 * 1024,
+        concurrency: int = 4,
+        max_pending: Optional[int] = None,
+        store_text: bool = True,
+        report_interval: float = 10.0,
+    ):
+        self.embedding = embedding
+        self.index = index
+        self.model = model
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.spans = spans
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.concurrency = concurrency
+        self.max_pending = max_pending or 2 * concurrency
+        self.store_text = store_text
+        self.report_interval = report_interval
+
+    def _embed(self, batch: List[Chunk]) -> Any:
+        import numpy as np
+
+        res = self.embedding.create(
+            input=[chunk["text"] for chunk in batch], model=self.model, encoding_format="numpy"
+        )
+        return np.stack([item["embedding"] for item in res["data"]])
+
+    def _metadata(self, chunk: Chunk) -> Dict[str, Any]:
+        metadata = {**chunk["metadata"], "document_id": chunk["document_id"], "chunk": chunk["chunk"]}
+        if self.store_text:
+            metadata["text"] = chunk["text"]
+        return metadata
+
+    def run(self, documents: Iterable[Document]) -> IngestionReport:
+        """
+        Ingests the documents and returns throughput statistics. Raises the first error of any stage after all
+        stages stopped, batches embedded before the error are kept in the index.
+
+        Args:
+            documents (`Iterable[Dict[str, Any]]`): Documents with `id`, `text` and optional `metadata`, e.g. from
+                `read_documents`.
+        """
+        pending: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_pending)
+        results: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        document_count = 0
+
+        def counted() -> Iterator[Document]:
+            nonlocal document_count
+            for document in documents:
+                document_count += 1
+                yield document
+
+        def put(target: "queue.Queue[Any]", item: Any) -> bool:
+            # blocks while the next stage is busy (backpressure), gives up once the pipeline is stopping
+            while not stop.is_set():
+                try:
+                    target.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce() -> None:
+            try:
+                batches = batch_chunks(
+                    counted(), self.max_tokens, self.overlap, self.spans, self.batch_size, self.max_batch_bytes
+                )
+                for batch in batches:
+                    if not put(pending, batch):
+                        break
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                for _ in range(self.concurrency):
+                    pending.put(_DONE)
+
+        def embed() -> None:
+            while True:
+                batch = pending.get()
+                if batch is _DONE:
+                    results.put(_DONE)
+                    return
+                if stop.is_set():
+                    continue
+                try:
+                    item = (batch, self._embed(batch))
+                except BaseException as e:
+                    item = (batch, e)
+                put(results, item)
+
+        threads = [threading.Thread(target=produce, name="easyllm-ingest-reader", daemon=True)]
+        threads += [
+            threading.Thread(target=embed, name=f"easyllm-ingest-embed-{i}", daemon=True)
+            for i in range(self.concurrency)
+        ]
+        start = last_report = time.perf_counter()
+        for thread in threads:
+            thread.start()
+
+        chunks = batches = size = 0
+        finished = 0
+        while finished < self.concurrency:
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            batch, vectors = item
+            if stop.is_set():
+                continue
+            if isinstance(vectors, BaseException):
+                errors.append(vectors)
+                stop.set()
+                continue
+            try:
+                self.index.add(vectors, metadata=[self._metadata(chunk) for chunk in batch])
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+                continue
+            chunks += len(batch)
+            batches += 1
+            size += sum(chunk["bytes"] for chunk in batch)
+            now = time.perf_counter()
+            if now - last_report >= self.report_interval:
+                last_report = now
+                logger.info(
+                    "Ingested %s documents, %s chunks, %.1f chunks/s, %.2f MB/s",
+                    document_count,
+                    chunks,
+                    chunks / (now - start),
+                    size / (now - start) / 1e6,
+                )
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+
+        duration = time.perf_counter() - start
+        return IngestionReport(
+            documents=document_count,
+            chunks=chunks,
+            batches=batches,
+            bytes=size,
+            duration=duration,
+            chunks_per_second=chunks / duration if duration else 0.0,
+            bytes_per_second=size / duration if duration else 0.0,
+        )
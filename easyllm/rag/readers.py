@@ -0,0 +1,63 @@
+import json
+from typing import Any, Dict, Iterator, Optional
+
+Document = Dict[str, Any]
+
+
+def _document(record: Dict[str, Any], position: int, text_field: str, id_field: Optional[str]) -> Document:
+    text = record.get(text_field)
+    if not isinstance(text, str):
+        raise ValueError(f"Record {position} has no string field {text_field}")
+    metadata = {k: v for k, v in record.items() if k not in (text_field, id_field)}
+    return {"id": record[id_field] if id_field else position, "text": text, "metadata": metadata}
+
+
+def read_jsonl(path: str, text_field: str = "text", id_field: Optional[str] = None) -> Iterator[Document]:
+    """
+    Lazily reads documents from a JSONL file, one JSON object per line.
+
+    Args:
+        path (`str`): Path to the JSONL file.
+        text_field (`str`, defaults to "text"): Field holding the document text.
+        id_field (`str`, *optional*, defaults to None): Field holding the document id, defaults to the line number.
+    """
+    with open(path) as f:
+        position = 0
+        for line in f:
+            if line.strip():
+                yield _document(json.loads(line), position, text_field, id_field)
+                position += 1
+
+
+def read_parquet(
+    path: str, text_field: str = "text", id_field: Optional[str] = None, batch_size: int = 1024
+) -> Iterator[Document]:
+    """
+    Lazily reads documents from a Parquet file in record batches, so only `batch_size` rows are in memory at once.
+    Requires `pyarrow`.
+
+    Args:
+        path (`str`): Path to the Parquet file.
+        text_field (`str`, defaults to "text"): Column holding the document text.
+        id_field (`str`, *optional*, defaults to None): Column holding the document id, defaults to the row number.
+        batch_size (`int`, defaults to 1024): Number of rows read at once.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Reading Parquet files requires pyarrow. Install it with `pip install pyarrow`.") from e
+
+    position = 0
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        for record in batch.to_pylist():
+            yield _document(record, position, text_field, id_field)
+            position += 1
+
+
+def read_documents(path: str, **kwargs) -> Iterator[Document]:
+    """Reads documents from a `.jsonl` or `.parquet` file, see `read_jsonl` and `read_parquet`."""
+    if path.endswith(".parquet"):
+        return read_parquet(path, **kwargs)
+    if path.endswith((".jsonl", ".json")):
+        return read_jsonl(path, **kwargs)
+    raise ValueError(f"Unsupported file type {path}, expected .jsonl or .parquet")
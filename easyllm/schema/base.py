@@ -1,15 +1,51 @@
-import importlib.metadata
-from typing import Literal, Optional
+import os
+from dataclasses import asdict, is_dataclass
+from typing import Any, Literal, Optional, Type, TypeVar
 
-from packaging.version import parse
+import pydantic
 from pydantic import BaseModel
 
+# checked once at import, `importlib.metadata` lookups are too slow to repeat for every response
+PYDANTIC_V2 = int(pydantic.VERSION.split(".")[0]) >= 2
+
+# validate response objects built by the clients, useful for debugging. Responses are constructed without
+# validation by default since their fields are produced by the library itself.
+VALIDATE_RESPONSES = os.environ.get("EASYLLM_VALIDATE_RESPONSES", "false").lower() == "true"
+
+T = TypeVar("T", bound=BaseModel)
+
+
+def construct_object(schema: Type[T], /, **data: Any) -> T:
+    """
+    Creates a model instance without validation, for trusted data produced by the library. Nested models have to
+    be constructed as well. Defaults are applied for missing fields.
+    """
+    if VALIDATE_RESPONSES:
+        return schema(**data)
+    if PYDANTIC_V2:
+        return schema.model_construct(**data)
+    return schema.construct(**data)
+
+
+def _dump(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return {k: _dump(v) for k, v in value.__dict__.items() if v is not None}
+    if isinstance(value, list) and value and (isinstance(value[0], BaseModel) or is_dataclass(value[0])):
+        return [_dump(v) for v in value]
+    if is_dataclass(value) and not isinstance(value, type):
+        return asdict(value)
+    # leaf values, e.g. lists of floats, are returned as is instead of being copied
+    return value
+
 
 def dump_object(object):
-    if parse(importlib.metadata.version("pydantic")) < parse("2.0.0"):
+    """
+    Converts a model into a dictionary. With pydantic v2, fields set to None are excluded, with pydantic v1 the output
+    of `dict()` is returned unchanged, including fields set to None.
+    """
+    if not PYDANTIC_V2:
         return object.dict()
-    else:
-        return object.model_dump(exclude_none=True)
+    return _dump(object)
 
 
 class ChatMessage(BaseModel):
@@ -4,7 +4,7 @@ from typing import Any, Dict, List, Literal, Optional, Union
 from nanoid import generate
 from pydantic import BaseModel, Field
 
-from easyllm.schema.base import ChatMessage, Usage
+from easyllm.schema.base import PYDANTIC_V2, ChatMessage, Usage, construct_object
 
 
 # More documentation https://platform.openai.com/docs/api-reference/chat/create
@@ -46,7 +46,7 @@ class DeltaMessage(BaseModel):
 class ChatCompletionResponseStreamChoice(BaseModel):
     index: int
     delta: Union[DeltaMessage, Dict[str, str]]
-    finish_reason: Optional[Literal["stop", "length"]] = None
+    finish_reason: Optional[Literal["stop", "length", "stop_sequence", "eos_token", "max_tokens"]] = None
 
 
 class ChatCompletionStreamResponse(BaseModel):
@@ -117,6 +117,18 @@ class EmbeddingsObjectResponse(BaseModel):
     embedding: List[float]
 
 
+def embedding_object(index: int, embedding: Any) -> EmbeddingsObjectResponse:
+    """
+    Creates the response object of an embedding. Lists of floats are validated with `EASYLLM_VALIDATE_RESPONSES`,
+    base64 encoded float32 bytes and numpy arrays of the other `encoding_format`s are always set without validation.
+    """
+    if isinstance(embedding, list):
+        return construct_object(EmbeddingsObjectResponse, index=index, embedding=embedding)
+    if PYDANTIC_V2:
+        return EmbeddingsObjectResponse.model_construct(index=index, embedding=embedding)
+    return EmbeddingsObjectResponse.construct(index=index, embedding=embedding)
+
+
 class EmbeddingsResponse(BaseModel):
     object: str = "list"
     data: List[EmbeddingsObjectResponse]
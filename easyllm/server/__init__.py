@@ -0,0 +1,3 @@
+from easyllm.server.gateway import Gateway, serve
+from easyllm.server.http import HTTPServer
+from easyllm.server.mock import MockConfig, MockServer, serve_mock
@@ -0,0 +1,305 @@
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import ModuleType
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Union
+
+import requests
+
+from easyllm.clients import client_name, load_client
+from easyllm.server.http import HTTPError, HTTPServer, JSONResponse, Request, Response, StreamingResponse
+from easyllm.utils import setup_logger
+from easyllm.utils.deadlines import Deadline, use_deadline
+from easyllm.utils.serialization import dumps
+
+logger = setup_logger()
+
+# seconds the worker threads wait for each other during the warm up
+WARMUP_TIMEOUT = 30
+
+# maps the OpenAI routes to the client classes implementing them
+ROUTES = {
+    "/v1/chat/completions": "ChatCompletion",
+    "/v1/completions": "Completion",
+    "/v1/embeddings": "Embedding",
+}
+
+_DONE = object()
+
+
+def _upstream_error(error: Exception) -> HTTPError:
+    """Maps an exception of a client call to the HTTP error of the gateway, for responses and stream events."""
+    if isinstance(error, HTTPError):
+        return error
+    if isinstance(error, (TimeoutError, requests.exceptions.Timeout)):
+        return HTTPError(504, str(error) or "Upstream request timed out", "timeout_error")
+    if isinstance(error, (ValueError, TypeError)):
+        return HTTPError(400, str(error))
+    if isinstance(error, NotImplementedError):
+        return HTTPError(501, str(error), "not_implemented")
+    return HTTPError(502, str(error), "upstream_error")
+
+
+class Gateway:
+    """
+    OpenAI compatible HTTP gateway in front of an easyllm client module. Requests are executed on a thread pool,
+    since the clients are synchronous, while the event loop only handles the connections.
+
+    Args:
+        client (`ModuleType`): The client module, e.g. `easyllm.clients.huggingface`, or a client instance.
+        workers (`int`, defaults to 16): Number of threads executing upstream requests.
+        max_concurrency (`int`, defaults to 64): Maximum number of concurrent upstream requests, including streams.
+        max_queue (`int`, *optional*, defaults to None): Maximum number of requests waiting for a free slot before
+            new requests are rejected with a 429. Unbounded if not set.
+        model (`str`, *optional*, defaults to None): Default model used when a request does not provide one.
+        request_timeout (`float`, *optional*, defaults to None): Seconds a request may take from its arrival,
+            including the time waiting for a free slot, before the gateway responds with a 504. Requests can set a
+            shorter timeout with the `X-Request-Timeout` header. Upstream requests only use the default connect
+            and read timeouts if neither is set.
+    """
+
+    def __init__(
+        self,
+        client: ModuleType,
+        workers: int = 16,
+        max_concurrency: int = 64,
+        max_queue: Optional[int] = None,
+        model: Optional[str] = None,
+        request_timeout: Optional[float] = None,
+    ):
+        self.client = client
+        self.workers = workers
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.model = model
+        self.request_timeout = request_timeout
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="easyllm-gateway")
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting = 0
+        self._parameters: Dict[str, set] = {}
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore:
+        # created lazily so it is bound to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    def warmup(self, connections: int = 1) -> List[Dict[str, int]]:
+        """
+        Warms up the client on every worker thread, since pooled sessions are per thread: credentials are resolved,
+        `connections` connections per thread are opened to the endpoint of the default model and serverless models
+        are pinged once. Failures are logged, the gateway serves traffic either way.
+
+        Returns:
+            `List[Dict[str, int]]`: The connections opened per url by each worker.
+        """
+        warmup = getattr(self.client, "warmup", None)
+        if warmup is None:
+            return []
+        models = [self.model] if self.model else None
+        # every task waits for the others, so each one runs on its own worker thread
+        barrier = threading.Barrier(self.workers)
+
+        def run(ping: Optional[bool]) -> Dict[str, int]:
+            try:
+                barrier.wait(timeout=WARMUP_TIMEOUT)
+            except threading.BrokenBarrierError:
+                pass
+            return warmup(models, connections=connections, ping=ping)
+
+        # only the first worker sends the ping, the others use the default of never pinging
+        futures = [self.executor.submit(run, None if i == 0 else False) for i in range(self.workers)]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.warning("Warm up of %s failed: %s", client_name(self.client), e)
+        return results
+
+    def _build_kwargs(self, resource: str, create: Any, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Keeps only the parameters the client `create` method accepts, e.g. drops OpenAI's `user` field."""
+        if resource not in self._parameters:
+            self._parameters[resource] = set(inspect.signature(create).parameters)
+        kwargs = {k: v for k, v in body.items() if k in self._parameters[resource] and v is not None}
+        if "model" not in kwargs and self.model is not None:
+            kwargs["model"] = self.model
+        if kwargs.get("encoding_format") not in (None, "float", "base64"):
+            raise HTTPError(400, "encoding_format must be one of 'float' or 'base64'")
+        return kwargs
+
+    def _deadline(self, request: Request) -> Deadline:
+        timeout = self.request_timeout
+        header = request.headers.get("x-request-timeout")
+        if header is not None:
+            try:
+                requested = float(header)
+            except ValueError:
+                raise HTTPError(400, "X-Request-Timeout must be a number of seconds") from None
+            if requested <= 0:
+                raise HTTPError(400, "X-Request-Timeout must be positive")
+            timeout = min(timeout, requested) if timeout is not None else requested
+        return Deadline(timeout)
+
+    async def _acquire(self) -> None:
+        if self.max_queue is not None and self.semaphore.locked() and self._waiting >= self.max_queue:
+            raise HTTPError(429, "Too many requests, please retry later", "rate_limit_error")
+        self._waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self._waiting -= 1
+
+    async def handle(self, request: Request) -> Union[Response, StreamingResponse]:
+        if request.method == "GET" and request.path == "/health":
+            return JSONResponse({"status": "ok"})
+        if request.method == "GET" and request.path == "/metrics":
+            from easyllm.utils.metrics import CONTENT_TYPE, render_prometheus
+
+            return Response(render_prometheus(), content_type=CONTENT_TYPE)
+
+        resource = ROUTES.get(request.path)
+        if resource is None:
+            raise HTTPError(404, f"Unknown route {request.path}")
+        if request.method != "POST":
+            raise HTTPError(405, f"Method {request.method} not allowed for {request.path}")
+        client_class = getattr(self.client, resource, None)
+        if client_class is None:
+            raise HTTPError(404, f"{client_name(self.client)} does not support {request.path}")
+
+        body = request.json()
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        kwargs = self._build_kwargs(resource, client_class.create, body)
+        deadline = self._deadline(request)
+
+        await self._acquire()
+        if kwargs.get("stream"):
+            try:
+                iterator = await self._run(client_class.create, kwargs, deadline)
+            except BaseException:
+                self.semaphore.release()
+                raise
+            return StreamingResponse(self._stream(iterator), on_close=self.semaphore.release)
+        try:
+            result = await self._run(client_class.create, kwargs, deadline)
+        finally:
+            self.semaphore.release()
+        return JSONResponse(result)
+
+    async def _run(self, create: Any, kwargs: Dict[str, Any], deadline: Deadline) -> Any:
+        loop = asyncio.get_running_loop()
+
+        def call() -> Any:
+            # requests which waited for a slot until their deadline passed are not sent
+            deadline.check()
+            with use_deadline(deadline):
+                return create(**kwargs)
+
+        try:
+            return await loop.run_in_executor(self.executor, call)
+        except HTTPError:
+            raise
+        except Exception as e:
+            error = _upstream_error(e)
+            if error.status == 502:
+                logger.exception("Upstream request failed")
+            raise error from e
+
+    async def _stream(self, iterator: Iterator[Dict[str, Any]]) -> AsyncIterator[bytes]:
+        """Pulls chunks of the synchronous client generator on the thread pool and encodes them as server-sent events."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                chunk = await loop.run_in_executor(self.executor, next, iterator, _DONE)
+                if chunk is _DONE:
+                    break
+                yield b"data: " + dumps(chunk) + b"\n\n"
+            yield b"data: [DONE]\n\n"
+        except Exception as e:
+            error = _upstream_error(e)
+            if error.status == 502:
+                logger.exception("Upstream stream failed")
+            event = {"error": {"message": error.message, "type": error.type, "code": error.status}}
+            yield b"data: " + dumps(event) + b"\n\n"
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                await loop.run_in_executor(self.executor, close)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown(wait=False)
+
+
+def serve(
+    client: Union[str, ModuleType] = "huggingface",
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    workers: int = 16,
+    max_concurrency: int = 64,
+    max_queue: Optional[int] = None,
+    pool_size: Optional[int] = None,
+    prompt_builder: Optional[str] = None,
+    api_base: Optional[str] = None,
+    model: Optional[str] = None,
+    metrics: bool = False,
+    warmup: Optional[bool] = None,
+    request_timeout: Optional[float] = None,
+) -> None:
+    """
+    Starts the OpenAI compatible gateway and blocks until it is stopped.
+
+    Args:
+        client (`Union[str, ModuleType]`, defaults to "huggingface"): The client module or its name.
+        host (`str`, defaults to "127.0.0.1"): The host to bind to.
+        port (`int`, defaults to 8080): The port to bind to.
+        workers (`int`, defaults to 16): Number of threads executing upstream requests.
+        max_concurrency (`int`, defaults to 64): Maximum number of concurrent upstream requests.
+        max_queue (`int`, *optional*, defaults to None): Maximum number of queued requests before returning 429.
+        pool_size (`int`, *optional*, defaults to None): Upstream connections kept alive per host. Defaults to `workers`.
+        prompt_builder (`str`, *optional*, defaults to None): Name of a prompt builder from `PROMPT_MAPPING`.
+        api_base (`str`, *optional*, defaults to None): Overrides the `api_base` of the client module.
+        model (`str`, *optional*, defaults to None): Default model used when a request does not provide one.
+        metrics (`bool`, defaults to False): Whether to collect client metrics, served on `GET /metrics`.
+        warmup (`bool`, *optional*, defaults to None): Whether to warm up the connections of all workers before
+            serving, see `Gateway.warmup`. Defaults to the `EASYLLM_WARMUP` environment variable.
+        request_timeout (`float`, *optional*, defaults to None): Seconds a request may take before the gateway
+            responds with a 504, see `Gateway`.
+    """
+    from easyllm.utils.http import configure_http_pool
+
+    module = load_client(client) if isinstance(client, str) else client
+    configure_http_pool(pool_size or workers)
+    if prompt_builder is not None:
+        from easyllm.prompt_utils import PROMPT_MAPPING
+
+        if prompt_builder not in PROMPT_MAPPING:
+            raise ValueError(f"Prompt builder {prompt_builder} not found. Available: {list(PROMPT_MAPPING.keys())}")
+        module.prompt_builder = prompt_builder
+    if api_base is not None:
+        module.api_base = api_base
+    if metrics:
+        from easyllm.utils.metrics import enable_metrics
+
+        enable_metrics()
+
+    gateway = Gateway(
+        module,
+        workers=workers,
+        max_concurrency=max_concurrency,
+        max_queue=max_queue,
+        model=model,
+        request_timeout=request_timeout,
+    )
+    if warmup if warmup is not None else os.environ.get("EASYLLM_WARMUP", "").lower() in ("1", "true"):
+        gateway.warmup()
+    server = HTTPServer(gateway.handle, host=host, port=port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        gateway.shutdown()
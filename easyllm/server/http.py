@@ -0,0 +1,298 @@
+import asyncio
+import gzip
+import zlib
+from http import HTTPStatus
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+from easyllm.utils import setup_logger
+from easyllm.utils.serialization import dumps, loads
+
+logger = setup_logger()
+
+# maximum size of a request body we are willing to read
+MAX_BODY_SIZE = 16 * 1024 * 1024
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, type: str = "invalid_request_error"):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.type = type
+
+
+class Request:
+    def __init__(self, method: str, target: str, headers: Dict[str, str], body: bytes):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        try:
+            return loads(self.body or b"null")
+        except ValueError as e:
+            raise HTTPError(400, f"Request body is not valid JSON: {e}") from e
+
+
+class Response:
+    def __init__(
+        self,
+        body: Union[bytes, str] = b"",
+        status: int = 200,
+        content_type: str = "application/json",
+        headers: Optional[Dict[str, str]] = None,
+    ):
+        self.body = body.encode() if isinstance(body, str) else body
+        self.status = status
+        self.headers = {"Content-Type": content_type, **(headers or {})}
+
+
+class JSONResponse(Response):
+    def __init__(self, content: Any, status: int = 200, headers: Optional[Dict[str, str]] = None):
+        super().__init__(dumps(content), status=status, headers=headers)
+
+
+class StreamingResponse:
+    """Response whose body is produced by an async iterator and sent with chunked transfer encoding."""
+
+    def __init__(
+        self,
+        iterator: AsyncIterator[bytes],
+        status: int = 200,
+        content_type: str = "text/event-stream",
+        headers: Optional[Dict[str, str]] = None,
+        on_close: Optional[Callable[[], None]] = None,
+    ):
+        self.iterator = iterator
+        self.on_close = on_close
+        self.status = status
+        self.headers = {"Content-Type": content_type, "Cache-Control": "no-cache", **(headers or {})}
+
+
+def error_response(status: int, message: str, type: str = "invalid_request_error") -> JSONResponse:
+    """Creates an OpenAI compatible error response."""
+    return JSONResponse({"error": {"message": message, "type": type, "code": status}}, status=status)
+
+
+Handler = Callable[[Request], Awaitable[Union[Response, StreamingResponse]]]
+
+
+def _status_line(status: int) -> bytes:
+    try:
+        phrase = HTTPStatus(status).phrase
+    except ValueError:
+        phrase = ""
+    return f"HTTP/1.1 {status} {phrase}\r\n".encode()
+
+
+def _encode_headers(headers: Dict[str, str]) -> bytes:
+    return "".join(f"{k}: {v}\r\n" for k, v in headers.items()).encode() + b"\r\n"
+
+
+def _decode_body(request: Request) -> None:
+    """Decompresses a gzip encoded request body in place, refusing bodies above `MAX_BODY_SIZE` once decompressed."""
+    encoding = request.headers.get("content-encoding", "identity").strip().lower()
+    if encoding == "identity" or not request.body:
+        return
+    if encoding != "gzip":
+        raise HTTPError(415, f"Content-Encoding {encoding} is not supported")
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    try:
+        body = decompressor.decompress(request.body, MAX_BODY_SIZE + 1)
+    except zlib.error as e:
+        raise HTTPError(400, f"Request body is not valid gzip: {e}") from e
+    if len(body) > MAX_BODY_SIZE:
+        raise HTTPError(413, f"Request body exceeds {MAX_BODY_SIZE} bytes")
+    request.body = body
+    request.headers.pop("content-encoding", None)
+
+
+def _accepts_gzip(accept_encoding: str) -> bool:
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+class HTTPServer:
+    """
+    Minimal asyncio HTTP/1.1 server with keep-alive and chunked streaming responses. It only implements what the
+    OpenAI compatible endpoints need, so easyllm does not depend on a web framework.
+
+    Args:
+        handler (`Callable`): Coroutine that receives a `Request` and returns a `Response` or `StreamingResponse`.
+        host (`str`, defaults to "127.0.0.1"): The host to bind to.
+        port (`int`, defaults to 8080): The port to bind to, use 0 to pick a free port.
+        keep_alive_timeout (`float`, defaults to 30): Seconds an idle connection is kept open.
+        gzip_min_size (`int`, *optional*, defaults to None): Responses of at least this many bytes are gzip compressed
+            for clients sending `Accept-Encoding: gzip`. Disabled if None. Gzip compressed request bodies are always
+            accepted.
+    """
+
+    def __init__(
+        self,
+        handler: Handler,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        keep_alive_timeout: float = 30,
+        gzip_min_size: Optional[int] = None,
+    ):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self.keep_alive_timeout = keep_alive_timeout
+        self.gzip_min_size = gzip_min_size
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections = set()
+        # number of accepted connections and the most connections open at the same time
+        self.connections_opened = 0
+        self.peak_connections = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        # resolve the port if it was picked by the OS
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info(f"Listening on http://{self.host}:{self.port}")
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # idle keep-alive connections would otherwise keep the server open
+            for task in list(self._connections):
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Request]:
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keep_alive_timeout)
+        except asyncio.LimitOverrunError as e:
+            raise HTTPError(431, "Request header fields too large") from e
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            return None
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = lines[0].split(" ", 2)
+        except ValueError as e:
+            raise HTTPError(400, "Malformed request line") from e
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            raise HTTPError(411, "Chunked request bodies are not supported, please send a Content-Length")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError as e:
+            raise HTTPError(400, "Invalid Content-Length header") from e
+        if length > MAX_BODY_SIZE:
+            raise HTTPError(413, f"Request body exceeds {MAX_BODY_SIZE} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        self.connections_opened += 1
+        self.peak_connections = max(self.peak_connections, len(self._connections))
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    await self._write_response(writer, error_response(e.status, e.message), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                if await self._switch_protocol(request, reader, writer):
+                    break
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                response = await self._dispatch(request)
+                if isinstance(response, StreamingResponse):
+                    await self._write_stream(writer, response, keep_alive)
+                else:
+                    await self._write_response(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # connection closed by `close()` during shutdown
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _switch_protocol(
+        self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        """
+        Hook for subclasses serving another protocol on the connection after `request`, e.g. the HTTP/2 of the mock
+        server. Returns whether the connection was served, it is closed afterwards.
+        """
+        return False
+
+    async def _dispatch(self, request: Request) -> Union[Response, StreamingResponse]:
+        try:
+            _decode_body(request)
+            response = await self.handler(request)
+        except HTTPError as e:
+            return error_response(e.status, e.message, e.type)
+        except Exception as e:
+            logger.exception("Unhandled error while processing request")
+            return error_response(500, str(e), "server_error")
+        if (
+            self.gzip_min_size is not None
+            and isinstance(response, Response)
+            and len(response.body) >= self.gzip_min_size
+            and "Content-Encoding" not in response.headers
+            and _accepts_gzip(request.headers.get("accept-encoding", ""))
+        ):
+            response.body = gzip.compress(response.body, compresslevel=6)
+            response.headers["Content-Encoding"] = "gzip"
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _write_response(self, writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+        headers = {
+            **response.headers,
+            "Content-Length": str(len(response.body)),
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        writer.write(_status_line(response.status) + _encode_headers(headers) + response.body)
+        await writer.drain()
+
+    async def _write_stream(self, writer: asyncio.StreamWriter, response: StreamingResponse, keep_alive: bool) -> None:
+        headers = {
+            **response.headers,
+            "Transfer-Encoding": "chunked",
+            "Connection": "keep-alive" if keep_alive else "close",
+        }
+        try:
+            writer.write(_status_line(response.status) + _encode_headers(headers))
+            async for chunk in response.iterator:
+                if chunk:
+                    writer.write(f"{len(chunk):x}\r\n".encode() + chunk + b"\r\n")
+                    # respect backpressure of slow readers
+                    await writer.drain()
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # stop producing chunks (and upstream work) if the client went away
+            aclose = getattr(response.iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+            if response.on_close is not None:
+                response.on_close()
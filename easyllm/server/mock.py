@@ -0,0 +1,537 @@
+import asyncio
+import base64
+import binascii
+import hashlib
+import json
+import random
+import re
+import struct
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from easyllm.server.http import (
+    MAX_BODY_SIZE,
+    HTTPError,
+    HTTPServer,
+    JSONResponse,
+    Request,
+    Response,
+    StreamingResponse,
+)
+from easyllm.utils import setup_logger
+
+logger = setup_logger()
+
+_VOCABULARY = (
+    "the of and to in is was for on that with as by at from his her an be this which or are it had not but have "
+    "were they one all their there been has when who more will no if out so up said what its about into than them "
+    "can only other new some could time these two may then do first any my now such like our over man me even most"
+).split()
+
+_SAGEMAKER_ROUTE = re.compile(r"^/endpoints/(?P<endpoint>[^/]+)/invocations$")
+_BEDROCK_ROUTE = re.compile(r"^/model/(?P<model>[^/]+)/(?P<action>invoke|invoke-with-response-stream)$")
+
+
+class MockConfig(BaseModel):
+    """
+    Behaviour of the mock server.
+
+    Args:
+        tokens_per_second (`float`, defaults to 50): Decoding speed of a single request.
+        ttft (`float`, defaults to 0.05): Time to first token in seconds, emulates queueing and prefill.
+        max_output_tokens (`int`, defaults to 128): Upper bound for generated tokens, regardless of `max_new_tokens`.
+        embedding_dim (`int`, defaults to 384): Dimension of the returned embeddings.
+        embedding_latency (`float`, defaults to 0.005): Latency of an embedding request in seconds.
+        error_rate (`float`, defaults to 0): Probability of answering a request with a 500.
+        rate_limit (`float`, *optional*): Requests per second accepted before answering with 429.
+        max_concurrency (`int`, *optional*): Concurrent requests accepted before answering with 429.
+        seed (`int`, defaults to 42): Seed for error injection.
+        loading_time (`float`, defaults to 0): Seconds the model takes to load, counted from the first request.
+            Until then requests are answered with a 503 and an `estimated_time` like the Hugging Face Inference API,
+            requests with `X-Wait-For-Model: true` are held until the model is loaded.
+        gzip_min_size (`int`, *optional*): Responses of at least this many bytes are gzip compressed for clients
+            accepting it.
+    """
+
+    tokens_per_second: float = 50.0
+    ttft: float = 0.05
+    max_output_tokens: int = 128
+    embedding_dim: int = 384
+    embedding_latency: float = 0.005
+    error_rate: float = 0.0
+    rate_limit: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    seed: int = 42
+    loading_time: float = 0.0
+    gzip_min_size: Optional[int] = None
+
+
+def _stable_seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "little")
+
+
+def _tokens(prompt: str, count: int) -> List[Tuple[int, str]]:
+    """Deterministic token ids and texts for a prompt."""
+    offset = _stable_seed(prompt)
+    ids = [(offset + i * 7919) % len(_VOCABULARY) for i in range(count)]
+    return [(i, f" {_VOCABULARY[i]}") for i in ids]
+
+
+def _logprob(token_id: int, position: int) -> float:
+    return -((token_id * 31 + position * 17) % 1000) / 250 - 0.01
+
+
+def _prefill(prompt: str) -> List[Dict[str, Any]]:
+    """Emulates TGI's `decoder_input_details`, one input token per whitespace separated word."""
+    prefill = []
+    for position, word in enumerate(prompt.split()):
+        token_id = _stable_seed(word) % 32000
+        prefill.append(
+            {"id": token_id, "text": word, "logprob": None if position == 0 else _logprob(token_id, position)}
+        )
+    return prefill
+
+
+def _embedding(text: str, dim: int) -> List[float]:
+    rng = random.Random(_stable_seed(text))
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+def encode_npy(rows: List[List[float]]) -> bytes:
+    """Encodes equally long rows as a little-endian float32 `.npy` document, version 1.0."""
+    dim = len(rows[0]) if rows else 0
+    header = repr({"descr": "<f4", "fortran_order": False, "shape": (len(rows), dim)}).encode("latin1")
+    # the header is padded with spaces and a newline, so the data starts at a multiple of 64 bytes
+    header += b" " * (63 - (10 + len(header)) % 64) + b"\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header + _float32(rows)
+
+
+def _float32(rows: List[List[float]]) -> bytes:
+    values = [value for row in rows for value in row]
+    return struct.pack(f"<{len(values)}f", *values)
+
+
+def _negotiate(accept: str, offered: Tuple[str, ...]) -> str:
+    """Returns the media type of `offered` with the highest quality in an `Accept` header, the first on ties."""
+    best, best_quality = offered[0], 0.0
+    for media_range in accept.split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if media_type.lower() in offered and quality > best_quality:
+            best, best_quality = media_type.lower(), quality
+    return best
+
+
+def encode_event_stream_message(headers: Dict[str, str], payload: bytes) -> bytes:
+    """Encodes a message in the AWS event stream format used by Bedrock streaming responses."""
+    encoded_headers = b""
+    for name, value in headers.items():
+        name_bytes, value_bytes = name.encode(), value.encode()
+        # header type 7 is a string
+        encoded_headers += struct.pack(">B", len(name_bytes)) + name_bytes
+        encoded_headers += struct.pack(">BH", 7, len(value_bytes)) + value_bytes
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack(">II", total_length, len(encoded_headers))
+    message = prelude + struct.pack(">I", binascii.crc32(prelude)) + encoded_headers + payload
+    return message + struct.pack(">I", binascii.crc32(message))
+
+
+# connection preface of HTTP/2 clients with prior knowledge, parsed as a `PRI *` request followed by these bytes
+HTTP2_PREFACE = b"PRI * HTTP/2.0\r\n\r\nSM\r\n\r\n"
+_HTTP2_PREFACE_REST = b"SM\r\n\r\n"
+
+# headers which are not allowed in HTTP/2 responses
+_CONNECTION_HEADERS = {"connection", "keep-alive", "transfer-encoding", "upgrade", "proxy-connection"}
+
+
+class _MockHTTPServer(HTTPServer):
+    """`HTTPServer` which also serves cleartext HTTP/2 (h2c) to clients with prior knowledge if `h2` is installed."""
+
+    async def _switch_protocol(
+        self, request: Request, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        if (request.method, request.path) != ("PRI", "*"):
+            return False
+        if await reader.readexactly(len(_HTTP2_PREFACE_REST)) == _HTTP2_PREFACE_REST:
+            await self._serve_http2(reader, writer)
+        return True
+
+    async def _serve_http2(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serves the streams of an HTTP/2 connection concurrently until the client closes it."""
+        try:
+            import h2.config
+            import h2.connection
+            import h2.errors
+            import h2.events
+            import h2.exceptions
+        except ImportError:
+            logger.warning("Closing HTTP/2 connection, install h2 to serve HTTP/2")
+            return
+
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False, header_encoding="utf-8"))
+        conn.initiate_connection()
+        # the preface was consumed to detect HTTP/2
+        conn.receive_data(HTTP2_PREFACE)
+        drain_lock = asyncio.Lock()
+        # streams waiting for the client to grow their flow control window
+        window_waiters: Dict[int, asyncio.Event] = {}
+        pending: Dict[int, Tuple[List[Tuple[str, str]], bytearray]] = {}
+        tasks: Dict[int, asyncio.Task] = {}
+
+        async def flush() -> None:
+            data = conn.data_to_send()
+            if data:
+                writer.write(data)
+                # concurrent drains are not supported before Python 3.10
+                async with drain_lock:
+                    await writer.drain()
+
+        async def send_data(stream_id: int, data: bytes) -> None:
+            while data:
+                size = min(conn.local_flow_control_window(stream_id), conn.max_outbound_frame_size, len(data))
+                if size <= 0:
+                    waiter = window_waiters[stream_id] = asyncio.Event()
+                    await waiter.wait()
+                    continue
+                conn.send_data(stream_id, data[:size])
+                data = data[size:]
+                await flush()
+
+        async def respond(stream_id: int, headers: List[Tuple[str, str]], body: bytes) -> None:
+            pseudo = {k: v for k, v in headers if k.startswith(":")}
+            fields = {k.lower(): v for k, v in headers if not k.startswith(":")}
+            request = Request(pseudo.get(":method", "GET").upper(), pseudo.get(":path", "/"), fields, body)
+            response = await self._dispatch(request)
+            response_headers = [(":status", str(response.status))] + [
+                (k.lower(), str(v)) for k, v in response.headers.items() if k.lower() not in _CONNECTION_HEADERS
+            ]
+            try:
+                if isinstance(response, StreamingResponse):
+                    try:
+                        conn.send_headers(stream_id, response_headers)
+                        await flush()
+                        async for chunk in response.iterator:
+                            if chunk:
+                                await send_data(stream_id, chunk)
+                        conn.end_stream(stream_id)
+                        await flush()
+                    finally:
+                        aclose = getattr(response.iterator, "aclose", None)
+                        if aclose is not None:
+                            await aclose()
+                        if response.on_close is not None:
+                            response.on_close()
+                else:
+                    response_headers.append(("content-length", str(len(response.body))))
+                    conn.send_headers(stream_id, response_headers, end_stream=not response.body)
+                    await flush()
+                    if response.body:
+                        await send_data(stream_id, response.body)
+                        conn.end_stream(stream_id)
+                        await flush()
+            except (h2.exceptions.StreamClosedError, ConnectionError):
+                # reset by the client or the connection was closed
+                pass
+            finally:
+                window_waiters.pop(stream_id, None)
+
+        def finished(stream_id: int, task: asyncio.Task) -> None:
+            tasks.pop(stream_id, None)
+            if not task.cancelled() and task.exception() is not None:
+                logger.error("HTTP/2 stream %s failed", stream_id, exc_info=task.exception())
+
+        try:
+            await flush()
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                try:
+                    events = conn.receive_data(data)
+                except h2.exceptions.ProtocolError:
+                    await flush()
+                    break
+                for event in events:
+                    if isinstance(event, h2.events.RequestReceived):
+                        pending[event.stream_id] = (event.headers, bytearray())
+                    elif isinstance(event, h2.events.DataReceived):
+                        conn.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                        if event.stream_id in pending:
+                            body = pending[event.stream_id][1]
+                            body += event.data
+                            if len(body) > MAX_BODY_SIZE:
+                                del pending[event.stream_id]
+                                conn.reset_stream(event.stream_id, h2.errors.ErrorCodes.REFUSED_STREAM)
+                    elif isinstance(event, h2.events.StreamEnded) and event.stream_id in pending:
+                        headers, body = pending.pop(event.stream_id)
+                        task = asyncio.ensure_future(respond(event.stream_id, headers, bytes(body)))
+                        task.add_done_callback(lambda t, stream_id=event.stream_id: finished(stream_id, t))
+                        tasks[event.stream_id] = task
+                    elif isinstance(event, h2.events.StreamReset):
+                        pending.pop(event.stream_id, None)
+                        task = tasks.pop(event.stream_id, None)
+                        if task is not None:
+                            task.cancel()
+                    elif isinstance(event, (h2.events.WindowUpdated, h2.events.RemoteSettingsChanged)):
+                        # waiting streams check their window again, it may be shared with the connection
+                        for waiter in window_waiters.values():
+                            waiter.set()
+                    elif isinstance(event, h2.events.ConnectionTerminated):
+                        return
+                await flush()
+        finally:
+            for task in list(tasks.values()):
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+class MockServer:
+    """
+    Local stand-in for Text Generation Inference, Hugging Face feature-extraction, Amazon SageMaker and Amazon
+    Bedrock endpoints to benchmark and test the clients without network access.
+
+    Routes:
+        - `POST /generate` and `POST /generate_stream`: TGI generate endpoints.
+        - `POST /endpoints/<name>/invocations`: SageMaker text generation and embeddings. Embeddings are returned as
+          `application/x-npy` or raw float32 (`application/octet-stream`) if the `Accept` header prefers them.
+        - `POST /model/<id>/invoke` and `POST /model/<id>/invoke-with-response-stream`: Bedrock Anthropic models.
+        - any other `POST`, e.g. `/` or `/<model>`: TGI root route if the body has `parameters`, else feature-extraction.
+        - `GET /stats`: counters of the mock server, see `stats`.
+
+    Clients with prior knowledge can use HTTP/2 over cleartext if `h2` is installed. Gzip compressed request bodies
+    are accepted.
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 8081):
+        self.config = config or MockConfig()
+        self.http = _MockHTTPServer(self.handle, host=host, port=port, gzip_min_size=self.config.gzip_min_size)
+        self._rng = random.Random(self.config.seed)
+        self._in_flight = 0
+        self._allowance = self.config.rate_limit or 0.0
+        self._last_check = time.monotonic()
+        self._loading_since: Optional[float] = None
+        # number of requests answered with a 503 while the model was loading
+        self.loading_responses = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.http.host}:{self.http.port}"
+
+    def start_in_background(self) -> str:
+        """Starts the server on a background thread and returns its base url."""
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self.http.start())
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name="easyllm-mock")
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.http.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def serve_forever(self) -> None:
+        asyncio.run(self.http.serve_forever())
+
+    def _admit(self) -> None:
+        """Raises a 429 or 500 according to the configured rate limit, concurrency and error rate."""
+        if self.config.rate_limit is not None:
+            # token bucket refilled at `rate_limit` requests per second
+            now = time.monotonic()
+            self._allowance = min(
+                self.config.rate_limit, self._allowance + (now - self._last_check) * self.config.rate_limit
+            )
+            self._last_check = now
+            if self._allowance < 1:
+                raise HTTPError(429, "Model is overloaded", "overloaded")
+            self._allowance -= 1
+        if self.config.max_concurrency is not None and self._in_flight >= self.config.max_concurrency:
+            raise HTTPError(429, "Model is overloaded", "overloaded")
+        if self.config.error_rate and self._rng.random() < self.config.error_rate:
+            raise HTTPError(500, "Injected error", "generation")
+
+    async def handle(self, request: Request) -> Union[Response, StreamingResponse]:
+        if request.method == "GET" and request.path in ("/health", "/ping"):
+            return JSONResponse({"status": "ok"})
+        if request.method == "GET" and request.path == "/info":
+            return JSONResponse({"model_id": "easyllm/mock", "max_total_tokens": 4096, "version": "mock"})
+        if request.method == "GET" and request.path == "/stats":
+            return JSONResponse(self.stats())
+        if request.method != "POST":
+            raise HTTPError(405, f"Method {request.method} not allowed")
+
+        body = request.json()
+        try:
+            self._admit()
+        except HTTPError as e:
+            # TGI error format, also understood by the other clients as a non 200 response
+            headers = {"Retry-After": "1"} if e.status == 429 else None
+            return JSONResponse({"error": e.message, "error_type": e.type}, status=e.status, headers=headers)
+
+        if self.config.loading_time:
+            remaining = self._loading_remaining()
+            if remaining > 0:
+                if request.headers.get("x-wait-for-model", "").lower() != "true":
+                    self.loading_responses += 1
+                    error = {"error": "Model easyllm/mock is currently loading", "estimated_time": remaining}
+                    return JSONResponse(error, status=503)
+                await asyncio.sleep(remaining)
+
+        self._in_flight += 1
+        try:
+            response = await self._route(request.path, body, request.headers.get("accept", ""))
+        except BaseException:
+            self._in_flight -= 1
+            raise
+        if isinstance(response, StreamingResponse):
+            response.on_close = self._release
+        else:
+            self._in_flight -= 1
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the accepted connections, the most connections open at the same time and the 503s while loading."""
+        return {
+            "connections_opened": self.http.connections_opened,
+            "peak_connections": self.http.peak_connections,
+            "loading_responses": self.loading_responses,
+        }
+
+    def _loading_remaining(self) -> float:
+        now = time.monotonic()
+        if self._loading_since is None:
+            self._loading_since = now
+        return self.config.loading_time - (now - self._loading_since)
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+
+    async def _route(self, path: str, body: Dict[str, Any], accept: str = "") -> Union[Response, StreamingResponse]:
+        if path == "/generate":
+            return JSONResponse(await self._generate(body))
+        if path == "/generate_stream":
+            return StreamingResponse(self._generate_stream(body))
+        match = _SAGEMAKER_ROUTE.match(path)
+        if match:
+            if "parameters" in body:
+                return JSONResponse([await self._generate(body)])
+            embeddings = await self._embed(body.get("inputs"))
+            content_type = _negotiate(accept, ("application/json", "application/x-npy", "application/octet-stream"))
+            if content_type == "application/x-npy":
+                return Response(encode_npy(embeddings), content_type=content_type)
+            if content_type == "application/octet-stream":
+                return Response(_float32(embeddings), content_type=content_type)
+            return JSONResponse({"vectors": embeddings})
+        match = _BEDROCK_ROUTE.match(path)
+        if match:
+            if match.group("action") == "invoke":
+                return JSONResponse(await self._bedrock_invoke(body))
+            return StreamingResponse(self._bedrock_stream(body), content_type="application/vnd.amazon.eventstream")
+        # Hugging Face Inference API / TGI root route
+        if "parameters" in body or body.get("stream"):
+            if body.get("stream"):
+                return StreamingResponse(self._generate_stream(body))
+            return JSONResponse([await self._generate(body)])
+        inputs = body.get("inputs")
+        embeddings = await self._embed(inputs)
+        return JSONResponse(embeddings if isinstance(inputs, list) else embeddings[0])
+
+    def _plan(self, prompt: str, max_new_tokens: int) -> Tuple[List[Tuple[int, str]], str]:
+        count = max(1, min(int(max_new_tokens), self.config.max_output_tokens))
+        finish_reason = "length" if count == max_new_tokens else "eos_token"
+        return _tokens(prompt, count), finish_reason
+
+    async def _generate(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        prompt = body.get("inputs", "")
+        parameters = body.get("parameters") or {}
+        tokens, finish_reason = self._plan(prompt, parameters.get("max_new_tokens", 20))
+        await asyncio.sleep(self.config.ttft + (len(tokens) - 1) / self.config.tokens_per_second)
+        text = "".join(t for _, t in tokens)
+        details = {
+            "finish_reason": finish_reason,
+            "generated_tokens": len(tokens),
+            "seed": parameters.get("seed"),
+            "prefill": _prefill(prompt) if parameters.get("decoder_input_details") else [],
+            "tokens": [
+                {"id": i, "text": t, "logprob": _logprob(i, p), "special": False} for p, (i, t) in enumerate(tokens)
+            ],
+        }
+        return {
+            "generated_text": prompt + text if parameters.get("return_full_text") else text,
+            "details": details,
+        }
+
+    async def _generate_stream(self, body: Dict[str, Any]) -> AsyncIterator[bytes]:
+        prompt = body.get("inputs", "")
+        parameters = body.get("parameters") or {}
+        tokens, finish_reason = self._plan(prompt, parameters.get("max_new_tokens", 20))
+        await asyncio.sleep(self.config.ttft)
+        for position, (token_id, text) in enumerate(tokens):
+            if position > 0:
+                await asyncio.sleep(1 / self.config.tokens_per_second)
+            last = position == len(tokens) - 1
+            event = {
+                "token": {"id": token_id, "text": text, "logprob": _logprob(token_id, position), "special": False},
+                "generated_text": "".join(t for _, t in tokens) if last else None,
+                "details": {"finish_reason": finish_reason, "generated_tokens": len(tokens), "seed": None}
+                if last
+                else None,
+            }
+            yield f"data:{json.dumps(event)}\n\n".encode()
+
+    async def _embed(self, inputs: Union[str, List[str], None]) -> List[List[float]]:
+        inputs = inputs if isinstance(inputs, list) else [inputs or ""]
+        await asyncio.sleep(self.config.embedding_latency)
+        return [_embedding(str(text), self.config.embedding_dim) for text in inputs]
+
+    async def _bedrock_invoke(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        tokens, finish_reason = self._plan(body.get("prompt", ""), body.get("max_tokens_to_sample", 256))
+        await asyncio.sleep(self.config.ttft + (len(tokens) - 1) / self.config.tokens_per_second)
+        return {
+            "completion": "".join(t for _, t in tokens),
+            "stop_reason": "max_tokens" if finish_reason == "length" else "stop_sequence",
+        }
+
+    async def _bedrock_stream(self, body: Dict[str, Any]) -> AsyncIterator[bytes]:
+        tokens, finish_reason = self._plan(body.get("prompt", ""), body.get("max_tokens_to_sample", 256))
+        await asyncio.sleep(self.config.ttft)
+        headers = {":event-type": "chunk", ":content-type": "application/json", ":message-type": "event"}
+        for position, (_, text) in enumerate(tokens):
+            if position > 0:
+                await asyncio.sleep(1 / self.config.tokens_per_second)
+            last = position == len(tokens) - 1
+            stop_reason = ("max_tokens" if finish_reason == "length" else "stop_sequence") if last else None
+            chunk = json.dumps({"completion": text, "stop_reason": stop_reason}).encode()
+            payload = json.dumps({"bytes": base64.b64encode(chunk).decode()}).encode()
+            yield encode_event_stream_message(headers, payload)
+
+
+def serve_mock(host: str = "127.0.0.1", port: int = 8081, **kwargs) -> None:
+    """
+    Starts the mock server and blocks until it is stopped.
+
+    Args:
+        host (`str`, defaults to "127.0.0.1"): The host to bind to.
+        port (`int`, defaults to 8081): The port to bind to.
+        kwargs: Fields of `MockConfig`, e.g. `tokens_per_second` or `error_rate`.
+    """
+    server = MockServer(MockConfig(**kwargs), host=host, port=port)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,2 +1,10 @@
-from easyllm.utils.aws import AWSSigV4, get_bedrock_client
 from easyllm.utils.logging import setup_logger
+
+
+def __getattr__(name):
+    # the aws helpers import requests, load them only when they are used
+    if name in ("AWSSigV4", "get_bedrock_client"):
+        from easyllm.utils import aws
+
+        return getattr(aws, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
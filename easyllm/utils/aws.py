@@ -3,21 +3,19 @@
 import hashlib
 import hmac
 import os
+import threading
+import time
 import urllib.parse
+import weakref
 from datetime import datetime
-from typing import Optional
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
 
 from requests import __version__ as requests_version
 from requests.auth import AuthBase
 from requests.compat import urlparse
 from requests.models import PreparedRequest
 
-try:
-    import boto3
-    from botocore.config import Config
-except ImportError:
-    boto3 = None
-
+from easyllm.utils.deadlines import DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT
 from easyllm.utils.logging import setup_logger
 
 logger = setup_logger()
@@ -31,31 +29,290 @@ def sign_msg(key, msg):
     return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
 
 
+# seconds before expiry at which credentials are renewed in the background. botocore only renews refreshable
+# credentials within 15 minutes of their expiry, the margin is inside that window
+REFRESH_MARGIN = 14 * 60
+# seconds between attempts if a renewal failed or returned the same credentials
+REFRESH_RETRY_INTERVAL = 30
+
+
+class AWSCredentials(NamedTuple):
+    access_key: str
+    secret_key: str
+    token: Optional[str] = None
+    # epoch seconds at which the credentials expire, None if they do not
+    expiry: Optional[float] = None
+
+
+class RefreshableCredentials:
+    """
+    AWS credentials renewed on a background thread `margin` seconds before they expire, e.g. assumed roles or
+    instance profiles of long-running workers. Requests read the current credentials without locking or waiting for
+    a renewal. Only if the background renewal failed until the credentials expired, the next request renews them.
+
+    Args:
+        fetch (`Callable[[], AWSCredentials]`): Returns new credentials, called on the background thread.
+        margin (`float`, defaults to 840): Seconds before expiry at which the credentials are renewed.
+        retry_interval (`float`, defaults to 30): Seconds between attempts if a renewal failed or returned the same
+            credentials.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], AWSCredentials],
+        margin: float = REFRESH_MARGIN,
+        retry_interval: float = REFRESH_RETRY_INTERVAL,
+    ):
+        self.fetch = fetch
+        self.margin = margin
+        self.retry_interval = retry_interval
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._current = fetch()
+        self._thread: Optional[threading.Thread] = None
+        if self._current.expiry is not None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name="easyllm-aws-credentials")
+            self._thread.start()
+
+    def get(self) -> AWSCredentials:
+        """Returns the current credentials."""
+        current = self._current
+        if current.expiry is not None and current.expiry <= time.time():
+            with self._lock:
+                if self._current is current:
+                    logger.warning("AWS credentials expired before they were renewed, renewing them now")
+                    self.refresh()
+            current = self._current
+        return current
+
+    def refresh(self) -> AWSCredentials:
+        """Fetches new credentials, requests use them right away."""
+        # replacing the tuple is atomic, readers see either the old or the new credentials
+        self._current = self.fetch()
+        return self._current
+
+    def _run(self) -> None:
+        while True:
+            expiry = self._current.expiry
+            if expiry is None:
+                return
+            delay = max(expiry - self.margin - time.time(), self.retry_interval)
+            if self._stop.wait(delay):
+                return
+            previous = self._current
+            try:
+                current = self.refresh()
+                # credentials read again periodically, e.g. of botocore, only get a new expiry while they are unchanged
+                if current[:3] == previous[:3]:
+                    logger.debug("Renewed AWS credentials did not change, retrying in %ss", self.retry_interval)
+                else:
+                    logger.info("Renewed AWS credentials, valid until %s", current.expiry)
+            except Exception as e:
+                logger.warning("Renewing AWS credentials failed, retrying in %ss: %s", self.retry_interval, e)
+
+    def close(self) -> None:
+        """Stops the background renewal. Expired credentials are still renewed by the next `get`."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+
+# credentials shared by the signers and clients of one source, with the number of their users
+_shared: Dict[Hashable, Tuple[RefreshableCredentials, int]] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_credentials(key: Hashable, fetch: Callable[[], AWSCredentials]) -> RefreshableCredentials:
+    """
+    Returns the `RefreshableCredentials` of the credential source `key`, created with `fetch` on first use, so
+    signers and clients of the same source share one background renewal. Every call has to be paired with a
+    `release_credentials(key)`.
+    """
+    with _shared_lock:
+        entry = _shared.get(key)
+        credentials = entry[0] if entry is not None else RefreshableCredentials(fetch)
+        _shared[key] = (credentials, (entry[1] if entry is not None else 0) + 1)
+    return credentials
+
+
+def release_credentials(key: Hashable) -> None:
+    """Releases credentials of `shared_credentials`, the renewal of the last user is stopped."""
+    with _shared_lock:
+        entry = _shared.pop(key, None)
+        if entry is None:
+            return
+        credentials, users = entry
+        if users > 1:
+            _shared[key] = (credentials, users - 1)
+            return
+    credentials.close()
+
+
+def _is_refreshable(credentials: Any) -> bool:
+    from botocore.credentials import RefreshableCredentials as BotocoreRefreshableCredentials
+
+    return isinstance(credentials, BotocoreRefreshableCredentials)
+
+
+def _from_botocore(credentials: Any) -> AWSCredentials:
+    """
+    Reads botocore credentials. Refreshable ones, e.g. of instance profiles or SSO, are renewed by botocore within 15
+    minutes of their expiry when they are read.
+    """
+    frozen = credentials.get_frozen_credentials()
+    if not _is_refreshable(credentials):
+        return AWSCredentials(frozen.access_key, frozen.secret_key, frozen.token)
+    # botocore has no public expiry, the credentials are read again every `REFRESH_RETRY_INTERVAL` seconds and
+    # botocore renews them on such a read when they are about to expire
+    expiry = time.time() + REFRESH_MARGIN + REFRESH_RETRY_INTERVAL
+    return AWSCredentials(frozen.access_key, frozen.secret_key, frozen.token, expiry)
+
+
+def _botocore_source(credentials: Any) -> Hashable:
+    """Key of a botocore credential source for `shared_credentials`, the method and the current access key."""
+    return ("botocore", credentials.method, credentials.get_frozen_credentials().access_key)
+
+
+def refreshable_boto3_session(credentials: RefreshableCredentials, **session_kwargs):
+    """
+    Creates a boto3 Session whose clients sign requests with `credentials`, so they keep their connection pools while
+    the credentials are renewed in the background.
+    """
+    boto3 = _import_boto3()
+    if boto3 is None:
+        raise ImportError("boto3 is required, install it with `pip install easyllm[bedrock]`")
+    import botocore.session
+    from botocore.credentials import CredentialProvider, Credentials, ReadOnlyCredentials
+
+    # newer botocore versions add fields, e.g. `account_id`
+    missing = (None,) * (len(ReadOnlyCredentials._fields) - 3)
+
+    class _Credentials(Credentials):
+        # botocore reads the frozen credentials for every request it signs
+        method = "easyllm-refreshable"
+
+        account_id = None
+
+        def __init__(self):
+            pass
+
+        @property
+        def access_key(self):
+            return credentials.get().access_key
+
+        @property
+        def secret_key(self):
+            return credentials.get().secret_key
+
+        @property
+        def token(self):
+            return credentials.get().token
+
+        def get_frozen_credentials(self):
+            current = credentials.get()
+            return ReadOnlyCredentials(current.access_key, current.secret_key, current.token, *missing)
+
+    class _Provider(CredentialProvider):
+        METHOD = "easyllm-refreshable"
+
+        def load(self):
+            return _Credentials()
+
+    botocore_session = botocore.session.Session(profile=session_kwargs.pop("profile_name", None))
+    botocore_session.get_component("credential_provider").insert_before("env", _Provider())
+    return boto3.Session(botocore_session=botocore_session, **session_kwargs)
+
+
+def _import_boto3():
+    """Imports boto3 on first use, it adds ~100ms to the import time of easyllm otherwise."""
+    try:
+        import boto3
+    except ImportError:
+        return None
+    return boto3
+
+
 class AWSSigV4(AuthBase):
     def __init__(self, service, **kwargs):
         """Create authentication mechanism
 
+        Credentials and region are resolved lazily on the first request (or `resolve()`), so creating the object
+        does not open a boto3 Session.
+
         :param service: AWS Service identifier, for example `ec2`.  This is required.
         :param region:  AWS Region, for example `us-east-1`.  If not provided, it will be set using
             the environment variables `AWS_DEFAULT_REGION` or using boto3, if available.
         :param session: If boto3 is available, will attempt to get credentials using boto3,
             unless passed explicitly.  If using boto3, the provided session will be used or a new
-            session will be created.
+            session will be created. Refreshable credentials of the session, e.g. of an assumed role
+            or an instance profile, are renewed in the background before they expire.
+        :param credentials: `RefreshableCredentials` used instead of the credentials above. They are
+            not closed by `close()`.
 
         """
         # Set Service
         self.service = service
-
+        self._kwargs = kwargs
+        self._resolved = False
+        self._lock = threading.Lock()
+        self._region = None
+        # releases the shared credentials of the boto3 session, when closed or garbage collected
+        self._release: Optional[weakref.finalize] = None
+
+    @property
+    def region(self) -> str:
+        self.resolve()
+        return self._region
+
+    def resolve(self) -> None:
+        """Resolves credentials and region, only the first call has an effect."""
+        if self._resolved:
+            return
+        with self._lock:
+            if not self._resolved:
+                self._resolve(self._kwargs)
+                self._resolved = True
+
+    def close(self) -> None:
+        """Releases the credentials of the boto3 session, stopping their renewal if no other signer uses them."""
+        if self._release is not None:
+            self._release()
+
+    @property
+    def credentials(self) -> AWSCredentials:
+        """The current credentials, renewed in the background if they expire."""
+        self.resolve()
+        return self._credentials.get()
+
+    @property
+    def aws_access_key_id(self) -> str:
+        return self.credentials.access_key
+
+    @property
+    def aws_secret_access_key(self) -> str:
+        return self.credentials.secret_key
+
+    @property
+    def aws_session_token(self) -> Optional[str]:
+        return self.credentials.token
+
+    def _resolve(self, kwargs) -> None:
+        session = None
+        self._credentials = kwargs.get("credentials")
         # First, get credentials passed explicitly
-        self.aws_access_key_id = kwargs.get("aws_access_key_id")
-        self.aws_secret_access_key = kwargs.get("aws_secret_access_key")
-        self.aws_session_token = kwargs.get("aws_session_token")
+        aws_access_key_id = kwargs.get("aws_access_key_id")
+        aws_secret_access_key = kwargs.get("aws_secret_access_key")
+        aws_session_token = kwargs.get("aws_session_token")
         # Next, try environment variables or use boto3
-        if self.aws_access_key_id is None or self.aws_secret_access_key is None:
+        if self._credentials is not None:
+            pass
+        elif aws_access_key_id is None or aws_secret_access_key is None:
+            boto3 = _import_boto3()
             if boto3 is not None:
                 # Setup Session
                 if "session" in kwargs:
-                    if type(kwargs["session"]) == boto3.Session:
+                    if isinstance(kwargs["session"], boto3.Session):
                         session = kwargs["session"]
                     else:
                         raise ValueError("Session must be boto3.Session, {} invalid, ".format(type(kwargs["session"])))
@@ -68,31 +325,36 @@ class AWSSigV4(AuthBase):
                         "No credentials found in boto3 session, please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables or configure boto3 session"
                     )
                 logger.debug("Got credential from boto3 session")
-                self.aws_access_key_id = cred.access_key
-                self.aws_secret_access_key = cred.secret_key
-                self.aws_session_token = cred.token
-                self.region = session.region_name
-                logger.debug("Got region from boto3 session")
+                key = _botocore_source(cred)
+                self._credentials = shared_credentials(key, lambda: _from_botocore(cred))
+                self._release = weakref.finalize(self, release_credentials, key)
             else:
                 logger.debug("Checking environment for credentials")
-                self.aws_access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
-                self.aws_secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
-                self.aws_session_token = os.environ.get("AWS_SESSION_TOKEN") or os.environ.get("AWS_SECURITY_TOKEN")
-        # Last, fail if still not found
-        if self.aws_access_key_id is None or self.aws_secret_access_key is None:
-            raise KeyError(
-                "AWS Access Key ID and Secret Access Key are required, please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables"
-            )
+                aws_access_key_id = os.environ.get("AWS_ACCESS_KEY_ID")
+                aws_secret_access_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
+                aws_session_token = os.environ.get("AWS_SESSION_TOKEN") or os.environ.get("AWS_SECURITY_TOKEN")
+        if self._credentials is None:
+            # Last, fail if still not found
+            if aws_access_key_id is None or aws_secret_access_key is None:
+                raise KeyError(
+                    "AWS Access Key ID and Secret Access Key are required, please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables"
+                )
+            static = AWSCredentials(aws_access_key_id, aws_secret_access_key, aws_session_token)
+            self._credentials = RefreshableCredentials(lambda: static)
 
         # Get Region passed explicitly
-        self.region = kwargs.get("region")
+        region = kwargs.get("region")
         # Next, try environment variables or use boto3
-        if self.region is None:
+        if region is None:
             logger.debug("Checking environment for region")
-            self.region = os.environ.get("AWS_DEFAULT_REGION") or os.environ.get("AWS_REGION")
+            region = os.environ.get("AWS_DEFAULT_REGION") or os.environ.get("AWS_REGION")
+        if region is None and session is not None:
+            logger.debug("Got region from boto3 session")
+            region = session.region_name
         # Last, fail if not found
-        if self.region is None:
+        if region is None:
             raise KeyError("Region is required, please set AWS_DEFAULT_REGION or AWS_REGION environment variable")
+        self._region = region
 
     def __call__(self, r: PreparedRequest) -> PreparedRequest:
         """Called to add authentication information to request
@@ -102,6 +364,9 @@ class AWSSigV4(AuthBase):
         :returns: `requests.models.PreparedRequest`, modified to add authentication
 
         """
+        self.resolve()
+        # read once, so a renewal in the background does not mix keys of different credentials
+        credentials = self._credentials.get()
         # Create a date for headers and the credential string
         t = datetime.utcnow()
         self.amzdate = t.strftime("%Y%m%dT%H%M%SZ")
@@ -133,8 +398,8 @@ class AWSSigV4(AuthBase):
         if "User-Agent" not in r.headers:
             r.headers["User-Agent"] = "python-requests/{} auth-aws-sigv4/{}".format(requests_version, __version__)
         r.headers["X-AMZ-Date"] = self.amzdate
-        if self.aws_session_token is not None:
-            r.headers["x-amz-security-token"] = self.aws_session_token
+        if credentials.token is not None:
+            r.headers["x-amz-security-token"] = credentials.token
 
         # Task 1: Create Canonical Request
         # Ref: http://docs.aws.amazon.com/general/latest/gr/sigv4-create-canonical-request.html
@@ -185,7 +450,7 @@ class AWSSigV4(AuthBase):
         logger.debug("String-to-Sign: '%s'", string_to_sign)
 
         # Task 3: Calculate Signature
-        k_date = sign_msg(("AWS4" + self.aws_secret_access_key).encode("utf-8"), self.datestamp)
+        k_date = sign_msg(("AWS4" + credentials.secret_key).encode("utf-8"), self.datestamp)
         k_region = sign_msg(k_date, self.region)
         k_service = sign_msg(k_region, self.service)
         k_signing = sign_msg(k_service, "aws4_request")
@@ -194,7 +459,7 @@ class AWSSigV4(AuthBase):
 
         # Task 4: Add signing information to request
         r.headers["Authorization"] = "AWS4-HMAC-SHA256 Credential={}/{}, SignedHeaders={}, Signature={}".format(
-            self.aws_access_key_id, credential_scope, signed_headers, signature
+            credentials.access_key, credential_scope, signed_headers, signature
         )
         logger.debug(
             "Returning Request: <PreparedRequest method=%s, url=%s, headers=%s, SignedHeaders=%s, Signature=%s",
@@ -214,6 +479,7 @@ def get_bedrock_client(
     aws_secret_access_key: Optional[str] = None,
     aws_session_token: Optional[str] = None,
     runtime: Optional[bool] = True,
+    endpoint_url: Optional[str] = None,
 ):
     """Create a boto3 client for Amazon Bedrock, with optional configuration overrides
 
@@ -221,12 +487,15 @@ def get_bedrock_client(
     ----------
     assumed_role :
         Optional ARN of an AWS IAM role to assume for calling the Bedrock service. If not
-        specified, the current active credentials will be used.
+        specified, the current active credentials will be used. Credentials of the role and
+        refreshable credentials of the session are renewed in the background before they expire.
     region :
         Optional name of the AWS Region in which the service should be called (e.g. "us-east-1").
         If not specified, AWS_REGION or AWS_DEFAULT_REGION environment variable will be used.
     runtime :
         Optional choice of getting different client to perform operations with the Amazon Bedrock service.
+    endpoint_url :
+        Optional url overriding the Amazon Bedrock endpoint, e.g. a local mock server.
     """
     if region is None:
         target_region = os.environ.get("AWS_REGION", os.environ.get("AWS_DEFAULT_REGION"))
@@ -240,23 +509,48 @@ def get_bedrock_client(
     if profile_name:
         session_kwargs["profile_name"] = profile_name
 
+    boto3 = _import_boto3()
+    if boto3 is None:
+        raise ImportError("boto3 is required for Amazon Bedrock, install it with `pip install easyllm[bedrock]`")
+    from botocore.config import Config
+
     retry_config = Config(
         region_name=target_region,
+        connect_timeout=DEFAULT_CONNECT_TIMEOUT,
+        read_timeout=DEFAULT_READ_TIMEOUT,
         retries={
             "max_attempts": 10,
             "mode": "standard",
         },
     )
     session = boto3.Session(**session_kwargs)
+    # credential source whose renewal is shared, see `shared_credentials`
+    source = None
 
     if assumed_role:
-        logger.info(f"  Using role: {assumed_role}", end="")
+        logger.info("Using role: %s", assumed_role)
         sts = session.client("sts")
-        response = sts.assume_role(RoleArn=str(assumed_role), RoleSessionName="llm-bedrock")
-        logger.info(" ... successful!")
-        client_kwargs["aws_access_key_id"] = response["Credentials"]["AccessKeyId"]
-        client_kwargs["aws_secret_access_key"] = response["Credentials"]["SecretAccessKey"]
-        client_kwargs["aws_session_token"] = response["Credentials"]["SessionToken"]
+
+        def assume_role() -> AWSCredentials:
+            response = sts.assume_role(RoleArn=str(assumed_role), RoleSessionName="llm-bedrock")
+            logger.info("Assumed role %s", assumed_role)
+            c = response["Credentials"]
+            return AWSCredentials(
+                c["AccessKeyId"], c["SecretAccessKey"], c["SessionToken"], c["Expiration"].timestamp()
+            )
+
+        # the role is assumed again before its credentials expire, the client keeps its connections
+        base = session.get_credentials()
+        source = ("assume_role", str(assumed_role), _botocore_source(base) if base is not None else None)
+        session = refreshable_boto3_session(shared_credentials(source, assume_role), **session_kwargs)
+    elif aws_access_key_id is None or aws_secret_access_key is None:
+        chain = session.get_credentials()
+        if chain is not None and _is_refreshable(chain):
+            # e.g. instance profiles or SSO, renewed in the background instead of on the request path
+            source = _botocore_source(chain)
+            session = refreshable_boto3_session(
+                shared_credentials(source, lambda: _from_botocore(chain)), **session_kwargs
+            )
     else:
         client_kwargs["aws_access_key_id"] = aws_access_key_id
         client_kwargs["aws_secret_access_key"] = aws_secret_access_key
@@ -267,7 +561,13 @@ def get_bedrock_client(
     else:
         service_name = "bedrock"
 
+    if endpoint_url:
+        client_kwargs["endpoint_url"] = endpoint_url
+
     bedrock_client = session.client(service_name=service_name, config=retry_config, **client_kwargs)
+    if source is not None:
+        # the renewal is shared with other clients of the source and stopped once they are all garbage collected
+        weakref.finalize(bedrock_client, release_credentials, source)
 
     logger.info("boto3 Bedrock client successfully created!")
     return bedrock_client
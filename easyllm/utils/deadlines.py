@@ -0,0 +1,112 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Tuple
+
+# seconds to open a connection and between two received bytes of a response, used when no deadline is set
+DEFAULT_CONNECT_TIMEOUT = 10.0
+DEFAULT_READ_TIMEOUT = 300.0
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a request can not finish before its deadline."""
+
+
+class Deadline:
+    """
+    Time budget of a request: `connect` and `read` bound each connection attempt and each read of the response,
+    `total` bounds the whole request including retries, waiting for a loading model and streaming. The timeouts of
+    every attempt are clamped to what remains of `total`.
+
+    Args:
+        total (`float`, *optional*, defaults to None): Seconds the request may take from now. Unbounded if not set.
+        connect (`float`, defaults to 10): Seconds to open a connection.
+        read (`float`, defaults to 300): Seconds to wait for data of the response, e.g. the next streamed token.
+    """
+
+    __slots__ = ("connect", "read", "expires")
+
+    def __init__(
+        self,
+        total: Optional[float] = None,
+        connect: float = DEFAULT_CONNECT_TIMEOUT,
+        read: float = DEFAULT_READ_TIMEOUT,
+    ):
+        self.connect = connect
+        self.read = read
+        # `time.monotonic()` at which the request expires
+        self.expires = time.monotonic() + total if total is not None else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left until the deadline, None if unbounded."""
+        if self.expires is None:
+            return None
+        return self.expires - time.monotonic()
+
+    def expired(self) -> bool:
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self) -> None:
+        """Raises `DeadlineExceeded` if the deadline passed."""
+        if self.expired():
+            raise DeadlineExceeded("Request deadline exceeded")
+
+    def timeout(self) -> Tuple[float, float]:
+        """Returns the `(connect, read)` timeout of the next attempt, as accepted by `requests`."""
+        remaining = self.remaining()
+        if remaining is None:
+            return self.connect, self.read
+        if remaining <= 0:
+            raise DeadlineExceeded("Request deadline exceeded")
+        return min(self.connect, remaining), min(self.read, remaining)
+
+    def child(
+        self, total: Optional[float] = None, connect: Optional[float] = None, read: Optional[float] = None
+    ) -> "Deadline":
+        """Returns a deadline for a part of this request, which never ends later and never has longer timeouts."""
+        child = Deadline(
+            total,
+            connect=min(connect, self.connect) if connect is not None else self.connect,
+            read=min(read, self.read) if read is not None else self.read,
+        )
+        if self.expires is not None and (child.expires is None or self.expires < child.expires):
+            child.expires = self.expires
+        return child
+
+
+NO_DEADLINE = Deadline()
+
+_current: ContextVar[Deadline] = ContextVar("easyllm_deadline", default=NO_DEADLINE)
+
+
+def current_deadline() -> Deadline:
+    """Returns the deadline of the request executed by the caller, only bounded by the default timeouts if unset."""
+    return _current.get()
+
+
+@contextmanager
+def deadline(
+    total: Optional[float] = None, connect: Optional[float] = None, read: Optional[float] = None
+) -> Iterator[Deadline]:
+    """
+    Sets the deadline of the client requests made in the block. Nested deadlines never extend the enclosing one.
+
+    Example:
+        ```python
+        with deadline(total=5, connect=1):
+            huggingface.ChatCompletion.create(messages=messages)
+        ```
+    """
+    with use_deadline(_current.get().child(total, connect, read)) as inner:
+        yield inner
+
+
+@contextmanager
+def use_deadline(value: Deadline) -> Iterator[Deadline]:
+    """Sets `value` as the deadline of the block, e.g. on a thread pool or inside a stream started by a request."""
+    token = _current.set(value)
+    try:
+        yield value
+    finally:
+        _current.reset(token)
@@ -0,0 +1,115 @@
+import base64
+import io
+from typing import Any, List, Optional, Sequence, Union
+
+from easyllm.utils.serialization import loads
+
+# "float" keeps the OpenAI default of python lists, "base64" matches OpenAI's little-endian float32 encoding and
+# "numpy"/"float32" return float32 numpy arrays
+ENCODING_FORMATS = ("float", "base64", "numpy", "float32")
+
+# binary response formats of embedding endpoints, npy arrays and raw little-endian float32 rows
+NPY_CONTENT_TYPE = "application/x-npy"
+FLOAT32_CONTENT_TYPE = "application/octet-stream"
+# prefers the binary formats, endpoints which do not support them answer with JSON
+BINARY_ACCEPT = f"{NPY_CONTENT_TYPE}, {FLOAT32_CONTENT_TYPE};q=0.9, application/json;q=0.5"
+
+
+def _import_numpy():
+    """Imports numpy on first use, it is only required for the binary encoding formats."""
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "numpy is required for the `numpy`, `float32` and `base64` encoding formats. "
+            "Install it with `pip install easyllm[numpy]`."
+        ) from e
+    return numpy
+
+
+def validate_encoding_format(encoding_format: str) -> None:
+    if encoding_format not in ENCODING_FORMATS:
+        raise ValueError(
+            f"encoding_format {encoding_format} is not supported. Supported formats are: {ENCODING_FORMATS}"
+        )
+
+
+def is_binary_embedding(content_type: Optional[str]) -> bool:
+    """Returns whether a response `Content-Type` is one of the binary embedding formats."""
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    return media_type in (NPY_CONTENT_TYPE, FLOAT32_CONTENT_TYPE)
+
+
+def decode_npy(content: bytes) -> Any:
+    """
+    Decodes a `.npy` document into a numpy array without copying the data, the array is a read-only view of `content`.
+    """
+    np = _import_numpy()
+    header = io.BytesIO(content)
+    version = np.lib.format.read_magic(header)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(header)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(header)
+    if dtype.hasobject:
+        raise ValueError("npy arrays of python objects are not supported")
+    array = np.frombuffer(content, dtype=dtype, count=int(np.prod(shape)), offset=header.tell())
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+def parse_embeddings(
+    content: Union[bytes, str],
+    keys: Sequence[str] = (),
+    content_type: Optional[str] = None,
+    rows: Optional[int] = None,
+) -> Any:
+    """
+    Parses an embeddings response body into a contiguous float32 matrix with one row per input. Binary bodies are
+    decoded without copying, so the matrix is read-only.
+
+    Args:
+        content (`Union[bytes, str]`): The response body. A JSON array of embeddings or an object holding it, an npy
+            array or raw little-endian float32 values.
+        keys (`Sequence[str]`, *optional*): Keys of a JSON object response that can hold the embeddings, e.g.
+            `("vectors", "embeddings")`, checked in order.
+        content_type (`str`, *optional*, defaults to None): The `Content-Type` of the response, JSON if not provided.
+        rows (`int`, *optional*, defaults to None): Number of embeddings in a raw float32 body, defaults to 1.
+    """
+    np = _import_numpy()
+    media_type = (content_type or "").split(";")[0].strip().lower()
+    if media_type == NPY_CONTENT_TYPE:
+        matrix = decode_npy(content)
+        if matrix.dtype != np.float32 or not matrix.flags["C_CONTIGUOUS"]:
+            matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        return np.atleast_2d(matrix)
+    if media_type == FLOAT32_CONTENT_TYPE:
+        if len(content) % 4:
+            raise ValueError(f"Embeddings response of {len(content)} bytes is not a float32 array")
+        return np.frombuffer(content, dtype="<f4").astype(np.float32, copy=False).reshape(rows or 1, -1)
+    parsed = loads(content)
+    if isinstance(parsed, dict):
+        parsed = next((parsed[key] for key in keys if key in parsed), None)
+        if parsed is None:
+            raise ValueError(f"Embeddings response has none of the keys {list(keys)}")
+    return np.atleast_2d(np.asarray(parsed, dtype=np.float32))
+
+
+def encode_embeddings(matrix: Any, encoding_format: str) -> List[Any]:
+    """
+    Converts a float32 matrix into one embedding per row in the requested encoding format. `numpy` and `float32`
+    rows are views into the same contiguous matrix.
+    """
+    validate_encoding_format(encoding_format)
+    if encoding_format == "float":
+        return matrix.tolist()
+    if encoding_format == "base64":
+        np = _import_numpy()
+        matrix = np.ascontiguousarray(matrix, dtype="<f4")
+        return [base64.b64encode(row.tobytes()).decode("ascii") for row in matrix]
+    return list(matrix)
+
+
+def decode_base64_embedding(embedding: str) -> Any:
+    """Decodes a base64 encoded embedding into a float32 numpy array."""
+    np = _import_numpy()
+    return np.frombuffer(base64.b64decode(embedding), dtype="<f4")
@@ -0,0 +1,331 @@
+import contextlib
+import gzip
+import threading
+import weakref
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from easyllm.utils.logging import setup_logger
+
+logger = setup_logger()
+
+# default number of pooled connections kept per upstream host
+DEFAULT_POOL_SIZE = 10
+
+# bodies smaller than this are sent uncompressed, gzip does not pay off for them
+GZIP_MIN_SIZE = 1024
+
+_pool_size = DEFAULT_POOL_SIZE
+_local = threading.local()
+
+
+def build_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Creates a `requests.Session` keeping up to `pool_size` connections alive per upstream host."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Returns a pooled `requests.Session` for the current thread. `requests.Session` is not guaranteed to be
+    thread-safe, so every thread gets its own session which keeps its connections alive between calls.
+    """
+    session = getattr(_local, "session", None)
+    if session is None or getattr(_local, "pool_size", None) != _pool_size:
+        session = build_session(_pool_size)
+        _local.session = session
+        _local.pool_size = _pool_size
+    return session
+
+
+def configure_http_pool(pool_size: Optional[int] = None) -> None:
+    """
+    Configures the connection pool size used for upstream requests of the clients. Sessions are re-created lazily
+    on the next request of each thread.
+
+    Args:
+        pool_size (`int`, *optional*, defaults to 10): The number of connections kept alive per upstream host.
+    """
+    global _pool_size
+    _pool_size = pool_size or DEFAULT_POOL_SIZE
+
+    # huggingface_hub keeps its own sessions, configure them to use the same pool size
+    from huggingface_hub import configure_http_backend
+
+    configure_http_backend(backend_factory=lambda: build_session(_pool_size))
+
+
+def _connection_pool(session: requests.Session, url: str) -> Any:
+    """The urllib3 pool `session` sends requests to `url` with."""
+    adapter = session.get_adapter(url)
+    get_connection = getattr(adapter, "get_connection_with_tls_context", None)
+    # the settings `Session.send` uses, including `REQUESTS_CA_BUNDLE` and proxies of the environment
+    settings = session.merge_environment_settings(url, {}, None, None, None)
+    if get_connection is not None:
+        # requests >= 2.32.2 keys its pools by the TLS settings of the request as well
+        request = requests.Request("GET", url).prepare()
+        return get_connection(request, settings["verify"], proxies=settings["proxies"], cert=settings["cert"])
+    return adapter.get_connection(url, settings["proxies"])
+
+
+def warm_connections(session: requests.Session, url: str, connections: int = 1) -> int:
+    """
+    Opens up to `connections` connections to the host of `url` in the pool of `session` ahead of the first request,
+    so DNS, TCP and TLS are not paid by live traffic. Connections already open in the pool are reused.
+
+    Returns:
+        `int`: The number of connections opened, 0 if the urllib3 version does not allow to fill its pools.
+    """
+    pool = _connection_pool(session, url)
+    # urllib3 has no public API to fill a pool, connections are checked out with its private `_get_conn`, connected
+    # and returned unused with `_put_conn`. Warming up is skipped if these internals changed.
+    get_conn, put_conn = getattr(pool, "_get_conn", None), getattr(pool, "_put_conn", None)
+    maxsize = getattr(getattr(pool, "pool", None), "maxsize", None)
+    if get_conn is None or put_conn is None or not isinstance(maxsize, int):
+        logger.warning("Skipping connection warm up, the pools of urllib3 %s can not be filled", urllib3.__version__)
+        return 0
+    checked_out = []
+    opened = 0
+    try:
+        for _ in range(min(connections, maxsize)):
+            conn = get_conn()
+            checked_out.append(conn)
+            if getattr(conn, "sock", None) is None:
+                conn.connect()
+                opened += 1
+    except (AttributeError, TypeError) as e:
+        logger.warning(
+            "Skipping connection warm up, the pools of urllib3 %s can not be filled: %s", urllib3.__version__, e
+        )
+    finally:
+        for conn in checked_out:
+            put_conn(conn)
+    return opened
+
+
+def gzip_body(data: bytes, headers: Dict[str, str], min_size: int = GZIP_MIN_SIZE) -> Tuple[bytes, Dict[str, str]]:
+    """
+    Compresses a request body of at least `min_size` bytes with gzip and returns it with the `Content-Encoding` header
+    added. Request signers, e.g. `AWSSigV4`, have to sign the returned bytes.
+    """
+    if len(data) < min_size:
+        return data, headers
+    return gzip.compress(data, compresslevel=6), {**headers, "Content-Encoding": "gzip"}
+
+
+def _import_httpx():
+    """Imports httpx on first use, it is only required for HTTP/2 and async requests."""
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError("httpx is not installed, install it with `pip install easyllm[http2]`") from None
+    return httpx
+
+
+class _StreamBody:
+    """Exposes an httpx response as the `raw` body of a `requests.Response`, so `iter_lines` and `close` work."""
+
+    def __init__(self, response: Any, on_close: Callable[[], None]):
+        self.response = response
+        self.on_close = on_close
+
+    def stream(self, chunk_size: Optional[int] = None, decode_content: bool = True) -> Iterator[bytes]:
+        httpx = _import_httpx()
+        try:
+            yield from self.response.iter_bytes()
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.ReadTimeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if not self.response.is_closed:
+            self.response.close()
+            self.on_close()
+
+    def release_conn(self) -> None:
+        self.close()
+
+
+def to_requests_response(
+    response: Any, stream: bool = False, on_close: Optional[Callable[[], None]] = None
+) -> requests.Response:
+    """
+    Wraps an httpx response as a `requests.Response`, so code written for requests, e.g. `hf_raise_for_status` or
+    `InferenceClient`, handles both transports. Without `stream` the body is read and the response closed.
+    `on_close` is called once the response is closed.
+    """
+    on_close = on_close or (lambda: None)
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.headers = CaseInsensitiveDict(response.headers)
+    converted.url = str(response.url)
+    converted.reason = response.reason_phrase
+    converted.encoding = response.encoding
+    if stream and response.status_code < 400:
+        converted.raw = _StreamBody(response, on_close)
+    else:
+        # error bodies are read right away, they are parsed for the error message
+        try:
+            converted._content = response.read()
+        finally:
+            # async responses were read and closed by the caller
+            if not response.is_closed:
+                response.close()
+            on_close()
+    return converted
+
+
+class _Shard:
+    """An httpx client and the number of its requests in flight."""
+
+    __slots__ = ("client", "in_flight")
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.in_flight = 0
+
+
+class HTTPXTransport:
+    """
+    Sends requests with httpx. With `http2`, concurrent requests to a host are multiplexed as streams over a few
+    HTTP/2 connections instead of holding one HTTP/1.1 connection each, which matters for many concurrent token
+    streams. `https` urls negotiate HTTP/2 and fall back to HTTP/1.1, cleartext `http` urls use HTTP/2 with prior
+    knowledge, which Text Generation Inference supports. The sync clients are shared by all threads, async clients are
+    created per event loop.
+
+    httpx runs at most `max_streams` streams on a connection and queues further requests instead of opening another
+    connection, so requests are spread over up to `max_connections` HTTP/2 connections, the least busy one first,
+    opening another one once every connection has `max_streams` streams in flight.
+
+    Args:
+        http2 (`bool`, defaults to True): Whether to use HTTP/2, requires the `h2` package.
+        max_connections (`int`, *optional*, defaults to None): Connections kept per host, defaults to the pool size
+            of `configure_http_pool`.
+        max_streams (`int`, defaults to 100): Streams in flight per HTTP/2 connection before another one is opened,
+            the limit of httpx and of most servers.
+    """
+
+    def __init__(self, http2: bool = True, max_connections: Optional[int] = None, max_streams: int = 100):
+        self.http2 = http2
+        self.max_connections = max_connections or _pool_size
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._shards: Dict[bool, List[_Shard]] = {}
+        self._async_shards: "weakref.WeakKeyDictionary[Any, Dict[bool, List[_Shard]]]" = weakref.WeakKeyDictionary()
+
+    def _create_client(self, cleartext: bool, is_async: bool) -> Any:
+        httpx = _import_httpx()
+        # HTTP/1.1 requests are not multiplexed, they are spread over the connections of a single client instead
+        limits = httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)
+        options = {"http1": not (self.http2 and cleartext), "http2": self.http2, "limits": limits, "timeout": None}
+        return httpx.AsyncClient(**options) if is_async else httpx.Client(**options)
+
+    def _acquire(self, url: str, is_async: bool) -> _Shard:
+        cleartext = url.startswith("http://")
+        with self._lock:
+            if is_async:
+                import asyncio
+
+                shards = self._async_shards.setdefault(asyncio.get_running_loop(), {}).setdefault(cleartext, [])
+            else:
+                shards = self._shards.setdefault(cleartext, [])
+            shard = min(shards, key=lambda s: s.in_flight, default=None)
+            max_shards = self.max_connections if self.http2 else 1
+            if shard is None or (shard.in_flight >= self.max_streams and len(shards) < max_shards):
+                shard = _Shard(self._create_client(cleartext, is_async))
+                shards.append(shard)
+            shard.in_flight += 1
+        return shard
+
+    def _release(self, shard: _Shard) -> None:
+        with self._lock:
+            shard.in_flight -= 1
+
+    def _request(self, client: Any, url: str, data: bytes, headers: Dict[str, str], timeout: Tuple[float, float]):
+        connect, read = timeout
+        timeout = _import_httpx().Timeout(connect=connect, read=read, write=read, pool=connect)
+        return client.build_request("POST", url, content=data, headers=headers, timeout=timeout)
+
+    def post(
+        self, url: str, data: bytes, headers: Dict[str, str], timeout: Tuple[float, float], stream: bool = False
+    ) -> requests.Response:
+        """
+        Sends a POST request and returns it as a `requests.Response`. Timeouts and connection errors are raised as
+        the exceptions of requests, so callers handle both transports the same way.
+
+        Args:
+            url (`str`): The url.
+            data (`bytes`): The request body.
+            headers (`Dict[str, str]`): The request headers.
+            timeout (`Tuple[float, float]`): The connect and read timeouts in seconds.
+            stream (`bool`, defaults to False): Whether to stream the response body with `iter_lines`.
+        """
+        httpx = _import_httpx()
+        shard = self._acquire(url, is_async=False)
+        try:
+            response = shard.client.send(self._request(shard.client, url, data, headers, timeout), stream=True)
+        except httpx.TimeoutException as e:
+            self._release(shard)
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            self._release(shard)
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        except BaseException:
+            self._release(shard)
+            raise
+        return to_requests_response(response, stream, on_close=lambda: self._release(shard))
+
+    @contextlib.asynccontextmanager
+    async def astream(
+        self, url: str, data: bytes, headers: Dict[str, str], timeout: Tuple[float, float]
+    ) -> AsyncIterator[Any]:
+        """
+        Async version of `post` yielding the `httpx.Response` with the unread body, which is closed on exit, e.g.
+        `async with transport.astream(...) as response: async for line in response.aiter_lines(): ...`.
+        """
+        httpx = _import_httpx()
+        shard = self._acquire(url, is_async=True)
+        try:
+            response = await shard.client.send(self._request(shard.client, url, data, headers, timeout), stream=True)
+            try:
+                yield response
+            finally:
+                await response.aclose()
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(str(e)) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        finally:
+            self._release(shard)
+
+    async def apost(self, url: str, data: bytes, headers: Dict[str, str], timeout: Tuple[float, float]) -> Any:
+        """Async version of `post` returning the `httpx.Response` with its body read."""
+        async with self.astream(url, data, headers, timeout) as response:
+            await response.aread()
+        return response
+
+    def close(self) -> None:
+        """Closes the connections of the sync clients."""
+        with self._lock:
+            shards, self._shards = self._shards, {}
+        for shard in [s for group in shards.values() for s in group]:
+            shard.client.close()
+
+    async def aclose(self) -> None:
+        """Closes the connections of the async clients of the running event loop."""
+        import asyncio
+
+        with self._lock:
+            shards = self._async_shards.pop(asyncio.get_running_loop(), {})
+        for shard in [s for group in shards.values() for s in group]:
+            await shard.client.aclose()
@@ -1,6 +1,11 @@
+import json
 import logging
 import os
+import random
 import sys
+from typing import Any, Optional, Set
+
+from easyllm.utils.tracing import Trace, TraceHook, add_hook, remove_hook
 
 
 def setup_logger() -> logging.Logger:
@@ -29,3 +34,104 @@ def setup_logger() -> logging.Logger:
         # datasets_logging.set_verbosity(log_level)
         # trfs_logging.set_verbosity(log_level)
         return logger
+
+
+_logger = logging.getLogger(__name__)
+# child of the shared logger with its own level, used by calls passing `debug=True`
+_debug_logger = logging.getLogger(f"{__name__}.debug")
+_debug_logger.setLevel(logging.DEBUG)
+
+_warned: Set[str] = set()
+
+
+def request_logger(debug: bool = False) -> logging.Logger:
+    """
+    Returns the logger of a single client call. `debug=True` returns a logger with level DEBUG instead of changing the
+    level of the shared logger, so debug output is limited to the call which asked for it.
+    """
+    return _debug_logger if debug else _logger
+
+
+def warn_once(logger: logging.Logger, key: str, msg: str, *args: Any) -> None:
+    """Logs a warning the first time `key` is seen in the process, later calls are a set lookup."""
+    if key in _warned:
+        return
+    _warned.add(key)
+    logger.warning(msg, *args)
+
+
+class RequestLogHook(TraceHook):
+    """
+    Tracing hook logging a sample of the client requests as one JSON object per line, with client, model, endpoint,
+    status, latency, time to first token, token counts and phase durations in milliseconds. The record is also
+    attached to the log record as `easyllm_request` for structured formatters. Prompts and responses are never logged.
+
+    Args:
+        sample_rate (`float`, defaults to 0.01): Fraction of successful requests to log.
+        log_errors (`bool`, defaults to True): Whether to log every failed request, regardless of `sample_rate`.
+        logger (`logging.Logger`, *optional*, defaults to None): The logger to use, defaults to
+            `easyllm.utils.logging.requests`.
+    """
+
+    def __init__(self, sample_rate: float = 0.01, log_errors: bool = True, logger: Optional[logging.Logger] = None):
+        if not 0 <= sample_rate <= 1:
+            raise ValueError(f"sample_rate must be between 0 and 1, got {sample_rate}")
+        self.sample_rate = sample_rate
+        self.log_errors = log_errors
+        self.logger = logger or logging.getLogger(f"{__name__}.requests")
+
+    def _sampled(self, trace: Trace) -> bool:
+        if trace.error is not None and self.log_errors:
+            return True
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def on_end(self, trace: Trace) -> None:
+        level = logging.INFO if trace.error is None else logging.WARNING
+        if not self._sampled(trace) or not self.logger.isEnabledFor(level):
+            return
+        record = {
+            "client": trace.client,
+            "operation": trace.operation,
+            "model": trace.model,
+            "endpoint": trace.endpoint,
+            "stream": trace.stream,
+            "status": trace.status,
+            "error": f"{type(trace.error).__name__}: {trace.error}" if trace.error is not None else None,
+            "latency_ms": _ms(trace.latency),
+            "ttft_ms": _ms(trace.ttft) if trace.operation != "embedding" else None,
+            "prompt_tokens": trace.prompt_tokens,
+            "completion_tokens": trace.completion_tokens,
+            "phases_ms": {name: _ms(end - start) for name, start, end in trace.phases},
+        }
+        self.logger.log(level, json.dumps(record), extra={"easyllm_request": record})
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+
+_request_log_hook: Optional[RequestLogHook] = None
+
+
+def enable_request_logging(
+    sample_rate: float = 0.01, log_errors: bool = True, logger: Optional[logging.Logger] = None
+) -> RequestLogHook:
+    """
+    Starts logging a sample of the client requests, see `RequestLogHook`. Replaces a previously enabled hook. Also
+    enabled on import when the `EASYLLM_LOG_SAMPLE_RATE` environment variable is set.
+    """
+    global _request_log_hook
+    disable_request_logging()
+    _request_log_hook = add_hook(RequestLogHook(sample_rate, log_errors, logger))
+    return _request_log_hook
+
+
+def disable_request_logging() -> None:
+    global _request_log_hook
+    if _request_log_hook is not None:
+        remove_hook(_request_log_hook)
+        _request_log_hook = None
+
+
+if os.environ.get("EASYLLM_LOG_SAMPLE_RATE"):
+    enable_request_logging(float(os.environ["EASYLLM_LOG_SAMPLE_RATE"]))
@@ -0,0 +1,313 @@
+import asyncio
+import math
+import threading
+from bisect import bisect_left
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from easyllm.utils.tracing import Trace, TraceHook, add_hook, remove_hook
+
+Labels = Tuple[str, ...]
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Metric:
+    """
+    Base class of the metrics. Every thread updates its own shard of values without locking, snapshots merge the
+    shards. Shards of finished threads are kept, so values never go backwards.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str]):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[Labels, Any]] = []
+        self._lock = threading.Lock()
+
+    def _values(self) -> Dict[Labels, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values: Dict[Labels, Any] = {}
+            with self._lock:
+                self._shards.append(values)
+            self._local.values = values
+            return values
+
+    def _items(self) -> List[Tuple[Labels, Any]]:
+        with self._lock:
+            shards = list(self._shards)
+        # copying a dict is atomic under the GIL, so a shard can be read while its thread updates it
+        return [item for shard in shards for item in list(shard.items())]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, labels: Labels, amount: float = 1) -> None:
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+    def snapshot(self) -> Dict[Labels, float]:
+        merged: Dict[Labels, float] = {}
+        for labels, value in self._items():
+            merged[labels] = merged.get(labels, 0) + value
+        return merged
+
+
+class Gauge(Counter):
+    """A value going up and down, e.g. requests in flight. `inc` and `dec` may happen on different threads."""
+
+    type = "gauge"
+
+    def dec(self, labels: Labels, amount: float = 1) -> None:
+        self.inc(labels, -amount)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str], buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, labels: Labels, value: float) -> None:
+        values = self._values()
+        state = values.get(labels)
+        if state is None:
+            # count per bucket, the last one is +Inf, followed by sum and count
+            state = values[labels] = [0] * (len(self.buckets) + 3)
+        state[bisect_left(self.buckets, value)] += 1
+        state[-2] += value
+        state[-1] += 1
+
+    def snapshot(self) -> Dict[Labels, Dict[str, Any]]:
+        """Returns the cumulative bucket counts, sum and count per label set."""
+        merged: Dict[Labels, List[float]] = {}
+        for labels, state in self._items():
+            total = merged.setdefault(labels, [0] * len(state))
+            for i, value in enumerate(list(state)):
+                total[i] += value
+        result = {}
+        for labels, state in merged.items():
+            cumulative, buckets = 0, {}
+            for bound, count in zip((*self.buckets, math.inf), state):
+                cumulative += count
+                buckets[bound] = cumulative
+            result[labels] = {"buckets": buckets, "sum": state[-2], "count": state[-1]}
+        return result
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class MetricsRegistry:
+    """Holds metrics by name and renders them in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif type(metric) is not cls:
+                raise ValueError(f"Metric {name} is already registered as a {metric.type}")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def snapshot(self) -> Dict[str, Dict[Labels, Any]]:
+        """Returns the current values of all metrics, keyed by metric name and label values."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def render(self) -> str:
+        """Renders all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for labels, value in sorted(metric.snapshot().items()):
+                if isinstance(metric, Histogram):
+                    names = (*metric.labelnames, "le")
+                    for bound, count in value["buckets"].items():
+                        formatted = _format_labels(names, (*labels, _format_value(bound)))
+                        lines.append(f"{metric.name}_bucket{formatted} {count}")
+                    formatted = _format_labels(metric.labelnames, labels)
+                    lines.append(f"{metric.name}_sum{formatted} {_format_value(value['sum'])}")
+                    lines.append(f"{metric.name}_count{formatted} {value['count']}")
+                else:
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class ClientMetrics(TraceHook):
+    """
+    Tracing hook maintaining request metrics of the clients, keyed by client module and model: requests, errors by
+    status, prompt and completion tokens, time to first token, latency and requests in flight.
+
+    Args:
+        registry (`MetricsRegistry`, *optional*, defaults to None): The registry to add the metrics to, defaults to
+            the global `REGISTRY`.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or REGISTRY
+        labels = ("client", "model")
+        self.requests = self.registry.counter(
+            "easyllm_requests_total", "Requests sent by the clients.", (*labels, "operation")
+        )
+        self.errors = self.registry.counter(
+            "easyllm_errors_total", "Failed requests by HTTP status or error type.", (*labels, "status")
+        )
+        self.prompt_tokens = self.registry.counter("easyllm_prompt_tokens_total", "Prompt tokens.", labels)
+        self.completion_tokens = self.registry.counter("easyllm_completion_tokens_total", "Completion tokens.", labels)
+        self.ttft = self.registry.histogram(
+            "easyllm_time_to_first_token_seconds", "Time to first token of completions.", labels
+        )
+        self.latency = self.registry.histogram(
+            "easyllm_request_duration_seconds", "Duration of requests, until the end of the stream.", labels
+        )
+        self.in_flight = self.registry.gauge("easyllm_requests_in_flight", "Requests in flight.", labels)
+
+    def on_start(self, trace: Trace) -> None:
+        labels = (trace.client, trace.model or "")
+        self.requests.inc((*labels, trace.operation))
+        self.in_flight.inc(labels)
+
+    def on_end(self, trace: Trace) -> None:
+        labels = (trace.client, trace.model or "")
+        self.in_flight.dec(labels)
+        if trace.error is not None:
+            status = str(trace.status) if trace.status else type(trace.error).__name__
+            self.errors.inc((*labels, status))
+        elif trace.operation != "embedding":
+            self.ttft.observe(labels, trace.ttft)
+        self.latency.observe(labels, trace.latency)
+        if trace.prompt_tokens:
+            self.prompt_tokens.inc(labels, trace.prompt_tokens)
+        if trace.completion_tokens:
+            self.completion_tokens.inc(labels, trace.completion_tokens)
+
+
+_client_metrics: Optional[ClientMetrics] = None
+
+
+def enable_metrics(registry: Optional[MetricsRegistry] = None) -> ClientMetrics:
+    """Starts maintaining client metrics in `registry` (defaults to `REGISTRY`) and returns the hook."""
+    global _client_metrics
+    if _client_metrics is None or _client_metrics.registry is not (registry or REGISTRY):
+        disable_metrics()
+        _client_metrics = add_hook(ClientMetrics(registry))
+    return _client_metrics
+
+
+def disable_metrics() -> None:
+    """Stops maintaining client metrics, the collected values are kept."""
+    global _client_metrics
+    if _client_metrics is not None:
+        remove_hook(_client_metrics)
+        _client_metrics = None
+
+
+def render_prometheus(registry: Optional[MetricsRegistry] = None) -> str:
+    """Returns a snapshot of all metrics in the Prometheus text exposition format."""
+    return (registry or REGISTRY).render()
+
+
+class MetricsServer:
+    """
+    Tiny HTTP server answering `GET /metrics` with the Prometheus text format, running on a background thread.
+
+    Args:
+        host (`str`, defaults to "127.0.0.1"): The host to bind to.
+        port (`int`, defaults to 9464): The port to bind to, use 0 to pick a free port.
+        registry (`MetricsRegistry`, *optional*, defaults to None): The registry to export, defaults to `REGISTRY`.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 9464, registry: Optional[MetricsRegistry] = None):
+        from easyllm.server.http import HTTPServer
+
+        self.registry = registry or REGISTRY
+        self.http = HTTPServer(self.handle, host=host, port=port)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    async def handle(self, request: Any) -> Any:
+        from easyllm.server.http import Response, error_response
+
+        if request.method == "GET" and request.path == "/metrics":
+            return Response(self.registry.render(), content_type=CONTENT_TYPE)
+        return error_response(404, f"Unknown route {request.path}")
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.http.host}:{self.http.port}/metrics"
+
+    def start(self) -> str:
+        """Starts the server on a background thread and returns the scrape url."""
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self.http.start())
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True, name="easyllm-metrics")
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self.http.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+
+def start_metrics_server(
+    host: str = "127.0.0.1", port: int = 9464, registry: Optional[MetricsRegistry] = None
+) -> MetricsServer:
+    """Enables client metrics and serves them for Prometheus on `http://<host>:<port>/metrics`."""
+    enable_metrics(registry)
+    server = MetricsServer(host, port, registry)
+    server.start()
+    return server
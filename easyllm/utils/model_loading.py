@@ -0,0 +1,241 @@
+import asyncio
+import threading
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from easyllm.utils import setup_logger
+from easyllm.utils.deadlines import current_deadline
+
+logger = setup_logger()
+
+# header making the Hugging Face Inference API hold a request until the model is loaded
+WAIT_FOR_MODEL_HEADER = "X-Wait-For-Model"
+# seconds between checks of async requests waiting for the poll of another request
+_ASYNC_WAIT_INTERVAL = 0.05
+
+
+class ModelLoadingTimeout(TimeoutError):
+    """Raised when a model was not loaded within `ModelLoadingWaiter.max_wait` seconds."""
+
+    def __init__(self, url: str, estimated_time: Optional[float]):
+        super().__init__(f"Model at {url} is still loading, estimated time {estimated_time}s")
+        self.url = url
+        self.estimated_time = estimated_time
+
+
+def loading_estimate(response: Any) -> Optional[float]:
+    """
+    Returns the `estimated_time` in seconds of a 503 response of a model being loaded, None for any other response.
+    """
+    if response.status_code != 503:
+        return None
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    if not isinstance(body, dict) or ("estimated_time" not in body and "loading" not in str(body.get("error"))):
+        return None
+    return float(body.get("estimated_time") or 0)
+
+
+class ModelLoadingWaiter:
+    """
+    Waits for models loaded on demand by the Hugging Face Inference API, which answers requests for a cold model with
+    a 503 and an `estimated_time`. The first request seeing the 503 polls the model, sleeping for the server's
+    estimate between attempts or, with `wait_for_model`, re-sending with `X-Wait-For-Model: true` so the server holds
+    it until the model is loaded. Concurrent requests for the same url wait for that poll instead of polling
+    themselves, and are sent once the model is loaded.
+
+    Args:
+        max_wait (`float`, defaults to 600): Seconds a request waits for the model before raising
+            `ModelLoadingTimeout`.
+        min_interval (`float`, defaults to 1): Lower bound of the sleep between polls.
+        max_interval (`float`, defaults to 30): Upper bound of the sleep between polls, in case the estimate is off.
+        wait_for_model (`bool`, defaults to False): Whether the polling request asks the server to hold it until the
+            model is loaded instead of sleeping between polls.
+    """
+
+    def __init__(
+        self,
+        max_wait: float = 600.0,
+        min_interval: float = 1.0,
+        max_interval: float = 30.0,
+        wait_for_model: bool = False,
+    ):
+        self.max_wait = max_wait
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.wait_for_model = wait_for_model
+        self._lock = threading.Lock()
+        self._polls: Dict[str, threading.Event] = {}
+
+    def is_loading(self, url: str) -> bool:
+        """Whether a request is currently polling the model at `url`."""
+        return url in self._polls
+
+    def request(self, url: str, send: Callable[[Dict[str, str]], Any]) -> Any:
+        """
+        Sends a request with `send`, which is called with extra headers and returns a `requests.Response`, waiting
+        while the model at `url` is being loaded. Returns the first response which is not a loading response. The
+        wait ends at the deadline of the request if it is earlier than `max_wait`.
+        """
+        deadline = time.monotonic() + self.max_wait
+        expires = current_deadline().expires
+        if expires is not None:
+            deadline = min(deadline, expires)
+        while True:
+            poll = self._polls.get(url)
+            if poll is not None:
+                # another request polls the model, wait for it instead of polling as well
+                if not poll.wait(timeout=max(0.0, deadline - time.monotonic())):
+                    raise ModelLoadingTimeout(url, None)
+                continue
+            response = send({})
+            estimated_time = loading_estimate(response)
+            if estimated_time is None:
+                return response
+            with self._lock:
+                poll = self._polls.get(url)
+                if poll is None:
+                    poll = self._polls[url] = threading.Event()
+                    break
+        try:
+            return self._poll(url, send, estimated_time, deadline)
+        finally:
+            with self._lock:
+                del self._polls[url]
+            poll.set()
+
+    async def arequest(self, url: str, send: Callable[[Dict[str, str]], Awaitable[Any]]) -> Any:
+        """
+        Async version of `request`, `send` is a coroutine function returning an `httpx.Response` whose body is read if
+        it is a 503. Async and sync requests for the same url share one poll.
+        """
+        deadline = time.monotonic() + self.max_wait
+        expires = current_deadline().expires
+        if expires is not None:
+            deadline = min(deadline, expires)
+        while True:
+            poll = self._polls.get(url)
+            if poll is not None:
+                # another request polls the model, checking its event does not block the event loop
+                while not poll.is_set():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ModelLoadingTimeout(url, None)
+                    await asyncio.sleep(min(_ASYNC_WAIT_INTERVAL, remaining))
+                continue
+            response = await send({})
+            estimated_time = loading_estimate(response)
+            if estimated_time is None:
+                return response
+            with self._lock:
+                poll = self._polls.get(url)
+                if poll is None:
+                    poll = self._polls[url] = threading.Event()
+                    break
+        try:
+            return await self._apoll(url, send, estimated_time, deadline)
+        finally:
+            with self._lock:
+                del self._polls[url]
+            poll.set()
+
+    async def _apoll(
+        self, url: str, send: Callable[[Dict[str, str]], Awaitable[Any]], estimated_time: float, deadline: float
+    ) -> Any:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ModelLoadingTimeout(url, estimated_time)
+            if self.wait_for_model:
+                logger.info("Model at %s is loading, waiting for it (estimated %.1fs)", url, estimated_time)
+                response = await send({WAIT_FOR_MODEL_HEADER: "true"})
+            else:
+                delay = min(max(estimated_time, self.min_interval), self.max_interval, remaining)
+                logger.info("Model at %s is loading, retrying in %.1fs", url, delay)
+                await asyncio.sleep(delay)
+                response = await send({})
+            next_estimate = loading_estimate(response)
+            if next_estimate is None:
+                return response
+            estimated_time = next_estimate
+
+    def _poll(self, url: str, send: Callable[[Dict[str, str]], Any], estimated_time: float, deadline: float) -> Any:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ModelLoadingTimeout(url, estimated_time)
+            if self.wait_for_model:
+                logger.info("Model at %s is loading, waiting for it (estimated %.1fs)", url, estimated_time)
+                response = send({WAIT_FOR_MODEL_HEADER: "true"})
+            else:
+                delay = min(max(estimated_time, self.min_interval), self.max_interval, remaining)
+                logger.info("Model at %s is loading, retrying in %.1fs", url, delay)
+                time.sleep(delay)
+                response = send({})
+            next_estimate = loading_estimate(response)
+            if next_estimate is None:
+                return response
+            estimated_time = next_estimate
+
+
+class KeepWarm:
+    """
+    Keeps serverless models loaded by pinging them every `interval` seconds on a background thread, e.g. only during
+    business hours so they are unloaded at night. Failed pings are logged.
+
+    Args:
+        client (`Any`): A client module or instance with a `ping(model)` method, e.g. `easyllm.clients.huggingface`.
+        models (`List[str]`): The models to keep loaded.
+        interval (`float`, defaults to 300): Seconds between pings of a model.
+        hours (`Tuple[int, int]`, defaults to (0, 24)): Local hours `[start, end)` during which models are pinged.
+        weekdays (`Sequence[int]`, defaults to all days): Days on which models are pinged, Monday is 0.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        models: List[str],
+        interval: float = 300.0,
+        hours: Tuple[int, int] = (0, 24),
+        weekdays: Sequence[int] = (0, 1, 2, 3, 4, 5, 6),
+    ):
+        self.client = client
+        self.models = list(models)
+        self.interval = interval
+        self.hours = hours
+        self.weekdays = tuple(weekdays)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def is_active(self, now: Optional[datetime] = None) -> bool:
+        """Whether models are pinged at `now`, defaults to the current local time."""
+        now = now or datetime.now()
+        return now.weekday() in self.weekdays and self.hours[0] <= now.hour < self.hours[1]
+
+    def ping_all(self) -> None:
+        for model in self.models:
+            try:
+                self.client.ping(model)
+            except Exception as e:
+                logger.warning("Keep warm ping of %s failed: %s", model, e)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if self.is_active():
+                self.ping_all()
+            self._stop.wait(self.interval)
+
+    def start(self) -> "KeepWarm":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="easyllm-keep-warm")
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
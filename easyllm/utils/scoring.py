@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "numpy is required for log-likelihood scoring. Install it with `pip install easyllm[numpy]`."
+        ) from e
+    return numpy
+
+
+def _token_field(token: Any, name: str) -> Any:
+    # TGI returns dictionaries, huggingface_hub parses them into dataclasses
+    return token[name] if isinstance(token, dict) else getattr(token, name)
+
+
+def _visible_length(text: str) -> int:
+    return len("".join(text.split()))
+
+
+def continuation_logprobs(prefill: Sequence[Any], continuation: str) -> List[float]:
+    """
+    Returns the logprobs of the prefill tokens covering `continuation`, the end of the scored text. Tokens are
+    aligned by their non-whitespace characters, so tokenizers that encode spaces differently (e.g. "▁") align as
+    well. A token spanning the boundary between context and continuation is counted to the continuation.
+
+    Args:
+        prefill (`Sequence[Any]`): The `details.prefill` tokens of a TGI response with `decoder_input_details`.
+        continuation (`str`): The scored continuation.
+    """
+    remaining = _visible_length(continuation)
+    logprobs = []
+    for token in reversed(prefill):
+        if remaining <= 0:
+            break
+        logprob = _token_field(token, "logprob")
+        if logprob is None:
+            raise ValueError("The continuation covers the first token of the input, which has no logprob")
+        logprobs.append(logprob)
+        remaining -= _visible_length(_token_field(token, "text"))
+    return logprobs[::-1]
+
+
+def pair_inputs(context: Union[str, List[str]], continuation: Union[str, List[str]]) -> List[Tuple[str, str]]:
+    """Pairs contexts with continuations, a single context is shared by all continuations (multiple choice)."""
+    contexts = [context] if isinstance(context, str) else list(context)
+    continuations = [continuation] if isinstance(continuation, str) else list(continuation)
+    if len(contexts) == 1:
+        contexts = contexts * len(continuations)
+    if len(contexts) != len(continuations):
+        raise ValueError(f"Got {len(contexts)} contexts but {len(continuations)} continuations")
+    if any(not ctx for ctx in contexts):
+        raise ValueError("Contexts must not be empty, the first token of an input has no logprob")
+    return list(zip(contexts, continuations))
+
+
+def build_scores(logprobs: List[List[float]], prompt_tokens: int, model: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Packs the continuation logprobs of each input into flat NumPy arrays. The logprobs of input `i` are
+    `logprobs[offsets[i]:offsets[i + 1]]`, see `split_logprobs`.
+    """
+    np = _import_numpy()
+    num_tokens = np.array([len(item) for item in logprobs], dtype=np.int32)
+    offsets = np.zeros(len(logprobs) + 1, dtype=np.int64)
+    np.cumsum(num_tokens, out=offsets[1:])
+    flat = np.fromiter((lp for item in logprobs for lp in item), dtype=np.float32, count=int(offsets[-1]))
+    return {
+        "object": "loglikelihood",
+        "model": model,
+        "sum": np.array([sum(item) for item in logprobs], dtype=np.float64),
+        "num_tokens": num_tokens,
+        "logprobs": flat,
+        "offsets": offsets,
+        "usage": {"prompt_tokens": prompt_tokens, "total_tokens": prompt_tokens},
+    }
+
+
+def split_logprobs(scores: Dict[str, Any]) -> List[Any]:
+    """Returns the per-token logprobs of each input of a `LogLikelihood.create` result as a list of arrays."""
+    np = _import_numpy()
+    return np.split(scores["logprobs"], scores["offsets"][1:-1])
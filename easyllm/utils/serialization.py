@@ -0,0 +1,71 @@
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+# JSON backend, "orjson" if it is installed else "json". Overridden by the `EASYLLM_JSON_BACKEND` environment variable
+# or `set_json_backend`
+backend = ""
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+_dumps: Callable[[Any], bytes]
+_loads: Callable[[Union[bytes, str]], Any]
+
+
+def _default(obj: Any) -> Any:
+    # numpy arrays and scalars, which orjson serializes natively
+    tolist = getattr(obj, "tolist", None)
+    if tolist is not None:
+        return tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _json_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=_default).encode("utf-8")
+
+
+def set_json_backend(name: Optional[str] = None) -> str:
+    """
+    Selects the JSON library used for request and response bodies of the clients and the gateway. orjson is ~3x
+    faster for large arrays of floats, e.g. embeddings.
+
+    Args:
+        name (`str`, *optional*, defaults to None): "orjson" or "json". Defaults to orjson if it is installed.
+
+    Returns:
+        `str`: The name of the selected backend.
+    """
+    global backend, _dumps, _loads
+    if name not in (None, "orjson", "json"):
+        raise ValueError(f"JSON backend {name} is not supported. Supported backends are: ['orjson', 'json']")
+    if name != "json":
+        try:
+            import orjson
+        except ImportError:
+            if name == "orjson":
+                raise ImportError("orjson is not installed, install it with `pip install orjson`") from None
+        else:
+            options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            _dumps = lambda obj: orjson.dumps(obj, default=_default, option=options)  # noqa: E731
+            _loads = orjson.loads
+            backend = "orjson"
+            return backend
+    _dumps = _json_dumps
+    _loads = json.loads
+    backend = "json"
+    return backend
+
+
+def dumps(obj: Any) -> bytes:
+    """Serializes `obj` to compact UTF-8 JSON bytes, which can be sent and signed without encoding them again."""
+    return _dumps(obj)
+
+
+def loads(content: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Parses a JSON document from bytes or a string, without decoding bytes first."""
+    if isinstance(content, memoryview):
+        content = bytes(content)
+    return _loads(content)
+
+
+set_json_backend(os.environ.get("EASYLLM_JSON_BACKEND") or None)
@@ -0,0 +1,42 @@
+from typing import Any, Dict, NoReturn
+
+import huggingface_hub
+from requests import HTTPError
+
+# the text generation types and errors of `InferenceClient` lived in the private
+# `huggingface_hub.inference._text_generation` before 0.22, which exports public `TextGenerationOutput` types instead
+LEGACY_TEXT_GENERATION = tuple(int(part) for part in huggingface_hub.__version__.split(".")[:2]) < (0, 22)
+
+
+def parse_text_generation(data: Dict[str, Any]) -> Any:
+    """Parses a Text Generation Inference response into the type `InferenceClient.text_generation` returns."""
+    if LEGACY_TEXT_GENERATION:
+        from huggingface_hub.inference._text_generation import TextGenerationResponse
+
+        return TextGenerationResponse(**data)
+    from huggingface_hub import TextGenerationOutput
+
+    return TextGenerationOutput.parse_obj_as_instance(data)
+
+
+def parse_text_generation_stream(data: Dict[str, Any]) -> Any:
+    """Parses an event of a Text Generation Inference stream into the type `InferenceClient` yields."""
+    if LEGACY_TEXT_GENERATION:
+        from huggingface_hub.inference._text_generation import TextGenerationStreamResponse
+
+        return TextGenerationStreamResponse(**data)
+    from huggingface_hub import TextGenerationStreamOutput
+
+    return TextGenerationStreamOutput.parse_obj_as_instance(data)
+
+
+def raise_text_generation_error(error: HTTPError) -> NoReturn:
+    """
+    Raises the error `InferenceClient.text_generation` raises for an error response, e.g. a `ValidationError` for a
+    TGI `error_type` of "validation". Newer versions only get the `HTTPError` of `hf_raise_for_status`.
+    """
+    if LEGACY_TEXT_GENERATION:
+        from huggingface_hub.inference._text_generation import raise_text_generation_error
+
+        raise_text_generation_error(error)
+    raise error
@@ -0,0 +1,354 @@
+import functools
+import inspect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+PHASES = ("validate", "build_prompt", "connect", "send", "first_token", "complete", "serialize")
+
+
+class TraceHook:
+    """
+    Base class of tracing hooks, receiving the phases of every client request. All methods are optional. Hooks are
+    called synchronously on the thread executing the request, so they should be cheap.
+    """
+
+    def on_start(self, trace: "Trace") -> None:
+        pass
+
+    def on_phase(self, trace: "Trace", phase: str, start: float, end: float) -> None:
+        pass
+
+    def on_end(self, trace: "Trace") -> None:
+        pass
+
+
+class Trace:
+    """
+    Timings of a single `create` call. Timestamps are `time.perf_counter()` values, `wall_start` is the epoch time of
+    `start` in nanoseconds for exporters.
+
+    Phases are recorded in order: `validate` (request schema), `build_prompt`, `connect` (client, session and
+    credentials), `send` (until the response stream opened), `first_token`, `complete` (until the full response
+    arrived) and `serialize` (building the response). Non-streaming requests have no `send` and `first_token` phases,
+    streaming requests no `serialize` phase.
+    """
+
+    __slots__ = (
+        "hooks",
+        "client",
+        "operation",
+        "model",
+        "endpoint",
+        "stream",
+        "start",
+        "wall_start",
+        "end",
+        "last",
+        "phases",
+        "prompt_tokens",
+        "completion_tokens",
+        "status",
+        "error",
+        "data",
+    )
+
+    def __init__(self, hooks: Tuple[TraceHook, ...], client: str, operation: str, model: Optional[str] = None):
+        self.hooks = hooks
+        self.client = client
+        self.operation = operation
+        self.model = model
+        self.endpoint: Optional[str] = None
+        self.stream = False
+        self.wall_start = time.time_ns()
+        self.start = self.last = time.perf_counter()
+        self.end: Optional[float] = None
+        self.phases: List[Tuple[str, float, float]] = []
+        self.prompt_tokens: Optional[int] = None
+        self.completion_tokens: Optional[int] = None
+        self.status: Optional[int] = None
+        self.error: Optional[BaseException] = None
+        # scratch space for hooks, e.g. an OpenTelemetry context
+        self.data: Dict[str, Any] = {}
+        for hook in hooks:
+            hook.on_start(self)
+
+    def phase(self, name: str) -> None:
+        """Ends the phase `name`, which started at the end of the previous phase."""
+        now = time.perf_counter()
+        start, self.last = self.last, now
+        self.phases.append((name, start, now))
+        for hook in self.hooks:
+            hook.on_phase(self, name, start, now)
+
+    def update(self, **attributes: Any) -> None:
+        """Sets attributes of the trace, e.g. `endpoint`, `status` or token counts."""
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+    def phase_end(self, name: str) -> Optional[float]:
+        """Returns the end of the first phase `name`, or None if it was not recorded."""
+        for phase, _, end in self.phases:
+            if phase == name:
+                return end
+        return None
+
+    @property
+    def ttft(self) -> Optional[float]:
+        """Time to first token in seconds, the latency for non-streaming requests."""
+        end = self.phase_end("first_token") or self.end
+        return end - self.start if end is not None else None
+
+    @property
+    def latency(self) -> Optional[float]:
+        return self.end - self.start if self.end is not None else None
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        if self.end is not None:
+            return
+        self.end = time.perf_counter()
+        if error is not None:
+            self.error = error
+            if self.status is None:
+                self.status = error_status(error)
+        for hook in self.hooks:
+            hook.on_end(self)
+
+
+class _NoopTrace:
+    """Returned by `current_trace` when tracing is disabled, so instrumented code needs no checks."""
+
+    __slots__ = ()
+
+    def phase(self, name: str) -> None:
+        pass
+
+    def update(self, **attributes: Any) -> None:
+        pass
+
+
+NOOP_TRACE = _NoopTrace()
+
+_hooks: Tuple[TraceHook, ...] = ()
+_hooks_lock = threading.Lock()
+_current: ContextVar[Any] = ContextVar("easyllm_trace", default=NOOP_TRACE)
+
+
+def add_hook(hook: TraceHook) -> TraceHook:
+    """Registers a hook for the requests of all clients and returns it."""
+    global _hooks
+    with _hooks_lock:
+        # readers use the tuple without locking, it is replaced instead of mutated
+        _hooks = (*_hooks, hook)
+    return hook
+
+
+def remove_hook(hook: TraceHook) -> None:
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(h for h in _hooks if h is not hook)
+
+
+def current_trace() -> Any:
+    """Returns the trace of the request executed by the caller, a no-op trace if tracing is disabled."""
+    return _current.get()
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """Extracts the HTTP status code of a requests, huggingface_hub or botocore error, if any."""
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    if isinstance(status, int):
+        return status
+    if isinstance(response, dict):
+        return response.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return None
+
+
+def _has_content(chunk: Dict[str, Any]) -> bool:
+    choice = chunk["choices"][0]
+    delta = choice.get("delta")
+    if isinstance(delta, dict):
+        return bool(delta.get("content"))
+    return bool(choice.get("text"))
+
+
+def _traced_stream(trace: Trace, chunks: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    trace.stream = True
+    # time between `create` returning and the first read of the stream is spent by the caller
+    trace.last = time.perf_counter()
+    tokens = 0
+    opened = False
+    try:
+        for chunk in chunks:
+            if not opened:
+                opened = True
+                trace.phase("send")
+            if _has_content(chunk):
+                if tokens == 0:
+                    trace.phase("first_token")
+                tokens += 1
+            yield chunk
+        trace.phase("complete")
+    except BaseException as e:
+        trace.update(completion_tokens=tokens)
+        trace.finish(e if not isinstance(e, GeneratorExit) else None)
+        raise
+    trace.update(completion_tokens=tokens)
+    trace.finish()
+
+
+async def _atraced_stream(trace: Trace, chunks: AsyncIterator[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+    """Async version of `_traced_stream`."""
+    trace.stream = True
+    trace.last = time.perf_counter()
+    tokens = 0
+    opened = False
+    try:
+        async for chunk in chunks:
+            if not opened:
+                opened = True
+                trace.phase("send")
+            if _has_content(chunk):
+                if tokens == 0:
+                    trace.phase("first_token")
+                tokens += 1
+            yield chunk
+        trace.phase("complete")
+    except BaseException as e:
+        trace.update(completion_tokens=tokens)
+        trace.finish(e if not isinstance(e, GeneratorExit) else None)
+        raise
+    trace.update(completion_tokens=tokens)
+    trace.finish()
+
+
+def _finish_response(trace: Trace, result: Dict[str, Any]) -> Dict[str, Any]:
+    trace.phase("serialize")
+    usage = result.get("usage") or {}
+    trace.update(prompt_tokens=usage.get("prompt_tokens"), completion_tokens=usage.get("completion_tokens"))
+    trace.finish()
+    return result
+
+
+def traced(client: str, operation: str) -> Callable:
+    """
+    Decorates a `create` method so its requests are traced while hooks are registered. The method marks its phases on
+    `current_trace()`, streaming responses are traced until the stream is exhausted or closed. Coroutine methods, e.g.
+    `acreate`, are traced the same way and may return async iterators for streams.
+    """
+
+    def decorator(create: Callable) -> Callable:
+        parameters = list(inspect.signature(create).parameters)
+        model_position = parameters.index("model") if "model" in parameters else len(parameters)
+
+        def start(args, kwargs) -> Optional[Trace]:
+            hooks = _hooks
+            if not hooks:
+                return None
+            model = kwargs.get("model") if len(args) <= model_position else args[model_position]
+            return Trace(hooks, client, operation, model)
+
+        if inspect.iscoroutinefunction(create):
+
+            @functools.wraps(create)
+            async def async_wrapper(*args, **kwargs):
+                trace = start(args, kwargs)
+                if trace is None:
+                    return await create(*args, **kwargs)
+                token = _current.set(trace)
+                try:
+                    result = await create(*args, **kwargs)
+                except BaseException as e:
+                    trace.finish(e)
+                    raise
+                finally:
+                    _current.reset(token)
+                if not isinstance(result, dict):
+                    return _atraced_stream(trace, result)
+                return _finish_response(trace, result)
+
+            return async_wrapper
+
+        @functools.wraps(create)
+        def wrapper(*args, **kwargs):
+            trace = start(args, kwargs)
+            if trace is None:
+                return create(*args, **kwargs)
+            token = _current.set(trace)
+            try:
+                result = create(*args, **kwargs)
+            except BaseException as e:
+                trace.finish(e)
+                raise
+            finally:
+                _current.reset(token)
+            if not isinstance(result, dict):
+                return _traced_stream(trace, result)
+            return _finish_response(trace, result)
+
+        return wrapper
+
+    return decorator
+
+
+class OpenTelemetryHook(TraceHook):
+    """
+    Emits an OpenTelemetry span per request with a child span per phase. Spans are created when the request ended,
+    with the recorded timestamps, as children of the span active when the request started. Requires
+    `opentelemetry-api` and a configured tracer provider.
+
+    Args:
+        tracer (`Any`, *optional*, defaults to None): The tracer to use, defaults to `trace.get_tracer("easyllm")`.
+    """
+
+    def __init__(self, tracer: Any = None):
+        try:
+            from opentelemetry import context, trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryHook requires opentelemetry. Install it with `pip install opentelemetry-api`."
+            ) from e
+        self._context = context
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer("easyllm")
+
+    def _ns(self, trace: Trace, timestamp: float) -> int:
+        return trace.wall_start + int((timestamp - trace.start) * 1e9)
+
+    def on_start(self, trace: Trace) -> None:
+        trace.data["otel_context"] = self._context.get_current()
+
+    def on_end(self, trace: Trace) -> None:
+        attributes = {
+            "easyllm.client": trace.client,
+            "easyllm.operation": trace.operation,
+            "easyllm.stream": trace.stream,
+        }
+        for name, value in (
+            ("gen_ai.request.model", trace.model),
+            ("server.address", trace.endpoint),
+            ("gen_ai.usage.prompt_tokens", trace.prompt_tokens),
+            ("gen_ai.usage.completion_tokens", trace.completion_tokens),
+            ("http.response.status_code", trace.status),
+        ):
+            if value is not None:
+                attributes[name] = value
+        span = self.tracer.start_span(
+            f"easyllm.{trace.client}.{trace.operation}",
+            context=trace.data.get("otel_context"),
+            start_time=trace.wall_start,
+            attributes=attributes,
+        )
+        parent = self._trace.set_span_in_context(span)
+        for phase, start, end in trace.phases:
+            child = self.tracer.start_span(phase, context=parent, start_time=self._ns(trace, start))
+            child.end(end_time=self._ns(trace, end))
+        if trace.error is not None:
+            span.record_exception(trace.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(trace.error)))
+        span.end(end_time=self._ns(trace, trace.end))
@@ -0,0 +1,115 @@
+"""
+Sockets and latency of concurrent token streams over HTTP/1.1 and HTTP/2 against the local mock TGI server. The mock
+runs in its own process, so it does not compete with the client threads for the GIL.
+
+    python scripts/bench_http2.py --streams 200 --max-tokens 64 --modes sync-http1 sync-http2 async-http1 async-http2
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import socket
+import time
+
+import requests as http
+
+from easyllm.bench import run_benchmark
+from easyllm.bench.stats import RequestResult, build_report
+from easyllm.clients.huggingface import HuggingFaceClient
+from easyllm.server.mock import serve_mock
+from easyllm.utils.http import configure_http_pool
+
+
+def start_mock(**config):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    process = multiprocessing.Process(target=serve_mock, kwargs={"port": port, **config}, daemon=True)
+    process.start()
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            http.get(f"{url}/health", timeout=1)
+            return process, url
+        except http.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("mock server did not start")
+
+
+async def stream_async(client, request):
+    start = time.perf_counter()
+    ttft, last, itl, tokens = None, None, [], 0
+    try:
+        async for _chunk in await client.Completion.acreate(**request, stream=True):
+            now = time.perf_counter()
+            if last is None:
+                ttft = now - start
+            else:
+                itl.append(now - last)
+            last = now
+            tokens += 1
+    except Exception as e:
+        return RequestResult(start=start, latency=time.perf_counter() - start, error=type(e).__name__)
+    return RequestResult(
+        start=start, latency=time.perf_counter() - start, ttft=ttft, inter_token_latencies=itl, output_tokens=tokens
+    )
+
+
+def run_async(client, requests):
+    async def run():
+        begin = time.perf_counter()
+        results = await asyncio.gather(*(stream_async(client, request) for request in requests))
+        await client.transport().aclose()
+        return results, time.perf_counter() - begin
+
+    results, duration = asyncio.run(run())
+    return build_report(list(results), duration, client="huggingface", stream=True, concurrency=len(requests))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=200, help="Concurrent streams.")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--ttft", type=float, default=0.05)
+    parser.add_argument(
+        "--modes",
+        nargs="+",
+        choices=["sync-http1", "sync-http2", "async-http1", "async-http2"],
+        default=["sync-http1", "sync-http2", "async-http1", "async-http2"],
+    )
+    args = parser.parse_args()
+
+    # the sync HTTP/1.1 pool keeps a connection per stream instead of closing the ones above the default size
+    configure_http_pool(args.streams)
+    requests = [{"prompt": f"request {i}", "max_tokens": args.max_tokens} for i in range(args.streams)]
+    config = {"tokens_per_second": args.tokens_per_second, "ttft": args.ttft, "max_output_tokens": args.max_tokens}
+
+    print(f"{args.streams} concurrent streams of {args.max_tokens} tokens")
+    print(
+        f"{'mode':<14}{'sockets':>9}{'peak':>7}{'ttft p50':>10}{'ttft p99':>10}{'p50 (ms)':>10}{'p99 (ms)':>10}{'errors':>8}"
+    )
+    for mode in args.modes:
+        # a server per mode, so its connection counters only count the connections of the mode
+        process, url = start_mock(**config)
+        client = HuggingFaceClient(api_base=url, api_key="hf_bench", http2=mode.endswith("http2"))
+        try:
+            if mode.startswith("sync"):
+                report = run_benchmark(client, requests, concurrency=args.streams, stream=True)
+                client.transport().close()
+            else:
+                report = run_async(client, requests)
+            # the health check and this request opened a connection each
+            stats = http.get(f"{url}/stats").json()
+        finally:
+            process.terminate()
+            process.join()
+        print(
+            f"{mode:<14}{stats['connections_opened'] - 2:>9}{stats['peak_connections']:>7}"
+            f"{report.ttft.p50 * 1000:>10.1f}{report.ttft.p99 * 1000:>10.1f}"
+            f"{report.latency.p50 * 1000:>10.1f}{report.latency.p99 * 1000:>10.1f}{report.errors:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Recall and latency of the approximate IVF index against exact search on synthetic clustered embeddings.
+
+    python scripts/bench_index.py --size 1000000 --dim 384 --nlist 1024 --nprobe 1 4 16 64
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from easyllm.index import FlatIndex, IVFIndex
+
+
+def synthetic(size, dim, clusters, rng):
+    """Gaussian mixture, embeddings of real corpora are clustered by topic as well."""
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, size)]
+    vectors += 0.5 * rng.standard_normal((size, dim), dtype=np.float32)
+    return vectors
+
+
+def recall(found, truth):
+    return np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, truth)])
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=512)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--quantizer", choices=["int8", "pq"], nargs="+", default=["int8", "pq"])
+    parser.add_argument("--pq-m", type=int, default=None)
+    parser.add_argument("--train-samples", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = synthetic(args.size, args.dim, clusters=max(1, args.size // 100), rng=rng)
+    queries = vectors[rng.integers(0, args.size, args.queries)] + 0.3 * rng.standard_normal(
+        (args.queries, args.dim), dtype=np.float32
+    )
+
+    flat = FlatIndex(args.dim, capacity=args.size)
+    flat.add(vectors)
+    (_, truth), elapsed = timed(lambda: flat.search(queries, args.k))
+    print(f"{args.size} x {args.dim} vectors, {args.queries} queries, recall@{args.k}")
+    print(f"{'index':<16}{'nprobe':>8}{'recall':>10}{'ms/query':>12}{'bytes/vector':>14}")
+    print(f"{'flat':<16}{'-':>8}{1.0:>10.3f}{elapsed * 1000 / args.queries:>12.3f}{args.dim * 4:>14}")
+
+    for quantizer in args.quantizer:
+        index = IVFIndex(args.dim, nlist=args.nlist, quantizer=quantizer, pq_m=args.pq_m)
+        _, train_time = timed(lambda index=index: index.train(vectors, max_samples=args.train_samples))
+        _, add_time = timed(lambda index=index: index.add(vectors))
+        name = f"ivf-{quantizer}"
+        for nprobe in args.nprobe:
+            (_, ids), elapsed = timed(lambda index=index, nprobe=nprobe: index.search(queries, args.k, nprobe=nprobe))
+            per_query = elapsed * 1000 / args.queries
+            print(f"{name:<16}{nprobe:>8}{recall(ids, truth):>10.3f}{per_query:>12.3f}{index.code_size:>14}")
+        print(f"{'':<16}train {train_time:.1f}s, add {add_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
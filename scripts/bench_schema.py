@@ -0,0 +1,56 @@
+"""
+Compares validated and trusted construction of embedding responses.
+
+    python scripts/bench_schema.py --inputs 1000 --dim 1024
+"""
+import argparse
+import random
+import time
+
+from easyllm.schema.base import Usage, construct_object, dump_object
+from easyllm.schema.openai import EmbeddingsObjectResponse, EmbeddingsResponse
+
+
+def validated(vectors):
+    return EmbeddingsResponse(
+        data=[EmbeddingsObjectResponse(index=i, embedding=v) for i, v in enumerate(vectors)],
+        usage=Usage(prompt_tokens=len(vectors), total_tokens=len(vectors)),
+    )
+
+
+def constructed(vectors):
+    return construct_object(
+        EmbeddingsResponse,
+        data=[construct_object(EmbeddingsObjectResponse, index=i, embedding=v) for i, v in enumerate(vectors)],
+        usage=construct_object(Usage, prompt_tokens=len(vectors), total_tokens=len(vectors)),
+    )
+
+
+def timeit(fn, vectors, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        dump_object(fn(vectors))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    vectors = [[rng.random() for _ in range(args.dim)] for _ in range(args.inputs)]
+
+    slow = timeit(validated, vectors, args.repeat)
+    fast = timeit(constructed, vectors, args.repeat)
+    print(f"{args.inputs} x {args.dim} embeddings, build + dump_object (best of {args.repeat})")
+    print(f"validated:   {slow * 1000:8.2f} ms")
+    print(f"constructed: {fast * 1000:8.2f} ms ({slow / fast:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import json
+from types import ModuleType
+
+import pytest
+
+from easyllm.batch import load_checkpoint, run_batch
+
+
+class Crash(BaseException):
+    pass
+
+
+def fake_client(calls, crash_at=None):
+    class Completion:
+        @staticmethod
+        def create(prompt, model=None):
+            calls.append(prompt)
+            if prompt == crash_at:
+                raise Crash()
+            if prompt == "fail":
+                raise ConnectionError("upstream down")
+            return {"choices": [{"text": prompt.upper()}], "model": model, "usage": {"completion_tokens": 2}}
+
+    module = ModuleType("fake")
+    module.Completion = Completion
+    return module
+
+
+def write_requests(path, prompts):
+    with open(path, "w") as f:
+        for i, prompt in enumerate(prompts):
+            f.write(json.dumps({"custom_id": f"id-{i}", "prompt": prompt}) + "\n")
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_batch_writes_results_and_failures(tmp_path):
+    write_requests(tmp_path / "in.jsonl", ["a", "fail", "b", "c"])
+    calls = []
+    report = run_batch(
+        fake_client(calls), str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), concurrency=2, model="m"
+    )
+    assert (report.succeeded, report.failed, report.output_tokens) == (3, 1, 6)
+
+    results = sorted(read_jsonl(tmp_path / "out.jsonl"), key=lambda r: r["offset"])
+    assert [r["offset"] for r in results] == [0, 2, 3]
+    assert results[1]["custom_id"] == "id-2"
+    assert results[1]["response"]["choices"][0]["text"] == "B"
+    assert results[1]["response"]["model"] == "m"
+    (failure,) = read_jsonl(tmp_path / "out.failures.jsonl")
+    assert failure["offset"] == 1
+    assert failure["error"] == "ConnectionError"
+    assert failure["request"]["prompt"] == "fail"
+
+    # a finished job is not run again
+    report = run_batch(fake_client(calls), str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    assert report.requests == 0
+    assert len(calls) == 4
+
+
+def test_batch_ignores_stream_key(tmp_path):
+    with open(tmp_path / "in.jsonl", "w") as f:
+        f.write(json.dumps({"prompt": "a", "stream": True}) + "\n")
+    report = run_batch(fake_client([]), str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    assert (report.succeeded, report.failed, report.output_tokens) == (1, 0, 2)
+    (result,) = read_jsonl(tmp_path / "out.jsonl")
+    assert result["response"]["choices"][0]["text"] == "A"
+
+
+def test_batch_resumes_after_crash(tmp_path):
+    prompts = [f"p{i}" for i in range(50)]
+    write_requests(tmp_path / "in.jsonl", prompts)
+    args = (str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+
+    calls = []
+    with pytest.raises(Crash):
+        run_batch(fake_client(calls, crash_at="p30"), *args, concurrency=4, checkpoint_interval=0)
+    checkpoint = load_checkpoint(str(tmp_path / "out.jsonl.checkpoint"))
+    assert 0 < checkpoint.offset <= 30
+
+    resumed = []
+    report = run_batch(fake_client(resumed), *args, concurrency=4)
+    # only lines after the checkpoint are sent again, and every line has exactly one result
+    assert "p0" not in resumed
+    assert report.succeeded == len(resumed)
+    assert sorted(r["offset"] for r in read_jsonl(tmp_path / "out.jsonl")) == list(range(50))
+
+
+def test_batch_refuses_to_overwrite(tmp_path):
+    write_requests(tmp_path / "in.jsonl", ["a"])
+    (tmp_path / "out.jsonl").write_text("existing\n")
+    with pytest.raises(FileExistsError):
+        run_batch(fake_client([]), str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"))
+    report = run_batch(fake_client([]), str(tmp_path / "in.jsonl"), str(tmp_path / "out.jsonl"), overwrite=True)
+    assert report.succeeded == 1
+    assert len(read_jsonl(tmp_path / "out.jsonl")) == 1
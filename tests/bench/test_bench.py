@@ -0,0 +1,77 @@
+import time
+from types import ModuleType
+
+import pytest
+
+from easyllm.bench import run_benchmark
+from easyllm.bench.stats import percentile
+
+
+class ChatCompletion:
+    @staticmethod
+    def create(messages, stream=False):
+        if messages[-1]["content"] == "fail":
+            raise ConnectionError("upstream down")
+        chunks = [{"choices": [{"delta": {"role": "assistant"}}]}]
+        chunks += [{"choices": [{"delta": {"content": t}}]} for t in ["Hello", " ", "World"]]
+        chunks += [{"choices": [{"delta": {}, "finish_reason": "stop"}]}]
+        if stream:
+            return iter(chunks)
+        return {"choices": [], "usage": {"prompt_tokens": 1, "completion_tokens": 3, "total_tokens": 4}}
+
+
+class Completion:
+    @staticmethod
+    def create(prompt, stream=False):
+        time.sleep(0.001)
+        chunks = [{"choices": [{"text": "a"}]}, {"choices": [{"text": "b"}]}]
+        if prompt == "usage":
+            # e.g. OpenAI's `stream_options={"include_usage": True}`, several tokens per chunk
+            chunks.append({"choices": [], "usage": {"completion_tokens": 7}})
+        return iter(chunks)
+
+
+def fake_client():
+    module = ModuleType("fake")
+    module.ChatCompletion = ChatCompletion
+    module.Completion = Completion
+    return module
+
+
+@pytest.mark.parametrize(["q", "expected"], [(0, 1.0), (50, 2.5), (100, 4.0)])
+def test_percentile(q, expected):
+    assert percentile([4.0, 1.0, 3.0, 2.0], q) == pytest.approx(expected)
+
+
+def test_percentile_empty():
+    assert percentile([], 50) is None
+
+
+def test_closed_loop_benchmark():
+    requests = [{"messages": [{"role": "user", "content": "hi"}]}, {"prompt": "hi"}]
+    report = run_benchmark(fake_client(), requests, num_requests=10, concurrency=4)
+    assert report.requests == 10
+    assert report.errors == 0
+    assert report.output_tokens == 5 * 3 + 5 * 2
+    assert report.ttft.p50 is not None
+    assert report.inter_token_latency.p99 is not None
+
+
+def test_open_loop_benchmark_with_errors():
+    requests = [{"messages": [{"role": "user", "content": "fail"}]}, {"messages": [{"role": "user", "content": "hi"}]}]
+    report = run_benchmark(fake_client(), requests, num_requests=4, rate=1000, stream=False)
+    assert report.mode == "open-loop"
+    assert report.errors == 2
+    assert report.error_rate == 0.5
+    assert report.errors_by_type == {"ConnectionError": 2}
+    assert report.output_tokens == 6
+
+
+def test_stream_key_of_requests_and_reported_usage():
+    requests = [
+        {"messages": [{"role": "user", "content": "hi"}], "stream": False},
+        {"prompt": "usage", "stream": True},
+    ]
+    report = run_benchmark(fake_client(), requests, concurrency=2)
+    assert report.errors == 0
+    assert report.output_tokens == 3 + 7
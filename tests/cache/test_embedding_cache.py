@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from easyllm.cache import CachedEmbedding, EmbeddingCache  # noqa: E402
+
+
+class FakeEmbedding:
+    """Embeds a text as [len(text), 1, 0, 0] and records the inputs sent upstream."""
+
+    def __init__(self):
+        self.calls = []
+
+    def create(self, input, model=None, encoding_format="float"):
+        self.calls.append(list(input))
+        vectors = [np.array([len(text), 1, 0, 0], dtype=np.float32) for text in input]
+        return {
+            "data": [{"index": i, "embedding": v} for i, v in enumerate(vectors)],
+            "usage": {"prompt_tokens": len(input), "total_tokens": len(input)},
+        }
+
+
+def test_only_misses_are_sent_upstream(tmp_path) -> None:
+    upstream = FakeEmbedding()
+    embedding = CachedEmbedding(upstream, EmbeddingCache(tmp_path))
+
+    first = embedding.create(input=["a", "bb"], model="m")
+    second = embedding.create(input=["bb", "ccc", "a"], model="m")
+
+    assert upstream.calls == [["a", "bb"], ["ccc"]]
+    assert [item["embedding"][0] for item in second["data"]] == [2, 3, 1]
+    assert first["data"][0]["embedding"] == [1, 1, 0, 0]
+    assert second["usage"]["prompt_tokens"] == 1
+    assert embedding.cache.stats()["hit_rate"] == pytest.approx(2 / 5)
+
+
+def test_model_is_part_of_the_key(tmp_path) -> None:
+    upstream = FakeEmbedding()
+    embedding = CachedEmbedding(upstream, EmbeddingCache(tmp_path))
+    embedding.create(input="a", model="m1")
+    embedding.create(input="a", model="m2")
+    assert upstream.calls == [["a"], ["a"]]
+
+
+def test_persistence_and_partial_writes(tmp_path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    cache.put("m", ["a", "b"], np.eye(2, 3, dtype=np.float32))
+    cache.close()
+    # simulate a crash after the vector was written but before its key
+    with open(os.path.join(tmp_path, "vectors.f32"), "ab") as f:
+        f.write(np.ones(3, dtype=np.float32).tobytes())
+
+    cache = EmbeddingCache(tmp_path)
+    assert cache.dim == 3
+    assert len(cache) == 2
+    matrix, missing = cache.get("m", ["b", "c"])
+    assert missing == [1]
+    assert matrix[0].tolist() == [0, 1, 0]
+    with pytest.raises(ValueError):
+        EmbeddingCache(tmp_path, dim=4)
+
+
+def test_compact(tmp_path) -> None:
+    cache = EmbeddingCache(tmp_path)
+    cache.put("m", ["a", "b", "c"], np.arange(9, dtype=np.float32).reshape(3, 3))
+
+    assert cache.compact([("m", "c"), ("m", "a"), ("m", "unknown")]) == 1
+    assert len(cache) == 2
+    assert os.path.getsize(os.path.join(tmp_path, "vectors.f32")) == 2 * 3 * 4
+    matrix, missing = cache.get("m", ["a", "b", "c"])
+    assert missing == [1]
+    assert matrix[2].tolist() == [6, 7, 8]
+
+    cache.put("m", ["d"], np.ones((1, 3), dtype=np.float32))
+    assert EmbeddingCache(tmp_path).get("m", ["d"])[0][0].tolist() == [1, 1, 1]
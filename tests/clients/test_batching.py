@@ -0,0 +1,66 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from easyllm.clients.batching import EmbeddingBatcher
+
+
+class FakeEmbedding:
+    def __init__(self, delay=0.02, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def create(self, input, model=None, encoding_format="float"):
+        with self.lock:
+            self.batches.append((model, list(input)))
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream failed")
+        return {"data": [{"index": i, "embedding": [float(len(text)), 0.0]} for i, text in enumerate(input)]}
+
+
+def test_threads_are_batched() -> None:
+    upstream = FakeEmbedding()
+    texts = ["x" * i for i in range(1, 33)]
+    with EmbeddingBatcher(upstream, max_batch_size=8, max_wait_ms=20, max_concurrency=2) as batcher:
+        with ThreadPoolExecutor(32) as pool:
+            results = list(pool.map(batcher.embed, texts))
+
+    assert results == [[float(len(text)), 0.0] for text in texts]
+    assert len(upstream.batches) < len(texts)
+    assert all(len(batch) <= 8 for _, batch in upstream.batches)
+    assert batcher.inputs == len(texts)
+
+
+def test_asyncio_and_models() -> None:
+    upstream = FakeEmbedding()
+
+    async def run(batcher):
+        return await asyncio.gather(
+            batcher.acreate("a", model="m1"), batcher.acreate("bb", model="m2"), batcher.acreate("a", model="m1")
+        )
+
+    with EmbeddingBatcher(upstream, max_wait_ms=20) as batcher:
+        responses = asyncio.run(run(batcher))
+
+    assert [r["data"][0]["embedding"][0] for r in responses] == [1.0, 2.0, 1.0]
+    assert responses[1]["model"] == "m2"
+    # duplicate inputs are embedded once, each model gets its own request
+    assert sorted(upstream.batches) == [("m1", ["a"]), ("m2", ["bb"])]
+
+
+def test_errors_reach_every_caller() -> None:
+    with EmbeddingBatcher(FakeEmbedding(fail=True), max_wait_ms=20) as batcher:
+        futures = [batcher.submit(text) for text in ["a", "b"]]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="upstream failed"):
+                future.result()
+    with pytest.raises(RuntimeError):
+        batcher.embed("closed")
+    with pytest.raises(TypeError):
+        EmbeddingBatcher(FakeEmbedding()).submit(["a", "b"])
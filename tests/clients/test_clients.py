@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from easyllm.clients import client_name, huggingface, sagemaker
+from easyllm.clients.huggingface import HuggingFaceClient
+from easyllm.clients.sagemaker import SageMakerClient
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils import http as http_utils
+from easyllm.utils.http import build_session, warm_connections
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+@pytest.fixture()
+def mock_url():
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001, embedding_dim=8), port=0)
+    yield server.start_in_background()
+    server.stop()
+
+
+def test_huggingface_instances_are_isolated(mock_url):
+    llama = HuggingFaceClient(api_base=mock_url, prompt_builder="llama2", stop_sequences=["</s>"], seed=1)
+    vicuna = HuggingFaceClient(api_base=mock_url, prompt_builder="vicuna")
+
+    def call(client):
+        return client.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=3)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(call, [llama, vicuna] * 8))
+    assert all(res["usage"]["completion_tokens"] == 3 for res in results)
+
+    assert llama.get_inference_client(f"{mock_url}/m") is llama.get_inference_client(f"{mock_url}/m")
+    assert llama.get_inference_client(f"{mock_url}/m") is not vicuna.get_inference_client(f"{mock_url}/m")
+    assert llama._stop("STOP") == ["</s>", "STOP"] and llama.stop_sequences == ["</s>"]
+    assert huggingface.api_base != mock_url and huggingface.prompt_builder is None
+    assert client_name(llama) == "huggingface"
+
+    emb = llama.Embedding.create(input=["a", "b"], model="embedding-model")
+    assert len(emb["data"]) == 2
+
+
+def test_sagemaker_instance(mock_url):
+    client = SageMakerClient(api_base=f"{mock_url}/endpoints", prompt_builder="llama2", auth=lambda r: r, pool_size=2)
+
+    res = client.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=4)
+    assert res["usage"]["completion_tokens"] == 4
+    res = client.Completion.create(prompt="Hello", model="m", max_tokens=2)
+    assert res["usage"]["completion_tokens"] == 2
+    assert len(client.Embedding.create(input=["a", "b", "c"], model="e")["data"]) == 3
+    scores = client.LogLikelihood.create("The answer is", [" yes", " no"], model="m")
+    assert list(scores["num_tokens"]) == [1, 1]
+
+    session = client.get_session()
+    assert session is client.get_session() and session is not sagemaker.get_session()
+    assert client_name(client) == "sagemaker"
+
+
+def test_default_client_reads_module_configuration(mock_url, monkeypatch):
+    monkeypatch.setattr(huggingface, "api_base", mock_url)
+    monkeypatch.setattr(huggingface, "seed", 7)
+    monkeypatch.setattr(huggingface, "stop_sequences", ["</s>"])
+    default = huggingface.default_client
+    assert (default.api_base, default.seed, default.stop_sequences) == (mock_url, 7, ["</s>"])
+    assert huggingface.get_inference_client(mock_url) is default.get_inference_client(mock_url)
+
+    monkeypatch.setattr(sagemaker, "api_base", "http://sagemaker")
+    assert sagemaker.get_api_base() == sagemaker.default_client.get_api_base() == "http://sagemaker"
+
+
+def test_warm_connections(mock_url):
+    session = build_session(pool_size=4)
+    assert warm_connections(session, mock_url, connections=3) == 3
+    # open connections are reused, the pool holds at most `pool_size`
+    assert warm_connections(session, mock_url, connections=8) == 1
+    assert session.post(f"{mock_url}/m", json={"inputs": "a", "parameters": {"max_new_tokens": 1}}).ok
+
+
+def test_warmed_connections_are_used():
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001), port=0)
+    url = server.start_in_background()
+    try:
+        session = build_session(pool_size=2)
+        assert warm_connections(session, url, connections=2) == 2
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            body = {"inputs": "a", "parameters": {"max_new_tokens": 1}}
+            assert all(executor.map(lambda _: session.post(f"{url}/m", json=body).ok, range(4)))
+        # the requests were sent over the warmed connections
+        assert server.http.connections_opened == 2
+    finally:
+        server.stop()
+
+
+def test_warm_connections_without_urllib3_internals(mock_url, monkeypatch):
+    class Pool:
+        # a pool of a urllib3 version without `_get_conn` and `_put_conn`
+        pool = None
+
+    monkeypatch.setattr(http_utils, "_connection_pool", lambda session, url: Pool())
+    assert warm_connections(build_session(), mock_url, connections=2) == 0
+
+
+def test_client_warmup(mock_url):
+    client = HuggingFaceClient(api_base=mock_url, api_key="hf_test")
+    # both models are served by the same host, so they share the pool
+    assert client.warmup(["a", "b"], connections=2, ping=True) == {f"{mock_url}/a": 2, f"{mock_url}/b": 0}
+    assert not client._pings_by_default(f"{mock_url}/a")
+    assert HuggingFaceClient()._pings_by_default("https://api-inference.huggingface.co/models/gpt2")
+
+    client = SageMakerClient(api_base=f"{mock_url}/endpoints", auth=lambda r: r, pool_size=2)
+    assert client.warmup(["m"], connections=2, ping=True) == {f"{mock_url}/endpoints/m/invocations": 2}
@@ -0,0 +1,146 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from easyllm.clients.huggingface import HuggingFaceClient
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils.http import HTTPXTransport
+from easyllm.utils.model_loading import ModelLoadingWaiter
+from easyllm.utils.tracing import TraceHook, add_hook, remove_hook
+
+pytest.importorskip("httpx")
+pytest.importorskip("h2")
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+@pytest.fixture()
+def server():
+    server = MockServer(MockConfig(tokens_per_second=200, ttft=0.01), port=0)
+    server.start_in_background()
+    yield server
+    server.stop()
+
+
+def test_streams_share_one_connection(server):
+    client = HuggingFaceClient(api_base=server.url, api_key="hf_test", prompt_builder="llama2", http2=True)
+    res = client.ChatCompletion.create(messages=MESSAGES, max_tokens=3)
+    assert res["usage"]["completion_tokens"] == 3
+
+    def stream(i):
+        return list(client.Completion.create(prompt=f"request {i}", max_tokens=10, stream=True))
+
+    with ThreadPoolExecutor(max_workers=20) as executor:
+        streams = list(executor.map(stream, range(20)))
+    assert all(len(chunks) == 10 for chunks in streams)
+    assert server.http.connections_opened == 1
+    client.transport().close()
+
+
+def test_connections_are_added_when_streams_are_in_use(server):
+    client = HuggingFaceClient(api_base=server.url, api_key="hf_test", http2=True)
+    client._transports[True] = HTTPXTransport(max_connections=2, max_streams=2)
+
+    with ThreadPoolExecutor(max_workers=6) as executor:
+        results = list(executor.map(lambda i: client.Completion.create(prompt=str(i), max_tokens=5), range(6)))
+    assert all(res["usage"]["completion_tokens"] == 5 for res in results)
+    assert server.http.connections_opened == 2
+    client.transport().close()
+
+
+@pytest.mark.parametrize("http2", [True, False])
+def test_acreate(server, http2):
+    client = HuggingFaceClient(api_base=server.url, api_key="hf_test", prompt_builder="llama2", http2=http2)
+
+    async def run():
+        res = await client.ChatCompletion.acreate(messages=MESSAGES, max_tokens=4, n=2)
+        stream = await client.ChatCompletion.acreate(messages=MESSAGES, max_tokens=4, stream=True)
+        chunks = [chunk async for chunk in stream]
+
+        async def complete(i):
+            return [chunk async for chunk in await client.Completion.acreate(prompt=str(i), max_tokens=6, stream=True)]
+
+        completions = await asyncio.gather(*(complete(i) for i in range(10)))
+        await client.transport().aclose()
+        return res, chunks, completions
+
+    res, chunks, completions = asyncio.run(run())
+    assert res["usage"]["completion_tokens"] == 8 and len(res["choices"]) == 2
+    streamed = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+    assert streamed == res["choices"][0]["message"]["content"]
+    assert chunks[-1]["choices"][0]["finish_reason"] == "length"
+    assert all(len(chunks) == 6 for chunks in completions)
+    assert (server.http.connections_opened == 1) == http2
+
+
+def test_acreate_waits_for_loading_model():
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001, loading_time=0.3), port=0)
+    url = server.start_in_background()
+    waiter = ModelLoadingWaiter(min_interval=0.05)
+    client = HuggingFaceClient(api_base=url, api_key="hf_test", prompt_builder="llama2", model_loading=waiter)
+
+    async def run():
+        async def stream():
+            return [chunk async for chunk in await client.Completion.acreate(prompt="Hi", max_tokens=2, stream=True)]
+
+        results = await asyncio.gather(
+            *(client.ChatCompletion.acreate(messages=MESSAGES, max_tokens=2) for _ in range(3)),
+            *(stream() for _ in range(3)),
+        )
+        await client.transport().aclose()
+        return results
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        server.stop()
+    assert all(res["usage"]["completion_tokens"] == 2 for res in results[:3])
+    assert all(len(chunks) == 2 for chunks in results[3:])
+    # one request polls the loading model, the others wait for it
+    assert server.loading_responses <= 6 + 0.3 / 0.05 + 1
+
+
+def test_acreate_is_traced(server):
+    class Recorder(TraceHook):
+        def __init__(self):
+            self.traces = []
+
+        def on_end(self, trace):
+            self.traces.append(trace)
+
+    recorder = add_hook(Recorder())
+    client = HuggingFaceClient(api_base=server.url, api_key="hf_test", prompt_builder="llama2")
+
+    async def run():
+        await client.ChatCompletion.acreate(messages=MESSAGES, max_tokens=3)
+        stream = await client.Completion.acreate(prompt="Hi", model="m", max_tokens=4, stream=True)
+        chunks = [chunk async for chunk in stream]
+        await client.transport().aclose()
+        return chunks
+
+    try:
+        chunks = asyncio.run(run())
+    finally:
+        remove_hook(recorder)
+    chat, completion = recorder.traces
+    assert (chat.operation, chat.completion_tokens, chat.stream) == ("chat", 3, False)
+    assert [p for p, _, _ in chat.phases] == ["validate", "build_prompt", "connect", "complete", "serialize"]
+    assert (completion.operation, completion.model, completion.stream) == ("completion", "m", True)
+    assert completion.completion_tokens == len(chunks) == 4
+    assert completion.ttft <= completion.latency
+
+
+def test_errors_match_the_requests_transport():
+    from huggingface_hub.inference._text_generation import GenerationError
+
+    server = MockServer(MockConfig(error_rate=1.0), port=0)
+    url = server.start_in_background()
+    client = HuggingFaceClient(api_base=url, api_key="hf_test", http2=True)
+    try:
+        with pytest.raises(GenerationError):
+            client.Completion.create(prompt="Hello", max_tokens=2)
+        with pytest.raises(GenerationError):
+            asyncio.run(client.Completion.acreate(prompt="Hello", max_tokens=2))
+    finally:
+        server.stop()
@@ -0,0 +1,103 @@
+import inspect
+import threading
+import time
+
+import pytest
+
+from easyllm.clients import client_name
+from easyllm.clients.huggingface import HuggingFaceClient
+from easyllm.clients.scheduling import BATCH, RequestScheduler
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils.deadlines import DeadlineExceeded, current_deadline
+
+
+def test_interactive_requests_run_first():
+    order = []
+    release = threading.Event()
+    with RequestScheduler(max_concurrency=1, reserved=0) as scheduler:
+        blocked = scheduler.submit(release.wait, priority=BATCH)
+        futures = [scheduler.submit(order.append, f"batch-{i}", priority=BATCH) for i in range(3)]
+        futures.append(scheduler.submit(order.append, "interactive"))
+        futures.append(scheduler.submit(order.append, "urgent", timeout=30))
+        release.set()
+        for future in [blocked, *futures]:
+            future.result()
+    # requests with a deadline run before requests of the same priority without one
+    assert order == ["urgent", "interactive", "batch-0", "batch-1", "batch-2"]
+
+
+def test_reserved_threads_only_run_interactive_requests():
+    release = threading.Event()
+    with RequestScheduler(max_concurrency=2, reserved=1) as scheduler:
+        batch = [scheduler.submit(release.wait, 5, priority=BATCH) for _ in range(2)]
+        # one batch request runs, the other waits for the unreserved thread
+        assert scheduler.submit(lambda: "interactive").result(timeout=2) == "interactive"
+        assert not batch[1].running() or not batch[0].running()
+        release.set()
+        assert all(future.result() for future in batch)
+
+    with pytest.raises(ValueError):
+        RequestScheduler(max_concurrency=1, reserved=1)
+
+
+def test_requests_which_can_not_finish_in_time_are_dropped():
+    with RequestScheduler(max_concurrency=1, reserved=0) as scheduler:
+        scheduler.run(time.sleep, 0.2, name="slow")
+        assert scheduler.expected_latency("slow") >= 0.2
+        with pytest.raises(DeadlineExceeded):
+            scheduler.run(time.sleep, 0.2, name="slow", timeout=0.1)
+        assert scheduler.dropped == 1
+        # requests run with their deadline
+        expires = scheduler.run(lambda: current_deadline().expires, timeout=5)
+        assert expires is not None and expires > time.monotonic()
+
+
+def test_scheduled_client():
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001), port=0)
+    url = server.start_in_background()
+    try:
+        with RequestScheduler(max_concurrency=2) as scheduler:
+            client = scheduler.client(HuggingFaceClient(api_base=url, prompt_builder="llama2"), timeout=10)
+            res = client.ChatCompletion.create(messages=[{"role": "user", "content": "Hello!"}], max_tokens=2)
+            assert res["usage"]["completion_tokens"] == 2
+            assert client_name(client) == "huggingface" and client.prompt_builder == "llama2"
+            assert "messages" in inspect.signature(client.ChatCompletion.create).parameters
+            assert scheduler.expected_latency("huggingface.ChatCompletion") > 0
+    finally:
+        server.stop()
+
+
+def test_streams_hold_their_thread():
+    read = []
+
+    def stream(n):
+        for i in range(n):
+            time.sleep(0.01)
+            read.append(i)
+            yield i
+
+    with RequestScheduler(max_concurrency=1, reserved=0) as scheduler:
+        chunks = scheduler.run(stream, 3, name="stream")
+        # the stream occupies the only thread until it is read to the end
+        other = scheduler.submit(lambda: "other")
+        assert next(chunks) == 0
+        assert not other.done()
+        assert list(chunks) == [1, 2]
+        assert other.result(timeout=2) == "other"
+        assert scheduler.expected_latency("stream") >= 0.03
+
+        # closing a stream stops reading it and releases the thread
+        chunks = scheduler.run(stream, 1000)
+        next(chunks)
+        chunks.close()
+        assert scheduler.run(lambda: "after close", timeout=2) == "after close"
+        assert len(read) < 3 + 1000
+
+        def failing():
+            yield 1
+            raise ConnectionError("upstream down")
+
+        chunks = scheduler.run(failing)
+        assert next(chunks) == 1
+        with pytest.raises(ConnectionError):
+            next(chunks)
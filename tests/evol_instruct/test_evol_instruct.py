@@ -0,0 +1,99 @@
+import threading
+from types import ModuleType
+
+import pytest
+
+from easyllm.evol_instruct import (
+    EvolInstruct,
+    EvolutionFilter,
+    ResponseFilter,
+    build_evolution_prompt,
+    clean_instruction,
+    completed_rounds,
+    load_round,
+    read_dataset,
+)
+
+
+def fake_client(calls):
+    lock = threading.Lock()
+
+    class ChatCompletion:
+        @staticmethod
+        def create(messages, model=None, **kwargs):
+            content = messages[0]["content"]
+            with lock:
+                calls.append(content)
+            if "#Rewritten Prompt#:" in content or "#Created Prompt#:" in content:
+                instruction = content.split("Given Prompt#:\n", 1)[1].split("\n#", 1)[0]
+                if "fail" in instruction:
+                    answer = "#Rewritten Prompt#: The given prompt cannot be rewritten."
+                else:
+                    answer = f"#Rewritten Prompt#:\n{instruction} in detail"
+            elif "refuse" in content:
+                answer = "Sorry, I can not answer that."
+            else:
+                answer = f"Here is a thorough answer to: {content}"
+            return {"choices": [{"message": {"role": "assistant", "content": answer}}]}
+
+    module = ModuleType("fake")
+    module.ChatCompletion = ChatCompletion
+    return module
+
+
+def test_prompts_and_filters():
+    assert "Explain gravity" in build_evolution_prompt("Explain gravity", "constraints")
+    assert "#Created Prompt#" in build_evolution_prompt("Explain gravity", "breadth")
+    with pytest.raises(ValueError):
+        build_evolution_prompt("Explain gravity", "unknown")
+
+    assert clean_instruction("#Rewritten Prompt#:\n Explain gravity ") == "Explain gravity"
+    evolution_filter = EvolutionFilter()
+    assert evolution_filter("Explain gravity", "Explain gravity to a child in two sentences") is None
+    assert evolution_filter("Explain gravity", "explain  gravity!") == "unchanged"
+    assert evolution_filter("Explain gravity", "Rewrite the given prompt about gravity") == "copied_prompt"
+    assert evolution_filter("Explain gravity", "Gravity") == "length"
+
+    response_filter = ResponseFilter()
+    assert response_filter("Gravity is the force by which a planet draws objects toward its center.") is None
+    assert response_filter("I'm sorry, but I cannot help with that.") == "refusal"
+    assert response_filter("... ok.") == "empty_response"
+
+
+def test_evol_instruct_rounds(tmp_path):
+    calls = []
+    seeds = ["Explain gravity", "Write a poem about the sea", "This should fail", "Please refuse this"]
+    engine = EvolInstruct(fake_client(calls), str(tmp_path), concurrency=3)
+    report = engine.run(seeds, rounds=2)
+
+    assert completed_rounds(str(tmp_path)) == [0, 1, 2]
+    assert report.instructions == 8
+    assert report.evolved == 4
+    assert report.failed == {"copied_prompt": 2, "refusal": 2}
+    # failed evolutions do not spend a response call
+    assert report.llm_calls == len(calls) == 8 + 4 + 2
+
+    round_2 = {r["id"]: r for r in load_round(str(tmp_path), 2)}
+    assert round_2["0-1-2"]["parent_id"] == "0-1"
+    assert round_2["0-1-2"]["instruction"] == "Explain gravity in detail in detail"
+    assert round_2["0-1-2"]["response"].startswith("Here is a thorough answer")
+    # failed instructions stay in the pool unchanged
+    assert round_2["2"]["instruction"] == "This should fail"
+    assert round_2["2"]["reason"] == "copied_prompt"
+    assert len(list(read_dataset(str(tmp_path)))) == 4
+
+
+def test_evol_instruct_resumes(tmp_path):
+    calls = []
+    first = EvolInstruct(fake_client(calls), str(tmp_path), seed=1).run(["Explain gravity", "Sort a list"], rounds=1)
+    assert first.evolved == 2
+
+    resumed = []
+    report = EvolInstruct(fake_client(resumed), str(tmp_path), seed=1).run([], rounds=3)
+    assert report.instructions == 4
+    assert all("Explain gravity in detail" in c or "Sort a list in detail" in c for c in resumed)
+    assert completed_rounds(str(tmp_path)) == [0, 1, 2, 3]
+    # the method only depends on the seed, the id and the round
+    assert [r["method"] for r in load_round(str(tmp_path), 1)] == [
+        EvolInstruct(None, str(tmp_path), seed=1)._method(str(i), 1) for i in range(2)
+    ]
@@ -0,0 +1,68 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from easyllm.index import FlatIndex  # noqa: E402
+from easyllm.index.flat import top_k  # noqa: E402
+
+
+@pytest.fixture()
+def vectors():
+    return np.random.default_rng(0).standard_normal((500, 16), dtype=np.float32)
+
+
+def test_top_k_sorted() -> None:
+    scores = np.array([[0.1, 0.9, 0.5, 0.7]], dtype=np.float32)
+    values, positions = top_k(scores, 2)
+    assert positions.tolist() == [[1, 3]]
+    assert np.allclose(values, [[0.9, 0.7]])
+    assert top_k(scores, 10)[1].tolist() == [[1, 3, 2, 0]]
+
+
+@pytest.mark.parametrize("metric", ["cosine", "ip"])
+def test_search_matches_brute_force(vectors, metric) -> None:
+    index = FlatIndex(16, metric=metric, capacity=8)
+    for start in range(0, len(vectors), 64):
+        index.add(vectors[start : start + 64])
+    assert len(index) == len(vectors)
+
+    queries = vectors[:20] + 0.01
+    scores, ids = index.search(queries, k=5)
+    assert scores.shape == ids.shape == (20, 5)
+
+    stored = vectors / np.linalg.norm(vectors, axis=1, keepdims=True) if metric == "cosine" else vectors
+    expected = np.argsort(-(queries @ stored.T), axis=1)[:, :5]
+    assert (ids == expected).all()
+
+
+def test_add_embedding_response_with_ids_and_metadata() -> None:
+    index = FlatIndex(2)
+    response = {"data": [{"index": 0, "embedding": [1.0, 0.0]}, {"index": 1, "embedding": [0.0, 1.0]}]}
+    index.add(response, ids=[10, 20], metadata=[{"text": "a"}, {"text": "b"}])
+
+    results = index.query([0.1, 1.0], k=1)
+    assert results[0][0]["id"] == 20
+    assert results[0][0]["metadata"] == {"text": "b"}
+    with pytest.raises(ValueError):
+        index.add([[1.0, 0.0, 0.0]])
+
+
+def test_save_load_mmap(vectors, tmp_path) -> None:
+    index = FlatIndex(16)
+    index.add(vectors, metadata=[{"i": i} for i in range(len(vectors))])
+    index.save(tmp_path)
+
+    loaded = FlatIndex.load(tmp_path)
+    assert isinstance(loaded.vectors.base, np.memmap) or isinstance(loaded.vectors, np.memmap)
+    assert (loaded.search(vectors[:3], k=3)[1] == index.search(vectors[:3], k=3)[1]).all()
+
+    loaded.add(vectors[:1])
+    assert len(loaded) == len(vectors) + 1
+    loaded.save(tmp_path)
+    assert len(FlatIndex.load(tmp_path, mmap=False)) == len(vectors) + 1
+    assert FlatIndex.load(tmp_path).metadata[3] == {"i": 3}
+
+
+def test_empty_index_search() -> None:
+    scores, ids = FlatIndex(4).search([1.0, 0.0, 0.0, 0.0], k=3)
+    assert scores.shape == ids.shape == (1, 0)
@@ -0,0 +1,92 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from easyllm.index import FlatIndex, IVFIndex  # noqa: E402
+from easyllm.index.ivf import kmeans  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def vectors():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32), dtype=np.float32)
+    return centers[rng.integers(0, 20, 2000)] + 0.1 * rng.standard_normal((2000, 32), dtype=np.float32)
+
+
+def test_kmeans_finds_clusters() -> None:
+    rng = np.random.default_rng(0)
+    points = np.concatenate([rng.normal(-5, 0.1, (50, 2)), rng.normal(5, 0.1, (50, 2))]).astype(np.float32)
+    centroids = kmeans(points, 2, seed=1)
+    assert sorted(np.round(centroids[:, 0]).tolist()) == [-5, 5]
+
+
+# pq_m=32 encodes one dimension per byte, which keeps pq precise enough to compare exact ids
+@pytest.mark.parametrize("quantizer", ["int8", "pq"])
+def test_recall_against_flat(vectors, quantizer) -> None:
+    flat = FlatIndex(32)
+    flat.add(vectors)
+    index = IVFIndex(32, nlist=16, quantizer=quantizer, pq_m=32, nprobe=16)
+    index.train(vectors)
+    index.add(vectors[:1000])
+    index.add(vectors[1000:])
+    assert len(index) == len(vectors)
+
+    queries = vectors[:50]
+    _, expected = flat.search(queries, k=1)
+    _, found = index.search(queries, k=5)
+    assert np.mean(found[:, :1] == expected) >= 0.9
+    assert (found == np.arange(50)[:, None]).any(axis=1).all()
+
+
+def test_nprobe_limits_candidates(vectors) -> None:
+    index = IVFIndex(32, nlist=16)
+    index.train(vectors)
+    index.add(vectors[:3])
+    scores, ids = index.search(vectors[0], k=5, nprobe=1)
+    assert ids[0, 0] == 0
+    assert (ids[0][np.isinf(scores[0])] == -1).all()
+    assert len(index.query(vectors[0], k=5, nprobe=16)[0]) == 3
+
+
+def test_untrained_index_raises(vectors) -> None:
+    with pytest.raises(ValueError):
+        IVFIndex(32, nlist=16).add(vectors)
+
+
+@pytest.mark.parametrize("quantizer", ["int8", "pq"])
+def test_save_load(vectors, tmp_path, quantizer) -> None:
+    index = IVFIndex(32, nlist=16, quantizer=quantizer, pq_m=32)
+    index.train(vectors)
+    index.add(vectors, metadata=[{"i": i} for i in range(len(vectors))])
+    index.save(tmp_path)
+
+    loaded = IVFIndex.load(tmp_path)
+    assert (loaded.search(vectors[:5], k=3)[1] == index.search(vectors[:5], k=3)[1]).all()
+    assert loaded.query(vectors[7], k=1)[0][0]["metadata"] == {"i": 7}
+    loaded.add(vectors[:1])
+    assert len(loaded) == len(vectors) + 1
+
+
+def test_search_during_add(vectors) -> None:
+    from concurrent.futures import ThreadPoolExecutor
+
+    index = IVFIndex(32, nlist=16, nprobe=16)
+    index.train(vectors)
+    index.add(vectors[:100])
+    clusters = list(index._codes)
+    index.search(vectors[:5], k=3)
+    # searches do not rewrite the clusters
+    assert all(a is b for a, b in zip(index._codes, clusters))
+
+    def search(_):
+        _, ids = index.search(vectors[:20], k=5)
+        return ids
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        searches = [executor.submit(search, i) for i in range(50)]
+        for start in range(100, len(vectors), 50):
+            index.add(vectors[start : start + 50])
+        results = [future.result() for future in searches]
+    assert all(((ids >= 0) & (ids < len(vectors))).all() for ids in results)
+    _, ids = index.search(vectors[:20], k=1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
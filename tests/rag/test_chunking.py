@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+from easyllm.rag import batch_chunks, chunk_text, read_documents
+
+
+def test_chunk_text_overlap() -> None:
+    text = " ".join(str(i) for i in range(10))
+    chunks = list(chunk_text(text, max_tokens=4, overlap=1))
+    assert chunks == ["0 1 2 3", "3 4 5 6", "6 7 8 9"]
+
+
+def test_chunk_text_keeps_formatting() -> None:
+    text = "Hello,  world!\nSecond line."
+    assert list(chunk_text(text, max_tokens=10, overlap=0)) == [text]
+    assert list(chunk_text("   ", max_tokens=10, overlap=0)) == []
+    with pytest.raises(ValueError):
+        list(chunk_text(text, max_tokens=2, overlap=2))
+
+
+def test_batch_chunks_bounds() -> None:
+    documents = [{"id": i, "text": "word " * 20} for i in range(5)]
+    batches = list(batch_chunks(documents, max_tokens=5, overlap=0, batch_size=3, max_batch_bytes=40))
+    assert sum(len(batch) for batch in batches) == 20
+    assert all(len(batch) <= 3 for batch in batches)
+    assert all(sum(chunk["bytes"] for chunk in batch) <= 40 for batch in batches)
+    assert batches[0][0]["document_id"] == 0
+
+
+def test_read_jsonl(tmp_path) -> None:
+    path = tmp_path / "docs.jsonl"
+    path.write_text("\n".join(json.dumps({"doc": f"d{i}", "text": f"text {i}", "source": "x"}) for i in range(3)))
+    documents = list(read_documents(str(path), id_field="doc"))
+    assert documents[1] == {"id": "d1", "text": "text 1", "metadata": {"source": "x"}}
+    with pytest.raises(ValueError):
+        list(read_documents(str(path), text_field="missing"))
+
+
+def test_read_parquet(tmp_path) -> None:
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = str(tmp_path / "docs.parquet")
+    pq.write_table(pa.table({"text": ["a", "b", "c"]}), path)
+    assert [d["text"] for d in read_documents(path, batch_size=2)] == ["a", "b", "c"]
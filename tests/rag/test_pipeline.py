@@ -0,0 +1,79 @@
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from easyllm.index import FlatIndex  # noqa: E402
+from easyllm.rag import IngestionPipeline  # noqa: E402
+
+
+class FakeEmbedding:
+    def __init__(self, delay=0.0, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def create(self, input, model=None, encoding_format="float"):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on and any(self.fail_on in text for text in input):
+                raise RuntimeError("upstream failed")
+            return {"data": [{"embedding": np.array([len(t), 1.0], dtype=np.float32)} for t in input]}
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def test_ingest_into_index() -> None:
+    documents = [{"id": f"doc-{i}", "text": "lorem ipsum " * 50, "metadata": {"n": i}} for i in range(20)]
+    embedding = FakeEmbedding(delay=0.01)
+    index = FlatIndex(2)
+
+    report = IngestionPipeline(embedding, index, max_tokens=16, overlap=4, batch_size=8, concurrency=3).run(documents)
+
+    assert report.documents == 20
+    assert report.chunks == len(index) == 20 * 8
+    assert report.chunks_per_second > 0 and report.bytes_per_second > 0
+    assert 1 < embedding.max_active <= 3
+    metadata = index.query([1.0, 0.0], k=1)[0][0]["metadata"]
+    assert set(metadata) == {"n", "document_id", "chunk", "text"}
+
+
+def test_backpressure_bounds_reading() -> None:
+    read = 0
+    gate = threading.Event()
+
+    def documents():
+        nonlocal read
+        for i in range(100):
+            read += 1
+            yield {"id": i, "text": "word"}
+
+    class GatedEmbedding(FakeEmbedding):
+        def create(self, input, model=None, encoding_format="float"):
+            gate.wait()
+            return super().create(input, model, encoding_format)
+
+    index = FlatIndex(2)
+    pipeline = IngestionPipeline(GatedEmbedding(), index, batch_size=1, concurrency=1, max_pending=2)
+    thread = threading.Thread(target=pipeline.run, args=(documents(),))
+    thread.start()
+    time.sleep(0.3)
+    # one batch in flight, two queued and one waiting to be queued, plus the chunk being batched
+    assert read <= 5
+    gate.set()
+    thread.join()
+    assert len(index) == 100
+
+
+def test_embedding_errors_are_raised() -> None:
+    documents = [{"id": i, "text": "bad" if i == 5 else "good"} for i in range(10)]
+    with pytest.raises(RuntimeError, match="upstream failed"):
+        IngestionPipeline(FakeEmbedding(fail_on="bad"), FlatIndex(2), batch_size=2).run(documents)
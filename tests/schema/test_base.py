@@ -2,7 +2,21 @@ from typing import Any
 
 import pytest
 
-from easyllm.schema.base import ChatMessage, Usage
+from easyllm.schema.base import PYDANTIC_V2, ChatMessage, Usage, construct_object, dump_object
+from easyllm.schema.openai import (
+    ChatCompletionResponse,
+    ChatCompletionResponseChoice,
+    ChatCompletionResponseStreamChoice,
+    ChatCompletionStreamResponse,
+    CompletionResponse,
+    CompletionResponseChoice,
+    CompletionResponseStreamChoice,
+    CompletionStreamResponse,
+    DeltaMessage,
+    EmbeddingsObjectResponse,
+    EmbeddingsResponse,
+    embedding_object,
+)
 
 
 def test_chat_message() -> None:
@@ -111,3 +125,117 @@ def test_str_to_int_for_usage(
     assert isinstance(usage.completion_tokens, type(10))
     assert usage.total_tokens == 10
     assert isinstance(usage.total_tokens, type(10))
+
+
+def test_construct_object_matches_validated_dump() -> None:
+    """Test that trusted construction dumps to the same dictionary as validation."""
+    data = [[0.1, 0.2], [0.3, 0.4]]
+
+    def build(factory):
+        return factory(
+            EmbeddingsResponse,
+            data=[factory(EmbeddingsObjectResponse, index=i, embedding=e) for i, e in enumerate(data)],
+            usage=factory(Usage, prompt_tokens=2, total_tokens=2),
+        )
+
+    validated = dump_object(build(lambda schema, **kwargs: schema(**kwargs)))
+    constructed = dump_object(build(construct_object))
+
+    assert constructed == validated
+    assert "completion_tokens" not in constructed["usage"]
+    assert constructed["data"][1] == {"index": 1, "object": "embedding", "embedding": [0.3, 0.4]}
+
+
+def test_construct_object_skips_validation() -> None:
+    """Test that trusted construction does not coerce or reject values."""
+    usage = construct_object(Usage, prompt_tokens="10", total_tokens=10)
+    assert usage.prompt_tokens == "10"
+
+
+def test_embedding_object_validates_only_float_lists(monkeypatch) -> None:
+    """Test that encoded embeddings bypass the `List[float]` validation of the schema."""
+    from easyllm.schema import base
+
+    monkeypatch.setattr(base, "VALIDATE_RESPONSES", True)
+    assert embedding_object(0, "AACAPw==").embedding == "AACAPw=="
+    assert embedding_object(1, [1, 0.5]).embedding == [1.0, 0.5]
+    with pytest.raises(ValueError):
+        embedding_object(0, ["not a float"])
+
+
+def _responses(factory):
+    usage = factory(Usage, prompt_tokens=2, completion_tokens=1, total_tokens=3)
+    return {
+        "chat": factory(
+            ChatCompletionResponse,
+            id="hf-1",
+            created=1,
+            choices=[
+                factory(
+                    ChatCompletionResponseChoice, index=0, message=factory(ChatMessage, role="assistant", content="Hi")
+                )
+            ],
+            usage=usage,
+        ),
+        "chat_stream": factory(
+            ChatCompletionStreamResponse,
+            id="hf-1",
+            created=1,
+            choices=[
+                factory(ChatCompletionResponseStreamChoice, index=0, delta=factory(DeltaMessage, role="assistant"))
+            ],
+        ),
+        "completion": factory(
+            CompletionResponse,
+            id="hf-1",
+            created=1,
+            choices=[factory(CompletionResponseChoice, index=0, text="Hi", finish_reason="length")],
+            usage=usage,
+        ),
+        "completion_stream": factory(
+            CompletionStreamResponse,
+            id="hf-1",
+            created=1,
+            choices=[factory(CompletionResponseStreamChoice, index=0, text="Hi")],
+        ),
+        "embeddings": factory(
+            EmbeddingsResponse, data=[factory(EmbeddingsObjectResponse, index=0, embedding=[0.5])], usage=usage
+        ),
+    }
+
+
+# dumped keys of the response, its first choice (or embedding) and the message or delta of the choice
+DUMPED_KEYS = {
+    "chat": (
+        {"id", "object", "created", "model", "choices", "usage"},
+        {"index", "message"},
+        {"role", "content"},
+    ),
+    "chat_stream": ({"id", "object", "created", "choices"}, {"index", "delta"}, {"role"}),
+    "completion": (
+        {"id", "object", "created", "model", "choices", "usage"},
+        {"index", "text", "finish_reason"},
+        None,
+    ),
+    "completion_stream": ({"id", "object", "created", "model", "choices"}, {"index", "text"}, None),
+    "embeddings": ({"object", "data", "model", "usage"}, {"index", "object", "embedding"}, None),
+}
+
+
+@pytest.mark.parametrize("kind", sorted(DUMPED_KEYS))
+def test_dump_object_keys(kind: str) -> None:
+    """Test the dumped keys of each response type, fields set to None are kept by pydantic v1 like `dict()` did."""
+    validated = _responses(lambda schema, **kwargs: schema(**kwargs))[kind]
+    dumped = dump_object(_responses(construct_object)[kind])
+    assert dumped == dump_object(validated)
+
+    if not PYDANTIC_V2:
+        assert dumped == validated.dict()
+        return
+    assert dumped == validated.model_dump(exclude_none=True)
+    response_keys, choice_keys, message_keys = DUMPED_KEYS[kind]
+    choice = (dumped.get("choices") or dumped.get("data"))[0]
+    assert set(dumped) == response_keys
+    assert set(choice) == choice_keys
+    if message_keys is not None:
+        assert set(choice.get("message") or choice["delta"]) == message_keys
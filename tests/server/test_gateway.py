@@ -0,0 +1,163 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+from contextlib import contextmanager
+from types import ModuleType
+
+import pytest
+
+from easyllm.server import Gateway, HTTPServer
+from easyllm.utils.deadlines import current_deadline
+
+
+class ChatCompletion:
+    @staticmethod
+    def create(messages, model=None, stream=False, max_tokens=16):
+        if stream:
+            return iter([{"choices": [{"delta": {"content": m["content"]}}]} for m in messages])
+        return {"model": model, "choices": [{"message": messages[-1]}], "max_tokens": max_tokens}
+
+
+class Completion:
+    @staticmethod
+    def create(prompt, model=None):
+        raise ValueError("invalid prompt")
+
+
+class Embedding:
+    @staticmethod
+    def create(input, model=None):
+        # emulates an upstream request taking `input` seconds
+        time.sleep(float(input))
+        current_deadline().check()
+        return {"data": [], "timeout": current_deadline().timeout()}
+
+
+def fake_client():
+    module = ModuleType("fake")
+    module.ChatCompletion = ChatCompletion
+    module.Completion = Completion
+    return module
+
+
+@contextmanager
+def serving(gateway):
+    loop = asyncio.new_event_loop()
+    http_server = HTTPServer(gateway.handle, port=0)
+    loop.run_until_complete(http_server.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield http_server
+    asyncio.run_coroutine_threadsafe(http_server.close(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+    gateway.shutdown()
+
+
+@pytest.fixture()
+def server():
+    with serving(Gateway(fake_client(), workers=2, max_concurrency=2, model="default-model")) as http_server:
+        yield http_server
+
+
+def post(server, path, body, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    conn.request("POST", path, body=json.dumps(body), headers={"Content-Type": "application/json", **(headers or {})})
+    res = conn.getresponse()
+    status, body = res.status, res.read()
+    conn.close()
+    return status, body
+
+
+def test_chat_completion(server):
+    messages = [{"role": "user", "content": "Hello!"}]
+    status, body = post(server, "/v1/chat/completions", {"messages": messages, "user": "ignored"})
+    assert status == 200
+    result = json.loads(body)
+    assert result["model"] == "default-model"
+    assert result["choices"][0]["message"] == messages[0]
+
+
+def test_chat_completion_stream(server):
+    messages = [{"role": "user", "content": "Hello"}, {"role": "user", "content": "World"}]
+    status, body = post(server, "/v1/chat/completions", {"messages": messages, "stream": True})
+    assert status == 200
+    events = [line[len("data: ") :] for line in body.decode().split("\n\n") if line]
+    assert events[-1] == "[DONE]"
+    assert [json.loads(e)["choices"][0]["delta"]["content"] for e in events[:-1]] == ["Hello", "World"]
+
+
+def test_client_errors(server):
+    status, body = post(server, "/v1/completions", {"prompt": "Hello"})
+    assert status == 400
+    assert json.loads(body)["error"]["message"] == "invalid prompt"
+
+    status, _ = post(server, "/v1/embeddings", {"input": "Hello"})
+    assert status == 404
+
+
+def test_request_timeout():
+    module = ModuleType("slow")
+    module.Embedding = Embedding
+    with serving(Gateway(module, workers=2, request_timeout=30)) as server:
+        status, body = post(server, "/v1/embeddings", {"input": "0"}, headers={"X-Request-Timeout": "2"})
+        assert status == 200
+        connect, read = json.loads(body)["timeout"]
+        assert 0 < read <= 2 and connect <= 2
+
+        status, body = post(server, "/v1/embeddings", {"input": "0.2"}, headers={"X-Request-Timeout": "0.05"})
+        assert status == 504
+        assert json.loads(body)["error"]["type"] == "timeout_error"
+
+        status, _ = post(server, "/v1/embeddings", {"input": "0"}, headers={"X-Request-Timeout": "soon"})
+        assert status == 400
+
+
+def test_stream_timeout():
+    class SlowCompletion:
+        @staticmethod
+        def create(prompt, model=None, stream=False):
+            yield {"choices": [{"text": "a"}]}
+            raise TimeoutError("read timed out")
+
+    module = ModuleType("slow")
+    module.Completion = SlowCompletion
+    with serving(Gateway(module, workers=1)) as server:
+        status, body = post(server, "/v1/completions", {"prompt": "Hello", "stream": True})
+    assert status == 200
+    events = [line[len("data: ") :] for line in body.decode().split("\n\n") if line]
+    assert json.loads(events[0])["choices"][0]["text"] == "a"
+    assert json.loads(events[1])["error"] == {"message": "read timed out", "type": "timeout_error", "code": 504}
+
+
+def test_metrics_route(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port)
+    conn.request("GET", "/metrics")
+    res = conn.getresponse()
+    assert res.status == 200
+    assert res.getheader("Content-Type").startswith("text/plain")
+    res.read()
+    conn.close()
+
+
+def test_warmup_runs_on_every_worker():
+    calls = []
+
+    def warmup(models, connections=1, ping=None):
+        calls.append((threading.current_thread().name, models, ping))
+        return {"url": connections}
+
+    module = fake_client()
+    module.warmup = warmup
+    gateway = Gateway(module, workers=4, model="m")
+    try:
+        assert gateway.warmup(connections=2) == [{"url": 2}] * 4
+    finally:
+        gateway.shutdown()
+    assert len({name for name, _, _ in calls}) == 4
+    assert all(models == ["m"] for _, models, _ in calls)
+    assert sorted(str(ping) for _, _, ping in calls) == ["False", "False", "False", "None"]
+    assert Gateway(fake_client(), workers=1).warmup() == []
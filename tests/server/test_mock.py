@@ -0,0 +1,143 @@
+import http.client
+import json
+
+import pytest
+
+from easyllm.server.mock import MockConfig, MockServer, encode_event_stream_message
+
+
+@pytest.fixture()
+def mock_url():
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001, embedding_dim=8), port=0)
+    yield server.start_in_background()
+    server.stop()
+
+
+def test_huggingface_client(mock_url, monkeypatch):
+    from easyllm.clients import huggingface
+
+    monkeypatch.setattr(huggingface, "api_base", mock_url)
+    monkeypatch.setattr(huggingface, "prompt_builder", "llama2")
+    messages = [{"role": "user", "content": "Hello!"}]
+
+    res = huggingface.ChatCompletion.create(messages=messages, max_tokens=5)
+    assert res["usage"]["completion_tokens"] == 5
+    assert res["choices"][0]["finish_reason"] == "length"
+
+    chunks = list(huggingface.ChatCompletion.create(messages=messages, max_tokens=3, stream=True))
+    streamed = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks)
+    assert res["choices"][0]["message"]["content"].startswith(streamed)
+    assert chunks[-1]["choices"][0]["finish_reason"] == "length"
+
+    emb = huggingface.Embedding.create(input=["a", "b"], model="embedding-model")
+    assert len(emb["data"]) == 2
+    assert len(emb["data"][0]["embedding"]) == 8
+
+
+@pytest.mark.parametrize("client_name", ["huggingface", "sagemaker"])
+def test_embedding_encoding_formats(mock_url, monkeypatch, client_name):
+    np = pytest.importorskip("numpy")
+    from easyllm.clients import load_client
+    from easyllm.utils.embeddings import decode_base64_embedding
+
+    client = load_client(client_name)
+    monkeypatch.setattr(client, "api_base", mock_url + ("/endpoints" if client_name == "sagemaker" else ""))
+    if client_name == "sagemaker":
+        monkeypatch.setattr(client, "aws_auth", lambda request: request)
+
+    floats = client.Embedding.create(input=["a", "b"], model="embedding-model")
+    arrays = client.Embedding.create(input=["a", "b"], model="embedding-model", encoding_format="numpy")
+    encoded = client.Embedding.create(input="b", model="embedding-model", encoding_format="base64")
+
+    assert arrays["data"][1]["embedding"].dtype == np.float32
+    assert np.allclose(arrays["data"][1]["embedding"], floats["data"][1]["embedding"])
+    assert np.array_equal(decode_base64_embedding(encoded["data"][0]["embedding"]), arrays["data"][1]["embedding"])
+
+
+@pytest.mark.parametrize("accept", [None, "application/octet-stream", "application/json"])
+def test_sagemaker_binary_embeddings(accept):
+    np = pytest.importorskip("numpy")
+    from easyllm.clients.sagemaker import SageMakerClient
+
+    server = MockServer(MockConfig(embedding_dim=8, embedding_latency=0, gzip_min_size=0), port=0)
+    url = server.start_in_background()
+    requests, responses = [], []
+
+    def auth(request):
+        # the accepted formats of the client unless the test overrides them
+        if accept is not None:
+            request.headers["Accept"] = accept
+        request.register_hook("response", lambda response, **kwargs: responses.append(response))
+        requests.append(request)
+        return request
+
+    client = SageMakerClient(api_base=f"{url}/endpoints", auth=auth, binary_embeddings=True, gzip_requests=True)
+    json_client = SageMakerClient(api_base=f"{url}/endpoints", auth=lambda request: request)
+    inputs = ["a" * 1200, "b" * 1200]
+    try:
+        floats = client.Embedding.create(input=inputs, model="embedding-model")
+        arrays = client.Embedding.create(input=inputs[1], model="embedding-model", encoding_format="numpy")
+        expected = json_client.Embedding.create(input=inputs, model="embedding-model")
+    finally:
+        server.stop()
+
+    assert [item["embedding"] for item in floats["data"]] == [
+        pytest.approx(item["embedding"]) for item in expected["data"]
+    ]
+    assert np.allclose(arrays["data"][0]["embedding"], expected["data"][1]["embedding"])
+    content_type = accept or "application/x-npy"
+    assert [response.headers["Content-Type"] for response in responses] == [content_type, content_type]
+    assert all(response.headers["Content-Encoding"] == "gzip" for response in responses)
+    assert all(request.headers["Content-Encoding"] == "gzip" for request in requests)
+
+
+@pytest.mark.parametrize("client_name", ["huggingface", "sagemaker"])
+def test_loglikelihood(mock_url, monkeypatch, client_name):
+    pytest.importorskip("numpy")
+    from easyllm.clients import load_client
+    from easyllm.utils.scoring import split_logprobs
+
+    client = load_client(client_name)
+    monkeypatch.setattr(client, "api_base", mock_url + ("/endpoints" if client_name == "sagemaker" else ""))
+    if client_name == "sagemaker":
+        monkeypatch.setattr(client, "aws_auth", lambda request: request)
+
+    res = client.LogLikelihood.create(context="The capital of France is", continuation=[" Paris", " the city of Lyon"])
+    assert res["num_tokens"].tolist() == [1, 4]
+    assert res["usage"]["prompt_tokens"] == 6 + 9
+    per_token = split_logprobs(res)
+    assert [len(item) for item in per_token] == [1, 4]
+    assert res["sum"][1] == pytest.approx(float(per_token[1].sum()), rel=1e-5)
+    assert (res["logprobs"] <= 0).all()
+
+    again = client.LogLikelihood.create(context="The capital of France is", continuation=" Paris")
+    assert again["sum"][0] == pytest.approx(res["sum"][0])
+
+
+def test_rate_limit():
+    server = MockServer(MockConfig(rate_limit=1, ttft=0), port=0)
+    server.start_in_background()
+    try:
+        statuses = []
+        for _ in range(3):
+            conn = http.client.HTTPConnection("127.0.0.1", server.http.port)
+            conn.request("POST", "/generate", body=json.dumps({"inputs": "hi", "parameters": {"max_new_tokens": 1}}))
+            res = conn.getresponse()
+            statuses.append(res.status)
+            res.read()
+            conn.close()
+    finally:
+        server.stop()
+    assert statuses[0] == 200
+    assert 429 in statuses[1:]
+
+
+def test_event_stream_encoding():
+    eventstream = pytest.importorskip("botocore.eventstream")
+
+    message = encode_event_stream_message({":event-type": "chunk"}, b'{"bytes": "e30="}')
+    buffer = eventstream.EventStreamBuffer()
+    buffer.add_data(message)
+    decoded = next(iter(buffer))
+    assert decoded.headers[":event-type"] == "chunk"
+    assert decoded.payload == b'{"bytes": "e30="}'
@@ -0,0 +1,40 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# generous wall clock budget for importing a client module in a fresh interpreter
+IMPORT_BUDGET_SECONDS = 2.0
+
+# modules which are only needed once a request is sent
+HEAVY_MODULES = ["boto3", "botocore", "huggingface_hub.inference._client"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {heavy} if m in sys.modules]}}))
+"""
+
+
+@pytest.mark.parametrize(
+    "module", ["easyllm.clients.huggingface", "easyllm.clients.sagemaker", "easyllm.clients.bedrock"]
+)
+def test_client_import_is_lazy(module, tmp_path):
+    """Importing a client must not resolve credentials, create clients or import heavy dependencies."""
+    env = {k: v for k, v in os.environ.items() if not k.startswith(("AWS_", "HUGGINGFACE_"))}
+    # no credentials available, importing used to fail for sagemaker
+    env.update(HOME=str(tmp_path), HF_HOME=str(tmp_path), AWS_CONFIG_FILE=str(tmp_path / "config"))
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module, heavy=HEAVY_MODULES)],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    measured = json.loads(result.stdout.strip().splitlines()[-1])
+    assert measured["loaded"] == []
+    assert measured["seconds"] < IMPORT_BUDGET_SECONDS
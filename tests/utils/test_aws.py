@@ -0,0 +1,177 @@
+import datetime
+import gc
+import itertools
+import time
+
+import pytest
+import requests
+
+from easyllm.utils import aws
+from easyllm.utils.aws import (
+    AWSCredentials,
+    AWSSigV4,
+    RefreshableCredentials,
+    refreshable_boto3_session,
+    release_credentials,
+    shared_credentials,
+)
+
+
+def expiring(lifetime=0.2, delay=0.0):
+    counter = itertools.count()
+
+    def fetch():
+        i = next(counter)
+        if i:
+            time.sleep(delay)
+        return AWSCredentials(f"AKID{i}", f"secret{i}", f"token{i}", time.time() + lifetime)
+
+    return fetch
+
+
+def wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_credentials_are_renewed_in_the_background():
+    credentials = RefreshableCredentials(expiring(), margin=0.15, retry_interval=0.01)
+    try:
+        assert credentials.get().access_key == "AKID0"
+        wait_for(lambda: credentials._current.access_key != "AKID0")
+        assert credentials.get().secret_key.startswith("secret")
+    finally:
+        credentials.close()
+
+    assert credentials._thread is None
+    static = RefreshableCredentials(lambda: AWSCredentials("AKID", "secret"))
+    assert static._thread is None and static.get().token is None
+
+
+def test_reads_do_not_wait_for_a_renewal():
+    credentials = RefreshableCredentials(expiring(lifetime=10, delay=0.5), margin=10, retry_interval=0.01)
+    try:
+        # the renewal starts right away and takes 0.5s
+        time.sleep(0.05)
+        start = time.monotonic()
+        assert credentials.get().access_key == "AKID0"
+        assert time.monotonic() - start < 0.1
+    finally:
+        credentials.close()
+
+
+def test_expired_credentials_are_renewed_on_read():
+    def fetch():
+        if not calls:
+            calls.append(1)
+            return AWSCredentials("old", "secret", expiry=time.time() - 1)
+        calls.append(1)
+        return AWSCredentials("new", "secret", expiry=time.time() + 3600)
+
+    calls = []
+    credentials = RefreshableCredentials(fetch, retry_interval=3600)
+    try:
+        assert credentials.get().access_key == "new"
+        assert len(calls) == 2
+    finally:
+        credentials.close()
+
+
+def test_signer_uses_renewed_credentials():
+    credentials = RefreshableCredentials(lambda: AWSCredentials("AKID0", "secret0", "token0"))
+    auth = AWSSigV4("sagemaker", region="us-east-1", credentials=credentials)
+
+    def sign():
+        request = requests.Request("POST", "https://runtime.sagemaker.us-east-1.amazonaws.com/", data=b"{}")
+        return auth(request.prepare()).headers
+
+    headers = sign()
+    assert "Credential=AKID0/" in headers["Authorization"] and headers["x-amz-security-token"] == "token0"
+
+    credentials.fetch = lambda: AWSCredentials("AKID1", "secret1")
+    credentials.refresh()
+    headers = sign()
+    assert "Credential=AKID1/" in headers["Authorization"] and "x-amz-security-token" not in headers
+    assert auth.aws_access_key_id == "AKID1"
+
+
+def test_refreshable_boto3_session():
+    pytest.importorskip("boto3")
+    credentials = RefreshableCredentials(lambda: AWSCredentials("AKID0", "secret0"))
+    session = refreshable_boto3_session(credentials, region_name="us-east-1")
+    client = session.client("sts")
+    assert session.get_credentials().get_frozen_credentials().access_key == "AKID0"
+
+    credentials.fetch = lambda: AWSCredentials("AKID1", "secret1", "token1")
+    credentials.refresh()
+    frozen = session.get_credentials().get_frozen_credentials()
+    assert (frozen.access_key, frozen.token) == ("AKID1", "token1")
+    # existing clients sign with the renewed credentials as well
+    assert client._request_signer._credentials.get_frozen_credentials().access_key == "AKID1"
+
+
+def test_signers_of_one_source_share_the_renewal(monkeypatch):
+    botocore_credentials = pytest.importorskip("botocore.credentials")
+    boto3 = pytest.importorskip("boto3")
+
+    def metadata():
+        expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+        return {"access_key": "AKID", "secret_key": "secret", "token": "token", "expiry_time": expiry.isoformat()}
+
+    refreshable = botocore_credentials.RefreshableCredentials.create_from_metadata(metadata(), metadata, "sso")
+    monkeypatch.setattr(boto3.Session, "get_credentials", lambda self: refreshable)
+    signers = [AWSSigV4("sagemaker", region="us-east-1") for _ in range(3)]
+    credentials = {id(signer._credentials) for signer in signers if signer.credentials.access_key == "AKID"}
+    assert len(credentials) == 1
+    (shared,) = aws._shared.values()
+    assert shared[1] == 3 and shared[0]._thread is not None
+
+    signers[0].close()
+    signers[0].close()
+    del signers[1]
+    gc.collect()
+    assert list(aws._shared.values())[0][1] == 1
+    thread = shared[0]._thread
+    signers[-1].close()
+    assert not aws._shared and not thread.is_alive()
+
+
+def test_botocore_credentials_are_read_again():
+    botocore_credentials = pytest.importorskip("botocore.credentials")
+    static = aws._from_botocore(botocore_credentials.Credentials("AKID", "secret"))
+    assert static.expiry is None
+
+    expiry = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(hours=1)
+    metadata = {"access_key": "AKID", "secret_key": "secret", "token": "token", "expiry_time": expiry.isoformat()}
+    refreshable = botocore_credentials.RefreshableCredentials.create_from_metadata(metadata, lambda: metadata, "sso")
+    # botocore has no public expiry, the credentials are read again after the retry interval
+    assert aws._from_botocore(refreshable).expiry - time.time() <= aws.REFRESH_MARGIN + aws.REFRESH_RETRY_INTERVAL
+
+
+def test_unchanged_credentials_are_not_logged(monkeypatch):
+    infos = []
+    monkeypatch.setattr(aws.logger, "info", lambda *args: infos.append(args))
+    reads = []
+
+    def fetch():
+        # like botocore credentials read again, the same keys with a new expiry
+        reads.append(time.time())
+        return AWSCredentials("AKID", "secret", "token", time.time() + 0.1)
+
+    credentials = RefreshableCredentials(fetch, margin=0.1, retry_interval=0.01)
+    try:
+        wait_for(lambda: len(reads) > 5)
+    finally:
+        credentials.close()
+    assert infos == []
+
+
+def test_shared_credentials_are_released_by_the_last_user():
+    credentials = shared_credentials("source", expiring(lifetime=3600))
+    assert shared_credentials("source", expiring()) is credentials
+    release_credentials("source")
+    assert credentials._thread is not None
+    release_credentials("source")
+    assert credentials._thread is None and "source" not in aws._shared
@@ -0,0 +1,86 @@
+import time
+
+import pytest
+import requests
+
+from easyllm.clients.huggingface import HuggingFaceClient
+from easyllm.clients.sagemaker import SageMakerClient
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils.deadlines import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_READ_TIMEOUT,
+    Deadline,
+    DeadlineExceeded,
+    current_deadline,
+    deadline,
+)
+from easyllm.utils.model_loading import ModelLoadingTimeout, ModelLoadingWaiter
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+def test_deadline_timeouts():
+    assert current_deadline().timeout() == (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT)
+    connect, read = Deadline(total=2, connect=1).timeout()
+    assert connect == 1 and 1.9 < read <= 2
+
+    expired = Deadline(total=0)
+    assert expired.expired()
+    with pytest.raises(DeadlineExceeded):
+        expired.timeout()
+    with pytest.raises(TimeoutError):
+        expired.check()
+
+
+def test_nested_deadlines_never_extend():
+    with deadline(total=1, read=5) as outer:
+        assert current_deadline() is outer
+        with deadline(total=10, connect=30) as inner:
+            assert inner.expires == outer.expires
+            assert (inner.connect, inner.read) == (DEFAULT_CONNECT_TIMEOUT, 5)
+        with deadline(total=0.5) as inner:
+            assert inner.expires < outer.expires
+    assert current_deadline().expires is None
+
+
+def test_model_loading_wait_ends_at_deadline():
+    def loading(headers):
+        class Response:
+            status_code = 503
+
+            def json(self):
+                return {"error": "Model m is currently loading", "estimated_time": 0.05}
+
+        return Response()
+
+    start = time.monotonic()
+    with deadline(total=0.2), pytest.raises(ModelLoadingTimeout):
+        ModelLoadingWaiter(min_interval=0.05).request("m", loading)
+    assert time.monotonic() - start < 1
+
+
+@pytest.fixture()
+def slow_url():
+    server = MockServer(MockConfig(tokens_per_second=20, ttft=0.5), port=0)
+    yield server.start_in_background()
+    server.stop()
+
+
+def test_sagemaker_read_timeout(slow_url):
+    client = SageMakerClient(api_base=f"{slow_url}/endpoints", auth=lambda r: r)
+    start = time.monotonic()
+    with deadline(total=0.2), pytest.raises(requests.exceptions.Timeout):
+        client.Completion.create(prompt="Hello", model="m", max_tokens=2)
+    assert time.monotonic() - start < 0.5
+
+
+def test_huggingface_stream_deadline(slow_url):
+    client = HuggingFaceClient(api_base=slow_url, api_key="hf_test", prompt_builder="llama2")
+    with deadline(total=0.8):
+        stream = client.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=100, stream=True)
+    # the stream keeps the deadline of the call which created it
+    chunks = 0
+    with pytest.raises(DeadlineExceeded):
+        for _ in stream:
+            chunks += 1
+    assert 0 < chunks < 100
@@ -0,0 +1,71 @@
+import io
+import json
+
+import pytest
+
+from easyllm.utils.embeddings import decode_base64_embedding, decode_npy, encode_embeddings, parse_embeddings
+
+np = pytest.importorskip("numpy")
+
+
+def test_parse_embeddings_array() -> None:
+    matrix = parse_embeddings(json.dumps([[0.5, 1.0], [2.0, -1.5]]).encode())
+    assert matrix.dtype == np.float32
+    assert matrix.shape == (2, 2)
+    assert matrix.flags["C_CONTIGUOUS"]
+
+
+def test_parse_embeddings_single_and_object() -> None:
+    assert parse_embeddings("[0.5, 1.0]").shape == (1, 2)
+    matrix = parse_embeddings('{"vectors": [[0.5, 1.0]]}', keys=("vectors", "embeddings"))
+    assert matrix.tolist() == [[0.5, 1.0]]
+    with pytest.raises(ValueError):
+        parse_embeddings('{"other": [[0.5]]}', keys=("vectors",))
+
+
+@pytest.mark.parametrize("encoding_format", ["numpy", "float32"])
+def test_encode_embeddings_numpy(encoding_format) -> None:
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    rows = encode_embeddings(matrix, encoding_format)
+    assert len(rows) == 2
+    assert np.shares_memory(rows[1], matrix)
+
+
+def test_encode_embeddings_base64_round_trip() -> None:
+    matrix = np.random.default_rng(0).random((3, 4), dtype=np.float32)
+    rows = encode_embeddings(matrix, "base64")
+    assert all(isinstance(row, str) for row in rows)
+    assert np.array_equal(decode_base64_embedding(rows[2]), matrix[2])
+
+
+def test_encode_embeddings_unknown_format() -> None:
+    with pytest.raises(ValueError):
+        encode_embeddings(np.zeros((1, 2), dtype=np.float32), "float16")
+
+
+def test_parse_embeddings_binary() -> None:
+    matrix = np.arange(6, dtype=np.float32).reshape(2, 3)
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    content = buffer.getvalue()
+
+    parsed = parse_embeddings(content, content_type="application/x-npy")
+    assert np.array_equal(parsed, matrix)
+    # decoded without copying the response body
+    assert parsed.base is not None and not parsed.flags["WRITEABLE"]
+
+    raw = parse_embeddings(matrix.astype("<f4").tobytes(), content_type="application/octet-stream", rows=2)
+    assert np.array_equal(raw, matrix)
+    with pytest.raises(ValueError):
+        parse_embeddings(b"\x00" * 7, content_type="application/octet-stream")
+
+
+def test_decode_npy_converts_other_layouts() -> None:
+    matrix = np.asfortranarray(np.arange(6, dtype=np.float64).reshape(2, 3))
+    buffer = io.BytesIO()
+    np.save(buffer, matrix)
+    assert np.array_equal(decode_npy(buffer.getvalue()), matrix)
+
+    parsed = parse_embeddings(buffer.getvalue(), content_type="application/x-npy; charset=binary")
+    assert parsed.dtype == np.float32 and parsed.flags["C_CONTIGUOUS"]
+    assert parsed.tolist() == matrix.tolist()
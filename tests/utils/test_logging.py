@@ -0,0 +1,110 @@
+import json
+import logging
+
+import pytest
+
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils import logging as easyllm_logging
+from easyllm.utils.logging import (
+    RequestLogHook,
+    disable_request_logging,
+    enable_request_logging,
+    request_logger,
+    setup_logger,
+    warn_once,
+)
+from easyllm.utils.tracing import Trace
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+def test_request_logger_does_not_change_shared_level(caplog):
+    shared = setup_logger()
+    with caplog.at_level(logging.NOTSET):
+        request_logger(debug=True).debug("visible %s", 1)
+        request_logger().debug("hidden %s", 2)
+    assert shared.level == logging.INFO
+    assert [record.getMessage() for record in caplog.records] == ["visible 1"]
+
+
+def test_warn_once(caplog, monkeypatch):
+    monkeypatch.setattr(easyllm_logging, "_warned", set())
+    logger = setup_logger()
+    for _ in range(3):
+        warn_once(logger, "key", "warned %s", "once")
+    warn_once(logger, "other", "other")
+    assert [record.getMessage() for record in caplog.records] == ["warned once", "other"]
+
+
+class Unformattable:
+    def __str__(self):
+        raise AssertionError("formatted a discarded log message")
+
+
+def test_chat_builds_prompt_once(monkeypatch, caplog):
+    from easyllm.clients import base, huggingface
+
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001), port=0)
+    url = server.start_in_background()
+    calls = []
+    build = base.buildBasePrompt
+    monkeypatch.setattr(base, "buildBasePrompt", lambda messages: calls.append(1) or build(messages))
+    monkeypatch.setattr(huggingface, "api_base", url)
+    monkeypatch.setattr(huggingface, "prompt_builder", None)
+    monkeypatch.setattr(easyllm_logging, "_warned", set())
+    try:
+        for _ in range(2):
+            huggingface.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=2)
+        huggingface.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=2, debug=True)
+    finally:
+        server.stop()
+
+    assert len(calls) == 3
+    warnings = [r for r in caplog.records if r.levelno == logging.WARNING]
+    assert len(warnings) == 1 and "USER: Hello!" not in warnings[0].getMessage()
+    debug = [r.getMessage() for r in caplog.records if r.levelno == logging.DEBUG]
+    assert "Prompt sent to model will be:\nUSER: Hello!" in debug
+    assert setup_logger().level == logging.INFO
+
+    # debug arguments are only formatted when the message is emitted
+    request_logger().debug("Generation parameters:\n%s", Unformattable())
+
+
+def trace(error=None):
+    trace = Trace((), "huggingface", "chat", "m")
+    trace.phase("validate")
+    trace.finish(error)
+    return trace
+
+
+def test_request_log_hook_sampling(caplog):
+    hook = RequestLogHook(sample_rate=0.0)
+    hook.on_end(trace())
+    assert caplog.records == []
+
+    hook.on_end(trace(ConnectionError("down")))
+    (record,) = caplog.records
+    assert record.levelno == logging.WARNING
+    assert record.easyllm_request["error"] == "ConnectionError: down"
+
+    caplog.clear()
+    RequestLogHook(sample_rate=1.0).on_end(trace())
+    entry = json.loads(caplog.records[0].getMessage())
+    assert entry["client"] == "huggingface" and entry["model"] == "m"
+    assert set(entry["phases_ms"]) == {"validate"}
+    assert entry["latency_ms"] >= entry["phases_ms"]["validate"]
+
+    with pytest.raises(ValueError):
+        RequestLogHook(sample_rate=2)
+
+
+def test_enable_request_logging():
+    from easyllm.utils import tracing
+
+    hook = enable_request_logging(0.5)
+    try:
+        assert tracing._hooks == (hook,)
+        assert enable_request_logging(1.0) in tracing._hooks and hook not in tracing._hooks
+    finally:
+        disable_request_logging()
+    assert tracing._hooks == ()
@@ -0,0 +1,100 @@
+import http.client
+import math
+import threading
+from urllib.parse import urlsplit
+
+import pytest
+
+from easyllm.utils.metrics import ClientMetrics, MetricsRegistry, MetricsServer
+from easyllm.utils.tracing import add_hook, current_trace, remove_hook, traced
+
+
+@traced("fake", "chat")
+def create(messages, model=None, fail=False):
+    current_trace().phase("validate")
+    if fail:
+        error = ConnectionError("rate limited")
+        error.status_code = 429
+        raise error
+    return {"usage": {"prompt_tokens": 3, "completion_tokens": 2}}
+
+
+def test_updates_from_many_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter("requests_total", "Requests.", ("client",))
+    histogram = registry.histogram("latency_seconds", "Latency.", ("client",), buckets=(0.1, 1.0))
+
+    def work():
+        for i in range(10_000):
+            counter.inc(("a",))
+            histogram.observe(("a",), 0.5 if i % 2 else 5.0)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert counter.snapshot() == {("a",): 80_000}
+    latency = histogram.snapshot()[("a",)]
+    assert latency["buckets"] == {0.1: 0, 1.0: 40_000, math.inf: 80_000}
+    assert latency["sum"] == pytest.approx(40_000 * 5.5)
+    assert latency["count"] == 80_000
+
+
+def test_prometheus_text_format():
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests.", ("model",)).inc(('say "hi"',), 2)
+    registry.gauge("in_flight", "In flight.").inc(())
+    registry.histogram("latency_seconds", "Latency.", buckets=(0.5,)).observe((), 0.25)
+    with pytest.raises(ValueError):
+        registry.gauge("requests_total", "Requests.")
+
+    assert registry.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{model="say \\"hi\\""} 2',
+        "# HELP in_flight In flight.",
+        "# TYPE in_flight gauge",
+        "in_flight 1",
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.5"} 1',
+        'latency_seconds_bucket{le="+Inf"} 1',
+        "latency_seconds_sum 0.25",
+        "latency_seconds_count 1",
+    ]
+
+
+def test_client_metrics_and_scrape_endpoint():
+    registry = MetricsRegistry()
+    hook = add_hook(ClientMetrics(registry))
+    try:
+        create([], model="m")
+        create([], model="m")
+        with pytest.raises(ConnectionError):
+            create([], model="m", fail=True)
+    finally:
+        remove_hook(hook)
+
+    snapshot = registry.snapshot()
+    assert snapshot["easyllm_requests_total"] == {("fake", "m", "chat"): 3}
+    assert snapshot["easyllm_errors_total"] == {("fake", "m", "429"): 1}
+    assert snapshot["easyllm_completion_tokens_total"] == {("fake", "m"): 4}
+    assert snapshot["easyllm_requests_in_flight"] == {("fake", "m"): 0}
+    assert snapshot["easyllm_time_to_first_token_seconds"][("fake", "m")]["count"] == 2
+    assert snapshot["easyllm_request_duration_seconds"][("fake", "m")]["count"] == 3
+
+    server = MetricsServer(port=0, registry=registry)
+    url = urlsplit(server.start())
+    try:
+        conn = http.client.HTTPConnection(url.hostname, url.port)
+        conn.request("GET", "/metrics")
+        res = conn.getresponse()
+        body = res.read().decode()
+        conn.close()
+    finally:
+        server.stop()
+    assert res.status == 200
+    assert res.getheader("Content-Type").startswith("text/plain")
+    assert 'easyllm_prompt_tokens_total{client="fake",model="m"} 6' in body
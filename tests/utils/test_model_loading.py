@@ -0,0 +1,112 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pytest
+
+from easyllm.clients.huggingface import HuggingFaceClient
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils.model_loading import KeepWarm, ModelLoadingTimeout, ModelLoadingWaiter, loading_estimate
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body
+
+    def json(self):
+        if self.body is None:
+            raise ValueError("no json")
+        return self.body
+
+
+class LoadingModel:
+    """Answers 503 for the first `loading` requests, counting requests."""
+
+    def __init__(self, loading):
+        self.loading = loading
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def send(self, headers):
+        with self.lock:
+            self.requests.append(headers)
+            if len(self.requests) <= self.loading:
+                return FakeResponse(503, {"error": "Model m is currently loading", "estimated_time": 0.05})
+        return FakeResponse(200, {"generated_text": "ok"})
+
+
+def test_loading_estimate():
+    assert loading_estimate(FakeResponse(503, {"error": "loading", "estimated_time": 12.5})) == 12.5
+    assert loading_estimate(FakeResponse(503, {"error": "Model m is currently loading"})) == 0.0
+    assert loading_estimate(FakeResponse(503, {"error": "overloaded"})) is None
+    assert loading_estimate(FakeResponse(503)) is None
+    assert loading_estimate(FakeResponse(200, {"estimated_time": 1})) is None
+
+
+def test_waiter_collapses_concurrent_polls():
+    model = LoadingModel(loading=3)
+    waiter = ModelLoadingWaiter(min_interval=0.05)
+    barrier = threading.Barrier(8)
+
+    def call(_):
+        barrier.wait()
+        return waiter.request("m", model.send)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(call, range(8)))
+    assert all(res.status_code == 200 for res in results)
+    # 8 first attempts at most, then a single poller until the model is loaded, then the waiting requests
+    assert len(model.requests) <= 8 + 3 + 8
+    assert not waiter.is_loading("m")
+
+
+def test_waiter_wait_for_model_and_timeout():
+    model = LoadingModel(loading=1)
+    assert ModelLoadingWaiter(wait_for_model=True).request("m", model.send).status_code == 200
+    assert model.requests == [{}, {"X-Wait-For-Model": "true"}]
+
+    with pytest.raises(ModelLoadingTimeout):
+        ModelLoadingWaiter(max_wait=0.1, min_interval=0.05).request("m", LoadingModel(loading=100).send)
+
+
+@pytest.mark.parametrize("wait_for_model", [False, True])
+def test_huggingface_client_waits_for_loading_model(wait_for_model):
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001, loading_time=0.3), port=0)
+    url = server.start_in_background()
+    waiter = ModelLoadingWaiter(min_interval=0.05, wait_for_model=wait_for_model)
+    client = HuggingFaceClient(api_base=url, api_key="hf_test", prompt_builder="llama2", model_loading=waiter)
+    try:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = list(
+                executor.map(
+                    lambda _: client.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=2), range(6)
+                )
+            )
+    finally:
+        server.stop()
+    assert all(res["usage"]["completion_tokens"] == 2 for res in results)
+    # `InferenceClient` alone polls every second per request, here waiting requests leave polling to one request
+    assert server.loading_responses <= 6 + (0 if wait_for_model else 0.3 / 0.05 + 1)
+
+
+def test_keep_warm():
+    keep_warm = KeepWarm(None, ["m"], hours=(9, 17), weekdays=range(5))
+    assert keep_warm.is_active(datetime(2023, 9, 4, 9, 0))
+    assert not keep_warm.is_active(datetime(2023, 9, 4, 17, 0))
+    assert not keep_warm.is_active(datetime(2023, 9, 9, 12, 0))
+
+    pinged = threading.Event()
+
+    class Client:
+        def ping(self, model):
+            pinged.set()
+            raise ConnectionError("failures are logged")
+
+    keep_warm = KeepWarm(Client(), ["m"], interval=60).start()
+    try:
+        assert pinged.wait(5)
+    finally:
+        keep_warm.stop()
@@ -0,0 +1,39 @@
+import pytest
+
+from easyllm.utils.scoring import build_scores, continuation_logprobs, pair_inputs, split_logprobs
+
+np = pytest.importorskip("numpy")
+
+
+def test_continuation_logprobs_aligns_tokens():
+    prefill = [
+        {"id": 1, "text": "<s>", "logprob": None},
+        {"id": 2, "text": "▁Hello", "logprob": -1.0},
+        {"id": 3, "text": "▁wor", "logprob": -2.0},
+        {"id": 4, "text": "ld", "logprob": -0.5},
+    ]
+    assert continuation_logprobs(prefill, " world") == [-2.0, -0.5]
+    # a token spanning the boundary counts to the continuation
+    assert continuation_logprobs(prefill, "ld") == [-0.5]
+    assert continuation_logprobs(prefill, "rld") == [-2.0, -0.5]
+    with pytest.raises(ValueError):
+        continuation_logprobs(prefill, "<s>Hello world")
+
+
+def test_pair_inputs():
+    assert pair_inputs("Q:", [" a", " b"]) == [("Q:", " a"), ("Q:", " b")]
+    assert pair_inputs(["x", "y"], ["1", "2"]) == [("x", "1"), ("y", "2")]
+    with pytest.raises(ValueError):
+        pair_inputs(["x", "y"], ["1", "2", "3"])
+    with pytest.raises(ValueError):
+        pair_inputs("", "a")
+
+
+def test_build_and_split_scores():
+    scores = build_scores([[-1.0, -2.0], [], [-0.5]], prompt_tokens=7, model="m")
+    assert scores["offsets"].tolist() == [0, 2, 2, 3]
+    assert scores["num_tokens"].dtype == np.int32
+    assert scores["logprobs"].dtype == np.float32
+    assert scores["sum"].tolist() == [-3.0, 0.0, -0.5]
+    assert [item.tolist() for item in split_logprobs(scores)] == [[-1.0, -2.0], [], [-0.5]]
+    assert scores["usage"] == {"prompt_tokens": 7, "total_tokens": 7}
@@ -0,0 +1,52 @@
+import pytest
+
+from easyllm.clients.sagemaker import SageMakerClient
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils import serialization
+from easyllm.utils.serialization import dumps, loads, set_json_backend
+
+
+@pytest.fixture(params=["json", "orjson"])
+def json_backend(request):
+    pytest.importorskip(request.param)
+    previous = serialization.backend
+    yield set_json_backend(request.param)
+    set_json_backend(previous)
+
+
+def test_round_trip(json_backend):
+    body = {"inputs": "Grüße", "parameters": {"max_new_tokens": 4, "top_p": 0.5}}
+    encoded = dumps(body)
+    assert isinstance(encoded, bytes) and b" " not in encoded
+    assert loads(encoded) == body
+    assert loads(dumps({1: [1.5, -2.0]})) == {"1": [1.5, -2.0]}
+    assert loads(encoded.decode()) == loads(memoryview(encoded))
+
+    with pytest.raises(TypeError):
+        dumps({"unsupported": object()})
+    with pytest.raises(ValueError):
+        loads(b"{invalid")
+
+
+def test_numpy_arrays(json_backend):
+    np = pytest.importorskip("numpy")
+    assert loads(dumps({"vector": np.arange(3, dtype=np.float32)})) == {"vector": [0.0, 1.0, 2.0]}
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        set_json_backend("simplejson")
+
+
+def test_sagemaker_signs_the_sent_body(json_backend):
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001), port=0)
+    url = server.start_in_background()
+    bodies = []
+    client = SageMakerClient(api_base=f"{url}/endpoints", auth=lambda r: bodies.append(r.body) or r)
+    try:
+        res = client.Completion.create(prompt="Hello", model="m", max_tokens=2)
+    finally:
+        server.stop()
+    assert res["usage"]["completion_tokens"] == 2
+    (body,) = bodies
+    assert isinstance(body, bytes) and loads(body)["inputs"] == "Hello"
@@ -0,0 +1,41 @@
+import pytest
+import requests
+
+from easyllm.utils import text_generation
+from easyllm.utils.text_generation import (
+    parse_text_generation,
+    parse_text_generation_stream,
+    raise_text_generation_error,
+)
+
+
+def http_error(body):
+    response = requests.Response()
+    response.status_code = 422
+    response._content = body
+    return requests.HTTPError("422 Client Error", response=response)
+
+
+def test_parse_text_generation():
+    details = {"finish_reason": "length", "generated_tokens": 2, "seed": None, "prefill": [], "tokens": []}
+    res = parse_text_generation({"generated_text": "Hi", "details": details})
+    assert res.generated_text == "Hi" and res.details.generated_tokens == 2
+
+    token = {"id": 1, "text": "Hi", "logprob": -0.5, "special": False}
+    chunk = parse_text_generation_stream({"token": token, "generated_text": None, "details": None})
+    assert chunk.token.text == "Hi" and chunk.details is None
+
+
+def test_raise_text_generation_error(monkeypatch):
+    error = http_error(b'{"error": "Input too long", "error_type": "validation"}')
+    if text_generation.LEGACY_TEXT_GENERATION:
+        with pytest.raises(Exception, match="Input too long") as info:
+            raise_text_generation_error(error)
+        assert type(info.value).__name__ == "ValidationError"
+
+    # errors without a known `error_type` and versions without the legacy errors raise the `HTTPError`
+    with pytest.raises(requests.HTTPError):
+        raise_text_generation_error(http_error(b'{"error": "down"}'))
+    monkeypatch.setattr(text_generation, "LEGACY_TEXT_GENERATION", False)
+    with pytest.raises(requests.HTTPError):
+        raise_text_generation_error(error)
@@ -0,0 +1,130 @@
+import pytest
+
+from easyllm.server.mock import MockConfig, MockServer
+from easyllm.utils import tracing
+from easyllm.utils.tracing import NOOP_TRACE, TraceHook, add_hook, current_trace, remove_hook, traced
+
+MESSAGES = [{"role": "user", "content": "Hello!"}]
+
+
+class Recorder(TraceHook):
+    def __init__(self):
+        self.traces = []
+        self.phases = []
+
+    def on_phase(self, trace, phase, start, end):
+        assert start <= end
+        self.phases.append(phase)
+
+    def on_end(self, trace):
+        self.traces.append(trace)
+
+
+@pytest.fixture()
+def recorder():
+    hook = add_hook(Recorder())
+    yield hook
+    remove_hook(hook)
+
+
+def mock_server(**config):
+    server = MockServer(MockConfig(tokens_per_second=1000, ttft=0.001, embedding_dim=8, **config), port=0)
+    return server, server.start_in_background()
+
+
+@traced("fake", "chat")
+def create(messages, model=None, fail=False):
+    current_trace().phase("validate")
+    if fail:
+        raise ConnectionError("down")
+    return {"usage": {"prompt_tokens": 3, "completion_tokens": 2}}
+
+
+def test_disabled_tracing_is_a_noop():
+    assert tracing._hooks == ()
+    assert create(MESSAGES)["usage"]["completion_tokens"] == 2
+    assert current_trace() is NOOP_TRACE
+
+
+def test_traced_function(recorder):
+    create(MESSAGES, "m")
+    with pytest.raises(ConnectionError):
+        create(MESSAGES, model="m", fail=True)
+
+    ok, failed = recorder.traces
+    assert (ok.client, ok.operation, ok.model) == ("fake", "chat", "m")
+    assert [phase for phase, _, _ in ok.phases] == ["validate", "serialize"]
+    assert (ok.prompt_tokens, ok.completion_tokens, ok.error) == (3, 2, None)
+    assert ok.latency >= 0 and ok.ttft == ok.latency
+    assert isinstance(failed.error, ConnectionError)
+    assert current_trace() is NOOP_TRACE
+
+
+def test_huggingface_phases(recorder, monkeypatch):
+    from easyllm.clients import huggingface
+
+    server, url = mock_server()
+    monkeypatch.setattr(huggingface, "api_base", url)
+    monkeypatch.setattr(huggingface, "prompt_builder", "llama2")
+    try:
+        huggingface.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=4)
+        chunks = list(huggingface.ChatCompletion.create(messages=MESSAGES, max_tokens=3, stream=True))
+    finally:
+        server.stop()
+
+    trace, streamed = recorder.traces
+    assert [p for p, _, _ in trace.phases] == ["validate", "build_prompt", "connect", "complete", "serialize"]
+    assert trace.endpoint == f"{url}/m"
+    assert trace.completion_tokens == 4
+    assert [p for p, _, _ in streamed.phases] == [
+        "validate",
+        "build_prompt",
+        "connect",
+        "send",
+        "first_token",
+        "complete",
+    ]
+    assert streamed.stream and streamed.completion_tokens == len(chunks) - 2
+    assert streamed.ttft <= streamed.latency
+
+
+def test_sagemaker_error_status(recorder, monkeypatch):
+    from easyllm.clients import sagemaker
+
+    server, url = mock_server(error_rate=1.0)
+    monkeypatch.setattr(sagemaker, "api_base", url + "/endpoints")
+    monkeypatch.setattr(sagemaker, "aws_auth", lambda request: request)
+    monkeypatch.setattr(sagemaker, "prompt_builder", "llama2")
+    try:
+        with pytest.raises(Exception, match="Injected error"):
+            sagemaker.ChatCompletion.create(messages=MESSAGES, model="m", max_tokens=4)
+    finally:
+        server.stop()
+
+    (trace,) = recorder.traces
+    assert trace.status == 500
+    assert trace.error is not None
+    assert [p for p, _, _ in trace.phases][-1] == "complete"
+
+
+def test_opentelemetry_hook():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    hook = add_hook(tracing.OpenTelemetryHook(provider.get_tracer("test")))
+    try:
+        create(MESSAGES, model="m")
+    finally:
+        remove_hook(hook)
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    root = spans["easyllm.fake.chat"]
+    assert root.attributes["gen_ai.request.model"] == "m"
+    assert root.attributes["gen_ai.usage.completion_tokens"] == 2
+    assert spans["validate"].parent.span_id == root.context.span_id
+    assert root.start_time <= spans["validate"].start_time <= spans["serialize"].end_time <= root.end_time